@@ -1,7 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.utils.translation import gettext_lazy as _
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _, ngettext
+from .changelist import EstimatedCountPaginator, KeysetChangeList
 from .models import User, UserProfile
+from .pictures import picture_replaced
+from .search import filter_users, search_terms
 
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -10,10 +14,17 @@ class UserProfileInline(admin.StackedInline):
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
-    list_display = ('email', 'first_name', 'last_name', 'is_staff', 'is_verified', 'is_active', 'created_at')
+    list_display = ('email', 'first_name', 'last_name', 'location', 'is_staff', 'is_verified', 'is_active', 'created_at')
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'is_verified', 'created_at')
+    list_select_related = ('profile',)
     search_fields = ('email', 'first_name', 'last_name')
     ordering = ('-created_at',)
+    actions = ('activate_users', 'deactivate_users', 'mark_verified', 'unlock_accounts')
+
+    # Hundreds of thousands of rows: estimate the total and page by keyset
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    keyset_field = 'created_at'
     
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
@@ -37,6 +48,57 @@ class UserAdmin(BaseUserAdmin):
     readonly_fields = ('created_at', 'updated_at', 'last_login_ip')
     inlines = (UserProfileInline,)
 
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def save_model(self, request, obj, form, change):
+        replaced = 'profile_picture' in form.changed_data
+        # The form has already put the new upload on obj
+        previous_picture = getattr(form.initial.get('profile_picture'), 'name', None)
+        previous_variants = obj.profile_picture_variants
+        if replaced:
+            obj.profile_picture_variants = None
+        super().save_model(request, obj, form, change)
+        if replaced:
+            picture_replaced(obj, previous_picture, previous_variants)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Trigram indexes serve the plain icontains search on PostgreSQL and
+        # the FTS5 table stands in for them on SQLite; neither joins, so no
+        # duplicates
+        return filter_users(queryset, search_terms(search_term), self.search_fields), False
+
+    @admin.display(description=_('Location'), ordering='profile__location')
+    def location(self, user):
+        profile = getattr(user, 'profile', None)
+        return profile.location if profile is not None else ''
+
+    def update_selected(self, request, queryset, message, **changes):
+        """One UPDATE for the selection, however many rows "select all" covers"""
+        count = queryset.order_by().update(updated_at=timezone.now(), **changes)
+        self.message_user(request, ngettext(message[0], message[1], count) % {'count': count})
+
+    @admin.action(description=_('Activate selected users'), permissions=['change'])
+    def activate_users(self, request, queryset):
+        self.update_selected(request, queryset, ('%(count)d user activated.', '%(count)d users activated.'),
+                             is_active=True)
+
+    @admin.action(description=_('Deactivate selected users'), permissions=['change'])
+    def deactivate_users(self, request, queryset):
+        # Never the admin doing it, who would be signed out mid-action
+        self.update_selected(request, queryset.exclude(pk=request.user.pk),
+                             ('%(count)d user deactivated.', '%(count)d users deactivated.'), is_active=False)
+
+    @admin.action(description=_('Mark selected users as verified'), permissions=['change'])
+    def mark_verified(self, request, queryset):
+        self.update_selected(request, queryset, ('%(count)d user verified.', '%(count)d users verified.'),
+                             is_verified=True)
+
+    @admin.action(description=_('Unlock selected accounts'), permissions=['change'])
+    def unlock_accounts(self, request, queryset):
+        self.update_selected(request, queryset, ('%(count)d account unlocked.', '%(count)d accounts unlocked.'),
+                             failed_login_attempts=0, locked_until=None)
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'location', 'email_public', 'created_at')
@@ -9,7 +9,8 @@ class EmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         try:
             # Try to fetch user by email or username
-            user = User.objects.get(
+            # The profile is joined in for the login response
+            user = User.objects.select_related('profile').get(
                 Q(email=username) | Q(username=username)
             )
             
@@ -29,6 +30,7 @@ class EmailBackend(ModelBackend):
 
     def get_user(self, user_id):
         try:
-            return User.objects.get(pk=user_id)
+            # Profile responses read it straight away; other requests barely notice the join
+            return User.objects.select_related('profile').get(pk=user_id)
         except User.DoesNotExist:
             return None
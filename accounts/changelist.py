@@ -0,0 +1,127 @@
+"""
+Admin changelist pieces for tables too big to count or page by offset.
+
+EstimatedCountPaginator takes an unfiltered table's size from the planner's
+statistics (pg_class.reltuples) or SQLite's largest rowid. It only counts
+exactly when the estimate is under ADMIN_EXACT_COUNT_LIMIT. Filtered lists
+are counted up to that limit and shown as "more than" beyond it.
+
+KeysetChangeList pages the admin's default newest-first ordering by
+seeking past the last row shown, so every page costs the same index range
+scan as the first. Other orderings, picked from the column headers, fall
+back to numbered pages.
+"""
+
+import base64
+from django.conf import settings
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CURSOR_VAR = 'after'
+
+def estimate_rows(model, using='default'):
+    """A cheap row count for a whole table, or None if the backend has none"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            # -1 until the table is first analyzed
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            # Rowids only grow, so this overcounts by however many rows were deleted
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+            return cursor.fetchone()[0] or 0
+    return None
+
+class EstimatedCountPaginator(Paginator):
+    count_is_estimate = False
+    count_is_capped = False
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        queryset = self.object_list
+        if not queryset.query.has_filters():
+            estimate = estimate_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > limit:
+                self.count_is_estimate = True
+                return estimate
+        count = queryset.order_by()[:limit + 1].count()
+        if count > limit:
+            self.count_is_capped = True
+            return limit
+        return count
+
+def encode_cursor(value, pk):
+    raw = f'{value.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, pk = raw.split('|')
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise IncorrectLookupParameters('Invalid cursor')
+    value = parse_datetime(value)
+    if value is None:
+        raise IncorrectLookupParameters('Invalid cursor')
+    return value, pk
+
+class KeysetChangeList(ChangeList):
+    """
+    Newest-first pages addressed by the last row shown. The model admin's
+    ``keyset_field`` is a datetime it orders by, descending, with pk
+    breaking ties.
+    """
+    keyset = False
+    cursor = None
+    next_page_url = None
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_results(self, request):
+        # Filter, sort and search links start again from the newest row
+        self.params.pop(CURSOR_VAR, None)
+        self.filter_params.pop(CURSOR_VAR, None)
+        if self.params.get(ORDER_VAR) or self.show_all:
+            return super().get_results(request)
+
+        field = self.model_admin.keyset_field
+        queryset = self.queryset
+        self.cursor = request.GET.get(CURSOR_VAR)
+        if self.cursor:
+            value, pk = decode_cursor(self.cursor)
+            try:
+                pk = self.lookup_opts.pk.to_python(pk)
+            except ValidationError:
+                raise IncorrectLookupParameters('Invalid cursor')
+            # The first condition bounds the index range scan; the second only
+            # breaks ties between rows created at the same instant.
+            queryset = queryset.filter(**{f'{field}__lte': value}).exclude(**{field: value, 'pk__gte': pk})
+        # One extra row tells whether another page follows
+        rows = list(queryset.order_by(f'-{field}', '-pk')[:self.list_per_page + 1])
+        page = rows[:self.list_per_page]
+        if len(rows) > len(page):
+            last = page[-1]
+            self.next_page_url = self.get_query_string({CURSOR_VAR: encode_cursor(getattr(last, field), last.pk)})
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.result_list = page
+        self.can_show_all = False
+        self.multi_page = bool(self.cursor or self.next_page_url)
+        self.first_page_url = self.get_query_string()
+        self.keyset = True
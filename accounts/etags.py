@@ -0,0 +1,68 @@
+"""
+Version-stamp ETags for conditional GETs and optimistic concurrency.
+
+An ETag here is a hash of the stamps a payload is built from (row
+``updated_at`` values, chama ledger versions), never of the payload itself.
+So a request whose ``If-None-Match`` still matches is answered with a 304
+before anything is serialized, and a PUT whose ``If-Match`` no longer
+matches is refused before anything is written.
+
+Stamps also cover the negotiated renderer and the host, which change the
+bytes (the browsable API, absolute media URLs), so the tags are strong.
+"""
+
+import hashlib
+import time
+from django.conf import settings
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import User, UserProfile
+
+def make_etag(request, *stamps):
+    parts = (request.accepted_renderer.format, request.get_host(), *stamps)
+    return '"%s"' % hashlib.sha256('|'.join(map(str, parts)).encode()).hexdigest()[:32]
+
+def _opaque(tag):
+    return tag[2:] if tag.startswith('W/') else tag
+
+def not_modified(request, etag):
+    """A 304 if ``If-None-Match`` still matches ``etag``, else None"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return None
+    tags = parse_etags(header)
+    if '*' in tags or etag in {_opaque(tag) for tag in tags}:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return None
+
+def precondition_failed(request, etag):
+    """A 412 if ``If-Match`` is sent and no longer matches ``etag``, else None"""
+    header = request.headers.get('If-Match')
+    if not header:
+        return None
+    # If-Match uses strong comparison: weak tags never match
+    tags = parse_etags(header)
+    if '*' in tags or etag in tags:
+        return None
+    return Response(
+        {'error': 'The profile has changed since you loaded it'},
+        status=status.HTTP_412_PRECONDITION_FAILED, headers={'ETag': etag},
+    )
+
+def profile_etag(request, user):
+    """The profile's ``updated_at`` comes from ``select_related('profile')`` if it was used, else one query"""
+    if User.profile.related.is_cached(user):
+        profile = getattr(user, 'profile', None)
+        profile_updated = profile.updated_at if profile is not None else None
+    else:
+        profile_updated = UserProfile.objects.filter(user=user).values_list('updated_at', flat=True).first()
+    # last_login is saved without touching updated_at but is part of the payload
+    return make_etag(request, 'profile', user.pk, user.updated_at, user.last_login, profile_updated)
+
+def dashboard_etag(request, user, chama_id, role, versions):
+    # Payloads also age (this month's totals, the next meeting), so a tag
+    # lasts no longer than the dashboard cache's own backstop timeout
+    window = int(time.time() // settings.DASHBOARD_CACHE_TIMEOUT)
+    return make_etag(request, 'dashboard', user.pk, chama_id, role, *versions, window)
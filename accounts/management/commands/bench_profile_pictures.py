@@ -0,0 +1,139 @@
+import ctypes
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from accounts.pictures import VARIANT_FORMATS, VARIANT_SIZES, inspect_picture, render_variants
+from chamas.bench import rolled_back, timer
+
+PROFILE_URL = '/api/v1/accounts/users/profile/'
+
+def photo(width, height):
+    """A JPEG that compresses like a photo: noisy channels over a gradient"""
+    noise = Image.effect_noise((width, height), 48)
+    gradient = Image.linear_gradient('L').resize((width, height))
+    image = Image.merge('RGB', [noise, gradient, Image.blend(noise, gradient, 0.5)])
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+def render_in_full(file):
+    """Variants the straightforward way: decode everything, then resize"""
+    rendered = {}
+    with Image.open(file) as source:
+        image = ImageOps.exif_transpose(source).convert('RGB')
+    for label, size in VARIANT_SIZES.items():
+        variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        for extension, (picture_format, options) in VARIANT_FORMATS.items():
+            buffer = io.BytesIO()
+            variant.save(buffer, picture_format, **options)
+            rendered[label, extension] = buffer.getvalue()
+    return rendered
+
+def _status_kib(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+
+def peak_memory(function, data):
+    """MiB a fresh fork's resident size peaks above its start while running ``function`` once (Linux)"""
+    read, write = os.pipe()
+    pid = os.fork()
+    if not pid:
+        # Hand memory freed by earlier runs back, so it is not silently reused,
+        # then start the fork's high-water mark from its current size
+        Image.core.clear_cache()
+        ctypes.CDLL(None).malloc_trim(0)
+        with open('/proc/self/clear_refs', 'w') as refs:
+            refs.write('5')
+        before = _status_kib('VmRSS')
+        function(io.BytesIO(data))
+        os.write(write, str(_status_kib('VmHWM') - before).encode())
+        os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as pipe:
+        grown = int(pipe.read())
+    os.waitpid(pid, 0)
+    return grown / 1024
+
+class Command(BaseCommand):
+    help = 'Time profile picture validation and resizing for large phone photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--width', type=int, default=5472)
+        parser.add_argument('--height', type=int, default=3648)
+        parser.add_argument('--pictures', type=int, default=12, help='Pictures rendered through the pool')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def best(self, function, data):
+        times = []
+        for _ in range(self.repeat):
+            with timer() as took:
+                function(io.BytesIO(data))
+            times.append(took['seconds'])
+        return min(times)
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        width, height = options['width'], options['height']
+        data = photo(width, height)
+        self.stdout.write(
+            f'{width}x{height} JPEG ({width * height / 1e6:.0f} MP), {len(data) / 1e6:.1f} MB, {os.cpu_count()} CPUs'
+        )
+
+        # Validation: DRF's ImageField opens and verifies, the header check only parses
+        image_field = serializers.ImageField()
+        upload = lambda file: SimpleUploadedFile('photo.jpg', file.getvalue(), 'image/jpeg')
+        self.stdout.write(f"{'':<28} {'time':>10} {'peak RSS':>10}")
+        for label, function in (
+            ('ImageField validation', lambda file: image_field.to_internal_value(upload(file))),
+            ('Header check', inspect_picture),
+            ('Variants, full decode', render_in_full),
+            ('Variants, draft decode', render_variants),
+        ):
+            seconds = self.best(function, data)
+            self.stdout.write(f'{label:<28} {seconds * 1000:>7.1f} ms {peak_memory(function, data):>6.0f} MiB')
+
+        # Throughput of the background pool at the configured size, and of one thread
+        workers = settings.PICTURE_BACKGROUND_WORKERS or 1
+        for label, function in (('full decode', render_in_full), ('draft decode', render_variants)):
+            for threads in sorted({1, workers}):
+                with ThreadPoolExecutor(threads) as pool, timer() as took:
+                    list(pool.map(function, (io.BytesIO(data) for _ in range(options['pictures']))))
+                self.stdout.write(
+                    f"Pool of {threads}, {label}: {options['pictures'] / took['seconds']:.2f} pictures/s"
+                )
+
+        # The upload request itself: streamed to disk, header checked, no resizing
+        media = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media), rolled_back():
+                user = User.objects.create_user(
+                    email='pictures@example.com', username='pictures', password='!', phone_number='254700000000',
+                )
+                client = APIClient()
+                client.force_authenticate(user)
+                times = []
+                for _ in range(self.repeat):
+                    body = {'profile_picture': SimpleUploadedFile('photo.jpg', data, 'image/jpeg')}
+                    start = time.perf_counter()
+                    response = client.put(PROFILE_URL, body, format='multipart', HTTP_HOST='localhost')
+                    times.append(time.perf_counter() - start)
+                    assert response.status_code == 200, response.content
+            self.stdout.write(f'Profile upload request: {min(times) * 1000:.0f} ms')
+        finally:
+            shutil.rmtree(media, ignore_errors=True)
+
+        self.stdout.write(self.style.SUCCESS('Profile picture benchmark complete'))
@@ -0,0 +1,90 @@
+import timeit
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+
+from accounts.models import User, UserProfile
+from accounts.serializers import UserReadSerializer, UserSerializer
+from chamas.bench import rolled_back, timer
+
+class Command(BaseCommand):
+    help = 'Time UserSerializer against the compiled read path over many users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def seed(self, count, batch_size):
+        now = timezone.now()
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=f'serializer-{i}@example.com',
+                    username=f'serializer-{i}',
+                    first_name='Member',
+                    last_name=str(i),
+                    phone_number=f'2547{i:08d}',
+                    password='!',
+                    last_login=now,
+                    profile_picture=f'profile_pictures/{i}.jpg' if i % 2 else '',
+                )
+                for i in range(count)
+            ],
+            batch_size=batch_size,
+        )
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=user, bio=f'Member number {i}') for i, user in enumerate(users)],
+            batch_size=batch_size,
+        )
+        return [user.pk for user in users]
+
+    def run(self, label, queryset, serializer_class, context):
+        """Load the users, then serialize them; lazy profile queries count as serializing"""
+        queries = []
+        with connection.execute_wrapper(lambda execute, *args: queries.append(1) or execute(*args)):
+            with timer() as load:
+                users = list(queryset)
+            with timer() as dump:
+                data = serializer_class(users, many=True, context=context).data
+        seconds = dump['seconds']
+        self.stdout.write(
+            f"{label:<36} {load['seconds']:>7.3f} s {seconds:>9.3f} s {seconds / len(data) * 1e6:>8.1f} us "
+            f'{len(queries):>8,}'
+        )
+        return data, seconds
+
+    def handle(self, *args, **options):
+        context = {'request': RequestFactory().get('/', HTTP_HOST='localhost')}
+        with rolled_back():
+            pks = self.seed(options['users'], options['batch_size'])
+            users = User.objects.filter(pk__in=pks).order_by('last_name')
+            self.stdout.write(f'Serializing {len(pks):,} users with profiles')
+            self.stdout.write(f"{'':<36} {'load':>9} {'serialize':>11} {'per user':>11} {'queries':>8}")
+
+            _, lazy = self.run('UserSerializer, profile per user', users, UserSerializer, context)
+            expected, joined = self.run(
+                'UserSerializer, select_related', users.select_related('profile'), UserSerializer, context,
+            )
+            actual, compiled = self.run(
+                'UserReadSerializer, select_related', users.select_related('profile'), UserReadSerializer, context,
+            )
+            assert actual == expected, 'UserReadSerializer output differs from UserSerializer'
+
+            # One user per request, as register, login and the profile view serialize
+            user = users.select_related('profile').first()
+            per_request = []
+            for serializer_class in (UserSerializer, UserReadSerializer):
+                function = lambda: serializer_class(user, context=context).data
+                number, _ = timeit.Timer(function).autorange()
+                per_request.append(min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6)
+
+        self.stdout.write(
+            f'Speedup over select_related UserSerializer: {joined / compiled:.1f}x '
+            f'(over the per-user profile queries: {lazy / compiled:.1f}x)'
+        )
+        self.stdout.write(
+            f'Single user: UserSerializer {per_request[0]:.1f} us, UserReadSerializer {per_request[1]:.1f} us '
+            f'({per_request[0] / per_request[1]:.1f}x)'
+        )
+        self.stdout.write(self.style.SUCCESS('User serializer benchmark complete'))
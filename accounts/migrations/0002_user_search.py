@@ -0,0 +1,72 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    # External content: the index stores no copy of the rows, only trigrams
+    # pointing at auth_user's rowid
+    """
+    CREATE VIRTUAL TABLE user_search USING fts5(
+        email, first_name, last_name, content='auth_user', content_rowid='rowid', tokenize='trigram'
+    )
+    """,
+    "INSERT INTO user_search(user_search) VALUES ('rebuild')",
+    """
+    CREATE TRIGGER user_search_insert AFTER INSERT ON auth_user BEGIN
+        INSERT INTO user_search(rowid, email, first_name, last_name)
+        VALUES (new.rowid, new.email, new.first_name, new.last_name);
+    END
+    """,
+    """
+    CREATE TRIGGER user_search_delete AFTER DELETE ON auth_user BEGIN
+        INSERT INTO user_search(user_search, rowid, email, first_name, last_name)
+        VALUES ('delete', old.rowid, old.email, old.first_name, old.last_name);
+    END
+    """,
+    # Logins and profile saves touch other columns and leave the index alone
+    """
+    CREATE TRIGGER user_search_update AFTER UPDATE OF email, first_name, last_name ON auth_user BEGIN
+        INSERT INTO user_search(user_search, rowid, email, first_name, last_name)
+        VALUES ('delete', old.rowid, old.email, old.first_name, old.last_name);
+        INSERT INTO user_search(rowid, email, first_name, last_name)
+        VALUES (new.rowid, new.email, new.first_name, new.last_name);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS user_search_update',
+    'DROP TRIGGER IF EXISTS user_search_delete',
+    'DROP TRIGGER IF EXISTS user_search_insert',
+    'DROP TABLE IF EXISTS user_search',
+]
+
+# Serve Django's icontains, which compiles to UPPER(column::text) LIKE UPPER(%s)
+POSTGRES_FORWARD = ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+    f'CREATE INDEX IF NOT EXISTS auth_user_{column}_trgm ON auth_user USING gin (UPPER({column}::text) gin_trgm_ops)'
+    for column in ('email', 'first_name', 'last_name')
+]
+
+POSTGRES_REVERSE = [
+    f'DROP INDEX IF EXISTS auth_user_{column}_trgm' for column in ('email', 'first_name', 'last_name')
+]
+
+def run(statements):
+    def apply(apps, schema_editor):
+        vendor_statements = statements.get(schema_editor.connection.vendor, [])
+        with schema_editor.connection.cursor() as cursor:
+            for statement in vendor_statements:
+                cursor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
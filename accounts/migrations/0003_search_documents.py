@@ -0,0 +1,131 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:15
+
+import django.db.models.deletion
+from collections import defaultdict
+from django.conf import settings
+from django.db import migrations, models
+
+from accounts.search import document_values
+
+COLUMNS = 'name, email, phone, location, chamas'
+VALUES = 'new.name, new.email, new.phone, new.location, new.chamas'
+OLD_VALUES = 'old.name, old.email, old.phone, old.location, old.chamas'
+
+SQLITE_FORWARD = [
+    # Word prefixes, with 1- to 3-character prefixes indexed for type-ahead.
+    # The documents' integer id is a stable rowid to key the index by.
+    f"""
+    CREATE VIRTUAL TABLE member_search USING fts5(
+        {COLUMNS}, content='accounts_search_document', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )
+    """,
+    # The index's distinct words per column, for correcting typos
+    'CREATE VIRTUAL TABLE member_search_vocab USING fts5vocab(member_search, col)',
+    f"""
+    CREATE TRIGGER member_search_insert AFTER INSERT ON accounts_search_document BEGIN
+        INSERT INTO member_search(rowid, {COLUMNS}) VALUES (new.id, {VALUES});
+    END
+    """,
+    f"""
+    CREATE TRIGGER member_search_delete AFTER DELETE ON accounts_search_document BEGIN
+        INSERT INTO member_search(member_search, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES});
+    END
+    """,
+    # Upserts rewrite every column; only real changes touch the index
+    f"""
+    CREATE TRIGGER member_search_update AFTER UPDATE ON accounts_search_document
+    WHEN old.name IS NOT new.name OR old.email IS NOT new.email OR old.phone IS NOT new.phone
+        OR old.location IS NOT new.location OR old.chamas IS NOT new.chamas
+    BEGIN
+        INSERT INTO member_search(member_search, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES});
+        INSERT INTO member_search(rowid, {COLUMNS}) VALUES (new.id, {VALUES});
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS member_search_update',
+    'DROP TRIGGER IF EXISTS member_search_delete',
+    'DROP TRIGGER IF EXISTS member_search_insert',
+    'DROP TABLE IF EXISTS member_search_vocab',
+    'DROP TABLE IF EXISTS member_search',
+]
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    # Names and phone numbers outrank email and location. Chama tokens get
+    # weight D, which searched words never match.
+    """
+    ALTER TABLE accounts_search_document ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', name), 'A') || setweight(to_tsvector('simple', phone), 'A')
+        || setweight(to_tsvector('simple', email), 'B') || setweight(to_tsvector('simple', location), 'C')
+        || setweight(to_tsvector('simple', chamas), 'D')
+    ) STORED
+    """,
+    'CREATE INDEX accounts_search_document_vector ON accounts_search_document USING gin (search_vector)',
+    # Typo-tolerant name matches (word_similarity)
+    'CREATE INDEX accounts_search_document_name_trgm ON accounts_search_document USING gin (name gin_trgm_ops)',
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS accounts_search_document_name_trgm',
+    'DROP INDEX IF EXISTS accounts_search_document_vector',
+    'ALTER TABLE accounts_search_document DROP COLUMN IF EXISTS search_vector',
+]
+
+def run(statements):
+    def apply(apps, schema_editor):
+        with schema_editor.connection.cursor() as cursor:
+            for statement in statements.get(schema_editor.connection.vendor, []):
+                cursor.execute(statement)
+    return apply
+
+def backfill(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Membership = apps.get_model('chamas', 'Membership')
+    SearchDocument = apps.get_model('accounts', 'SearchDocument')
+    chamas = defaultdict(list)
+    for user_id, chama_id in Membership.objects.filter(is_active=True).values_list('user_id', 'chama_id'):
+        chamas[user_id].append(chama_id)
+    batch = []
+    for user in User.objects.select_related('profile').order_by('pk').iterator(chunk_size=2000):
+        profile = getattr(user, 'profile', None)
+        values = document_values(user, profile.location if profile else '', chamas[user.pk])
+        batch.append(SearchDocument(user=user, **values))
+        if len(batch) == 2000:
+            SearchDocument.objects.bulk_create(batch)
+            batch = []
+    SearchDocument.objects.bulk_create(batch)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_search'),
+        ('chamas', '0016_notification_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=301)),
+                ('email', models.CharField(max_length=254)),
+                ('phone', models.CharField(blank=True, help_text='The number in international, local and short forms', max_length=64)),
+                ('location', models.CharField(blank=True, max_length=100)),
+                ('chamas', models.TextField(blank=True, help_text='A token per chama the user is an active member of')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Search Document',
+                'verbose_name_plural': 'Search Documents',
+                'db_table': 'accounts_search_document',
+            },
+        ),
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_search_documents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, help_text='Resized copies of the picture: size -> format -> stored file; null until rendered', null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:11
+
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_profile_picture_variants'),
+    ]
+
+    # Storage lives in Python only. SQLite's schema editor would still rebuild
+    # auth_user for the AlterField, dropping the user_search triggers
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='user',
+                    name='profile_picture',
+                    field=models.ImageField(blank=True, null=True, storage=accounts.models.content_addressed_storage, upload_to='profile_pictures/'),
+                ),
+            ],
+        ),
+    ]
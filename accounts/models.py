@@ -1,10 +1,15 @@
 import uuid
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.core.files.storage import storages
 from django.db import models
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 import re
 
+def content_addressed_storage():
+    """The 'pictures' storage from STORAGES: files named by content hash (see config.media)"""
+    return storages['pictures']
+
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         """
@@ -62,7 +67,12 @@ class User(AbstractUser):
     
     # Profile fields
     date_of_birth = models.DateField(null=True, blank=True)
-    profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True)
+    profile_picture = models.ImageField(
+        upload_to='profile_pictures/', storage=content_addressed_storage, null=True, blank=True
+    )
+    profile_picture_variants = models.JSONField(
+        null=True, blank=True, help_text='Resized copies of the picture: size -> format -> stored file; null until rendered'
+    )
     
     # Override username to be non-required since we're using email
     username = models.CharField(
@@ -125,7 +135,7 @@ class User(AbstractUser):
         """Reset failed login attempts and unlock account"""
         self.failed_login_attempts = 0
         self.locked_until = None
-        self.save()
+        self.save(update_fields=['failed_login_attempts', 'locked_until', 'updated_at'])
 
     def record_failed_login(self):
         """Record a failed login attempt and lock account if threshold exceeded"""
@@ -135,14 +145,17 @@ class User(AbstractUser):
         if self.failed_login_attempts >= 5:
             self.locked_until = timezone.now() + timezone.timedelta(minutes=30)
         
-        self.save()
+        self.save(update_fields=['failed_login_attempts', 'locked_until', 'updated_at'])
 
     def record_successful_login(self, ip_address=None):
         """Record a successful login"""
         self.last_login = timezone.now()
         self.last_login_ip = ip_address
-        self.reset_failed_logins()
-        self.save()
+        self.failed_login_attempts = 0
+        self.locked_until = None
+        self.save(update_fields=[
+            'last_login', 'last_login_ip', 'failed_login_attempts', 'locked_until', 'updated_at',
+        ])
 
 class UserProfile(models.Model):
     """Extended user profile for additional information"""
@@ -172,3 +185,24 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return f"{self.user.email}'s Profile"
+
+class SearchDocument(models.Model):
+    """
+    The text the member directory searches for a user, copied from the user,
+    their profile and their memberships. Signals keep it current; migration
+    0003 indexes it (a tsvector and trigrams on PostgreSQL, FTS5 on SQLite).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='search_document')
+    name = models.CharField(max_length=301)
+    email = models.CharField(max_length=254)
+    phone = models.CharField(max_length=64, blank=True, help_text='The number in international, local and short forms')
+    location = models.CharField(max_length=100, blank=True)
+    chamas = models.TextField(blank=True, help_text='A token per chama the user is an active member of')
+
+    class Meta:
+        db_table = 'accounts_search_document'
+        verbose_name = 'Search Document'
+        verbose_name_plural = 'Search Documents'
+
+    def __str__(self):
+        return self.name
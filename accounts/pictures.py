@@ -0,0 +1,212 @@
+"""
+Profile picture uploads and their resized variants.
+
+Uploads go through PictureUploadHandler, which always spools the file to
+disk and stops reading once it passes PROFILE_PICTURE_MAX_BYTES.
+``inspect_picture`` then checks the format and dimensions from the image
+header alone, without decoding any pixels.
+
+After the upload commits, a small thread pool renders square WebP and JPEG
+copies in each of VARIANT_SIZES. Pillow releases the GIL while decoding,
+resizing and encoding, so the threads run in parallel. JPEG sources are
+decoded straight to a 1/2 to 1/8 scale (``Image.draft``), so a 20 MP photo
+never sits in memory at full resolution. The variants carry no EXIF data,
+so camera GPS tags stay out of them. ``User.profile_picture_variants``
+maps each size and format to its stored file; it is null until rendering
+finishes. Originals and variants alike are stored by content hash
+(config.media), so the same photo uploaded twice is stored once.
+"""
+
+import io
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps, UnidentifiedImageError
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import connection, transaction
+from django.http.multipartparser import MultiPartParserError
+from django.utils import timezone
+
+from chamas.cache import invalidate_user
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+# Pillow's names; MPO is the multi-picture JPEG some phones write
+PICTURE_FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP'}
+MAX_PICTURE_PIXELS = 50_000_000
+
+# Edge in pixels of each square variant
+VARIANT_SIZES = {'small': 96, 'medium': 320, 'large': 800}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANT_DIRECTORY = 'profile_pictures/variants'
+
+def picture_storage():
+    return User._meta.get_field('profile_picture').storage
+
+# ============================================================================
+# Uploads
+# ============================================================================
+
+class PictureTooLarge(MultiPartParserError):
+    pass
+
+class PictureUploadHandler(TemporaryFileUploadHandler):
+    """Spools every file to disk, and stops once one passes PROFILE_PICTURE_MAX_BYTES"""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.PROFILE_PICTURE_MAX_BYTES:
+            self.file.close()
+            limit = settings.PROFILE_PICTURE_MAX_BYTES / (1024 * 1024)
+            raise PictureTooLarge(f'Profile pictures can be at most {limit:g} MB.')
+        return super().receive_data_chunk(raw_data, start)
+
+def inspect_picture(file):
+    """``(format, width, height)`` from the image header; ValidationError if unusable"""
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            picture_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+        picture_format = None
+    finally:
+        file.seek(0)
+    if picture_format not in PICTURE_FORMATS:
+        raise ValidationError('Upload a JPEG, PNG or WebP image.')
+    if width * height > MAX_PICTURE_PIXELS:
+        raise ValidationError(f'Pictures can be at most {MAX_PICTURE_PIXELS // 1_000_000} megapixels.')
+    return picture_format, width, height
+
+# ============================================================================
+# Variants
+# ============================================================================
+
+def _flatten(image):
+    """RGB, with any transparency laid over white"""
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+def render_variants(file):
+    """Every variant of an image file, encoded: ``{(size, extension): bytes}``"""
+    rendered = {}
+    with Image.open(file) as source:
+        largest = max(VARIANT_SIZES.values())
+        # JPEG only; other formats ignore it and decode in full
+        source.draft('RGB', (largest, largest))
+        image = _flatten(ImageOps.exif_transpose(source))
+    # Largest first, each resized from the one before
+    for label, size in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+        edge = min(size, *image.size)
+        image = ImageOps.fit(image, (edge, edge), Image.Resampling.LANCZOS)
+        for extension, (picture_format, options) in VARIANT_FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, picture_format, **options)
+            rendered[label, extension] = buffer.getvalue()
+    return rendered
+
+def delete_variants(variants):
+    storage = picture_storage()
+    for formats in (variants or {}).values():
+        for name in formats.values():
+            storage.delete(name)
+
+def release_variants(picture, variants):
+    """Delete a picture's variants unless another user still has the picture, and with it the files"""
+    if not picture or not User.objects.filter(profile_picture=picture).exists():
+        delete_variants(variants)
+
+def process_picture(user_id):
+    """Render and store a user's variants; returns the new map, or None if there was nothing to do"""
+    source = User.objects.filter(pk=user_id).values_list('profile_picture', flat=True).first()
+    if not source:
+        return None
+    storage = picture_storage()
+    with storage.open(source) as file:
+        rendered = render_variants(file)
+    root = posixpath.splitext(posixpath.basename(source))[0]
+    variants = {}
+    for (label, extension), data in rendered.items():
+        name = storage.save(f'{VARIANT_DIRECTORY}/{root}-{label}.{extension}', ContentFile(data))
+        variants.setdefault(label, {})[extension] = name
+    # Only if no newer upload replaced the picture while this one rendered.
+    # updated_at moves the profile's ETag on, so clients see the variants
+    updated = User.objects.filter(pk=user_id, profile_picture=source).update(
+        profile_picture_variants=variants, updated_at=timezone.now(),
+    )
+    if not updated:
+        release_variants(source, variants)
+        return None
+    transaction.on_commit(lambda: invalidate_user(user_id))
+    return variants
+
+# ============================================================================
+# Background Jobs
+# ============================================================================
+
+_executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PICTURE_BACKGROUND_WORKERS, thread_name_prefix='profile-picture'
+        )
+    return _executor
+
+def _process_in_thread(user_id):
+    try:
+        process_picture(user_id)
+    except Exception:
+        logger.exception('Profile picture for user %s failed', user_id)
+    finally:
+        # Worker threads own their own connections
+        connection.close()
+
+def picture_replaced(user, previous_picture, previous_variants):
+    """
+    Once the current transaction commits, drop the old picture's variants
+    and render the new one's.
+
+    Pictures are stored by content, so users who uploaded the same image
+    share its file and its variants; those are kept while anyone still has
+    it. With PICTURE_BACKGROUND_WORKERS set to 0 the picture waits for the
+    process_profile_pictures command instead.
+    """
+    def start():
+        release_variants(previous_picture, previous_variants)
+        if settings.PICTURE_BACKGROUND_WORKERS and user.profile_picture:
+            _get_executor().submit(_process_in_thread, user.pk)
+    transaction.on_commit(start)
+
+def run_pending(limit=None):
+    """Render pictures still without variants in this process; returns how many were rendered"""
+    pending = (
+        User.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        .filter(profile_picture_variants__isnull=True).order_by('updated_at')
+    )
+    count = 0
+    for user_id in pending.values_list('pk', flat=True)[:limit]:
+        try:
+            rendered = process_picture(user_id)
+        except Exception:
+            # Left pending; the next run tries it again
+            logger.exception('Profile picture for user %s failed', user_id)
+            continue
+        if rendered is not None:
+            count += 1
+    return count
@@ -0,0 +1,155 @@
+"""
+Search over users: substring search for the admin, and the documents
+behind the member directory.
+
+On PostgreSQL, pg_trgm GIN indexes on each searched column serve Django's
+icontains lookups, so searches keep their usual form and semantics. SQLite
+has no such index. There, the ``user_search`` FTS5 table answers the same
+case-insensitive substring matches. It uses the trigram tokenizer with
+auth_user as external content, and triggers keep it in step. Both are
+created by accounts migration 0002.
+
+A trigram needs three characters, so shorter terms fall back to icontains.
+The FTS5 table is keyed by auth_user's rowid, which VACUUM may renumber.
+Run ``rebuild_search_index()`` after one.
+
+The member directory (chamas.directory) searches SearchDocument rows.
+Each row holds a user's name, email, profile location, phone number in the
+forms people type it, and a token per chama they are an active member of.
+``update_search_documents`` writes them from User, UserProfile and
+Membership saves.
+"""
+
+import re
+from collections import defaultdict
+from uuid import UUID
+from django.db import connections
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.text import smart_split, unescape_string_literal
+
+from chamas.models import Membership
+
+from .models import SearchDocument, User, UserProfile
+
+SEARCH_TABLE = 'user_search'
+SEARCH_FIELDS = ('email', 'first_name', 'last_name')
+MIN_TERM_LENGTH = 3
+
+def search_terms(query):
+    """Whitespace-separated terms, with quoted phrases kept whole as in the admin"""
+    terms = []
+    for bit in smart_split(query):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        if bit:
+            terms.append(bit)
+    return terms
+
+def fts_phrase(term):
+    """An FTS5 string matching ``term`` anywhere in any indexed column"""
+    return '"' + term.replace('"', '""') + '"'
+
+def fts_match(queryset, terms):
+    """A condition on the user's rowid: email or names contain every term"""
+    table = connections[queryset.db].ops.quote_name(queryset.model._meta.db_table)
+    return RawSQL(
+        f'{table}.rowid IN (SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s)',
+        [' AND '.join(fts_phrase(term) for term in terms)],
+        output_field=BooleanField(),
+    )
+
+def filter_users(queryset, terms, fields=SEARCH_FIELDS):
+    """``queryset`` narrowed to users with every term in one of ``fields``"""
+    indexed = []
+    if connections[queryset.db].vendor == 'sqlite' and set(fields) == set(SEARCH_FIELDS):
+        indexed = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+        if indexed:
+            queryset = queryset.filter(fts_match(queryset, indexed))
+    for term in terms:
+        if term not in indexed:
+            queryset = queryset.filter(Q.create([(f'{field}__icontains', term) for field in fields], connector=Q.OR))
+    return queryset
+
+def rebuild_search_index(using='default'):
+    """Re-read every user into the SQLite index; a no-op elsewhere"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+# ============================================================================
+# Member directory documents
+# ============================================================================
+
+# Saves touching only other fields (logins, lockouts) leave documents alone
+INDEXED_USER_FIELDS = frozenset({'first_name', 'last_name', 'email', 'phone_number'})
+INDEXED_PROFILE_FIELDS = frozenset({'location'})
+
+def phone_forms(number):
+    """A Kenyan number as people type it: 2547..., 07... and 7..."""
+    digits = re.sub(r'\D', '', number or '')
+    if digits.startswith('254') and len(digits) == 12:
+        return f'{digits} 0{digits[3:]} {digits[3:]}'
+    if digits.startswith('0') and len(digits) == 10:
+        return f'254{digits[1:]} {digits} {digits[1:]}'
+    return digits
+
+def chama_token(chama_id):
+    """The word a document holds for each chama its user is active in"""
+    return f'c{UUID(str(chama_id)).hex}'
+
+def chama_tokens(chama_ids):
+    return ' '.join(sorted(chama_token(chama_id) for chama_id in chama_ids))
+
+def document_values(user, location='', chama_ids=()):
+    return {
+        'name': f'{user.first_name} {user.last_name}'.strip(),
+        'email': user.email,
+        'phone': phone_forms(user.phone_number),
+        'location': location or '',
+        'chamas': chama_tokens(chama_ids),
+    }
+
+def _location(user):
+    if User.profile.related.is_cached(user):
+        profile = getattr(user, 'profile', None)
+        return profile.location if profile is not None else ''
+    return UserProfile.objects.filter(user=user).values_list('location', flat=True).first() or ''
+
+def update_search_documents(users, batch_size=2000):
+    """Write the users' documents in one upsert per batch"""
+    chama_ids = defaultdict(list)
+    memberships = Membership.objects.unscoped().filter(user__in=[user.pk for user in users], is_active=True)
+    for user_id, chama_id in memberships.values_list('user_id', 'chama_id'):
+        chama_ids[user_id].append(chama_id)
+    SearchDocument.objects.bulk_create(
+        [SearchDocument(user=user, **document_values(user, _location(user), chama_ids[user.pk])) for user in users],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['name', 'email', 'phone', 'location', 'chamas'],
+    )
+
+def update_document_chamas(user_id):
+    """
+    Re-read the chamas on an existing document. Never creates one, so it is
+    safe while the user is being deleted.
+    """
+    memberships = Membership.objects.unscoped().filter(user_id=user_id, is_active=True)
+    SearchDocument.objects.filter(user_id=user_id).update(
+        chamas=chama_tokens(memberships.values_list('chama_id', flat=True)),
+    )
+
+def rebuild_search_documents(batch_size=2000):
+    """Documents for every user, e.g. after users were bulk-created without signals"""
+    users = User.objects.select_related('profile').order_by('pk')
+    batch = []
+    for user in users.iterator(chunk_size=batch_size):
+        batch.append(user)
+        if len(batch) == batch_size:
+            update_search_documents(batch, batch_size)
+            batch = []
+    if batch:
+        update_search_documents(batch, batch_size)
@@ -1,7 +1,14 @@
-from rest_framework import serializers
+import inspect
+from operator import attrgetter
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from .models import User, UserProfile
+from .pictures import inspect_picture, picture_replaced, picture_storage
 import re
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -110,17 +117,164 @@ class UserProfileSerializer(serializers.ModelSerializer):
                  'email_notifications', 'sms_notifications', 'push_notifications')
         read_only_fields = ('created_at', 'updated_at')
 
+class PictureField(serializers.FileField):
+    """An image upload checked from its header, without decoding it as ImageField does"""
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        try:
+            inspect_picture(file)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+        return file
+
+def _variant_urls(variants, request):
+    storage = picture_storage()
+    urls = {}
+    for label, formats in variants.items():
+        urls[label] = {}
+        for extension, name in formats.items():
+            url = storage.url(name)
+            urls[label][extension] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+class PictureVariantsField(serializers.ReadOnlyField):
+    """``{size: {format: url}}`` for the resized copies; null until they are rendered"""
+
+    def to_representation(self, value):
+        return _variant_urls(value, self.context.get('request'))
+
 class UserSerializer(serializers.ModelSerializer):
     profile = UserProfileSerializer(read_only=True)
     full_name = serializers.ReadOnlyField()
+    profile_picture = PictureField(required=False, allow_null=True)
+    profile_picture_variants = PictureVariantsField()
 
     class Meta:
         model = User
         fields = ('id', 'email', 'first_name', 'last_name', 'full_name', 'phone_number',
-                  'is_verified', 'date_of_birth', 'profile_picture', 'profile',
+                  'is_verified', 'date_of_birth', 'profile_picture', 'profile_picture_variants', 'profile',
                   'created_at', 'last_login')
         read_only_fields = ('id', 'email', 'is_verified', 'created_at', 'last_login')
 
+    def update(self, instance, validated_data):
+        replaced = 'profile_picture' in validated_data
+        previous_picture, previous_variants = instance.profile_picture.name, instance.profile_picture_variants
+        if replaced:
+            instance.profile_picture_variants = None
+        user = super().update(instance, validated_data)
+        if replaced:
+            picture_replaced(user, previous_picture, previous_variants)
+        return user
+
+def _datetime(value, request):
+    # DateTimeField with the ISO 8601 format: current time zone, UTC written as Z
+    if isinstance(value, str):
+        return value
+    current = timezone.get_current_timezone()
+    value = value.astimezone(current) if timezone.is_aware(value) else timezone.make_aware(value, current)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+def _file_url(value, request):
+    if not value:
+        return None
+    try:
+        url = value.url
+    except AttributeError:
+        return None
+    return request.build_absolute_uri(url) if request is not None else url
+
+def _plain(to_representation):
+    return lambda value, request: to_representation(value)
+
+def _compile_field(field, model):
+    """``(get, represent)`` doing what ``field`` does for one instance"""
+    if (
+        len(field.source_attrs) != 1
+        # Methods are called by DRF; properties and columns are plain reads
+        or inspect.isfunction(getattr(model, field.source, None))
+    ):
+        return field.get_attribute, _plain(field.to_representation)
+    if isinstance(field, serializers.Serializer):
+        return attrgetter(field.source), _compile(field)
+    return attrgetter(field.source), _compile_value(field)
+
+def _compile_value(field):
+    kind = type(field)
+    if kind is serializers.ReadOnlyField:
+        return lambda value, request: value
+    if kind in (serializers.CharField, serializers.EmailField, serializers.URLField):
+        return _plain(str)
+    if kind is serializers.BooleanField:
+        return _plain(bool)
+    if kind is serializers.UUIDField and field.uuid_format == 'hex_verbose':
+        return _plain(str)
+    if kind is serializers.DateField and getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+        return lambda value, request: value if isinstance(value, str) else value.isoformat()
+    if (
+        kind is serializers.DateTimeField
+        and getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601
+        and settings.USE_TZ and not hasattr(field, 'timezone')
+    ):
+        return _datetime
+    if kind in (serializers.FileField, serializers.ImageField, PictureField) and getattr(
+        field, 'use_url', api_settings.UPLOADED_FILES_USE_URL
+    ):
+        return _file_url
+    if kind is PictureVariantsField:
+        return _variant_urls
+    # Anything else keeps DRF's own conversion
+    return _plain(field.to_representation)
+
+def _compile(serializer):
+    """A ``(instance, request) -> dict`` function for a serializer's readable fields"""
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    plan = [
+        (field.field_name, *_compile_field(field, model))
+        for field in serializer._readable_fields
+    ]
+
+    def represent(instance, request):
+        data = {}
+        for name, get, to_representation in plan:
+            try:
+                value = get(instance)
+            except ObjectDoesNotExist:
+                # A missing reverse one-to-one, which DRF also renders as null
+                value = None
+            data[name] = None if value is None else to_representation(value, request)
+        return data
+
+    return represent
+
+class UserReadSerializer:
+    """
+    UserSerializer's output for responses, without DRF's per-call field
+    machinery. The field plan is compiled once from UserSerializer, so the
+    two stay in step; load users with ``select_related('profile')``.
+    """
+
+    _represent = None
+
+    def __init__(self, instance, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @classmethod
+    def compiled(cls):
+        if cls._represent is None:
+            cls._represent = _compile(UserSerializer())
+        return cls._represent
+
+    @property
+    def data(self):
+        represent, request = self.compiled(), self.context.get('request')
+        if self.many:
+            return [represent(user, request) for user in self.instance]
+        return represent(self.instance, request)
+
 class ChangePasswordSerializer(serializers.Serializer):
     old_password = serializers.CharField(required=True, write_only=True)
     new_password = serializers.CharField(required=True, min_length=8, write_only=True)
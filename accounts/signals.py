@@ -1,6 +1,7 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import User, UserProfile
+from .search import INDEXED_PROFILE_FIELDS, INDEXED_USER_FIELDS, update_search_documents
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -11,11 +12,27 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, update_fields=None, **kwargs):
     """
     Save the UserProfile when the User is saved.
     """
+    if update_fields:
+        # Partial saves (logins, lockouts) change nothing on the profile
+        return
     try:
         instance.profile.save()
     except UserProfile.DoesNotExist:
         UserProfile.objects.create(user=instance)
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Keep the member directory's copy of the user's name, email and phone current"""
+    if raw or (update_fields and not INDEXED_USER_FIELDS.intersection(update_fields)):
+        return
+    update_search_documents([instance])
+
+@receiver(post_save, sender=UserProfile)
+def index_profile(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields and not INDEXED_PROFILE_FIELDS.intersection(update_fields)):
+        return
+    update_search_documents([instance.user])
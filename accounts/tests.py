@@ -1,3 +1,427 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+from PIL import Image
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from config.compression import CompressionMiddleware, available_codecs, brotli, negotiate, zstandard
+from config.media import MediaFilesMiddleware
+
+from chamas.bench import seed_chama
+from chamas.cache import invalidate_chama
+from chamas.dashboard import CACHE_NAMESPACE as DASHBOARD_CACHE_NAMESPACE, summary_stamp
+from .admin import UserAdmin
+from .models import User, UserProfile
+from .pictures import VARIANT_SIZES, process_picture, render_variants, run_pending
+from .search import filter_users, search_terms
+from .serializers import UserReadSerializer, UserSerializer
+
+PROFILE_URL = '/api/v1/accounts/users/profile/'
+DASHBOARD_URL = '/api/v1/accounts/dashboard/summary/'
+
+class ConditionalRequestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, (cls.user,) = seed_chama(1, 3, name='Tujenge')
+        UserProfile.objects.create(user=cls.user, bio='Treasurer of the welfare fund')
+
+    def setUp(self):
+        self.client = APIClient()
+        # Loaded as token authentication loads it, without the profile
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+
+    def test_profile_not_modified_skips_serializer(self):
+        response = self.client.get(PROFILE_URL)
+        etag = response['ETag']
+        self.assertEqual(response.status_code, 200)
+
+        with mock.patch('accounts.views.UserReadSerializer') as serializer, self.assertNumQueries(1):
+            response = self.client.get(PROFILE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(serializer.called)
+
+        profile = UserProfile.objects.get(user=self.user)
+        profile.bio = 'Chair'
+        profile.save()
+        response = self.client.get(PROFILE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_profile_put_requires_current_etag(self):
+        etag = self.client.get(PROFILE_URL)['ETag']
+        response = self.client.put(PROFILE_URL, {'first_name': 'Wanjiru'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # A second writer still holding the old tag loses
+        response = self.client.put(PROFILE_URL, {'first_name': 'Akinyi'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Wanjiru')
+
+    def test_conditional_headers_work_cross_origin(self):
+        response = self.client.options(
+            PROFILE_URL, HTTP_ORIGIN='http://localhost:5173', HTTP_ACCESS_CONTROL_REQUEST_METHOD='PUT',
+            HTTP_ACCESS_CONTROL_REQUEST_HEADERS='if-match, if-none-match',
+        )
+        self.assertIn('if-match', response['Access-Control-Allow-Headers'])
+        self.assertIn('if-none-match', response['Access-Control-Allow-Headers'])
+        response = self.client.get(PROFILE_URL, HTTP_ORIGIN='http://localhost:5173')
+        self.assertEqual(response['Access-Control-Expose-Headers'], 'etag')
+
+    def test_dashboard_not_modified_until_ledger_changes(self):
+        response = self.client.get(DASHBOARD_URL)
+        etag = response['ETag']
+
+        # Resolving the chama and the member's role; no payload is built
+        with mock.patch('accounts.views.get_dashboard_summary') as build, self.assertNumQueries(2):
+            response = self.client.get(DASHBOARD_URL, HTTP_IF_NONE_MATCH=f'W/{etag}')
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(build.called)
+
+        invalidate_chama(self.chama.pk)
+        response = self.client.get(DASHBOARD_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_stale_dashboard_is_not_tagged_as_current(self):
+        cache.clear()
+        previous = self.client.get(DASHBOARD_URL)['ETag']
+        invalidate_chama(self.chama.pk)
+        chama_id, role, _ = summary_stamp(self.user)
+
+        # Another request is rebuilding, so the previous payload is served
+        lock = f'{DASHBOARD_CACHE_NAMESPACE}:summary:{self.user.pk}:{chama_id}:{role}:lock'
+        cache.add(lock, 1)
+        try:
+            response = self.client.get(DASHBOARD_URL)
+        finally:
+            cache.delete(lock)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], previous)
+        # ...and its tag doesn't match the current versions
+        response = self.client.get(DASHBOARD_URL, HTTP_IF_NONE_MATCH=previous)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], previous)
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, (cls.user,) = seed_chama(1, 3, name='Tujenge')
+        UserProfile.objects.create(user=cls.user, bio='Keeps the minutes ' * 20)
+
+    def setUp(self):
+        self.client = APIClient(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        # Loaded as token authentication loads it, without the profile
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+
+    def test_negotiation(self):
+        codecs = available_codecs()
+        self.assertEqual(negotiate('br;q=1.0, gzip;q=0.5', {'gzip': codecs['gzip']}).name, 'gzip')
+        self.assertIsNone(negotiate('gzip;q=0, identity', codecs))
+        self.assertIsNone(negotiate('', codecs))
+        self.assertEqual(negotiate('*', codecs), next(iter(codecs.values())))
+
+    def test_codecs_share_one_compress_and_stream(self):
+        decompress = {
+            'gzip': gzip.decompress,
+            'br': lambda data: brotli.decompress(data),
+            'zstd': lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+        }
+        data = b'{"amount": "5000.00", "status": "completed"}' * 200
+        for name, codec in available_codecs().items():
+            with self.subTest(codec=name):
+                self.assertEqual(decompress[name](codec.compress(data)), data)
+                self.assertEqual(decompress[name](b''.join(codec.stream([data[:1000], b'', data[1000:]]))), data)
+                compressor = codec.compressor()
+                self.assertEqual(decompress[name](compressor.compress(data) + compressor.flush()), data)
+
+    def test_json_is_compressed_with_coded_etag(self):
+        plain = APIClient()
+        plain.force_authenticate(self.user)
+        identity = plain.get(PROFILE_URL)
+        self.assertFalse(identity.has_header('Content-Encoding'))
+
+        response = self.client.get(PROFILE_URL)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), identity.content)
+        self.assertEqual(response['ETag'], identity['ETag'][:-1] + '-gzip"')
+
+        # The coded tag still validates, for conditional GETs and writes alike
+        with self.assertNumQueries(1):
+            cached = self.client.get(PROFILE_URL, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual((cached.status_code, cached['ETag']), (304, response['ETag']))
+        updated = self.client.put(PROFILE_URL, {'last_name': 'Otieno'}, format='json', HTTP_IF_MATCH=response['ETag'])
+        self.assertEqual(updated.status_code, 200)
+
+    def test_small_and_exempt_responses_are_not_compressed(self):
+        with override_settings(COMPRESSION_MIN_SIZE=100_000):
+            self.assertFalse(self.client.get(PROFILE_URL).has_header('Content-Encoding'))
+        self.assertFalse(self.client.get('/api/v1/csrf-token/').has_header('Content-Encoding'))
+
+    def test_streaming_responses_are_compressed_incrementally(self):
+        rows = [f'{i},contribution,500.00\n'.encode() for i in range(5000)]
+        middleware = CompressionMiddleware(lambda request: StreamingHttpResponse(iter(rows), content_type='text/csv'))
+        response = middleware(RequestFactory().get('/export.csv', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(rows))
+
+class UserReadSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, users = seed_chama(3, 0, name='Tujenge')
+        full, cls.bare = users[0], users[1]
+        User.objects.filter(pk=full.pk).update(
+            date_of_birth=date(1990, 4, 1), profile_picture='profile_pictures/wanjiru.jpg',
+            last_login='2025-03-01T08:30:00.123456Z',
+        )
+        UserProfile.objects.create(user=full, bio='Chair \u2028 since 2019', website='https://example.com')
+        UserProfile.objects.create(user=users[2], phone_public=True)
+
+    def test_output_matches_user_serializer(self):
+        request = RequestFactory().get('/', HTTP_HOST='localhost')
+        for context in ({}, {'request': request}):
+            users = list(User.objects.select_related('profile').order_by('last_name'))
+            expected = UserSerializer(users, many=True, context=context).data
+            with self.assertNumQueries(0):
+                actual = UserReadSerializer(users, many=True, context=context).data
+            self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+            self.assertEqual(actual, expected)
+
+        self.assertIsNone(actual[1]['profile'])
+        self.assertEqual(actual[0]['profile_picture'], 'http://localhost/media/profile_pictures/wanjiru.jpg')
+
+    def test_single_user_loads_profile_lazily_without_select_related(self):
+        user = User.objects.get(pk=self.bare.pk)
+        with self.assertNumQueries(1):
+            data = UserReadSerializer(user).data
+        self.assertEqual(data, UserSerializer(user).data)
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=3)
+class UserAdminTests(TestCase):
+    URL = '/admin/accounts/user/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@example.com', 'pass-12345', first_name='Ada', last_name='Admin')
+        _, cls.members = seed_chama(5, 0, name='Tujenge')
+        # Distinct creation times, two of them tied
+        now = timezone.now()
+        for i, user in enumerate(cls.members):
+            User.objects.filter(pk=user.pk).update(created_at=now - timedelta(minutes=min(i, 3)))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_search_tracks_renames_and_deletes(self):
+        users = User.objects.all()
+        member = self.members[2]
+        self.assertEqual(list(filter_users(users, search_terms('EMBER "2@example"'))), [member])
+        # One-letter terms have no trigram and use icontains
+        self.assertEqual(filter_users(users, ['Me', '2@e']).get(), member)
+
+        member.first_name = 'Wanjiru'
+        member.save()
+        self.assertFalse(filter_users(users, ['Member 2']).exists())
+        self.assertEqual(filter_users(users, ['wanjiru']).get(), member)
+
+        member.delete()
+        self.assertFalse(filter_users(users, ['wanjiru']).exists())
+
+    def test_keyset_pages_cover_every_user_once(self):
+        expected = list(User.objects.order_by('-created_at', '-pk').values_list('email', flat=True))
+        seen, url = [], self.URL
+        with mock.patch.object(UserAdmin, 'list_per_page', 2):
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                cl = response.context['cl']
+                seen += [user.email for user in cl.result_list]
+                url = cl.next_page_url and self.URL + cl.next_page_url
+        self.assertEqual(seen, expected)
+        # Six rows is over the limit, so the total is estimated
+        self.assertTrue(cl.paginator.count_is_estimate)
+        self.assertContains(response, 'About 6 Users')
+        # The last page: sort and filter links drop the cursor
+        self.assertNotContains(response, '?after=')
+
+        response = self.client.get(self.URL, {'q': 'member'})
+        self.assertTrue(response.context['cl'].paginator.count_is_capped)
+        self.assertEqual(self.client.get(self.URL, {'after': 'not-a-cursor'}).status_code, 302)
+
+    def test_bulk_actions_are_single_updates(self):
+        User.objects.update(is_active=True)
+        data = {'action': 'deactivate_users', 'select_across': '1', 'index': '0', '_selected_action': [self.admin.pk]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.URL, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual([query['sql'].split()[0] for query in queries].count('UPDATE'), 1)
+        self.assertEqual(list(User.objects.filter(is_active=True)), [self.admin])
+
+def picture(size, picture_format='JPEG', mode='RGB', name='photo.jpg'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, 'teal' if mode == 'RGB' else 0).save(buffer, picture_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), PICTURE_BACKGROUND_WORKERS=0)
+class ProfilePictureTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('picture@example.com', 'pass-12345', first_name='Akinyi')
+        cls.other = User.objects.create_user('same-picture@example.com', 'pass-12345', first_name='Nduta')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+
+    def upload(self, file):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.put(PROFILE_URL, {'profile_picture': file}, format='multipart', HTTP_HOST='localhost')
+
+    def test_variants_are_rendered_after_upload(self):
+        response = self.upload(picture((1600, 1200)))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['profile_picture_variants'])
+        self.assertEqual(run_pending(), 1)
+
+        variants = self.client.get(PROFILE_URL, HTTP_HOST='localhost').json()['profile_picture_variants']
+        self.assertEqual({label: set(formats) for label, formats in variants.items()}, {
+            'small': {'webp', 'jpeg'}, 'medium': {'webp', 'jpeg'}, 'large': {'webp', 'jpeg'},
+        })
+        self.assertTrue(variants['large']['webp'].startswith('http://localhost/media/profile_pictures/variants/'))
+        stored = User.objects.get(pk=self.user.pk).profile_picture_variants
+        for label, formats in (('large', ('webp', 'WEBP')), ('small', ('jpeg', 'JPEG'))):
+            with default_storage.open(stored[label][formats[0]]) as file, Image.open(file) as image:
+                self.assertEqual((image.format, image.size), (formats[1], (VARIANT_SIZES[label],) * 2))
+        self.assertEqual(run_pending(), 0)
+
+    def test_profile_etag_moves_on_when_variants_are_rendered(self):
+        etag = self.upload(picture((400, 300)))['ETag']
+        self.assertEqual(self.client.get(PROFILE_URL, HTTP_HOST='localhost', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            process_picture(self.user.pk)
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        response = self.client.get(PROFILE_URL, HTTP_HOST='localhost', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['profile_picture_variants']), set(VARIANT_SIZES))
+
+    def test_replacing_the_picture_drops_old_variants(self):
+        self.upload(picture((400, 300)))
+        run_pending()
+        old = User.objects.get(pk=self.user.pk).profile_picture_variants
+        # Smaller than the large size: never upscaled
+        with default_storage.open(old['large']['jpeg']) as file, Image.open(file) as image:
+            self.assertEqual(image.size, (300, 300))
+
+        response = self.upload(picture((64, 64), 'PNG', 'RGBA', name='icon.png'))
+        self.assertIsNone(response.json()['profile_picture_variants'])
+        self.assertFalse(default_storage.exists(old['large']['jpeg']))
+        self.assertEqual(run_pending(), 1)
+
+    def test_identical_pictures_share_one_file(self):
+        self.upload(picture((400, 300)))
+        run_pending()
+        first = User.objects.get(pk=self.user.pk)
+        self.assertRegex(first.profile_picture.name, r'^profile_pictures/[0-9a-f]{2}/[0-9a-f]{62}\.jpg$')
+
+        self.client.force_authenticate(User.objects.get(pk=self.other.pk))
+        self.upload(picture((400, 300), name='same-photo.JPG'))
+        run_pending()
+        second = User.objects.get(pk=self.other.pk)
+        self.assertEqual(second.profile_picture.name, first.profile_picture.name)
+        self.assertEqual(second.profile_picture_variants, first.profile_picture_variants)
+        self.assertEqual(len(os.listdir(os.path.dirname(first.profile_picture.path))), 1)
+
+        # Still the first user's: replacing the second user's copy keeps it
+        self.upload(picture((64, 64), 'PNG', 'RGBA', name='icon.png'))
+        self.assertTrue(first.profile_picture.storage.exists(first.profile_picture_variants['large']['jpeg']))
+
+    def test_superseded_render_keeps_shared_variants(self):
+        self.upload(picture((400, 300)))
+        self.client.force_authenticate(User.objects.get(pk=self.other.pk))
+        self.upload(picture((400, 300)))
+        run_pending()
+        source = User.objects.get(pk=self.other.pk).profile_picture.name
+        shared = User.objects.get(pk=self.other.pk).profile_picture_variants
+
+        def replaced_while_rendering(file):
+            # A newer upload lands before the render is saved
+            User.objects.filter(pk=self.user.pk).update(profile_picture='profile_pictures/newer.jpg')
+            return render_variants(file)
+
+        for still_shared in (True, False):
+            User.objects.filter(pk=self.user.pk).update(profile_picture=source, profile_picture_variants=None)
+            if not still_shared:
+                User.objects.filter(pk=self.other.pk).update(profile_picture='', profile_picture_variants=None)
+            with mock.patch('accounts.pictures.render_variants', replaced_while_rendering):
+                self.assertIsNone(process_picture(self.user.pk))
+            self.assertEqual(default_storage.exists(shared['large']['jpeg']), still_shared)
+
+    def test_pictures_are_served_with_immutable_caching(self):
+        url = self.upload(picture((400, 300))).json()['profile_picture']
+        path = url.removeprefix('http://localhost')
+        with open(User.objects.get(pk=self.user.pk).profile_picture.path, 'rb') as file:
+            content = file.read()
+
+        response = self.client.get(path, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'max-age=315360000, public, immutable')
+        self.assertEqual(b''.join(response.streaming_content), content)
+        response.close()
+
+        response = self.client.get(path, HTTP_HOST='localhost', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(content)}')
+        self.assertEqual(b''.join(response.streaming_content), content[10:20])
+        response.close()
+
+        # The file itself goes to the server, at the range's start, for sendfile()
+        # (the test client wraps it in an iterator)
+        served = MediaFilesMiddleware(None)(RequestFactory().get(path, HTTP_RANGE='bytes=10-19'))
+        self.assertEqual(os.lseek(served.file_to_stream.fileno(), 0, os.SEEK_CUR), 10)
+        served.close()
+
+        response = self.client.get(path, HTTP_HOST='localhost', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_only_content_addressed_media_is_served(self):
+        default_storage.save('exports/statement.csv', io.BytesIO(b'date,amount\n'))
+        self.assertEqual(self.client.get('/media/exports/statement.csv', HTTP_HOST='localhost').status_code, 404)
+        name = f"profile_pictures/ab/{'c' * 62}.jpg"
+        self.assertEqual(self.client.get(f'/media/{name}', HTTP_HOST='localhost').status_code, 404)
+        self.assertEqual(self.client.get(f'/media/../{name}', HTTP_HOST='localhost').status_code, 404)
+
+    def test_uploads_are_checked_before_decoding(self):
+        response = self.upload(SimpleUploadedFile('notes.jpg', b'not an image'))
+        self.assertEqual(response.status_code, 400)
+        # 56 megapixels of one bit compress to a few kilobytes
+        response = self.upload(picture((8000, 7000), 'PNG', '1', name='huge.png'))
+        self.assertEqual(response.json(), {'profile_picture': ['Pictures can be at most 50 megapixels.']})
+        with override_settings(PROFILE_PICTURE_MAX_BYTES=1024):
+            response = self.upload(picture((1600, 1200)))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most', response.json()['detail'])
+        self.assertFalse(User.objects.get(pk=self.user.pk).profile_picture)
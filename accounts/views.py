@@ -12,14 +12,22 @@ from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 
+from .etags import dashboard_etag, not_modified, precondition_failed, profile_etag
 from .models import User
+from .pictures import PictureUploadHandler
 from .serializers import (
-    UserRegistrationSerializer, UserLoginSerializer, UserSerializer,
+    UserRegistrationSerializer, UserLoginSerializer, UserReadSerializer, UserSerializer,
     UserProfileSerializer, ChangePasswordSerializer,
     PasswordResetRequestSerializer, PasswordResetConfirmSerializer
 )
+from chamas.cache import get_metrics
+from chamas.dashboard import (
+    CACHE_NAMESPACE as DASHBOARD_CACHE_NAMESPACE, get_dashboard_summary, summary_stamp
+)
+from chamas.loans import project_chama_inflow
+from chamas.permissions import IsTreasurer
+from chamas.tenancy import current_chama_id
 import uuid
-from datetime import timedelta
 
 class AuthViewSet(GenericViewSet):
     """Authentication endpoints"""
@@ -46,7 +54,7 @@ class AuthViewSet(GenericViewSet):
                     pass
             
             # Prepare response data
-            user_data = UserSerializer(user, context={'request': request}).data
+            user_data = UserReadSerializer(user, context={'request': request}).data
             
             return Response({
                 'message': 'User registered successfully',
@@ -70,7 +78,7 @@ class AuthViewSet(GenericViewSet):
             # Login for session auth (helps with CSRF)
             login(request, user)
             
-            user_data = UserSerializer(user, context={'request': request}).data
+            user_data = UserReadSerializer(user, context={'request': request}).data
             
             return Response({
                 'message': 'Login successful',
@@ -112,24 +120,43 @@ class UserProfileViewSet(RetrieveModelMixin, UpdateModelMixin, GenericViewSet):
     def get_object(self):
         return self.request.user
 
+    def get_user_with_profile(self):
+        """The request's user with the profile joined in, reusing it if auth already did"""
+        user = self.request.user
+        if User.profile.related.is_cached(user):
+            return user
+        return User.objects.select_related('profile').get(pk=user.pk)
+
     @action(detail=False, methods=['get', 'put'], url_path='profile')
     def profile(self, request):
         """Get or update user profile"""
+        user = self.get_user_with_profile()
+        etag = profile_etag(request, user)
         if request.method == 'GET':
-            serializer = UserSerializer(request.user, context={'request': request})
-            return Response(serializer.data)
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+            return Response(UserReadSerializer(user, context={'request': request}).data, headers={'ETag': etag})
         
         elif request.method == 'PUT':
+            response = precondition_failed(request, etag)
+            if response is not None:
+                return response
+            # Before the body is parsed: pictures spool to disk and stop at the size limit
+            request.upload_handlers = [PictureUploadHandler(request)]
             serializer = UserSerializer(
-                request.user, 
+                user, 
                 data=request.data, 
                 partial=True,
                 context={'request': request}
             )
             
             if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data)
+                user = serializer.save()
+                return Response(
+                    UserReadSerializer(user, context={'request': request}).data,
+                    headers={'ETag': profile_etag(request, user)},
+                )
             
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -268,134 +295,37 @@ class DashboardViewSet(GenericViewSet):
     @action(detail=False, methods=['get'], url_path='summary')
     def dashboard_summary(self, request):
         """Get dashboard summary for authenticated user"""
-        user = request.user
-        
-        # This is mock data - replace with actual database queries
-        # For members
-        if not user.is_staff:
-            data = {
-                'personal_balance': 125000,
-                'group_balance': 2450000,
-                'next_meeting': {
-                    'date': (timezone.now() + timedelta(days=7)).isoformat(),
-                    'time': '14:00',
-                    'location': 'Community Hall, Nairobi',
-                    'agenda': 'Monthly contributions and loan approvals',
-                    'my_position': 3,
-                    'total_positions': 15,
-                },
-                'loan_status': {
-                    'active': True,
-                    'amount_borrowed': 50000,
-                    'amount_paid': 25000,
-                    'remaining_balance': 25000,
-                    'next_payment_date': (timezone.now() + timedelta(days=14)).isoformat(),
-                    'next_payment_amount': 5000,
-                } if user.id % 3 == 0 else None,  # Only some users have loans
-                'recent_transactions': [
-                    {
-                        'id': '1',
-                        'date': (timezone.now() - timedelta(days=2)).isoformat(),
-                        'type': 'contribution',
-                        'amount': 5000,
-                        'description': 'Monthly contribution',
-                        'status': 'completed',
-                    },
-                    {
-                        'id': '2',
-                        'date': (timezone.now() - timedelta(days=30)).isoformat(),
-                        'type': 'loan_payment',
-                        'amount': 5000,
-                        'description': 'Loan installment',
-                        'status': 'completed',
-                    },
-                    {
-                        'id': '3',
-                        'date': (timezone.now() - timedelta(days=60)).isoformat(),
-                        'type': 'loan_disbursement',
-                        'amount': 50000,
-                        'description': 'Business loan',
-                        'status': 'completed',
-                    },
-                ],
-                'contribution_summary': {
-                    'this_month': 5000,
-                    'total': 125000,
-                    'last_contribution_date': (timezone.now() - timedelta(days=2)).isoformat(),
-                },
-            }
-        # For treasurers/staff
-        else:
-            data = {
-                'group_summary': {
-                    'total_balance': 2450000,
-                    'total_collected_today': 75000,
-                    'outstanding_loans': 450000,
-                    'defaulters_count': 3,
-                    'total_members': 25,
-                    'attendance_rate': 88,
-                },
-                'defaulters': [
-                    {
-                        'id': '1',
-                        'name': 'John Kamau',
-                        'phone': '0712345678',
-                        'amount': 10000,
-                        'days_overdue': 45,
-                        'last_contribution': (timezone.now() - timedelta(days=60)).isoformat(),
-                    },
-                    {
-                        'id': '2',
-                        'name': 'Mary Wanjiku',
-                        'phone': '0723456789',
-                        'amount': 5000,
-                        'days_overdue': 30,
-                        'last_contribution': (timezone.now() - timedelta(days=45)).isoformat(),
-                    },
-                    {
-                        'id': '3',
-                        'name': 'Peter Otieno',
-                        'phone': '0734567890',
-                        'amount': 15000,
-                        'days_overdue': 15,
-                        'last_contribution': (timezone.now() - timedelta(days=30)).isoformat(),
-                    },
-                ],
-                'pending_actions': {
-                    'pending_loans': 5,
-                    'pending_approvals': 3,
-                    'upcoming_meetings': 1,
-                    'overdue_fines': 2,
-                },
-                'recent_group_transactions': [
-                    {
-                        'id': '1',
-                        'date': (timezone.now() - timedelta(hours=2)).isoformat(),
-                        'type': 'contribution',
-                        'member_name': 'Jane Muthoni',
-                        'amount': 5000,
-                        'description': 'Monthly contribution',
-                        'status': 'completed',
-                    },
-                    {
-                        'id': '2',
-                        'date': (timezone.now() - timedelta(days=1)).isoformat(),
-                        'type': 'loan_payment',
-                        'member_name': 'David Kiprop',
-                        'amount': 10000,
-                        'description': 'Loan repayment',
-                        'status': 'completed',
-                    },
-                    {
-                        'id': '3',
-                        'date': (timezone.now() - timedelta(days=2)).isoformat(),
-                        'type': 'contribution',
-                        'member_name': 'Grace Akinyi',
-                        'amount': 5000,
-                        'description': 'Monthly contribution',
-                        'status': 'completed',
-                    },
-                ],
-            }
-        
-        return Response(data, status=status.HTTP_200_OK)
+        stamp = summary_stamp(request.user)
+        etag = dashboard_etag(request, request.user, *stamp)
+        response = not_modified(request, etag)
+        if response is None:
+            # A stale payload is tagged with the versions it was built at
+            served, payload = get_dashboard_summary(request.user, stamp=stamp)
+            etag = dashboard_etag(request, request.user, *served)
+            response = Response(payload, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
+
+    @action(detail=False, methods=['get'], url_path='cache-stats',
+            permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        """Dashboard cache hit/miss counters"""
+        return Response(get_metrics(DASHBOARD_CACHE_NAMESPACE), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='loan-projection',
+            permission_classes=[IsTreasurer])
+    def loan_projection(self, request):
+        """Expected weekly loan repayments for the treasurer's chama"""
+        try:
+            weeks = min(max(int(request.query_params.get('weeks', 12)), 1), 104)
+        except ValueError:
+            return Response({'error': 'weeks must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        chama_id = current_chama_id()
+        if chama_id is None:
+            return Response({'error': 'You are not a member of any chama'}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'chama_id': str(chama_id),
+            'weeks': project_chama_inflow(chama_id, weeks=weeks),
+        }, status=status.HTTP_200_OK)
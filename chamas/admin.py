@@ -0,0 +1,104 @@
+from django.contrib import admin
+from .models import (
+    Chama, DailyRollup, Defaulter, ExportJob, Fine, Loan, Membership, Meeting, MpesaPayment, NotificationRun,
+    RotationSlot, StatementImport, Transaction,
+)
+
+class TenantAdminMixin:
+    """The admin works across chamas, so it lists every chama's rows"""
+
+    def get_queryset(self, request):
+        queryset = self.model.objects.unscoped()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+class MembershipInline(TenantAdminMixin, admin.TabularInline):
+    model = Membership
+    extra = 0
+    raw_id_fields = ('user',)
+
+@admin.register(Chama)
+class ChamaAdmin(admin.ModelAdmin):
+    list_display = ('name', 'contribution_amount', 'contribution_interval_days', 'created_at')
+    search_fields = ('name',)
+    readonly_fields = ('created_at', 'updated_at')
+    inlines = (MembershipInline,)
+
+@admin.register(Meeting)
+class MeetingAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('chama', 'scheduled_for', 'location')
+    list_filter = ('scheduled_for',)
+    raw_id_fields = ('chama',)
+
+@admin.register(Transaction)
+class TransactionAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('chama', 'member', 'transaction_type', 'amount', 'status', 'posted_at')
+    list_filter = ('transaction_type', 'status', 'posted_at')
+    search_fields = ('reference', 'member__email')
+    raw_id_fields = ('chama', 'member', 'loan')
+    readonly_fields = ('created_at',)
+
+@admin.register(Loan)
+class LoanAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('member', 'chama', 'principal', 'interest_method', 'interest_rate', 'installments', 'status')
+    list_filter = ('status', 'interest_method')
+    raw_id_fields = ('chama', 'member')
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('chama', 'day', 'inflow_amount', 'outflow_amount', 'transaction_count', 'pending_count')
+    list_filter = ('day',)
+    raw_id_fields = ('chama',)
+    readonly_fields = ('updated_at',)
+
+@admin.register(Defaulter)
+class DefaulterAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('member', 'chama', 'amount_due', 'days_overdue', 'last_contribution', 'computed_at')
+    raw_id_fields = ('chama', 'member')
+    ordering = ('chama', 'rank')
+
+@admin.register(Fine)
+class FineAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('member', 'chama', 'reason', 'period', 'amount', 'status', 'due_at', 'accrued_at')
+    list_filter = ('status', 'reason')
+    raw_id_fields = ('chama', 'member', 'loan')
+
+@admin.register(StatementImport)
+class StatementImportAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('filename', 'chama', 'status', 'rows_read', 'rows_imported', 'duplicates', 'started_at')
+    list_filter = ('status',)
+    raw_id_fields = ('chama', 'uploaded_by')
+    readonly_fields = ('started_at', 'finished_at')
+
+@admin.register(MpesaPayment)
+class MpesaPaymentAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('receipt', 'chama', 'amount', 'phone_number', 'payer_name', 'completed_at', 'status')
+    list_filter = ('status',)
+    search_fields = ('receipt', 'phone_number', 'payer_name')
+    raw_id_fields = ('chama', 'statement', 'member', 'transaction')
+    readonly_fields = ('created_at', 'reconciled_at')
+
+@admin.register(RotationSlot)
+class RotationSlotAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('chama', 'cycle', 'position', 'total_positions', 'member', 'scheduled_for')
+    list_filter = ('cycle',)
+    raw_id_fields = ('chama', 'member', 'meeting')
+    ordering = ('chama', 'cycle', 'position')
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(ExportJob)
+class ExportJobAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('report', 'file_format', 'chama', 'requested_by', 'status', 'created_at', 'finished_at')
+    list_filter = ('status', 'report', 'file_format')
+    raw_id_fields = ('chama', 'requested_by', 'member')
+    readonly_fields = ('created_at', 'finished_at')
+
+@admin.register(NotificationRun)
+class NotificationRunAdmin(TenantAdminMixin, admin.ModelAdmin):
+    list_display = ('key', 'chama', 'status', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    raw_id_fields = ('chama',)
+    readonly_fields = ('progress', 'sent', 'created_at', 'heartbeat_at', 'finished_at')
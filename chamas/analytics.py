@@ -0,0 +1,286 @@
+"""
+Contribution trend analytics for treasurers.
+
+Completed contributions in the reporting window come back from one query
+as three integer columns: the membership id, a month bucket and the
+amount in cents. Everything after that is NumPy. The columns are summed
+into a member x month matrix with bincount, and trends, consistency
+scores and cohort retention are reductions over that matrix.
+
+Reports are cached per chama and tagged with the chama version stamp, so
+the next ledger write invalidates them.
+"""
+
+import warnings
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import repeat
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import BigIntegerField, Case, CharField, F, IntegerField, Value, When
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+
+from .cache import chama_version, get_or_build
+from .loans import to_cents
+from .models import Membership, Transaction
+
+CACHE_NAMESPACE = 'analytics'
+
+ANALYTICS_MONTHS = 12
+MAX_ANALYTICS_MONTHS = 36
+
+# Rows per fetchmany() while loading the columns
+FETCH_SIZE = 20_000
+
+PERCENTILES = (25, 50, 75, 90)
+
+# Members listed as at risk (least consistent first)
+AT_RISK_LIMIT = 20
+
+# ============================================================================
+# Columnar Load
+# ============================================================================
+
+def month_starts(months, today=None):
+    """
+    Local midnights on the first of each of the last ``months`` months,
+    followed by the start of next month (the window's exclusive end).
+    """
+    tz = timezone.get_current_timezone()
+    today = today or timezone.localdate()
+    first = today.year * 12 + today.month - months
+    return [
+        timezone.make_aware(datetime(index // 12, index % 12 + 1, 1), tz)
+        for index in range(first, first + months + 1)
+    ]
+
+def _month_bucket(starts):
+    # Boundaries are compared in SQL, so the database never has to convert
+    # timestamps to the local timezone row by row
+    return Case(
+        *[When(posted_at__lt=start, then=Value(index)) for index, start in enumerate(starts[1:-1])],
+        default=Value(len(starts) - 2),
+        output_field=IntegerField(),
+    )
+
+def _member_key(field):
+    # Member ids as text, formatted by the database the same way in every query
+    return Cast(field, CharField())
+
+def member_columns(chama_id, starts):
+    """
+    ``(membership_ids, keys, join_months, active)`` for the chama's
+    members, in one order.
+
+    Keys map members to rows for contribution_columns. Join months index
+    into ``starts``; members who joined before the window get -1.
+    """
+    rows = list(
+        Membership.objects.filter(chama_id=chama_id).order_by('id')
+        .values_list('id', _member_key('user_id'), 'joined_at', 'is_active')
+    )
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    keys = {row[1]: index for index, row in enumerate(rows)}
+    joined = np.array([row[2].timestamp() for row in rows], dtype=np.float64)
+    active = np.array([row[3] for row in rows], dtype=bool)
+    boundaries = np.array([start.timestamp() for start in starts[:-1]])
+    join_months = np.searchsorted(boundaries, joined, side='right') - 1
+    return ids, keys, np.minimum(join_months, len(boundaries) - 1), active
+
+def contribution_columns(chama_id, starts, keys):
+    """
+    ``(members, months, cents)`` int64 arrays for the chama's completed
+    contributions between ``starts[0]`` and ``starts[-1]``.
+
+    ``members`` are row numbers from ``keys`` (see member_columns);
+    payments from people who are no longer members are dropped.
+    """
+    queryset = Transaction.objects.filter(
+        chama_id=chama_id,
+        transaction_type=Transaction.Type.CONTRIBUTION,
+        status=Transaction.Status.COMPLETED,
+        posted_at__gte=starts[0],
+        posted_at__lt=starts[-1],
+    ).values_list(
+        _member_key('member_id'),
+        _month_bucket(starts),
+        Cast(Round(F('amount') * 100), BigIntegerField()),
+    )
+    # Read the raw cursor and build each chunk's arrays in C: no model
+    # instances and no per-row result converters
+    sql, params = queryset.query.sql_with_params()
+    members, months, cents = [], [], []
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(FETCH_SIZE):
+            member_keys, month_index, amounts = zip(*rows)
+            members.append(np.fromiter(map(keys.get, member_keys, repeat(-1)), dtype=np.int64, count=len(rows)))
+            months.append(np.array(month_index, dtype=np.int64))
+            cents.append(np.array(amounts, dtype=np.int64))
+    if not members:
+        return (np.empty(0, dtype=np.int64),) * 3
+    members, months, cents = np.concatenate(members), np.concatenate(months), np.concatenate(cents)
+    known = members >= 0
+    return members[known], months[known], cents[known]
+
+# ============================================================================
+# Aggregations
+# ============================================================================
+
+@contextmanager
+def _quiet():
+    """Empty rows and months are expected here and come out as NaN"""
+    with warnings.catch_warnings(), np.errstate(all='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        yield
+
+def _money(cents):
+    cents = int(cents)
+    return cents // 100 if cents % 100 == 0 else cents / 100
+
+def _ratio(value):
+    # Empty months and members come out as NaN, growth from nothing as inf
+    return round(float(value), 4) if np.isfinite(value) else None
+
+def _percentile_money(cents):
+    # Months nobody paid in have NaN percentiles
+    return _money(round(cents)) if np.isfinite(cents) else None
+
+def expected_monthly_cents(chama):
+    """What a member on schedule pays in a month: every whole interval that fits in 30 days"""
+    return to_cents(chama.contribution_amount) * max(30 // max(chama.contribution_interval_days, 1), 1)
+
+def monthly_matrix(members, months, cents, height, width):
+    """Cents paid by each member (rows) in each month (columns)"""
+    totals = np.bincount(members * width + months, weights=cents, minlength=height * width)
+    return np.rint(totals).astype(np.int64).reshape(height, width)
+
+def monthly_trends(matrix, eligible, labels):
+    """Totals, participation and per-contributor percentiles for each month"""
+    paid = matrix > 0
+    totals = matrix.sum(axis=0)
+    contributors = paid.sum(axis=0)
+    members = eligible.sum(axis=0)
+    with _quiet():
+        participation = contributors / members
+        growth = np.concatenate([[np.nan], (totals[1:] - totals[:-1]) / totals[:-1]])
+        if matrix.shape[0]:
+            spread = np.nanpercentile(np.where(paid, matrix, np.nan), PERCENTILES, axis=0)
+        else:
+            spread = np.full((len(PERCENTILES), len(labels)), np.nan)
+    return [
+        {
+            'month': label,
+            'total': _money(totals[i]),
+            'contributors': int(contributors[i]),
+            'members': int(members[i]),
+            'participation': _ratio(participation[i]),
+            'growth': _ratio(growth[i]),
+            'percentiles': {f'p{p}': _percentile_money(spread[j, i]) for j, p in enumerate(PERCENTILES)},
+        }
+        for i, label in enumerate(labels)
+    ]
+
+def consistency_scores(matrix, eligible, expected_cents):
+    """
+    Per-member ``(score, on_target_months, eligible_months, variability)``.
+
+    The score is the share of eligible months in which the member paid at
+    least the expected monthly amount. Variability is the coefficient of
+    variation of their monthly totals. Both are NaN for members with no
+    eligible months.
+    """
+    on_target = (matrix >= expected_cents) if expected_cents else (matrix > 0)
+    hits = (on_target & eligible).sum(axis=1)
+    months = eligible.sum(axis=1)
+    amounts = np.where(eligible, matrix, np.nan)
+    with _quiet():
+        score = hits / months
+        mean = np.nanmean(amounts, axis=1) if matrix.shape[1] else np.full(len(matrix), np.nan)
+        variability = np.nanstd(amounts, axis=1) / mean
+    return score, hits, months, variability
+
+def cohort_retention(matrix, join_months, labels):
+    """Share of each join-month cohort still contributing in every later month"""
+    paid = matrix > 0
+    cohorts = []
+    for cohort in np.unique(join_months):
+        members = paid[join_months == cohort]
+        start = max(int(cohort), 0)
+        cohorts.append({
+            'cohort': labels[cohort] if cohort >= 0 else 'earlier',
+            'members': len(members),
+            'retention': [_ratio(share) for share in members[:, start:].mean(axis=0)],
+        })
+    return cohorts
+
+# ============================================================================
+# Report
+# ============================================================================
+
+def build_contribution_report(chama, months=ANALYTICS_MONTHS, today=None):
+    """Build the analytics payload without consulting the cache"""
+    starts = month_starts(months, today)
+    labels = [start.strftime('%Y-%m') for start in starts[:-1]]
+    member_ids, keys, join_months, active = member_columns(chama.pk, starts)
+    members, month_index, cents = contribution_columns(chama.pk, starts, keys)
+    matrix = monthly_matrix(members, month_index, cents, len(member_ids), months)
+
+    columns = np.arange(months)[None, :]
+    eligible = columns >= join_months[:, None]
+    # Only complete months count towards consistency; this month is still open
+    complete = eligible & (columns < months - 1) & active[:, None]
+    expected = expected_monthly_cents(chama)
+    score, hits, eligible_months, variability = consistency_scores(matrix, complete, expected)
+
+    scored = np.flatnonzero(eligible_months > 0)
+    at_risk = scored[np.lexsort((matrix[scored].sum(axis=1), score[scored]))][:AT_RISK_LIMIT]
+    names = {
+        membership_id: f'{first} {last}'.strip()
+        for membership_id, first, last in Membership.objects.filter(chama_id=chama.pk, id__in=member_ids[at_risk].tolist())
+        .values_list('id', 'user__first_name', 'user__last_name')
+    }
+    with _quiet():
+        score_spread = (
+            np.percentile(score[scored], PERCENTILES) if len(scored) else np.full(len(PERCENTILES), np.nan)
+        )
+
+    return {
+        'months': labels,
+        'expected_monthly': _money(expected),
+        'trend': monthly_trends(matrix, eligible, labels),
+        'consistency': {
+            'members': len(scored),
+            'percentiles': {f'p{p}': _ratio(value) for p, value in zip(PERCENTILES, score_spread)},
+            'at_risk': [
+                {
+                    'membership_id': int(member_ids[row]),
+                    'member_name': names.get(int(member_ids[row]), ''),
+                    'score': _ratio(score[row]),
+                    'on_target_months': int(hits[row]),
+                    'eligible_months': int(eligible_months[row]),
+                    'variability': _ratio(variability[row]),
+                    'total': _money(matrix[row].sum()),
+                }
+                for row in at_risk
+            ],
+        },
+        'cohorts': cohort_retention(matrix, join_months, labels),
+        'generated_at': timezone.now().isoformat(),
+    }
+
+def get_contribution_report(chama, months=ANALYTICS_MONTHS):
+    """Return the analytics payload for a chama, served from cache until its next ledger write"""
+    today = timezone.localdate()
+    # The month is part of the key: the window moves on the first of the month
+    key = f'{CACHE_NAMESPACE}:contributions:{chama.pk}:{months}:{today:%Y-%m}'
+    _, report = get_or_build(
+        key,
+        chama_version(chama.pk),
+        lambda: build_contribution_report(chama, months, today),
+        namespace=CACHE_NAMESPACE,
+        timeout=settings.ANALYTICS_CACHE_TIMEOUT,
+    )
+    return report
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+class ChamasConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'chamas'
+    verbose_name = 'Chamas'
+
+    def ready(self):
+        # Import signals to ensure they are connected
+        import chamas.signals
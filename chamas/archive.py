@@ -0,0 +1,365 @@
+"""
+Cold storage for old ledger months.
+
+archive_month copies a month of every chama's ledger into LedgerArchive
+chunks and then removes it from chama_transaction. On PostgreSQL the
+month's partition is dropped whole; elsewhere the range is deleted. A
+chunk holds up to ARCHIVE_CHUNK_ROWS rows of one chama, stored column by
+column (one JSON list per field) and zlib-compressed. Columns of similar
+values compress far better than rows.
+
+Archiving must not change anyone's balance, so each chama's archived
+completed rows are also summed into ArchivedTotal per (member, loan,
+type). Code that totals the whole ledger adds those sums. Statement and
+group exports read both tiers through iter_ledger.
+"""
+
+import heapq
+import json
+import uuid
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from operator import itemgetter
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from .cache import invalidate_chama
+from .models import ArchivedTotal, Chama, LedgerArchive, MpesaPayment, Transaction
+from .partitions import drop_partition, has_partition, month_range
+
+# Rows per compressed chunk; one chunk is decoded at a time when reading
+ARCHIVE_CHUNK_ROWS = 50_000
+
+FETCH_SIZE = 5000
+
+COLUMNS = (
+    'id', 'member_id', 'loan_id', 'meeting_id', 'transaction_type', 'amount',
+    'description', 'status', 'reference', 'posted_at', 'created_at', 'chain_seq', 'chain_hash',
+)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# ============================================================================
+# Chunk Encoding
+# ============================================================================
+
+def _micros(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+def _moment(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+def _uuid(value):
+    return uuid.UUID(value) if value else None
+
+ENCODERS = {
+    'member_id': lambda value: value.hex if value else None,
+    'amount': str,
+    'posted_at': _micros,
+    'created_at': _micros,
+}
+
+DECODERS = {
+    'member_id': _uuid,
+    'amount': Decimal,
+    'posted_at': _moment,
+    'created_at': _moment,
+}
+
+def encode_chunk(rows):
+    """Compress rows of COLUMNS values; returns ``(data, raw_size)``"""
+    columns = {}
+    for name, values in zip(COLUMNS, zip(*rows)):
+        encode = ENCODERS.get(name)
+        columns[name] = [encode(value) for value in values] if encode else list(values)
+    raw = json.dumps(columns, separators=(',', ':')).encode()
+    return zlib.compress(raw, 6), len(raw)
+
+# ============================================================================
+# Archiving
+# ============================================================================
+
+def _delete_hot(chama_id, start, end):
+    # A queryset delete() would load every row to null out MpesaPayment
+    # links one by one; archive_chama_month clears those in one UPDATE
+    params = [
+        Chama._meta.pk.get_db_prep_value(chama_id, connection),
+        connection.ops.adapt_datetimefield_value(start),
+        connection.ops.adapt_datetimefield_value(end),
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM chama_transaction WHERE chama_id = %s AND posted_at >= %s AND posted_at < %s', params
+        )
+
+def _add_totals(chama_id, totals):
+    """Merge one month's sums into the chama's archived totals"""
+    existing = ArchivedTotal.objects.filter(chama_id=chama_id)
+    for row in existing:
+        total = totals[(row.member_id, row.loan_id, row.transaction_type)]
+        total[0] += row.amount
+        total[1] += row.row_count
+        total[2] = max(total[2], row.last_posted_at) if total[2] else row.last_posted_at
+    # Rewriting the chama's few rows beats a CASE-per-row bulk_update
+    existing.delete()
+    ArchivedTotal.objects.bulk_create([
+        ArchivedTotal(
+            chama_id=chama_id, member_id=member_id, loan_id=loan_id, transaction_type=transaction_type,
+            amount=amount, row_count=count, last_posted_at=last_posted_at,
+        )
+        for (member_id, loan_id, transaction_type), (amount, count, last_posted_at) in totals.items()
+    ], batch_size=1000)
+
+def archive_chama_month(chama_id, start, end, delete=True):
+    """
+    Copy one chama's ledger rows in [start, end) to cold storage.
+
+    Returns ``(rows, raw_bytes, stored_bytes)``. With ``delete`` the rows
+    are then removed from the hot table; pass False when the caller drops
+    the whole partition instead.
+    """
+    rows = (
+        Transaction.objects.filter(chama_id=chama_id, posted_at__gte=start, posted_at__lt=end)
+        .order_by('posted_at', 'id')
+        .values_list(*COLUMNS)
+    )
+    get_key = itemgetter(1, 2, 4)
+    completed = Transaction.Status.COMPLETED
+    totals = defaultdict(lambda: [Decimal('0'), 0, None])
+    count = raw_bytes = stored_bytes = 0
+    batch = []
+
+    def flush():
+        nonlocal raw_bytes, stored_bytes
+        data, raw_size = encode_chunk(batch)
+        chained = [row[11] for row in batch if row[11] is not None]
+        LedgerArchive.objects.create(
+            chama_id=chama_id,
+            month=timezone.localdate(start),
+            first_posted_at=batch[0][9],
+            last_posted_at=batch[-1][9],
+            first_seq=min(chained, default=None),
+            last_seq=max(chained, default=None),
+            row_count=len(batch),
+            raw_bytes=raw_size,
+            data=data,
+        )
+        raw_bytes += raw_size
+        stored_bytes += len(data)
+
+    for row in rows.iterator(chunk_size=FETCH_SIZE):
+        batch.append(row)
+        if row[7] == completed:
+            total = totals[get_key(row)]
+            total[0] += row[5]
+            total[1] += 1
+            total[2] = row[9]
+        if len(batch) >= ARCHIVE_CHUNK_ROWS:
+            flush()
+            count += len(batch)
+            batch = []
+    if batch:
+        flush()
+        count += len(batch)
+    if not count:
+        return 0, 0, 0
+
+    _add_totals(chama_id, totals)
+    MpesaPayment.objects.filter(
+        chama_id=chama_id, transaction__posted_at__gte=start, transaction__posted_at__lt=end
+    ).update(transaction=None)
+    if delete:
+        _delete_hot(chama_id, start, end)
+    transaction.on_commit(lambda: invalidate_chama(chama_id))
+    return count, raw_bytes, stored_bytes
+
+def archive_month(year, month):
+    """
+    Move one month of every chama's ledger to cold storage.
+
+    Runs in one transaction, so a failure leaves the month where it was.
+    Returns ``(rows, raw_bytes, stored_bytes)``.
+    """
+    start, end = month_range(year, month)
+    totals = [0, 0, 0]
+    with transaction.atomic():
+        # A month with its own partition is dropped whole; rows in the
+        # legacy or default partition (or a plain table) are deleted
+        partitioned = has_partition(year, month)
+        for chama_id in Chama.objects.order_by('pk').values_list('pk', flat=True):
+            archived = archive_chama_month(chama_id, start, end, delete=not partitioned)
+            totals = [total + value for total, value in zip(totals, archived)]
+        if partitioned:
+            drop_partition(year, month)
+    return tuple(totals)
+
+def hot_since(chama_id):
+    """The first day whose ledger rows are all still hot, or None if nothing is archived"""
+    last = LedgerArchive.objects.filter(chama_id=chama_id).aggregate(month=Max('month'))['month']
+    if last is None:
+        return None
+    return (last.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+# ============================================================================
+# Reading Hot and Cold Together
+# ============================================================================
+
+NAME_FIELDS = ('member__first_name', 'member__last_name')
+
+def _chunk_rows(data, fields, start, end, member_id):
+    """Rows of one chunk as ``(*fields, posted_at, id)`` tuples"""
+    columns = json.loads(zlib.decompress(data))
+    # Pick the rows first, so only those get decoded
+    posted = columns['posted_at']
+    low = _micros(start) if start else None
+    high = _micros(end) if end else None
+    wanted = member_id.hex if member_id is not None else None
+    keep = [
+        index for index, (micros, member) in enumerate(zip(posted, columns['member_id']))
+        if (low is None or micros >= low) and (high is None or micros < high) and (wanted is None or member == wanted)
+    ]
+
+    def column(name):
+        decode = DECODERS.get(name)
+        values = columns[name]
+        return [decode(values[index]) for index in keep] if decode else [values[index] for index in keep]
+
+    selected = {name: column(name) for name in {*fields, 'posted_at', 'id'} if name not in NAME_FIELDS}
+    if any(field in NAME_FIELDS for field in fields):
+        members = column('member_id')
+        names = {
+            pk: (first, last)
+            for pk, first, last in get_user_model().objects.filter(pk__in=set(members) - {None})
+            .values_list('pk', 'first_name', 'last_name')
+        }
+        selected['member__first_name'] = [names.get(pk, ('', ''))[0] for pk in members]
+        selected['member__last_name'] = [names.get(pk, ('', ''))[1] for pk in members]
+    return zip(*(selected[field] for field in fields), selected['posted_at'], selected['id'])
+
+def _archived_rows(chama_id, fields, start, end, member_id):
+    chunks = LedgerArchive.objects.filter(chama_id=chama_id)
+    if start:
+        chunks = chunks.filter(last_posted_at__gte=start)
+    if end:
+        chunks = chunks.filter(first_posted_at__lt=end)
+    chunks = chunks.order_by('first_posted_at', 'id').values_list('first_posted_at', 'last_posted_at', 'data')
+
+    # Chunks of one month never overlap, but re-archiving a month that had
+    # rows backdated into it after it was archived adds chunks that do;
+    # overlapping runs are merged
+    key = itemgetter(slice(len(fields), len(fields) + 2))
+    run, run_end = [], None
+    for first, last, data in chunks.iterator(chunk_size=1):
+        if run and first > run_end:
+            yield from heapq.merge(*run, key=key)
+            run = []
+        run_end = max(run_end, last) if run else last
+        run.append(_chunk_rows(bytes(data), fields, start, end, member_id))
+    if run:
+        yield from heapq.merge(*run, key=key)
+
+def iter_ledger(chama_id, fields, start=None, end=None, member_id=None, chunk_size=FETCH_SIZE):
+    """
+    Tuples of ``fields`` for a chama's ledger rows in [start, end), hot and
+    archived, ordered by (posted_at, id).
+
+    Fields are Transaction column names plus member__first_name and
+    member__last_name.
+    """
+    hot = Transaction.objects.filter(chama_id=chama_id)
+    archived = LedgerArchive.objects.filter(chama_id=chama_id)
+    if start:
+        hot = hot.filter(posted_at__gte=start)
+        archived = archived.filter(last_posted_at__gte=start)
+    if end:
+        hot = hot.filter(posted_at__lt=end)
+        archived = archived.filter(first_posted_at__lt=end)
+    if member_id is not None:
+        hot = hot.filter(member_id=member_id)
+    hot = hot.order_by('posted_at', 'id')
+
+    if not archived.exists():
+        yield from hot.values_list(*fields).iterator(chunk_size=chunk_size)
+        return
+
+    tail = len(fields)
+    cold = _archived_rows(chama_id, fields, start, end, member_id)
+    hot = hot.values_list(*fields, 'posted_at', 'id').iterator(chunk_size=chunk_size)
+    for row in heapq.merge(cold, hot, key=itemgetter(slice(tail, tail + 2))):
+        yield row[:tail]
+
+def balance_before(chama_id, moment, member_id=None):
+    """
+    Signed sum of completed ledger rows posted before ``moment``, hot and
+    archived: the opening balance of a report that starts then.
+
+    Archived rows come from ArchivedTotal unless an archived chunk reaches
+    ``moment``; only then are the archived rows before it read.
+    """
+    inflow = Q(transaction_type__in=Transaction.INFLOW_TYPES)
+    completed = Q(status=Transaction.Status.COMPLETED)
+    hot = Transaction.objects.filter(chama_id=chama_id, posted_at__lt=moment)
+    totals = ArchivedTotal.objects.filter(chama_id=chama_id)
+    if member_id is not None:
+        hot = hot.filter(member_id=member_id)
+        totals = totals.filter(member_id=member_id)
+    sums = hot.aggregate(inflow=Sum('amount', filter=completed & inflow), outflow=Sum('amount', filter=completed & ~inflow))
+    balance = (sums['inflow'] or Decimal('0')) - (sums['outflow'] or Decimal('0'))
+
+    if not LedgerArchive.objects.filter(chama_id=chama_id, last_posted_at__gte=moment).exists():
+        sums = totals.aggregate(inflow=Sum('amount', filter=inflow), outflow=Sum('amount', filter=~inflow))
+        return balance + (sums['inflow'] or Decimal('0')) - (sums['outflow'] or Decimal('0'))
+    fields = ('transaction_type', 'status', 'amount')
+    for kind, state, amount, *_ in _archived_rows(chama_id, fields, None, moment, member_id):
+        if state == Transaction.Status.COMPLETED:
+            balance += amount if kind in Transaction.INFLOW_TYPES else -amount
+    return balance
+
+def iter_chain(chama_id, after_seq, fields, chunk_size=FETCH_SIZE):
+    """
+    ``(chain_seq, chain_hash, *fields)`` for a chama's chained rows after
+    ``after_seq``, hot and archived, in chain order.
+
+    Chunks are stored in posting order, so each one is sorted by sequence
+    number when it is read.
+    """
+    hot = (
+        Transaction.objects.filter(chama_id=chama_id, chain_seq__gt=after_seq)
+        .order_by('chain_seq')
+        .values_list('chain_seq', 'chain_hash', *fields)
+        .iterator(chunk_size=chunk_size)
+    )
+    chunks = LedgerArchive.objects.filter(chama_id=chama_id, last_seq__gt=after_seq)
+    if not chunks.exists():
+        yield from hot
+        return
+
+    def chunk_rows(data):
+        columns = json.loads(zlib.decompress(data))
+        keep = [index for index, seq in enumerate(columns['chain_seq']) if seq is not None and seq > after_seq]
+        keep.sort(key=columns['chain_seq'].__getitem__)
+        decoded = []
+        for name in ('chain_seq', 'chain_hash', *fields):
+            decode = DECODERS.get(name)
+            values = columns[name]
+            decoded.append([decode(values[i]) for i in keep] if decode else [values[i] for i in keep])
+        return zip(*decoded)
+
+    def cold():
+        run, run_end = [], None
+        for first, last, data in chunks.order_by('first_seq').values_list('first_seq', 'last_seq', 'data').iterator(
+            chunk_size=1
+        ):
+            if run and first > run_end:
+                yield from heapq.merge(*run, key=itemgetter(0))
+                run = []
+            run_end = max(run_end, last) if run else last
+            run.append(chunk_rows(bytes(data)))
+        if run:
+            yield from heapq.merge(*run, key=itemgetter(0))
+
+    yield from heapq.merge(cold(), hot, key=itemgetter(0))
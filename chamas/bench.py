@@ -0,0 +1,93 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Benchmarks seed synthetic data inside a transaction that is rolled back when
+they finish, so they can run against a development database safely.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Chama, Membership, Transaction
+from .rollups import rebuild_range
+
+User = get_user_model()
+
+class Rollback(Exception):
+    pass
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back"""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+@contextmanager
+def timer():
+    """Yield a dict whose 'seconds' key is filled in when the block exits"""
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.perf_counter() - start
+
+def seed_chama(members=25, transactions_per_member=40, days=365, batch_size=5000, name='Benchmark Chama'):
+    """Create a chama with members and a year of ledger history"""
+    chama = Chama.objects.create(name=name, contribution_amount=Decimal('5000'))
+    tag = chama.pk.hex[:8]
+    users = User.objects.bulk_create(
+        [
+            User(
+                email=f'bench-{tag}-{i}@example.com',
+                username=f'bench-{tag}-{i}',
+                first_name='Member',
+                last_name=str(i),
+                phone_number=f'2547{i:08d}',
+                password='!',
+            )
+            for i in range(members)
+        ],
+        batch_size=batch_size,
+    )
+    Membership.objects.bulk_create(
+        [Membership(chama=chama, user=user, joined_at=timezone.now() - timedelta(days=days)) for user in users],
+        batch_size=batch_size,
+    )
+
+    now = timezone.now()
+    rng = random.Random(tag)
+    types = [
+        Transaction.Type.CONTRIBUTION,
+        Transaction.Type.CONTRIBUTION,
+        Transaction.Type.CONTRIBUTION,
+        Transaction.Type.LOAN_PAYMENT,
+        Transaction.Type.LOAN_DISBURSEMENT,
+    ]
+    batch = []
+    for user in users:
+        for _ in range(transactions_per_member):
+            batch.append(Transaction(
+                chama=chama,
+                member=user,
+                transaction_type=rng.choice(types),
+                amount=Decimal(rng.randrange(500, 10000, 50)),
+                posted_at=now - timedelta(seconds=rng.randrange(days * 86400)),
+            ))
+            if len(batch) >= batch_size:
+                Transaction.objects.bulk_create(batch)
+                batch = []
+    if batch:
+        Transaction.objects.bulk_create(batch)
+    rebuild_range(chama.pk, timezone.localdate(now - timedelta(days=days)), timezone.localdate(now))
+    return chama, users
@@ -0,0 +1,133 @@
+"""
+Versioned caching helpers for chama payloads.
+
+Cached payloads are tagged with the version stamps of everything they were
+built from (the chama ledger, the user's profile). Writes bump a stamp, which
+invalidates every payload built from it in O(1) without deleting keys.
+"""
+
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = 'metrics'
+
+# ============================================================================
+# Version Stamps
+# ============================================================================
+
+def _version_key(scope, pk):
+    return f'version:{scope}:{pk}'
+
+def _new_version():
+    # Time-based so a stamp evicted from the cache never restarts at a value
+    # an older payload was tagged with.
+    return time.time_ns()
+
+def get_versions(*scopes):
+    """
+    Return the current version stamps for the given (scope, pk) pairs.
+
+    Missing stamps are initialised in the same round-trip so the returned
+    tuple is always complete.
+    """
+    keys = [_version_key(scope, pk) for scope, pk in scopes]
+    found = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return tuple(found[key] for key in keys)
+
+def bump_version(scope, pk):
+    """Invalidate every payload built from (scope, pk)"""
+    cache.set(_version_key(scope, pk), _new_version(), timeout=None)
+
+def chama_version(chama_id):
+    return get_versions(('chama', chama_id))[0]
+
+def invalidate_chama(chama_id):
+    bump_version('chama', chama_id)
+
+def invalidate_user(user_id):
+    bump_version('user', user_id)
+
+# ============================================================================
+# Metrics
+# ============================================================================
+
+def record_metric(namespace, name):
+    """Increment a shared hit/miss counter"""
+    key = f'{METRICS_PREFIX}:{namespace}:{name}'
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(key, 1, timeout=None)
+
+def get_metrics(namespace, names=('hit', 'miss', 'stale', 'wait')):
+    keys = {f'{METRICS_PREFIX}:{namespace}:{name}': name for name in names}
+    found = cache.get_many(keys)
+    metrics = {name: found.get(key, 0) for key, name in keys.items()}
+    lookups = metrics.get('hit', 0) + metrics.get('miss', 0) + metrics.get('stale', 0)
+    metrics['hit_rate'] = round(metrics.get('hit', 0) / lookups, 4) if lookups else None
+    return metrics
+
+def reset_metrics(namespace, names=('hit', 'miss', 'stale', 'wait')):
+    cache.delete_many([f'{METRICS_PREFIX}:{namespace}:{name}' for name in names])
+
+# ============================================================================
+# Stampede-Protected Lookup
+# ============================================================================
+
+def get_or_build(key, version, builder, namespace, timeout=None):
+    """
+    Return ``(version, payload)`` for the payload cached under ``key``, if
+    it was built at ``version``.
+
+    On a miss a single caller takes a short-lived lock and rebuilds. Other
+    callers get the previous (stale) payload if one exists, along with the
+    older version it was built at, so nothing labels it as current.
+    Otherwise they wait briefly for the rebuild before falling back to
+    building themselves.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 3600)
+    lock_timeout = getattr(settings, 'CACHE_REBUILD_LOCK_TIMEOUT', 10)
+    lock_wait = getattr(settings, 'CACHE_REBUILD_WAIT', 2.0)
+
+    entry = cache.get(key)
+    if entry is not None and entry[0] == version:
+        record_metric(namespace, 'hit')
+        return entry
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        record_metric(namespace, 'miss')
+        try:
+            payload = builder()
+            cache.set(key, (version, payload), timeout=timeout)
+            return version, payload
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        record_metric(namespace, 'stale')
+        return entry
+
+    # Nothing to serve yet: wait for the rebuilding request to finish
+    record_metric(namespace, 'wait')
+    deadline = time.monotonic() + lock_wait
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry
+
+    logger.warning('Timed out waiting for cache rebuild of %s', key)
+    record_metric(namespace, 'miss')
+    return version, builder()
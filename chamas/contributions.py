@@ -0,0 +1,131 @@
+"""
+Bulk posting of contributions recorded at a chama meeting.
+
+A meeting sheet is validated against one prefetched map of the chama's
+members, then every ledger row is written with a single bulk_create. Because
+bulk_create skips post_save signals, the rollups, defaulters and cached
+payloads that signals normally maintain are updated here explicitly, in the
+same transaction.
+"""
+
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_chama
+from .defaulters import schedule_refresh
+from .events import publish_transactions
+from .models import Membership, Transaction
+from .rollups import apply_transactions
+from .utils import normalize_phone
+
+MAX_SHEET_ROWS = 2000
+MAX_AMOUNT = Decimal('10000000')
+CENT = Decimal('0.01')
+
+def member_directory(chama_id):
+    """
+    Map every way a sheet may identify an active member to their user id.
+
+    Members can be referenced by user id, email or phone number.
+    """
+    directory = {}
+    members = Membership.objects.filter(chama_id=chama_id, is_active=True).values_list(
+        'user_id', 'user__email', 'user__phone_number'
+    )
+    for user_id, email, phone in members:
+        directory[str(user_id)] = user_id
+        directory[user_id.hex] = user_id
+        if email:
+            directory[email.lower()] = user_id
+        if phone:
+            directory[normalize_phone(phone)] = user_id
+    return directory
+
+def _resolve_member(row, directory):
+    for field in ('member_id', 'email', 'phone'):
+        value = row.get(field)
+        if not value:
+            continue
+        if field == 'email':
+            value = str(value).lower()
+        elif field == 'phone':
+            value = normalize_phone(value)
+        return directory.get(str(value))
+    return None
+
+def _parse_amount(value):
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+    if not amount.is_finite() or amount <= 0 or amount > MAX_AMOUNT or amount != amount.quantize(CENT):
+        return None
+    return amount.quantize(CENT)
+
+def validate_sheet(chama_id, rows):
+    """
+    Validate sheet rows; returns (entries, results).
+
+    ``entries`` holds (row index, member id, amount, row) for valid rows and
+    ``results`` one dict per row, with errors for invalid ones.
+    """
+    directory = member_directory(chama_id)
+    entries, results = [], []
+    seen_references = set()
+    for index, row in enumerate(rows):
+        errors = {}
+        if not isinstance(row, dict):
+            results.append({'row': index, 'status': 'invalid', 'errors': {'row': 'Expected an object.'}})
+            continue
+
+        member_id = _resolve_member(row, directory)
+        if member_id is None:
+            errors['member'] = 'No active member matches member_id, email or phone.'
+        amount = _parse_amount(row.get('amount'))
+        if amount is None:
+            errors['amount'] = f'Enter a positive amount up to {MAX_AMOUNT} with at most 2 decimal places.'
+        reference = str(row.get('reference') or '').strip()
+        if len(reference) > Transaction._meta.get_field('reference').max_length:
+            errors['reference'] = 'Reference is too long.'
+        elif reference and reference in seen_references:
+            errors['reference'] = 'Duplicate reference in this sheet.'
+        seen_references.add(reference)
+
+        if errors:
+            results.append({'row': index, 'status': 'invalid', 'errors': errors})
+        else:
+            entries.append((index, member_id, amount, row))
+            results.append({'row': index, 'status': 'valid'})
+    return entries, results
+
+def post_contributions(chama_id, entries, meeting=None, posted_at=None):
+    """
+    Write validated sheet entries as completed contributions.
+
+    Must run inside a transaction. Returns the created transactions in
+    entry order.
+    """
+    posted_at = posted_at or timezone.now()
+    description = f'Contribution at meeting on {meeting.scheduled_for:%Y-%m-%d}' if meeting else 'Contribution'
+    created = Transaction.objects.bulk_create([
+        Transaction(
+            chama_id=chama_id,
+            member_id=member_id,
+            meeting=meeting,
+            transaction_type=Transaction.Type.CONTRIBUTION,
+            amount=amount,
+            description=str(row.get('description') or description)[:255],
+            reference=str(row.get('reference') or '').strip(),
+            status=Transaction.Status.COMPLETED,
+            posted_at=posted_at,
+        )
+        for _, member_id, amount, row in entries
+    ])
+
+    # Signals don't fire for bulk_create: maintain derived data explicitly
+    apply_transactions(created)
+    schedule_refresh(chama_id)
+    transaction.on_commit(lambda: invalidate_chama(chama_id))
+    publish_transactions(chama_id, created)
+    return created
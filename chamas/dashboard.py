@@ -0,0 +1,265 @@
+"""
+Dashboard summary payloads for members and treasurers.
+
+Payloads are built from the chama ledger and cached per user and role. The
+cache entry is tagged with the chama and user version stamps, so ledger,
+meeting and profile writes (see chamas.signals) invalidate it immediately.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from .cache import get_or_build, get_versions
+from .loans import loan_status
+from .models import ArchivedTotal, DailyRollup, Defaulter, Fine, Loan, Meeting, Membership, Transaction
+from .rollups import group_totals
+from .rotation import member_position
+from .tenancy import current_chama_id, is_treasurer
+
+CACHE_NAMESPACE = 'dashboard'
+
+# Defaulters listed on the treasurer dashboard (largest arrears first)
+DASHBOARD_DEFAULTERS_LIMIT = 10
+
+ZERO = Decimal('0')
+
+def get_role(user, chama_id=None):
+    """Which dashboard the user sees in the chama (default: the current one)"""
+    return 'treasurer' if is_treasurer(user, chama_id) else 'member'
+
+def get_primary_chama_id(user):
+    """Return the chama the user joined first, or None"""
+    return (
+        Membership.objects.unscoped().filter(user=user, is_active=True)
+        .order_by('joined_at')
+        .values_list('chama_id', flat=True)
+        .first()
+    )
+
+def _number(value):
+    """Render ledger amounts the way the frontend expects (plain numbers)"""
+    value = value or ZERO
+    return int(value) if value == value.to_integral_value() else float(value)
+
+def _group_balance(chama_id):
+    totals = DailyRollup.objects.filter(chama_id=chama_id).aggregate(
+        inflow=Sum('inflow_amount'), outflow=Sum('outflow_amount')
+    )
+    return _number((totals['inflow'] or ZERO) - (totals['outflow'] or ZERO))
+
+def _next_meeting(chama_id, user):
+    meeting = (
+        Meeting.objects.filter(chama_id=chama_id, scheduled_for__gte=timezone.now())
+        .order_by('scheduled_for')
+        .first()
+    )
+    if meeting is None:
+        return None
+    scheduled = timezone.localtime(meeting.scheduled_for)
+    my_position, total_positions = member_position(chama_id, user.pk)
+    return {
+        'date': meeting.scheduled_for.isoformat(),
+        'time': scheduled.strftime('%H:%M'),
+        'location': meeting.location,
+        'agenda': meeting.agenda,
+        'my_position': my_position,
+        'total_positions': total_positions,
+    }
+
+def _transaction_row(txn, include_member=False):
+    row = {
+        'id': str(txn.pk),
+        'date': txn.posted_at.isoformat(),
+        'type': txn.transaction_type,
+    }
+    if include_member:
+        row['member_name'] = txn.member.full_name if txn.member else ''
+    row.update({
+        'amount': _number(txn.amount),
+        'description': txn.description,
+        'status': txn.status,
+    })
+    return row
+
+def _loan_status(user, chama_id):
+    loan = (
+        Loan.objects.filter(chama_id=chama_id, member=user, status=Loan.Status.ACTIVE)
+        .order_by('-disbursed_at')
+        .first()
+    )
+    if loan is None:
+        return None
+    status = loan_status(loan)
+    for field in ('amount_borrowed', 'amount_paid', 'remaining_balance', 'next_payment_amount'):
+        status[field] = _number(status[field])
+    return status
+
+def _defaulter_row(defaulter):
+    return {
+        'id': str(defaulter.member_id),
+        'name': defaulter.member.full_name,
+        'phone': defaulter.member.phone_number or '',
+        'amount': _number(defaulter.amount_due),
+        'days_overdue': defaulter.days_overdue,
+        'last_contribution': defaulter.last_contribution.isoformat() if defaulter.last_contribution else None,
+    }
+
+def build_member_summary(user, chama_id):
+    """Build the member dashboard payload"""
+    if chama_id is None:
+        return {
+            'personal_balance': 0,
+            'group_balance': 0,
+            'next_meeting': None,
+            'loan_status': None,
+            'recent_transactions': [],
+            'contribution_summary': {
+                'this_month': 0,
+                'total': 0,
+                'last_contribution_date': None,
+            },
+        }
+
+    now = timezone.now()
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    mine = Transaction.objects.filter(chama_id=chama_id, member=user)
+    contributions = mine.filter(
+        transaction_type=Transaction.Type.CONTRIBUTION,
+        status=Transaction.Status.COMPLETED,
+    ).aggregate(
+        total=Sum('amount'),
+        this_month=Sum('amount', filter=Q(posted_at__gte=month_start)),
+    )
+    last_contribution = (
+        mine.filter(transaction_type=Transaction.Type.CONTRIBUTION)
+        .order_by('-posted_at')
+        .values_list('posted_at', flat=True)
+        .first()
+    )
+    withdrawn = mine.filter(
+        transaction_type__in=(Transaction.Type.PAYOUT, Transaction.Type.WITHDRAWAL),
+        status=Transaction.Status.COMPLETED,
+    ).aggregate(total=Sum('amount'))['total'] or ZERO
+    # Rows moved to cold storage still count towards the balance
+    archived = ArchivedTotal.objects.filter(chama_id=chama_id, member=user).aggregate(
+        contributed=Sum('amount', filter=Q(transaction_type=Transaction.Type.CONTRIBUTION)),
+        withdrawn=Sum('amount', filter=Q(transaction_type__in=(Transaction.Type.PAYOUT, Transaction.Type.WITHDRAWAL))),
+        last_contribution=Max('last_posted_at', filter=Q(transaction_type=Transaction.Type.CONTRIBUTION)),
+    )
+    contributed = (contributions['total'] or ZERO) + (archived['contributed'] or ZERO)
+    withdrawn += archived['withdrawn'] or ZERO
+    last_contribution = last_contribution or archived['last_contribution']
+
+    return {
+        'personal_balance': _number(contributed - withdrawn),
+        'group_balance': _group_balance(chama_id),
+        'next_meeting': _next_meeting(chama_id, user),
+        'loan_status': _loan_status(user, chama_id),
+        'recent_transactions': [
+            _transaction_row(txn) for txn in mine.order_by('-posted_at', '-id')[:10]
+        ],
+        'contribution_summary': {
+            'this_month': _number(contributions['this_month']),
+            'total': _number(contributed),
+            'last_contribution_date': last_contribution.isoformat() if last_contribution else None,
+        },
+    }
+
+def build_treasurer_summary(user, chama_id):
+    """Build the treasurer dashboard payload"""
+    if chama_id is None:
+        return {
+            'group_summary': {
+                'total_balance': 0,
+                'total_collected_today': 0,
+                'collected_month_to_date': 0,
+                'collected_year_to_date': 0,
+                'outstanding_loans': 0,
+                'defaulters_count': 0,
+                'total_members': 0,
+                'attendance_rate': None,
+            },
+            'defaulters': [],
+            'pending_actions': {
+                'pending_loans': 0,
+                'pending_approvals': 0,
+                'upcoming_meetings': 0,
+                'overdue_fines': 0,
+            },
+            'recent_group_transactions': [],
+        }
+
+    now = timezone.now()
+    totals = group_totals(chama_id)
+    recent = (
+        Transaction.objects.filter(chama_id=chama_id)
+        .select_related('member')
+        .order_by('-posted_at', '-id')[:10]
+    )
+    defaulters = Defaulter.objects.filter(chama_id=chama_id)
+
+    return {
+        'group_summary': {
+            'total_balance': _number(totals['balance']),
+            'total_collected_today': _number(totals['collected_today']),
+            'collected_month_to_date': _number(totals['collected_month_to_date']),
+            'collected_year_to_date': _number(totals['collected_year_to_date']),
+            'outstanding_loans': _number(totals['outstanding_loans']),
+            'defaulters_count': defaulters.count(),
+            'total_members': Membership.objects.filter(chama_id=chama_id, is_active=True).count(),
+            # Attendance is not tracked yet
+            'attendance_rate': None,
+        },
+        'defaulters': [
+            _defaulter_row(defaulter)
+            for defaulter in defaulters.select_related('member').order_by('rank')[:DASHBOARD_DEFAULTERS_LIMIT]
+        ],
+        'pending_actions': {
+            'pending_loans': Loan.objects.filter(chama_id=chama_id, status=Loan.Status.PENDING).count(),
+            'pending_approvals': totals['pending_count'],
+            'upcoming_meetings': Meeting.objects.filter(
+                chama_id=chama_id,
+                scheduled_for__gte=now,
+                scheduled_for__lt=now + timedelta(days=30),
+            ).count(),
+            'overdue_fines': Fine.objects.filter(chama_id=chama_id, status=Fine.Status.UNPAID).count(),
+        },
+        'recent_group_transactions': [
+            _transaction_row(txn, include_member=True) for txn in recent
+        ],
+    }
+
+def build_dashboard_summary(user, chama_id=None, role=None):
+    """Build the dashboard payload without consulting the cache"""
+    role = role or get_role(user, chama_id)
+    if role == 'treasurer':
+        return build_treasurer_summary(user, chama_id)
+    return build_member_summary(user, chama_id)
+
+def summary_stamp(user, chama_id=None):
+    """
+    ``(chama_id, role, versions)`` a user's dashboard payload is built from,
+    without building it. The chama defaults to the current one, else the
+    user's first.
+    """
+    if chama_id is None:
+        chama_id = current_chama_id() or get_primary_chama_id(user)
+    return chama_id, get_role(user, chama_id), get_versions(('chama', chama_id), ('user', user.pk))
+
+def get_dashboard_summary(user, chama_id=None, stamp=None):
+    """
+    Return ``(stamp, payload)``: the dashboard payload for a user in a
+    chama (default: the current one, else their first), served from cache
+    when fresh, and the stamp it was built at. While another request
+    rebuilds, that is an older stamp than the one asked for.
+    """
+    chama_id, role, version = stamp or summary_stamp(user, chama_id)
+    version, payload = get_or_build(
+        f'{CACHE_NAMESPACE}:summary:{user.pk}:{chama_id}:{role}',
+        version,
+        lambda: build_dashboard_summary(user, chama_id, role),
+        namespace=CACHE_NAMESPACE,
+    )
+    return (chama_id, role, version), payload
@@ -0,0 +1,160 @@
+"""
+Set-based defaulter detection.
+
+A single INSERT ... SELECT computes expected versus paid contributions and
+days overdue for every active member of every chama (or a subset of chamas)
+and writes the results straight into the chama_defaulter table. The ledger is
+scanned once, grouped by (chama, member), together with the totals of
+archived months (see chamas.archive); no rows pass through Python.
+
+Expected contributions accrue one ``contribution_amount`` per elapsed
+``contribution_interval_days`` since the member joined. A member who has paid
+for ``k`` periods became overdue when period ``k + 1`` fell due.
+"""
+
+from threading import local
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidate_chama
+from .models import Chama, Defaulter, Transaction
+
+# Fractional days between the refresh time and when the member joined
+DAYS_SINCE_JOINED = {
+    'sqlite': "(julianday(%(now)s) - julianday(m.joined_at))",
+    'postgresql': "(EXTRACT(EPOCH FROM (%(now)s::timestamptz - m.joined_at)) / 86400.0)",
+}
+
+REFRESH_SQL = """
+INSERT INTO chama_defaulter (
+    chama_id, member_id, expected_amount, paid_amount, amount_due,
+    days_overdue, last_contribution, rank, computed_at
+)
+SELECT
+    chama_id, member_id, expected_amount, paid_amount, amount_due,
+    days_overdue, last_contribution,
+    ROW_NUMBER() OVER (
+        PARTITION BY chama_id ORDER BY amount_due DESC, days_overdue DESC, member_id
+    ),
+    %(now)s
+FROM (
+    SELECT
+        m.chama_id,
+        m.user_id AS member_id,
+        FLOOR(m.days_joined / m.interval_days) * m.per_period AS expected_amount,
+        COALESCE(p.paid, 0) AS paid_amount,
+        FLOOR(m.days_joined / m.interval_days) * m.per_period - COALESCE(p.paid, 0) AS amount_due,
+        CAST(FLOOR(
+            m.days_joined - (FLOOR(COALESCE(p.paid, 0) * 1.0 / m.per_period) + 1) * m.interval_days
+        ) AS INTEGER) AS days_overdue,
+        p.last_contribution
+    FROM (
+        SELECT
+            m.chama_id,
+            m.user_id,
+            c.contribution_amount AS per_period,
+            c.contribution_interval_days AS interval_days,
+            {days_joined} AS days_joined
+        FROM chama_membership m
+        JOIN chama c ON c.id = m.chama_id
+        WHERE m.is_active AND c.contribution_amount > 0 {membership_filter}
+    ) m
+    LEFT JOIN (
+        SELECT chama_id, member_id, SUM(paid) AS paid, MAX(last_contribution) AS last_contribution
+        FROM (
+            SELECT chama_id, member_id, SUM(amount) AS paid, MAX(posted_at) AS last_contribution
+            FROM chama_transaction
+            WHERE transaction_type = %(contribution)s AND status = %(completed)s {ledger_filter}
+            GROUP BY chama_id, member_id
+            UNION ALL
+            SELECT chama_id, member_id, amount, last_posted_at
+            FROM chama_archived_total
+            WHERE transaction_type = %(contribution)s {ledger_filter}
+        ) ledger
+        GROUP BY chama_id, member_id
+    ) p ON p.chama_id = m.chama_id AND p.member_id = m.user_id
+) arrears
+WHERE amount_due > 0
+"""
+
+def _chama_filter(column, chama_ids, params):
+    if chama_ids is None:
+        return ''
+    names = []
+    for i, chama_id in enumerate(chama_ids):
+        name = f'chama_{i}'
+        params[name] = Chama._meta.pk.get_db_prep_value(chama_id, connection)
+        names.append(f'%({name})s')
+    return f"AND {column} IN ({', '.join(names)})"
+
+def refresh_defaulters(chama_ids=None, now=None):
+    """
+    Recompute the defaulters table for the given chamas (default: all).
+
+    Returns the number of defaulter rows written.
+    """
+    if chama_ids is not None:
+        chama_ids = [Chama._meta.pk.to_python(chama_id) for chama_id in chama_ids]
+        if not chama_ids:
+            return 0
+    now = now or timezone.now()
+    params = {
+        'now': connection.ops.adapt_datetimefield_value(now),
+        'contribution': Transaction.Type.CONTRIBUTION,
+        'completed': Transaction.Status.COMPLETED,
+    }
+    sql = REFRESH_SQL.format(
+        days_joined=DAYS_SINCE_JOINED[connection.vendor],
+        ledger_filter=_chama_filter('chama_id', chama_ids, params),
+        membership_filter=_chama_filter('m.chama_id', chama_ids, params),
+    )
+
+    with transaction.atomic():
+        stale = Defaulter.objects.unscoped()
+        if chama_ids is not None:
+            stale = stale.filter(chama_id__in=chama_ids)
+        stale.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            written = cursor.rowcount
+
+    # Days overdue move on even without new payments
+    if chama_ids is None:
+        chama_ids = Chama.objects.values_list('id', flat=True)
+    for chama_id in chama_ids:
+        invalidate_chama(chama_id)
+    return written
+
+# ============================================================================
+# Refresh On Payment
+# ============================================================================
+
+# Chamas waiting for a refresh, per thread and database alias (connections
+# are per thread too)
+_pending = local()
+
+def _pending_chamas(alias):
+    if not hasattr(_pending, 'chamas'):
+        _pending.chamas = {}
+    return _pending.chamas.setdefault(alias, set())
+
+def _refresh_pending(alias):
+    pending = _pending_chamas(alias)
+    if pending:
+        chama_ids = list(pending)
+        pending.clear()
+        refresh_defaulters(chama_ids)
+
+def schedule_refresh(chama_id):
+    """
+    Refresh a chama's defaulters once the current transaction commits.
+
+    Many payments posted in one transaction trigger a single refresh: the
+    first commit callback takes every pending chama and the rest find
+    nothing left. A rolled-back transaction's callbacks never run, so its
+    chamas are refreshed with the next commit on the connection; an extra
+    refresh is harmless.
+    """
+    alias = transaction.get_connection().alias
+    _pending_chamas(alias).add(chama_id)
+    transaction.on_commit(lambda: _refresh_pending(alias), using=alias)
@@ -0,0 +1,230 @@
+"""
+Type-ahead member search for a chama.
+
+Treasurers look members up by name, phone or email while recording
+payments. Queries run against the search index over
+accounts.SearchDocument: a weighted tsvector and a trigram index on
+PostgreSQL, and the member_search FTS5 table on SQLite. Each document
+carries a token for every chama its user is an active member of, so the
+index itself narrows matches to one chama.
+
+Every word typed is a prefix, so "wanj kam" finds Wanjiru Kamau and
+"0712" finds 254712... numbers. Names and phone numbers rank above email
+and location. Only the first ``RANK_WINDOW`` matches are ranked, so a
+broad prefix in a very large chama costs the same as a narrow one. The
+next keystroke narrows it.
+
+When prefixes find fewer than ``limit`` members, names a typo or two away
+are added after them, ranked by trigram word similarity. PostgreSQL
+answers this with pg_trgm's ``<%``. On SQLite, misspelt words are matched
+against the index's own vocabulary of names first, and the corrected words
+are searched instead.
+"""
+
+import re
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from accounts.search import chama_token
+
+from .models import Membership
+
+User = get_user_model()
+
+MIN_QUERY_LENGTH = 2
+MAX_SEARCH_RESULTS = 25
+# Matches ranked per query, and per typo lookup
+RANK_WINDOW = 200
+FUZZY_WINDOW = 50
+# Shorter words have too few trigrams to tell a typo from another name
+FUZZY_MIN_LENGTH = 4
+# A dropped, doubled or swapped letter keeps about half of a name's trigrams;
+# pg_trgm's default word_similarity_threshold of 0.6 misses most of them
+WORD_SIMILARITY_THRESHOLD = 0.5
+# Names and phone numbers outrank email, then location
+COLUMN_WEIGHTS = (10, 3, 10, 1)
+
+WORD = re.compile(r'\w+')
+
+def query_words(query):
+    """Lower-cased words and digit runs, as the index tokenizes them"""
+    return WORD.findall(query.lower())
+
+def trigrams(word):
+    """pg_trgm's trigrams of one word: padded with two spaces before and one after"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def word_similarity(query, text):
+    """
+    The share of each query word's trigrams found in its closest word of
+    ``text``, averaged. A close cousin of pg_trgm's word_similarity, for
+    backends without it.
+    """
+    words = [trigrams(word) for word in query_words(text)]
+    scores = []
+    for word in query_words(query):
+        wanted = trigrams(word)
+        scores.append(max((len(wanted & candidate) / len(wanted) for candidate in words), default=0.0))
+    return sum(scores) / len(scores) if scores else 0.0
+
+def match_score(words, *columns):
+    """
+    Each word's best column weight, doubled when it is a whole word there
+    rather than a prefix. ``columns`` are name, email, phone and location.
+    """
+    columns = [(weight, query_words(text)) for weight, text in zip(COLUMN_WEIGHTS, columns)]
+    score = 0
+    for word in words:
+        score += max(
+            (weight * (2 if token == word else 1) for weight, tokens in columns for token in tokens if token.startswith(word)),
+            default=0,
+        )
+    return score
+
+# ============================================================================
+# Backends
+# ============================================================================
+
+# FTS5's bm25() reads every matching row of every phrase for its statistics,
+# the chama's token included, so the window is ranked in Python instead
+SQLITE_WINDOW_SQL = """
+    SELECT user_id, name, email, phone, location FROM accounts_search_document
+    WHERE id IN (SELECT rowid FROM member_search WHERE member_search MATCH %s LIMIT %s)
+"""
+
+SQLITE_VOCABULARY_SQL = """
+    SELECT term FROM member_search_vocab WHERE col = 'name' AND term >= %s AND term < %s
+"""
+
+# Chama tokens carry weight D; searched words only match A to C
+POSTGRES_PREFIX_SQL = """
+    SELECT d.user_id FROM (
+        SELECT user_id, name, search_vector FROM accounts_search_document
+        WHERE search_vector @@ to_tsquery('simple', %s) LIMIT %s
+    ) d
+    ORDER BY ts_rank(d.search_vector, to_tsquery('simple', %s)) DESC, d.name
+    LIMIT %s
+"""
+
+POSTGRES_FUZZY_SQL = """
+    SELECT d.user_id FROM accounts_search_document d
+    WHERE %s <%% d.name AND d.search_vector @@ to_tsquery('simple', %s)
+    ORDER BY word_similarity(%s, d.name) DESC, d.name
+    LIMIT %s
+"""
+
+SEARCHED_COLUMNS = '{name email phone location}'
+
+def _sqlite_window(cursor, token, clauses, window=RANK_WINDOW):
+    match = ' AND '.join([f'chamas : "{token}"', *clauses])
+    cursor.execute(SQLITE_WINDOW_SQL, [match, window])
+    return cursor.fetchall()
+
+def _sqlite_prefix(cursor, token, words, limit):
+    clauses = [f'{SEARCHED_COLUMNS} : "{word}"*' for word in words]
+    ranked = sorted(
+        (-match_score(words, name, email, phone, location), name, user_id)
+        for user_id, name, email, phone, location in _sqlite_window(cursor, token, clauses)
+    )
+    return [user_id for _, _, user_id in ranked[:limit]]
+
+def _sqlite_corrections(cursor, word):
+    """
+    Names in the index a typo away from ``word`` and sharing its first two
+    letters. Nothing if ``word`` already starts a name.
+    """
+    cursor.execute(SQLITE_VOCABULARY_SQL, [word[:2], word[0] + chr(ord(word[1]) + 1)])
+    terms = [term for term, in cursor.fetchall()]
+    if any(term.startswith(word) for term in terms):
+        return []
+    return [
+        term for term in terms
+        if abs(len(term) - len(word)) <= 2 and word_similarity(word, term) >= WORD_SIMILARITY_THRESHOLD
+    ]
+
+def _sqlite_fuzzy(cursor, token, words, limit):
+    clauses, corrected = [], False
+    for word in words:
+        # Digits are phone numbers and emails, not misspelt names
+        corrections = _sqlite_corrections(cursor, word) if word.isalpha() and len(word) >= FUZZY_MIN_LENGTH else []
+        if corrections:
+            corrected = True
+            clauses.append('{name} : (' + ' OR '.join([f'"{word}"*', *(f'"{term}"' for term in corrections)]) + ')')
+        else:
+            clauses.append(f'{SEARCHED_COLUMNS} : "{word}"*')
+    if not corrected:
+        return []
+    query = ' '.join(words)
+    scored = []
+    for user_id, name, *_ in _sqlite_window(cursor, token, clauses, FUZZY_WINDOW):
+        score = word_similarity(query, name)
+        if score >= WORD_SIMILARITY_THRESHOLD:
+            scored.append((-score, name, user_id))
+    return [user_id for _, _, user_id in sorted(scored)[:limit]]
+
+def _postgres_prefix(cursor, token, words, limit):
+    tsquery = ' & '.join([f'{token}:D', *(f'{word}:*ABC' for word in words)])
+    cursor.execute(POSTGRES_PREFIX_SQL, [tsquery, RANK_WINDOW, tsquery, limit])
+    return [row[0] for row in cursor.fetchall()]
+
+def _postgres_fuzzy(cursor, token, words, limit):
+    query = ' '.join(words)
+    # <% reads its cut-off from the session
+    cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)", [str(WORD_SIMILARITY_THRESHOLD)])
+    cursor.execute(POSTGRES_FUZZY_SQL, [query, f'{token}:D', query, limit])
+    return [row[0] for row in cursor.fetchall()]
+
+BACKENDS = {
+    'sqlite': (_sqlite_prefix, _sqlite_fuzzy),
+    'postgresql': (_postgres_prefix, _postgres_fuzzy),
+}
+
+# ============================================================================
+# Search
+# ============================================================================
+
+def find_member_ids(chama_id, query, limit=10):
+    """``[(user_id, 'prefix' | 'fuzzy')]``, best first, for the chama's active members"""
+    words = query_words(query)
+    if not words:
+        return []
+    prefix, fuzzy = BACKENDS[connection.vendor]
+    token = chama_token(chama_id)
+    with connection.cursor() as cursor:
+        found = [(user_id, 'prefix') for user_id in prefix(cursor, token, words, limit)]
+        if len(found) < limit and max(len(word) for word in words) >= FUZZY_MIN_LENGTH:
+            seen = {user_id for user_id, _ in found}
+            found += [
+                (user_id, 'fuzzy') for user_id in fuzzy(cursor, token, words, limit)
+                if user_id not in seen
+            ][:limit - len(found)]
+    return found
+
+def search_members(chama_id, query, limit=10):
+    """Matching members of the chama as response rows, best first"""
+    found = find_member_ids(chama_id, query, limit)
+    if not found:
+        return []
+    # Raw SQL hands back ids as the backend stores them
+    pk = User._meta.pk
+    found = [(pk.to_python(user_id), match) for user_id, match in found]
+    memberships = {
+        membership.user_id: membership
+        for membership in Membership.objects.filter(
+            chama_id=chama_id, user_id__in=[user_id for user_id, _ in found], is_active=True,
+        ).select_related('user')
+    }
+    return [
+        {
+            'id': user_id,
+            'full_name': memberships[user_id].user.full_name,
+            'email': memberships[user_id].user.email,
+            'phone_number': memberships[user_id].user.phone_number,
+            'role': memberships[user_id].role,
+            'match': match,
+        }
+        for user_id, match in found
+        # A membership changed by a bulk update may not be reindexed yet
+        if user_id in memberships
+    ]
@@ -0,0 +1,263 @@
+"""
+Streaming CSV and PDF exports of member statements and group reports.
+
+Rows come from archive.iter_ledger, which reads archived months from cold
+storage one chunk at a time and the hot ledger through
+``iterator(chunk_size=...)``. On PostgreSQL that is a server-side cursor. Rows are rendered by generators, so
+a response or file holds one chunk of rows at a time however large the
+ledger is. Small exports stream straight back to the client with
+StreamingHttpResponse. Large ones run as ExportJobs that write the same
+stream to storage and are downloaded when ready. A worker renews its
+job's lease as it renders, so a job whose worker died is picked up again.
+
+Reports limited to a date range open with the balance of everything
+completed before it, archived rows included. Descriptions, references and
+names that would start a spreadsheet formula are prefixed with ``'``.
+"""
+
+import csv
+import io
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .archive import balance_before, iter_ledger
+from .models import ExportJob, Transaction
+from .pdf import render_table
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Rows per string handed to the response; fewer, larger writes
+CSV_FLUSH_ROWS = 500
+
+CONTENT_TYPES = {
+    ExportJob.Format.CSV: 'text/csv; charset=utf-8',
+    ExportJob.Format.PDF: 'application/pdf',
+}
+
+# ============================================================================
+# Report Rows
+# ============================================================================
+
+def _bounds(date_from=None, date_to=None):
+    """Datetime range [start, end) covering whole local days"""
+    start = timezone.make_aware(datetime.combine(date_from, time.min)) if date_from else None
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min)) if date_to else None
+    return start, end
+
+def _local_minutes(tz):
+    """Formatter for row timestamps; resolving the zone once per export saves a lookup per row"""
+    return lambda moment: moment.astimezone(tz).strftime('%Y-%m-%d %H:%M')
+
+# Leading characters that make spreadsheet apps read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _text(value):
+    """Free text from members or statements, kept inert when opened in a spreadsheet"""
+    if value and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def _signed(transaction_type, amount):
+    return amount if transaction_type in Transaction.INFLOW_TYPES else -amount
+
+def statement_rows(chama_id, member_id, date_from=None, date_to=None):
+    """
+    Header and row generator for one member's statement with a running
+    balance, opening with everything completed before ``date_from``
+    """
+    header = ['Date', 'Type', 'Description', 'Reference', 'Status', 'Paid in', 'Paid out', 'Balance']
+
+    def rows():
+        start, end = _bounds(date_from, date_to)
+        balance = balance_before(chama_id, start, member_id) if start else 0
+        stamp = _local_minutes(timezone.get_current_timezone())
+        ledger = iter_ledger(
+            chama_id, ('posted_at', 'transaction_type', 'description', 'reference', 'status', 'amount'),
+            start, end, member_id=member_id, chunk_size=EXPORT_CHUNK_SIZE,
+        )
+        for posted_at, kind, description, reference, state, amount in ledger:
+            inflow = kind in Transaction.INFLOW_TYPES
+            if state == Transaction.Status.COMPLETED:
+                balance += _signed(kind, amount)
+            yield [
+                stamp(posted_at), kind, _text(description), _text(reference), state,
+                amount if inflow else '', '' if inflow else amount, balance,
+            ]
+    return header, rows()
+
+def group_rows(chama_id, date_from=None, date_to=None):
+    """
+    Header and row generator for the whole chama ledger with a running
+    balance, opening with everything completed before ``date_from``
+    """
+    header = ['Date', 'Member', 'Type', 'Description', 'Reference', 'Status', 'Amount', 'Balance']
+
+    def rows():
+        start, end = _bounds(date_from, date_to)
+        balance = balance_before(chama_id, start) if start else 0
+        stamp = _local_minutes(timezone.get_current_timezone())
+        ledger = iter_ledger(
+            chama_id,
+            (
+                'posted_at', 'member__first_name', 'member__last_name', 'transaction_type', 'description',
+                'reference', 'status', 'amount',
+            ),
+            start, end, chunk_size=EXPORT_CHUNK_SIZE,
+        )
+        for posted_at, first, last, kind, description, reference, state, amount in ledger:
+            if state == Transaction.Status.COMPLETED:
+                balance += _signed(kind, amount)
+            yield [
+                stamp(posted_at), _text(f'{first or ""} {last or ""}'.strip()),
+                kind, _text(description), _text(reference), state, _signed(kind, amount), balance,
+            ]
+    return header, rows()
+
+PDF_WIDTHS = {
+    ExportJob.Report.STATEMENT: [16, 17, 30, 12, 9, 12, 12, 13],
+    ExportJob.Report.GROUP: [16, 20, 17, 22, 12, 9, 12, 13],
+}
+
+# ============================================================================
+# Rendering
+# ============================================================================
+
+def iter_csv(header, rows):
+    """Yield UTF-8 CSV in blocks of CSV_FLUSH_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % CSV_FLUSH_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+def render(report, file_format, chama, member=None, date_from=None, date_to=None):
+    """Byte generator for a report in the given format"""
+    if report == ExportJob.Report.STATEMENT:
+        header, rows = statement_rows(chama.pk, member.pk, date_from, date_to)
+        title = f'{chama.name}: statement for {member.full_name}'
+    else:
+        header, rows = group_rows(chama.pk, date_from, date_to)
+        title = f'{chama.name}: group report'
+    if date_from or date_to:
+        title += f" ({date_from or 'start'} to {date_to or 'today'})"
+    if file_format == ExportJob.Format.PDF:
+        return render_table(title, header, PDF_WIDTHS[report], rows)
+    return iter_csv(header, rows)
+
+def export_filename(report, file_format, chama, member=None):
+    stamp = timezone.localdate().isoformat()
+    subject = member.full_name if member is not None else chama.name
+    slug = ''.join(ch if ch.isalnum() else '-' for ch in subject.lower()).strip('-') or 'chama'
+    return f'{report}-{slug}-{stamp}.{file_format}'
+
+def streaming_export(report, file_format, chama, member=None, date_from=None, date_to=None):
+    response = StreamingHttpResponse(
+        render(report, file_format, chama, member, date_from, date_to),
+        content_type=CONTENT_TYPES[file_format],
+    )
+    filename = export_filename(report, file_format, chama, member)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# ============================================================================
+# Background Jobs
+# ============================================================================
+
+_executor = None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.EXPORT_BACKGROUND_WORKERS, thread_name_prefix='chama-export'
+        )
+    return _executor
+
+def _stale_running():
+    stale = timezone.now() - timedelta(seconds=settings.EXPORT_LEASE_SECONDS)
+    return Q(status=ExportJob.Status.RUNNING) & (Q(heartbeat_at__lt=stale) | Q(heartbeat_at__isnull=True))
+
+def _claim(job_id):
+    """Mark a job as ours unless another worker is actively rendering it"""
+    # Workers serve every chama; the job row says which one
+    return ExportJob.objects.unscoped().filter(
+        Q(status=ExportJob.Status.PENDING) | _stale_running(), pk=job_id,
+    ).update(status=ExportJob.Status.RUNNING, heartbeat_at=timezone.now(), error='')
+
+def run_export(job_id):
+    """
+    Render a pending job to storage; safe to call from any thread.
+
+    A job left running by a worker that died is rendered again once its
+    lease runs out.
+    """
+    if not _claim(job_id):
+        return None
+    jobs = ExportJob.objects.unscoped().filter(pk=job_id)
+    job = jobs.select_related('chama', 'member').get()
+    beat_every = timedelta(seconds=settings.EXPORT_LEASE_SECONDS / 3)
+    try:
+        with tempfile.TemporaryFile() as spool:
+            last_beat = timezone.now()
+            for block in render(job.report, job.file_format, job.chama, job.member, job.date_from, job.date_to):
+                spool.write(block)
+                if timezone.now() - last_beat > beat_every:
+                    last_beat = timezone.now()
+                    jobs.update(heartbeat_at=last_beat)
+            spool.seek(0)
+            filename = export_filename(job.report, job.file_format, job.chama, job.member)
+            job.file.save(filename, File(spool), save=False)
+        job.status = ExportJob.Status.COMPLETED
+    except Exception as exc:
+        logger.exception('Export job %s failed', job.pk)
+        job.status = ExportJob.Status.FAILED
+        job.error = str(exc)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'status', 'error', 'finished_at'])
+    return job
+
+def _run_in_thread(job_id):
+    try:
+        run_export(job_id)
+    finally:
+        # Worker threads own their own connections
+        connection.close()
+
+def enqueue_export(job):
+    """
+    Start a job once the current transaction commits.
+
+    With EXPORT_BACKGROUND_WORKERS set to 0 jobs stay pending for the
+    run_export_jobs command instead.
+    """
+    if settings.EXPORT_BACKGROUND_WORKERS:
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job.pk))
+
+def run_pending(limit=None):
+    """
+    Run pending jobs, and running ones whose worker died, in this process,
+    oldest first; returns how many ran
+    """
+    job_ids = ExportJob.objects.unscoped().filter(
+        Q(status=ExportJob.Status.PENDING) | _stale_running()
+    ).order_by('created_at')
+    count = 0
+    for job_id in job_ids.values_list('pk', flat=True)[:limit]:
+        if run_export(job_id) is not None:
+            count += 1
+    return count
@@ -0,0 +1,238 @@
+"""
+Set-based accrual of late-payment fines.
+
+Two kinds of obligation can be missed:
+
+* Contributions: one ``contribution_amount`` falls due every
+  ``contribution_interval_days`` after a member joins, as in
+  chamas.defaulters. A member who has paid for ``k`` periods misses every
+  period after ``k`` that fell due more than ``fine_grace_days`` ago.
+* Loan repayments: an installment is missed once it is more than
+  ``fine_grace_days`` past due and repayments (applied oldest first) have
+  not covered it.
+
+Each missed period or installment is fined once, with the chama's
+``late_contribution_fine`` or ``late_repayment_fine``. Chamas with a zero fine
+are skipped. Fines are keyed by the obligation they punish, so the unique
+constraints on Fine make inserts idempotent: a rerun, or two overlapping
+runs, only add what is missing. Each query also reads the last period
+already fined per member or loan, so a nightly run only builds the fines
+that are new since the last one.
+
+accrue_fines finds every member behind on contributions, across all
+chamas, in one query that scans the ledger once (as chamas.defaulters
+does), then every active loan in a second. Results are read in chunks and
+each chunk's fines go in with their own ``bulk_create``, so no write holds
+locks for longer than a chunk takes. Only obligations that fell due
+within ``FINE_LOOKBACK_DAYS`` are fined, so turning fines on does not
+backdate years of them.
+"""
+
+import math
+import time
+from itertools import islice
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import invalidate_chama
+from .defaulters import DAYS_SINCE_JOINED
+from .loans import METHOD_CODES, outstanding_by_installment, rate_to_ppm, schedule_arrays, to_cents, with_repaid
+from .models import Chama, Fine, Loan, Transaction
+
+# Rows fetched, and fines inserted, per chunk
+FINE_CHUNK_SIZE = 5000
+
+CONTRIBUTIONS_SQL = """
+SELECT
+    chama_id, member_id, interval_days, grace_days, fine, days_joined, periods_paid, last_fined
+FROM (
+    SELECT
+        m.chama_id,
+        m.user_id AS member_id,
+        m.interval_days,
+        m.grace_days,
+        m.fine,
+        m.days_joined,
+        FLOOR(COALESCE(p.paid, 0) * 1.0 / m.per_period) AS periods_paid,
+        COALESCE(f.last_fined, 0) AS last_fined
+    FROM (
+        SELECT
+            m.chama_id,
+            m.user_id,
+            c.contribution_amount AS per_period,
+            c.contribution_interval_days AS interval_days,
+            c.fine_grace_days AS grace_days,
+            c.late_contribution_fine AS fine,
+            {days_joined} AS days_joined
+        FROM chama_membership m
+        JOIN chama c ON c.id = m.chama_id
+        WHERE m.is_active AND c.contribution_amount > 0 AND c.late_contribution_fine > 0
+    ) m
+    LEFT JOIN (
+        SELECT chama_id, member_id, SUM(paid) AS paid
+        FROM (
+            SELECT chama_id, member_id, SUM(amount) AS paid
+            FROM chama_transaction
+            WHERE transaction_type = %(contribution)s AND status = %(completed)s
+            GROUP BY chama_id, member_id
+            UNION ALL
+            SELECT chama_id, member_id, amount
+            FROM chama_archived_total
+            WHERE transaction_type = %(contribution)s
+        ) ledger
+        GROUP BY chama_id, member_id
+    ) p ON p.chama_id = m.chama_id AND p.member_id = m.user_id
+    LEFT JOIN (
+        SELECT chama_id, member_id, MAX(period) AS last_fined
+        FROM chama_fine
+        WHERE reason = %(late_contribution)s
+        GROUP BY chama_id, member_id
+    ) f ON f.chama_id = m.chama_id AND f.member_id = m.user_id
+) arrears
+WHERE FLOOR((days_joined - grace_days) / interval_days) > periods_paid
+    AND FLOOR((days_joined - grace_days) / interval_days) > last_fined
+"""
+
+def lookback_days():
+    return getattr(settings, 'FINE_LOOKBACK_DAYS', 90)
+
+def _late_contributions(rows, now, lookback):
+    """Fines for the missed periods of CONTRIBUTIONS_SQL rows"""
+    fines = []
+    chama_field = Chama._meta.pk
+    for chama_id, member_id, interval, grace, fine, days_joined, periods_paid, last_fined in rows:
+        days_joined = float(days_joined)
+        # Unpaid periods that fell due more than the grace period ago, within
+        # the lookback, and after those already fined
+        last = math.floor((days_joined - grace) / interval)
+        first = max(int(periods_paid) + 1, int(last_fined) + 1, math.ceil((days_joined - lookback) / interval), 1)
+        if first > last:
+            continue
+        joined = now - timedelta(days=days_joined)
+        chama_id = chama_field.to_python(chama_id)
+        for period in range(first, last + 1):
+            fines.append(Fine(
+                chama_id=chama_id,
+                member_id=member_id,
+                reason=Fine.Reason.LATE_CONTRIBUTION,
+                period=period,
+                amount=Decimal(str(fine)),
+                due_at=joined + timedelta(days=interval * period),
+                accrued_at=now,
+            ))
+    return fines
+
+def _late_repayments(loans, now, lookback):
+    """Fines for the missed installments of a batch of loans"""
+    if not loans:
+        return []
+    columns = list(zip(*loans))
+    principal_due, interest_due = schedule_arrays(
+        principal=[to_cents(value) for value in columns[3]],
+        rate_ppm=[rate_to_ppm(value) for value in columns[4]],
+        terms=columns[5],
+        methods=[METHOD_CODES[value] for value in columns[6]],
+        custom_interest=[to_cents(value) for value in columns[7]],
+    )
+    remaining = outstanding_by_installment(principal_due + interest_due, [to_cents(value) for value in columns[12]])
+
+    age = np.array([(now - disbursed).total_seconds() / 86400 for disbursed in columns[8]])
+    interval = np.asarray(columns[9], dtype=np.int64)
+    grace = np.asarray(columns[10], dtype=np.int64)
+    due_day = (np.arange(remaining.shape[1])[None, :] + 1) * interval[:, None]
+    late = (
+        (remaining > 0)
+        & (due_day + grace[:, None] <= age[:, None])
+        & (due_day >= (age - lookback)[:, None])
+        & (due_day > (interval * np.asarray(columns[13], dtype=np.int64))[:, None])
+    )
+    fines = []
+    for row, column in zip(*np.nonzero(late)):
+        loan_id, chama_id, member_id = loans[row][:3]
+        fines.append(Fine(
+            chama_id=chama_id,
+            member_id=member_id,
+            loan_id=loan_id,
+            reason=Fine.Reason.LATE_REPAYMENT,
+            period=int(column) + 1,
+            amount=loans[row][11],
+            due_at=loans[row][8] + timedelta(days=int(due_day[row, column])),
+            accrued_at=now,
+        ))
+    return fines
+
+def _insert(fines, chunk_size):
+    """Insert fines a chunk at a time, each in its own short transaction"""
+    for start in range(0, len(fines), chunk_size):
+        Fine.objects.bulk_create(fines[start:start + chunk_size], ignore_conflicts=True)
+
+def _accrued(now):
+    """Fines per chama accrued at ``now``"""
+    return dict(Fine.objects.unscoped().filter(accrued_at=now).values_list('chama_id').annotate(count=Count('id')))
+
+def accrue_fines(now=None, chunk_size=FINE_CHUNK_SIZE):
+    """
+    Fine every late contribution and loan installment in every chama.
+
+    Safe to rerun. Returns counts: members and loans behind, late
+    obligations found, fines created and the seconds taken.
+    """
+    started = time.perf_counter()
+    now = now or timezone.now()
+    lookback = lookback_days()
+    result = {'late_members': 0, 'late_loans': 0, 'late_contributions': 0, 'late_repayments': 0}
+    existing = _accrued(now)
+
+    params = {
+        'now': connection.ops.adapt_datetimefield_value(now),
+        'contribution': Transaction.Type.CONTRIBUTION,
+        'completed': Transaction.Status.COMPLETED,
+        'late_contribution': Fine.Reason.LATE_CONTRIBUTION,
+    }
+    # A server-side cursor on PostgreSQL, so only one chunk is in memory
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(CONTRIBUTIONS_SQL.format(days_joined=DAYS_SINCE_JOINED[connection.vendor]), params)
+        while rows := cursor.fetchmany(chunk_size):
+            fines = _late_contributions(rows, now, lookback)
+            _insert(fines, chunk_size)
+            result['late_members'] += len(rows)
+            result['late_contributions'] += len(fines)
+
+    last_fined = (
+        Fine.objects.filter(loan=OuterRef('pk'), reason=Fine.Reason.LATE_REPAYMENT)
+        .values('loan').annotate(last=Max('period')).values('last')
+    )
+    loans = with_repaid(
+        Loan.objects.unscoped().filter(
+            status=Loan.Status.ACTIVE, disbursed_at__isnull=False, chama__late_repayment_fine__gt=0,
+        )
+    ).annotate(last_fined=Coalesce(Subquery(last_fined), 0)).values_list(
+        'id', 'chama_id', 'member_id', 'principal', 'interest_rate', 'installments', 'interest_method',
+        'custom_interest', 'disbursed_at', 'interval_days', 'chama__fine_grace_days',
+        'chama__late_repayment_fine', 'repaid', 'last_fined',
+    )
+    rows = loans.iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        fines = _late_repayments(chunk, now, lookback)
+        _insert(fines, chunk_size)
+        result['late_loans'] += len({fine.loan_id for fine in fines})
+        result['late_repayments'] += len(fines)
+
+    # Fines carry the run's timestamp; anything already there was a rerun's
+    created = {
+        chama_id: count - existing.get(chama_id, 0)
+        for chama_id, count in _accrued(now).items()
+        if count > existing.get(chama_id, 0)
+    }
+    for chama_id in created:
+        invalidate_chama(chama_id)
+    result['created'] = sum(created.values())
+    result['chamas'] = len(created)
+    result['seconds'] = time.perf_counter() - started
+    return result
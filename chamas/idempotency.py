@@ -0,0 +1,87 @@
+"""
+Idempotency-Key support for unsafe endpoints.
+
+The first request with a key claims it by inserting an IdempotencyKey row in
+the same database transaction as the work it does, then stores its response
+there. Retries with the same key and body get the stored response back
+without redoing the work. Reusing a key with a different body is rejected.
+
+A retry racing the original waits for it to finish before claiming: on
+PostgreSQL its insert blocks on the unique index, on SQLite on the
+database write lock (for at most the connection's busy timeout, after
+which it fails with "database is locked"). Once the original commits, the
+insert fails the unique constraint and the stored response is replayed;
+if the original rolled back, the retry claims the key and does the work.
+"""
+
+import hashlib
+import json
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+def request_fingerprint(data):
+    body = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+def _stored(user, scope, key):
+    return IdempotencyKey.objects.filter(user=user, scope=scope, key=key).first()
+
+def _replay(stored, fingerprint):
+    if stored.request_hash != fingerprint:
+        return Response(
+            {'error': f'{IDEMPOTENCY_HEADER} was already used with a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(stored.response_body, status=stored.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(request, scope, handler):
+    """
+    Run ``handler()`` at most once per (user, scope, Idempotency-Key).
+
+    ``handler`` returns a Response and runs inside the transaction that
+    claims the key. Only successful (2xx) responses are stored; on any other
+    response the transaction is rolled back so the client can fix the request
+    and retry with the same key.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        with transaction.atomic():
+            return handler()
+    if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+        return Response({'error': f'{IDEMPOTENCY_HEADER} is too long'}, status=status.HTTP_400_BAD_REQUEST)
+
+    fingerprint = request_fingerprint(request.data)
+    stored = _stored(request.user, scope, key)
+    if stored is not None:
+        return _replay(stored, fingerprint)
+
+    with transaction.atomic():
+        try:
+            # Only the claim is guarded: an IntegrityError from the handler
+            # is its own and propagates
+            with transaction.atomic():
+                claim = IdempotencyKey.objects.create(
+                    user=request.user, scope=scope, key=key, request_hash=fingerprint
+                )
+        except IntegrityError:
+            # A concurrent request with the same key committed first
+            stored = _stored(request.user, scope, key)
+            if stored is None:
+                raise
+            return _replay(stored, fingerprint)
+
+        response = handler()
+        if not status.is_success(response.status_code):
+            transaction.set_rollback(True)
+            return response
+        claim.response_status = response.status_code
+        claim.response_body = response.data
+        claim.save(update_fields=['response_status', 'response_body'])
+        return response
@@ -0,0 +1,270 @@
+"""
+Hash-chained ledger integrity.
+
+Every ledger row carries a sequence number and a SHA-256 hash that covers
+the previous row's hash in the same chama. Together with the row's own
+fields that makes a chain: changing, removing or reordering a row breaks
+every link after it. The fields hashed are the ones that must never
+change: member, loan, type, amount, posting time, reference and
+description. Status is not hashed, because pending rows are legitimately
+completed or reversed later.
+
+Rows are chained as they are inserted. Transaction.save() and
+Transaction.objects.bulk_create() both reserve sequence numbers from the
+chama's LedgerHead. The reservation is an UPDATE, so it takes the row lock
+(the database write lock on SQLite) that serializes writers to a chama
+until they commit.
+
+verify_chama walks a chama's chain in sequence order, from its last
+LedgerCheckpoint or, with ``full``, from the first row, reading archived
+months from cold storage as well. It stores a new checkpoint every
+``checkpoint_every`` rows, so an interrupted run picks up where it stopped.
+run_parallel spreads chamas over a process pool.
+"""
+
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.apps import apps
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F
+
+from .tenancy import TenantManager, TenantQuerySet
+
+logger = logging.getLogger(__name__)
+
+GENESIS = '0' * 64
+
+# The hashed fields, in hashing order
+CHAIN_FIELDS = ('member_id', 'loan_id', 'transaction_type', 'amount', 'posted_at', 'reference', 'description')
+
+CHECKPOINT_EVERY = 100_000
+
+FETCH_SIZE = 5000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# ============================================================================
+# Hashing
+# ============================================================================
+
+def link(previous, seq, chama_id, member_id, loan_id, transaction_type, amount, posted_at, reference, description):
+    """The hash of one row, chained to ``previous``"""
+    payload = '\x1f'.join((
+        previous,
+        str(seq),
+        chama_id.hex,
+        member_id.hex if member_id else '',
+        str(loan_id) if loan_id else '',
+        transaction_type,
+        f'{Decimal(str(amount)):.2f}',
+        str((posted_at - EPOCH) // timedelta(microseconds=1)),
+        reference,
+        description,
+    ))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _reserve(chama_id, count):
+    """Claim ``count`` sequence numbers; returns ``(first_seq, previous_hash)``"""
+    LedgerHead = apps.get_model('chamas', 'LedgerHead')
+    heads = LedgerHead.objects.filter(chama_id=chama_id)
+    if not heads.update(seq=F('seq') + count):
+        try:
+            with transaction.atomic():
+                LedgerHead.objects.create(chama_id=chama_id, seq=count, hash=GENESIS)
+            return 1, GENESIS
+        except IntegrityError:
+            # Another writer started the chain first
+            heads.update(seq=F('seq') + count)
+    seq, previous = heads.values_list('seq', 'hash').get()
+    return seq - count + 1, previous
+
+def chain_rows(rows):
+    """
+    Give unsaved transactions their sequence numbers and hashes.
+
+    Must run inside the transaction that inserts them, so the reserved
+    numbers are released if the insert fails.
+    """
+    by_chama = {}
+    for row in rows:
+        by_chama.setdefault(row.chama_id, []).append(row)
+    LedgerHead = apps.get_model('chamas', 'LedgerHead')
+    for chama_id, members in by_chama.items():
+        seq, previous = _reserve(chama_id, len(members))
+        for row in members:
+            row.chain_seq = seq
+            row.chain_hash = previous = link(
+                previous, seq, chama_id, *(getattr(row, field) for field in CHAIN_FIELDS)
+            )
+            seq += 1
+        LedgerHead.objects.filter(chama_id=chama_id).update(hash=previous)
+
+class LedgerQuerySet(TenantQuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            chain_rows([obj for obj in objs if obj.chain_seq is None])
+            return super().bulk_create(objs, *args, **kwargs)
+
+class LedgerManager(TenantManager.from_queryset(LedgerQuerySet)):
+    """Tenant manager for the ledger that chains rows as they are bulk inserted"""
+
+# ============================================================================
+# Backfill
+# ============================================================================
+
+def backfill_chama(chama_id, batch_size=FETCH_SIZE):
+    """
+    Chain rows that were posted before the ledger was hash-chained, in id
+    order after the existing chain. Returns the number of rows chained.
+    """
+    Transaction = apps.get_model('chamas', 'Transaction')
+    chained = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Transaction.objects.filter(chama_id=chama_id, chain_seq__isnull=True)
+                .order_by('id')
+                .values_list('id', 'posted_at', *CHAIN_FIELDS)[:batch_size]
+            )
+            if not rows:
+                return chained
+            seq, previous = _reserve(chama_id, len(rows))
+            updates = []
+            for pk, posted_at, *fields in rows:
+                previous = link(previous, seq, chama_id, *fields)
+                updates.append((seq, previous, pk, posted_at))
+                seq += 1
+            # posted_at lets PostgreSQL go straight to the row's partition
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    'UPDATE chama_transaction SET chain_seq = %s, chain_hash = %s WHERE id = %s AND posted_at = %s',
+                    [
+                        (number, digest, pk, connection.ops.adapt_datetimefield_value(posted_at))
+                        for number, digest, pk, posted_at in updates
+                    ],
+                )
+            apps.get_model('chamas', 'LedgerHead').objects.filter(chama_id=chama_id).update(hash=previous)
+        chained += len(rows)
+
+# ============================================================================
+# Verification
+# ============================================================================
+
+def _chain(chama_id, after_seq):
+    """``(seq, hash, *CHAIN_FIELDS)`` for rows after ``after_seq``, hot and archived, in sequence order"""
+    # archive imports the models, which import this module
+    from .archive import iter_chain
+    return iter_chain(chama_id, after_seq, CHAIN_FIELDS, chunk_size=FETCH_SIZE)
+
+def verify_chama(chama_id, full=False, checkpoint_every=CHECKPOINT_EVERY, max_rows=None):
+    """
+    Check one chama's chain; returns a result dict.
+
+    Starts after the last checkpoint unless ``full``. Stops early after
+    ``max_rows`` rows; the next run resumes from the checkpoint stored
+    there. Failures are reported, never raised.
+    """
+    LedgerCheckpoint = apps.get_model('chamas', 'LedgerCheckpoint')
+    LedgerHead = apps.get_model('chamas', 'LedgerHead')
+    Transaction = apps.get_model('chamas', 'Transaction')
+    started = time.perf_counter()
+    result = {'chama_id': chama_id, 'rows': 0, 'first_seq': None, 'last_seq': None, 'error': None}
+
+    seq, previous = 0, GENESIS
+    if not full:
+        checkpoint = (
+            LedgerCheckpoint.objects.filter(chama_id=chama_id).order_by('-seq')
+            .values_list('seq', 'hash').first()
+        )
+        if checkpoint:
+            seq, previous = checkpoint
+            # A rewritten history would have to rehash the checkpointed row too
+            stored = (
+                Transaction.objects.filter(chama_id=chama_id, chain_seq=seq)
+                .values_list('chain_hash', flat=True).first()
+            )
+            if stored is not None and stored != previous:
+                result['error'] = f'row {seq} no longer matches its checkpoint'
+                return _finish(result, started)
+    head = LedgerHead.objects.filter(chama_id=chama_id).values_list('seq', flat=True).first() or 0
+    result['first_seq'] = seq + 1
+
+    def save_checkpoint():
+        LedgerCheckpoint.objects.create(
+            chama_id=chama_id, seq=seq, hash=previous, rows_verified=result['rows'], full=full,
+        )
+
+    since_checkpoint = 0
+    for row_seq, stored, *fields in _chain(chama_id, seq):
+        if row_seq != seq + 1:
+            result['error'] = f'rows {seq + 1} to {row_seq - 1} are missing'
+            break
+        if link(previous, row_seq, chama_id, *fields) != stored:
+            result['error'] = f'row {row_seq} does not match its hash'
+            break
+        seq, previous = row_seq, stored
+        result['rows'] += 1
+        since_checkpoint += 1
+        if since_checkpoint >= checkpoint_every:
+            save_checkpoint()
+            since_checkpoint = 0
+            logger.debug('Chama %s verified to row %s', chama_id, seq)
+        if max_rows is not None and result['rows'] >= max_rows:
+            break
+    else:
+        if seq < head:
+            result['error'] = f'rows {seq + 1} to {head} are missing'
+
+    if since_checkpoint:
+        save_checkpoint()
+    result['last_seq'] = seq
+    result['unchained'] = Transaction.objects.filter(chama_id=chama_id, chain_seq__isnull=True).count()
+    return _finish(result, started)
+
+def _finish(result, started):
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+def _init_worker():
+    import django
+    if not apps.ready:
+        django.setup()
+    # Never share a parent's database connection
+    connections.close_all()
+
+def _run(task, chama_id, kwargs):
+    if task == 'backfill':
+        return {'chama_id': chama_id, 'rows': backfill_chama(chama_id), 'error': None}
+    return verify_chama(chama_id, **kwargs)
+
+def _run_in_worker(task, chama_id, kwargs):
+    try:
+        return _run(task, chama_id, kwargs)
+    finally:
+        connections.close_all()
+
+def run_parallel(task, chama_ids, workers=None, **kwargs):
+    """
+    Run ``'verify'`` or ``'backfill'`` for many chamas, one chama per
+    process. Yields results as chamas finish; with one worker, or on
+    SQLite, everything runs in this process.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(chama_ids))
+    if connection.vendor == 'sqlite':
+        # One process's long read blocks every other process's checkpoint write
+        workers = 1
+    if workers <= 1:
+        for chama_id in chama_ids:
+            yield _run(task, chama_id, kwargs)
+        return
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(_run_in_worker, task, chama_id, kwargs) for chama_id in chama_ids]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,326 @@
+"""
+Loan amortization and portfolio projection.
+
+Schedules are computed for many loans at once on int64 arrays of cents, one
+row per loan and one column per installment, so a whole portfolio costs a
+handful of vector operations per installment column rather than a Python
+loop per installment. Interest rates are held as integer parts-per-million
+per period, which keeps every rounding step exact (half-up to the cent).
+The one irrational step, a reducing-balance loan's fixed installment, is
+computed per loan in Decimal. Products that could overflow int64 (very large
+loans at very high rates) fall back to Python integers.
+
+Methods:
+
+* flat: interest is ``rate x principal`` every period.
+* reducing_balance: a fixed installment (annuity) where each period's interest
+  is ``rate x outstanding balance``; the final installment clears the balance.
+* custom: a fixed total interest amount spread evenly over the installments.
+
+Principal and interest that don't split evenly into cents are carried by the
+final installment.
+"""
+
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal, localcontext
+import numpy as np
+from django.db.models import DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ArchivedTotal, Loan, Transaction
+
+PPM = 1_000_000
+HALF_PPM = PPM // 2
+INT64_MAX = np.iinfo(np.int64).max
+
+METHOD_CODES = {
+    Loan.Method.FLAT: 0,
+    Loan.Method.REDUCING_BALANCE: 1,
+    Loan.Method.CUSTOM: 2,
+}
+
+def to_cents(amount):
+    return int((amount or Decimal('0')) * 100)
+
+def from_cents(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+def rate_to_ppm(percent):
+    """Convert a percent-per-period rate (4 decimal places) to parts per million"""
+    return int((percent or Decimal('0')) * 10_000)
+
+# ============================================================================
+# Vectorized Schedules
+# ============================================================================
+
+def _interest(amounts, rate_ppm):
+    """``amounts x rate`` half-up to the cent; exact even where the product overflows int64"""
+    if len(amounts) and int(amounts.max()) * int(rate_ppm.max()) > INT64_MAX - HALF_PPM:
+        exact = (amounts.astype(object) * rate_ppm.astype(object) + HALF_PPM) // PPM
+        return exact.astype(np.int64)
+    return (amounts * rate_ppm + HALF_PPM) // PPM
+
+def _annuity(principal, rate_ppm, terms):
+    """Fixed reducing-balance installments in cents, computed in Decimal and rounded half-up"""
+    installments = []
+    with localcontext() as context:
+        context.prec = 40
+        for p, ppm, term in zip(principal.tolist(), rate_ppm.tolist(), terms.tolist()):
+            if ppm:
+                rate = Decimal(ppm) / PPM
+                amount = Decimal(p) * rate / (1 - (1 + rate) ** -term)
+            else:
+                amount = Decimal(p) / term
+            installments.append(int(amount.to_integral_value(ROUND_HALF_UP)))
+    return np.array(installments, dtype=np.int64)
+
+def _spread(totals, terms, columns):
+    """Split totals evenly over each loan's term; the remainder goes last"""
+    base = totals // terms
+    parts = np.where(columns < terms[:, None], base[:, None], 0)
+    rows = np.arange(len(totals))
+    parts[rows, terms - 1] += totals - base * terms
+    return parts
+
+def schedule_arrays(principal, rate_ppm, terms, methods, custom_interest=None):
+    """
+    Build repayment schedules for a batch of loans.
+
+    All arguments are 1-D arrays of equal length: principal and
+    custom_interest in cents, rate_ppm per period, terms (installment counts)
+    and method codes from METHOD_CODES. Returns ``(principal_due,
+    interest_due)`` as int64 arrays of shape (loans, max(terms)); columns past
+    a loan's term are zero.
+    """
+    principal = np.asarray(principal, dtype=np.int64)
+    rate_ppm = np.asarray(rate_ppm, dtype=np.int64)
+    terms = np.maximum(np.asarray(terms, dtype=np.int64), 1)
+    methods = np.asarray(methods, dtype=np.int8)
+    if custom_interest is None:
+        custom_interest = np.zeros_like(principal)
+    custom_interest = np.asarray(custom_interest, dtype=np.int64)
+
+    n = len(principal)
+    width = int(terms.max()) if n else 0
+    columns = np.arange(width)[None, :]
+    in_term = columns < terms[:, None]
+
+    # Flat and custom loans: principal in equal parts, constant interest
+    principal_due = _spread(principal, terms, columns)
+    flat_interest = np.where(in_term, _interest(principal, rate_ppm)[:, None], 0)
+    interest_due = np.where((methods == METHOD_CODES[Loan.Method.FLAT])[:, None], flat_interest, 0)
+    custom = methods == METHOD_CODES[Loan.Method.CUSTOM]
+    if custom.any():
+        interest_due[custom] = _spread(custom_interest[custom], terms[custom], columns)
+
+    # Reducing balance loans: annuity installment, interest on the balance
+    reducing = np.flatnonzero(methods == METHOD_CODES[Loan.Method.REDUCING_BALANCE])
+    if len(reducing):
+        p = principal[reducing]
+        ppm = rate_ppm[reducing]
+        term = terms[reducing]
+        installment = _annuity(p, ppm, term)
+
+        balance = p.copy()
+        for column in range(int(term.max())):
+            active = column < term
+            interest = np.where(active, _interest(balance, ppm), 0)
+            paid_down = np.clip(installment - interest, 0, balance)
+            paid_down = np.where(column == term - 1, balance, np.where(active, paid_down, 0))
+            principal_due[reducing, column] = paid_down
+            interest_due[reducing, column] = interest
+            balance = balance - paid_down
+
+    return principal_due, interest_due
+
+def _loan_arrays(loans):
+    return (
+        [to_cents(loan.principal) for loan in loans],
+        [rate_to_ppm(loan.interest_rate) for loan in loans],
+        [loan.installments for loan in loans],
+        [METHOD_CODES[loan.interest_method] for loan in loans],
+        [to_cents(loan.custom_interest) for loan in loans],
+    )
+
+def build_schedule(loan, start=None):
+    """
+    Return the full repayment schedule for one loan as a list of dicts.
+
+    Due dates count from disbursement (or ``start`` for loans not yet
+    disbursed), one ``interval_days`` apart.
+    """
+    principal_due, interest_due = schedule_arrays(*_loan_arrays([loan]))
+    start = loan.disbursed_at or start or timezone.now()
+    balance = to_cents(loan.principal)
+    schedule = []
+    for number in range(loan.installments):
+        principal_part = int(principal_due[0, number])
+        interest_part = int(interest_due[0, number])
+        balance -= principal_part
+        schedule.append({
+            'number': number + 1,
+            'due_date': start + timedelta(days=loan.interval_days * (number + 1)),
+            'principal': from_cents(principal_part),
+            'interest': from_cents(interest_part),
+            'total': from_cents(principal_part + interest_part),
+            'balance': from_cents(balance),
+        })
+    return schedule
+
+def outstanding_by_installment(installment_totals, paid):
+    """
+    Apply payments to installments oldest first.
+
+    ``installment_totals`` is (loans, columns) in cents and ``paid`` the total
+    repaid per loan. Returns what remains due on each installment.
+    """
+    due_so_far = np.cumsum(installment_totals, axis=1)
+    covered = np.minimum(due_so_far, np.asarray(paid, dtype=np.int64)[:, None])
+    covered_before = np.concatenate([np.zeros((len(covered), 1), dtype=np.int64), covered[:, :-1]], axis=1)
+    return installment_totals - (covered - covered_before)
+
+# ============================================================================
+# Per-Loan Status
+# ============================================================================
+
+def amount_repaid(loan):
+    repaid = Transaction.objects.filter(
+        chama_id=loan.chama_id,
+        loan=loan,
+        transaction_type=Transaction.Type.LOAN_PAYMENT,
+        status=Transaction.Status.COMPLETED,
+    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    archived = ArchivedTotal.objects.filter(
+        chama_id=loan.chama_id, loan=loan, transaction_type=Transaction.Type.LOAN_PAYMENT,
+    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    return repaid + archived
+
+def loan_status(loan, repaid=None):
+    """Dashboard summary for one active loan"""
+    repaid = amount_repaid(loan) if repaid is None else repaid
+    schedule = build_schedule(loan)
+    totals = np.array([[to_cents(row['total']) for row in schedule]], dtype=np.int64)
+    remaining = outstanding_by_installment(totals, [to_cents(repaid)])[0]
+    upcoming = np.flatnonzero(remaining > 0)
+    next_index = int(upcoming[0]) if len(upcoming) else None
+    return {
+        'active': loan.status == Loan.Status.ACTIVE,
+        'amount_borrowed': loan.principal,
+        'amount_paid': repaid,
+        'remaining_balance': from_cents(remaining.sum()),
+        'next_payment_date': schedule[next_index]['due_date'].isoformat() if next_index is not None else None,
+        'next_payment_amount': from_cents(remaining[next_index]) if next_index is not None else Decimal('0'),
+    }
+
+# ============================================================================
+# Portfolio Projection
+# ============================================================================
+
+def project_portfolio(principal, rate_ppm, terms, methods, custom_interest, start_day, interval_days,
+                      paid, weeks, from_day=0):
+    """
+    Expected cash inflow per week for a batch of loans, in cents.
+
+    ``start_day`` is each loan's disbursement as a day number and
+    ``interval_days`` its installment spacing; ``from_day`` is the day the
+    first projected week starts. Amounts already repaid are applied to the
+    oldest installments, and anything overdue before ``from_day`` lands in
+    week 0.
+    """
+    principal_due, interest_due = schedule_arrays(principal, rate_ppm, terms, methods, custom_interest)
+    remaining = outstanding_by_installment(principal_due + interest_due, paid)
+
+    columns = np.arange(remaining.shape[1])[None, :]
+    due_day = (np.asarray(start_day, dtype=np.int64)[:, None]
+               + (columns + 1) * np.asarray(interval_days, dtype=np.int64)[:, None])
+    week = np.maximum((due_day - from_day) // 7, 0)
+    in_window = (week < weeks) & (remaining > 0)
+    return np.bincount(week[in_window], weights=remaining[in_window], minlength=weeks).astype(np.int64)
+
+def with_repaid(loans):
+    """Annotate a loan queryset with the amount repaid, hot and archived"""
+    archived = (
+        ArchivedTotal.objects.filter(
+            chama_id=OuterRef('chama_id'), loan=OuterRef('pk'), transaction_type=Transaction.Type.LOAN_PAYMENT,
+        )
+        .values('loan')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    repaid = Sum(
+        'transactions__amount',
+        filter=Q(
+            transactions__transaction_type=Transaction.Type.LOAN_PAYMENT,
+            transactions__status=Transaction.Status.COMPLETED,
+        ),
+    )
+    zero = Value(Decimal('0'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    return loans.annotate(repaid=Coalesce(repaid, zero) + Coalesce(Subquery(archived), zero))
+
+def active_loans(chama_id):
+    """A chama's disbursed active loans, annotated with the amount repaid"""
+    return with_repaid(
+        Loan.objects.filter(chama_id=chama_id, status=Loan.Status.ACTIVE, disbursed_at__isnull=False)
+    )
+
+def _schedule_inputs(principal, interest_rate, installments, interest_method, custom_interest):
+    """schedule_arrays() arguments from columns of loan values"""
+    return (
+        [to_cents(value) for value in principal],
+        [rate_to_ppm(value) for value in interest_rate],
+        installments,
+        [METHOD_CODES[value] for value in interest_method],
+        [to_cents(value) for value in custom_interest],
+    )
+
+def outstanding_principal(chama_id):
+    """
+    Principal still owed on a chama's active loans.
+
+    Repayments include interest, so they are applied to the schedule:
+    installments oldest first, and each installment's interest before its
+    principal.
+    """
+    loans = list(active_loans(chama_id).values_list(
+        'principal', 'interest_rate', 'installments', 'interest_method', 'custom_interest', 'repaid',
+    ))
+    if not loans:
+        return Decimal('0')
+    columns = list(zip(*loans))
+    principal_due, interest_due = schedule_arrays(*_schedule_inputs(*columns[:5]))
+    remaining = outstanding_by_installment(principal_due + interest_due, [to_cents(value) for value in columns[5]])
+    return from_cents(np.minimum(remaining, principal_due).sum())
+
+def project_chama_inflow(chama_id, weeks=12, today=None):
+    """
+    Expected weekly loan repayments for a chama's active loans.
+
+    Loans and their repayments are read in one query; the projection itself
+    is vectorized across the whole portfolio.
+    """
+    today = today or timezone.localdate()
+    loans = list(active_loans(chama_id).values_list(
+        'principal', 'interest_rate', 'installments', 'interest_method',
+        'custom_interest', 'disbursed_at', 'interval_days', 'repaid',
+    ))
+    inflow = np.zeros(weeks, dtype=np.int64)
+    if loans:
+        columns = list(zip(*loans))
+        principal, rate_ppm, terms, methods, custom_interest = _schedule_inputs(*columns[:5])
+        inflow = project_portfolio(
+            principal=principal,
+            rate_ppm=rate_ppm,
+            terms=terms,
+            methods=methods,
+            custom_interest=custom_interest,
+            start_day=[timezone.localdate(value).toordinal() for value in columns[5]],
+            interval_days=columns[6],
+            paid=[to_cents(value) for value in columns[7]],
+            weeks=weeks,
+            from_day=today.toordinal(),
+        )
+    return [
+        {'week_starting': (today + timedelta(weeks=i)).isoformat(), 'expected_inflow': from_cents(cents)}
+        for i, cents in enumerate(inflow)
+    ]
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from chamas.fines import FINE_CHUNK_SIZE, accrue_fines
+
+class Command(BaseCommand):
+    help = 'Fine late contributions and loan repayments in every chama (run nightly; safe to rerun)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=FINE_CHUNK_SIZE, help='Rows read and fines inserted at a time'
+        )
+
+    def handle(self, *args, **options):
+        result = accrue_fines(chunk_size=options['chunk_size'])
+        self.stdout.write(
+            f"{result['late_members']:,} members owe {result['late_contributions']:,} late contributions; "
+            f"{result['late_loans']:,} loans have {result['late_repayments']:,} late repayments"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']:,} fines in {result['chamas']} chamas in {result['seconds']:.2f}s"
+        ))
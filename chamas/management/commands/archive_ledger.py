@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from chamas.archive import archive_month
+from chamas.models import Transaction
+
+class Command(BaseCommand):
+    help = 'Move ledger months older than the hot window to compressed cold storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months', type=int, default=settings.LEDGER_HOT_MONTHS,
+            help='Whole months before this one that stay hot',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='List the months without archiving them')
+
+    def handle(self, *args, **options):
+        if options['keep_months'] < 1:
+            raise CommandError('--keep-months must be at least 1')
+        today = timezone.localdate()
+        # Months are numbered year * 12 + month - 1
+        cutoff = today.year * 12 + today.month - 1 - options['keep_months']
+
+        # Archiving works across every chama
+        oldest = Transaction.objects.unscoped().aggregate(first=Min('posted_at'))['first']
+        if oldest is None:
+            self.stdout.write('The ledger is empty')
+            return
+        oldest = timezone.localtime(oldest)
+
+        started = timezone.now()
+        total_rows = total_stored = 0
+        for index in range(oldest.year * 12 + oldest.month - 1, cutoff):
+            year, month = divmod(index, 12)
+            if options['dry_run']:
+                self.stdout.write(f"Would archive {year}-{month + 1:02d}")
+                continue
+            rows, raw_bytes, stored_bytes = archive_month(year, month + 1)
+            total_rows += rows
+            total_stored += stored_bytes
+            if rows:
+                self.stdout.write(
+                    f"{year}-{month + 1:02d}: {rows:,} rows, {raw_bytes / 2**20:.1f} MB "
+                    f"compressed to {stored_bytes / 2**20:.1f} MB"
+                )
+
+        if options['dry_run']:
+            return
+        elapsed = (timezone.now() - started).total_seconds()
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {total_rows:,} rows ({total_stored / 2**20:.1f} MB) in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,44 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from chamas.models import Chama, Transaction
+from chamas.rollups import rebuild_range, rollup_day
+
+class Command(BaseCommand):
+    help = 'Build daily rollups from ledger history, one chunk of days at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chama', action='append', dest='chamas', help='Chama id (repeatable); default all')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Days recomputed per transaction')
+
+    def handle(self, *args, **options):
+        chunk = timedelta(days=options['chunk_days'])
+        chamas = Chama.objects.order_by('created_at').values_list('id', 'name')
+        if options['chamas']:
+            chamas = chamas.filter(id__in=options['chamas'])
+
+        started = timezone.now()
+        total_rows = 0
+        for chama_id, name in chamas.iterator():
+            bounds = Transaction.objects.filter(chama_id=chama_id).aggregate(
+                first=Min('posted_at'), last=Max('posted_at')
+            )
+            if bounds['first'] is None:
+                continue
+
+            day, last_day = rollup_day(bounds['first']), rollup_day(bounds['last'])
+            rows = 0
+            while day <= last_day:
+                chunk_end = min(day + chunk - timedelta(days=1), last_day)
+                rows += rebuild_range(chama_id, day, chunk_end)
+                day = chunk_end + timedelta(days=1)
+
+            total_rows += rows
+            self.stdout.write(f"{name}: {rows} days rolled up")
+
+        elapsed = (timezone.now() - started).total_seconds()
+        self.stdout.write(
+            self.style.SUCCESS(f"Backfill complete: {total_rows} rollup rows in {elapsed:.1f}s")
+        )
@@ -0,0 +1,72 @@
+import statistics
+from collections import defaultdict
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import reset_queries
+from django.utils import timezone
+
+from chamas.analytics import build_contribution_report, month_starts
+from chamas.bench import rolled_back, seed_chama, timer
+from chamas.models import Transaction
+
+def naive_trend(chama, starts):
+    """Monthly totals and contributor percentiles the obvious way: one model instance per row"""
+    totals = defaultdict(lambda: defaultdict(Decimal))
+    queryset = Transaction.objects.filter(
+        chama=chama,
+        transaction_type=Transaction.Type.CONTRIBUTION,
+        status=Transaction.Status.COMPLETED,
+        posted_at__gte=starts[0],
+        posted_at__lt=starts[-1],
+    )
+    for count, txn in enumerate(queryset.iterator(chunk_size=5000)):
+        month = timezone.localtime(txn.posted_at).strftime('%Y-%m')
+        totals[month][txn.member_id] += txn.amount
+        if count % 100_000 == 0:
+            reset_queries()
+    trend = {}
+    for month, members in totals.items():
+        paid = sorted(members.values())
+        trend[month] = (sum(paid), len(paid), statistics.quantiles(paid, n=4) if len(paid) > 1 else paid)
+    return trend
+
+class Command(BaseCommand):
+    help = 'Benchmark vectorized contribution analytics against a naive ORM loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=10_000_000)
+        parser.add_argument('--members', type=int, default=20_000)
+        parser.add_argument('--months', type=int, default=12)
+        parser.add_argument('--skip-naive', action='store_true', help='Only time the vectorized report')
+
+    def handle(self, *args, **options):
+        per_member = max(options['transactions'] // options['members'], 1)
+        rows = options['members'] * per_member
+        months = options['months']
+
+        with rolled_back():
+            with timer() as seeding:
+                chama, _ = seed_chama(options['members'], per_member, days=months * 31, batch_size=10_000)
+            self.stdout.write(f"Seeded {rows:,} ledger rows in {seeding['seconds']:.0f}s")
+
+            with timer() as vectorized:
+                report = build_contribution_report(chama, months)
+            self.stdout.write(f"Vectorized report:  {vectorized['seconds']:8.2f}s")
+            if options['skip_naive']:
+                return
+
+            with timer() as naive:
+                trend = naive_trend(chama, month_starts(months))
+            self.stdout.write(
+                f"Naive ORM loop:     {naive['seconds']:8.2f}s "
+                f"({naive['seconds'] / vectorized['seconds']:.0f}x slower)"
+            )
+
+            mismatched = [
+                row['month'] for row in report['trend']
+                if Decimal(str(row['total'])) != trend.get(row['month'], (Decimal('0'),))[0]
+            ]
+            if mismatched:
+                raise AssertionError(f"Monthly totals differ for {', '.join(mismatched)}")
+
+        self.stdout.write(self.style.SUCCESS('Analytics benchmark complete'))
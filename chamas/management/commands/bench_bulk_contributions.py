@@ -0,0 +1,54 @@
+import uuid
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from chamas.bench import rolled_back, seed_chama, timer
+from chamas.models import Membership, Transaction
+from chamas.tenancy import tenant
+from chamas.views import ContributionViewSet
+
+class Command(BaseCommand):
+    help = 'Benchmark posting a meeting sheet through the bulk contribution endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = options['rows']
+        view = ContributionViewSet.as_view({'post': 'bulk'})
+        factory = APIRequestFactory()
+
+        with rolled_back():
+            chama, users = seed_chama(count, 0)
+            treasurer = users[0]
+            Membership.objects.filter(chama=chama, user=treasurer).update(role=Membership.Role.TREASURER)
+            sheet = {'rows': [{'phone': user.phone_number, 'amount': '5000'} for user in users]}
+            key = uuid.uuid4().hex
+
+            def post():
+                request = factory.post(
+                    '/api/v1/chamas/contributions/bulk/', sheet, format='json', HTTP_IDEMPOTENCY_KEY=key
+                )
+                force_authenticate(request, user=treasurer)
+                # Called without the middleware that would open the tenant context
+                with tenant(chama.pk):
+                    return view(request)
+
+            with timer() as first:
+                response = post()
+            assert response.status_code == 201, response.data
+            with timer() as retry:
+                replayed = post()
+            assert replayed['Idempotent-Replayed'] == 'true'
+            assert Transaction.objects.filter(chama=chama).count() == count
+
+            with timer() as one_by_one:
+                for user in users:
+                    Transaction.objects.create(
+                        chama=chama, member=user, transaction_type=Transaction.Type.CONTRIBUTION, amount=5000
+                    )
+
+        self.stdout.write(f"Bulk sheet of {count} rows: {first['seconds'] * 1000:8.1f} ms")
+        self.stdout.write(f"Idempotent retry:        {retry['seconds'] * 1000:8.1f} ms")
+        self.stdout.write(f"{count} single inserts:     {one_by_one['seconds'] * 1000:8.1f} ms (ORM only, no HTTP)")
+        self.stdout.write(self.style.SUCCESS('Bulk contribution benchmark complete'))
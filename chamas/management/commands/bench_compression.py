@@ -0,0 +1,86 @@
+import timeit
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import UserProfile
+from chamas.bench import rolled_back, seed_chama
+from chamas.models import Membership
+from config.compression import BrotliCodec, CODECS, GzipCodec, ZstdCodec
+
+# Payloads members fetch, as (label, path)
+PAYLOADS = (
+    ('profile', '/api/v1/accounts/users/profile/'),
+    ('member dashboard', '/api/v1/accounts/dashboard/summary/'),
+    ('transactions, 20', '/api/v1/chamas/transactions/'),
+    ('transactions, 100', '/api/v1/chamas/transactions/?page_size=100'),
+    ('contribution analytics', '/api/v1/chamas/analytics/contributions/'),
+    ('statement CSV', '/api/v1/chamas/exports/statement/'),
+)
+
+# Codec classes at levels worth comparing for per-request compression
+CANDIDATES = (
+    (GzipCodec, (1, 6, 9)),
+    (BrotliCodec, (1, 5, 9)),
+    (ZstdCodec, (1, 3, 9)),
+)
+
+class Command(BaseCommand):
+    help = 'Compare CPU cost against bytes saved for each API payload and compression codec'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=30)
+        parser.add_argument('--transactions', type=int, default=200, help='Transactions per member')
+        parser.add_argument('--kbps', type=int, default=1000, help='Link speed the saving is priced at')
+
+    def best(self, function):
+        """Fastest microseconds per call"""
+        number, _ = timeit.Timer(function).autorange()
+        return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+    def fetch(self, members, transactions):
+        chama, users = seed_chama(members, transactions, name='Compression Benchmark')
+        treasurer = users[0]
+        Membership.objects.filter(chama=chama, user=treasurer).update(role=Membership.Role.TREASURER)
+        UserProfile.objects.create(user=treasurer, bio='Treasurer since the chama started.')
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(treasurer)
+        bodies = {}
+        for label, path in PAYLOADS:
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+            assert not response.has_header('Content-Encoding')
+            bodies[label] = b''.join(response.streaming_content) if response.streaming else response.content
+        self.stdout.write(f'Seeded {members} members with {transactions} transactions each')
+        return bodies
+
+    def handle(self, *args, **options):
+        # Identity bodies, fetched through the full stack with compression off
+        with rolled_back(), override_settings(ALLOWED_HOSTS=['localhost'], COMPRESSION_ENCODINGS=()):
+            bodies = self.fetch(options['members'], options['transactions'])
+
+        codecs = [
+            codec_class(level) for codec_class, levels in CANDIDATES
+            if CODECS[codec_class.name] is not None for level in levels
+        ]
+        missing = [codec_class.name for codec_class, _ in CANDIDATES if CODECS[codec_class.name] is None]
+        if missing:
+            self.stdout.write(f"Not installed, skipped: {', '.join(missing)}")
+
+        per_byte_ms = 8 / options['kbps']
+        self.stdout.write(
+            f"{'payload':<24} {'codec':<8} {'bytes':>10} {'ratio':>7} {'compress':>11} {'MB/s':>7} "
+            f"{'net saving @ ' + str(options['kbps']) + ' kbps':>24}"
+        )
+        for label, body in bodies.items():
+            self.stdout.write(f"{label:<24} {'identity':<8} {len(body):>10,}")
+            for codec in codecs:
+                compressed = codec.compress(body)
+                micros = self.best(lambda: codec.compress(body))
+                saved_ms = (len(body) - len(compressed)) * per_byte_ms - micros / 1000
+                self.stdout.write(
+                    f"{'':<24} {codec.name + '-' + str(codec.level):<8} {len(compressed):>10,} "
+                    f"{len(body) / len(compressed):>6.1f}x {micros:>8.0f} us {len(body) / micros:>7.0f} "
+                    f"{saved_ms:>21.1f} ms"
+                )
+        self.stdout.write(self.style.SUCCESS('Compression benchmark complete'))
@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.views import DashboardViewSet
+from chamas.bench import rolled_back, seed_chama, timer
+from chamas.cache import get_metrics, invalidate_user, reset_metrics
+from chamas.dashboard import CACHE_NAMESPACE
+from chamas.models import Membership
+
+class Command(BaseCommand):
+    help = 'Benchmark dashboard summary requests/sec with a cold and a warm cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--members', type=int, default=50)
+        parser.add_argument('--transactions', type=int, default=100, help='Ledger rows per member')
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        view = DashboardViewSet.as_view({'get': 'dashboard_summary'})
+        factory = APIRequestFactory()
+
+        with rolled_back():
+            self.stdout.write('Seeding benchmark chama...')
+            chama, users = seed_chama(options['members'], options['transactions'])
+            member, treasurer = users[0], users[1]
+            Membership.objects.filter(chama=chama, user=treasurer).update(role=Membership.Role.TREASURER)
+
+            for label, user in (('member', member), ('treasurer', treasurer)):
+                def call():
+                    request = factory.get('/api/v1/accounts/dashboard/summary/')
+                    force_authenticate(request, user=user)
+                    response = view(request)
+                    assert response.status_code == 200, response.status_code
+
+                cache.clear()
+                reset_metrics(CACHE_NAMESPACE)
+                with timer() as cold:
+                    for _ in range(count):
+                        invalidate_user(user.pk)
+                        call()
+                with timer() as warm:
+                    for _ in range(count):
+                        call()
+
+                self.stdout.write(
+                    f"{label:>10}: cold {count / cold['seconds']:8.1f} req/s | "
+                    f"warm {count / warm['seconds']:8.1f} req/s | "
+                    f"speedup {cold['seconds'] / warm['seconds']:.1f}x"
+                )
+                self.stdout.write(f"{'':>10}  metrics {get_metrics(CACHE_NAMESPACE)}")
+
+        self.stdout.write(self.style.SUCCESS('Dashboard benchmark complete'))
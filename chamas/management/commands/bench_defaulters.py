@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from chamas.bench import rolled_back, seed_chama, timer
+from chamas.defaulters import refresh_defaulters
+from chamas.models import Defaulter
+
+class Command(BaseCommand):
+    help = 'Benchmark the set-based defaulter refresh'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=100_000)
+        parser.add_argument('--chamas', type=int, default=20)
+        parser.add_argument('--transactions', type=int, default=6, help='Ledger rows per member')
+
+    def handle(self, *args, **options):
+        per_chama = options['members'] // options['chamas']
+
+        with rolled_back():
+            self.stdout.write(f"Seeding {options['chamas']} chamas x {per_chama} members...")
+            with timer() as seeding:
+                chama_ids = [
+                    seed_chama(per_chama, options['transactions'], name=f'Benchmark Chama {i}')[0].pk
+                    for i in range(options['chamas'])
+                ]
+            self.stdout.write(f"Seeded in {seeding['seconds']:.1f}s ({connection.vendor})")
+
+            with timer() as everything:
+                found = refresh_defaulters()
+            self.stdout.write(
+                f"All chamas: {found} defaulters among {per_chama * options['chamas']} members "
+                f"in {everything['seconds'] * 1000:.0f} ms"
+            )
+
+            with timer() as single:
+                refresh_defaulters([chama_ids[0]])
+            self.stdout.write(f"One chama (refresh on payment): {single['seconds'] * 1000:.0f} ms")
+
+            with timer() as read:
+                list(Defaulter.objects.filter(chama_id=chama_ids[0]).select_related('member').order_by('rank')[:10])
+            self.stdout.write(f"Treasurer read (top 10): {read['seconds'] * 1000:.1f} ms")
+
+        self.stdout.write(self.style.SUCCESS('Defaulter benchmark complete'))
@@ -0,0 +1,154 @@
+import asyncio
+import gc
+import statistics
+import threading
+import time
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from asgiref.sync import async_to_sync
+
+from chamas.bench import rolled_back, seed_chama, timer
+from chamas.events import BALANCE_CHANGED, Event, broker, get_backend
+
+def rss_bytes():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * 4096
+
+class Connection:
+    """An idle EventSource, driven straight through the ASGI app"""
+
+    def __init__(self, app, token, chama_id, port, tally):
+        self.frames = 0
+        self.ready = asyncio.Event()
+        self.tally = tally
+        self.received_at = None
+        self.status = None
+        self.closed = asyncio.Event()
+        self.sent_body = False
+        self.scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': '/api/v1/chamas/events/', 'raw_path': b'/api/v1/chamas/events/',
+            'query_string': f'chama={chama_id}'.encode(), 'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'authorization', f'Token {token}'.encode())],
+            'client': ('127.0.0.1', port), 'server': ('localhost', 8000),
+        }
+        self.task = asyncio.ensure_future(app(self.scope, self.receive, self.send))
+
+    async def receive(self):
+        if not self.sent_body:
+            self.sent_body = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message.get('body'):
+            self.frames += 1
+            if b'event: ready' in message['body']:
+                self.ready.set()
+            elif b'event: balance_changed' in message['body']:
+                self.received_at = time.perf_counter()
+                self.tally.count()
+
+class Tally:
+    """Resolves once every stream has received the current event"""
+
+    def __init__(self):
+        self.expected = 0
+        self.done = None
+
+    def reset(self, expected):
+        self.expected = expected
+        self.done = asyncio.get_running_loop().create_future()
+
+    def count(self):
+        self.expected -= 1
+        if not self.expected:
+            self.done.set_result(None)
+
+class Command(BaseCommand):
+    help = 'Hold idle event streams open through the ASGI app and time event fan-out to all of them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=5000)
+        parser.add_argument('--idle', type=float, default=20.0, help='Seconds to sit idle with every stream open')
+        parser.add_argument('--heartbeat', type=int, default=5, help='Seconds between keep-alives while idle')
+        parser.add_argument('--events', type=int, default=20, help='Events to fan out')
+
+    def handle(self, *args, **options):
+        # Like the test client: keep the request signals from closing the
+        # connection that holds the rolled-back transaction
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            streams = override_settings(EVENTS_HEARTBEAT_SECONDS=options['heartbeat'], ALLOWED_HOSTS=['localhost'])
+            with rolled_back(), streams:
+                chama, users = seed_chama(options['connections'], 0, name='Events Benchmark')
+                tokens = Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in users])
+                self.stdout.write(f'Seeded {len(users):,} members with tokens; backend {type(get_backend()).__name__}')
+                async_to_sync(self.run)(chama.pk, [token.key for token in tokens], options)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+        self.stdout.write(self.style.SUCCESS('Event stream benchmark complete'))
+
+    async def run(self, chama_id, tokens, options):
+        app = get_asgi_application()
+        gc.collect()
+        baseline = rss_bytes()
+
+        tally = Tally()
+        with timer() as opening:
+            connections = [Connection(app, token, chama_id, 10_000 + i, tally) for i, token in enumerate(tokens)]
+            await asyncio.wait_for(asyncio.gather(*(connection.ready.wait() for connection in connections)), 600)
+        refused = sum(connection.status != 200 for connection in connections)
+        gc.collect()
+        held = rss_bytes() - baseline
+        self.stdout.write(
+            f"Opened {len(connections):,} streams in {opening['seconds']:.1f}s "
+            f"({len(connections) / opening['seconds']:,.0f}/s), {refused} refused; "
+            f"RSS +{held / 2**20:.1f} MiB ({held / len(connections) / 1024:.1f} KiB per stream); "
+            f"{broker.count(chama_id):,} subscribed"
+        )
+
+        # Idle: only keep-alives flow; measure the process CPU they cost
+        frames = sum(connection.frames for connection in connections)
+        cpu, wall = time.process_time(), time.perf_counter()
+        await asyncio.sleep(options['idle'])
+        cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+        keep_alives = sum(connection.frames for connection in connections) - frames
+        self.stdout.write(
+            f"Idle {wall:.0f}s: {keep_alives:,} keep-alives, CPU {cpu:.2f}s ({cpu / wall:.1%} of one core)"
+        )
+
+        # Fan-out, published from another thread as the database listener does
+        totals, latencies = [], []
+        for index in range(options['events']):
+            tally.reset(len(connections))
+            event = Event(str(chama_id), BALANCE_CHANGED, {'group_delta': str(index)})
+            started = time.perf_counter()
+            threading.Thread(target=get_backend().publish, args=(event,)).start()
+            await tally.done
+            totals.append(time.perf_counter() - started)
+            latencies.extend(connection.received_at - started for connection in connections)
+        latencies.sort()
+        self.stdout.write(
+            f"Fan-out of {len(totals)} events to {len(connections):,} streams: "
+            f"all delivered in {statistics.median(totals) * 1000:.1f} ms median, {max(totals) * 1000:.1f} ms max; "
+            f"per stream p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms"
+        )
+
+        with timer() as closing:
+            for connection in connections:
+                connection.closed.set()
+            await asyncio.gather(*(connection.task for connection in connections), return_exceptions=True)
+        self.stdout.write(
+            f"Closed every stream in {closing['seconds']:.1f}s; {broker.count(chama_id)} still subscribed"
+        )
@@ -0,0 +1,52 @@
+import os
+import tracemalloc
+from django.core.management.base import BaseCommand
+
+from chamas.bench import rolled_back, seed_chama, timer
+from chamas.exports import render
+from chamas.models import ExportJob
+
+def current_rss_mb():
+    """Resident set size now (Linux); ru_maxrss only reports the lifetime peak"""
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+class Command(BaseCommand):
+    help = 'Benchmark streaming exports and check their memory ceiling on a large ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5_000_000)
+        parser.add_argument('--members', type=int, default=2000)
+        parser.add_argument('--ceiling-mb', type=float, default=32, help='Fail if memory grows by more than this')
+        parser.add_argument('--trace', action='store_true', help='Measure with tracemalloc (much slower)')
+
+    def handle(self, *args, **options):
+        per_member = max(options['rows'] // options['members'], 1)
+        rows = options['members'] * per_member
+
+        with rolled_back():
+            with timer() as seeding:
+                chama, _ = seed_chama(options['members'], per_member, batch_size=10_000)
+            self.stdout.write(f"Seeded {rows:,} ledger rows in {seeding['seconds']:.0f}s")
+
+            for file_format in (ExportJob.Format.CSV, ExportJob.Format.PDF):
+                if options['trace']:
+                    tracemalloc.start()
+                baseline = current_rss_mb()
+                growth = size = 0
+                with timer() as rendering:
+                    for count, block in enumerate(render(ExportJob.Report.GROUP, file_format, chama)):
+                        size += len(block)
+                        if count % 100 == 0:
+                            growth = max(growth, current_rss_mb() - baseline)
+                if options['trace']:
+                    growth = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                    tracemalloc.stop()
+                self.stdout.write(
+                    f"Group {file_format.upper()}: {size / 1024 / 1024:,.0f} MB in {rendering['seconds']:.0f}s "
+                    f"({rows / rendering['seconds']:,.0f} rows/s), memory growth {growth:.1f} MB"
+                )
+                if growth > options['ceiling_mb']:
+                    raise AssertionError(f"Memory grew {growth:.1f} MB, over the {options['ceiling_mb']} MB ceiling")
+
+        self.stdout.write(self.style.SUCCESS('Export benchmark complete'))
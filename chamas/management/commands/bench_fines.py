@@ -0,0 +1,58 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from chamas.bench import rolled_back, seed_chama, timer
+from chamas.fines import FINE_CHUNK_SIZE, accrue_fines
+from chamas.models import Chama, Loan
+
+class Command(BaseCommand):
+    help = 'Benchmark the set-based nightly fine accrual'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=100_000)
+        parser.add_argument('--chamas', type=int, default=20)
+        parser.add_argument('--transactions', type=int, default=6, help='Ledger rows per member')
+        parser.add_argument('--loan-share', type=float, default=0.1, help='Share of members with an active loan')
+        parser.add_argument('--chunk-size', type=int, default=FINE_CHUNK_SIZE)
+
+    def report(self, label, result):
+        self.stdout.write(
+            f"{label:<22} {result['seconds']:6.2f}s | {result['late_members']:,} members and "
+            f"{result['late_loans']:,} loans behind | {result['late_contributions']:,} late contributions, "
+            f"{result['late_repayments']:,} late repayments | {result['created']:,} fines created"
+        )
+
+    def handle(self, *args, **options):
+        per_chama = options['members'] // options['chamas']
+
+        with rolled_back():
+            self.stdout.write(f"Seeding {options['chamas']} chamas x {per_chama} members...")
+            with timer() as seeding:
+                loans = []
+                now = timezone.now()
+                for i in range(options['chamas']):
+                    chama, users = seed_chama(per_chama, options['transactions'], name=f'Benchmark Chama {i}')
+                    loans.extend(
+                        Loan(
+                            chama=chama, member=user, principal=Decimal('20000'), interest_rate=Decimal('1.5'),
+                            installments=12, status=Loan.Status.ACTIVE,
+                            disbursed_at=now - timedelta(days=30 * (1 + index % 6)),
+                        )
+                        for index, user in enumerate(users[:int(per_chama * options['loan_share'])])
+                    )
+                Loan.objects.bulk_create(loans, batch_size=5000)
+                Chama.objects.update(
+                    late_contribution_fine=Decimal('200'), late_repayment_fine=Decimal('500'), fine_grace_days=3,
+                )
+            self.stdout.write(f"Seeded {len(loans):,} loans in {seeding['seconds']:.1f}s ({connection.vendor})")
+
+            chunk_size = options['chunk_size']
+            self.report('First run', accrue_fines(chunk_size=chunk_size))
+            self.report('Rerun (idempotent)', accrue_fines(chunk_size=chunk_size))
+            next_month = timezone.now() + timedelta(days=30)
+            self.report('A month later', accrue_fines(now=next_month, chunk_size=chunk_size))
+
+        self.stdout.write(self.style.SUCCESS('Fine accrual benchmark complete'))
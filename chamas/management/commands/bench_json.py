@@ -0,0 +1,52 @@
+import io
+import timeit
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from chamas.bench import rolled_back, seed_chama
+from chamas.dashboard import build_dashboard_summary
+from chamas.models import Membership
+from chamas.tenancy import get_role
+from config.renderers import ORJSONParser, ORJSONRenderer
+
+class Command(BaseCommand):
+    help = 'Time rendering and parsing dashboard payloads with the stdlib and orjson JSON renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=200)
+        parser.add_argument('--transactions', type=int, default=50, help='Transactions per member')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing runs; the fastest is reported')
+
+    def best(self, function, repeat):
+        """Fastest microseconds per call"""
+        number, _ = timeit.Timer(function).autorange()
+        return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e6
+
+    def compare(self, label, stdlib, fast, repeat):
+        slow_us, fast_us = self.best(stdlib, repeat), self.best(fast, repeat)
+        self.stdout.write(f'{label:<32} {slow_us:>9.1f} us {fast_us:>9.1f} us {slow_us / fast_us:>7.1f}x')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        with rolled_back():
+            chama, users = seed_chama(options['members'], options['transactions'], name='JSON Benchmark')
+            Membership.objects.filter(chama=chama, user=users[0]).update(role=Membership.Role.TREASURER)
+            payloads = {
+                role: build_dashboard_summary(user, chama.pk, get_role(user, chama.pk))
+                for user, role in ((users[1], 'member'), (users[0], 'treasurer'))
+            }
+
+        self.stdout.write(f"{'':<32} {'stdlib':>12} {'orjson':>12} {'speedup':>8}")
+        for role, payload in payloads.items():
+            body = JSONRenderer().render(payload)
+            assert ORJSONRenderer().render(payload) == body
+            self.stdout.write(f'{role} dashboard: {len(body):,} bytes')
+            self.compare(
+                '  render', lambda: JSONRenderer().render(payload), lambda: ORJSONRenderer().render(payload), repeat,
+            )
+            self.compare(
+                '  parse', lambda: JSONParser().parse(io.BytesIO(body)),
+                lambda: ORJSONParser().parse(io.BytesIO(body)), repeat,
+            )
+        self.stdout.write(self.style.SUCCESS('JSON benchmark complete'))
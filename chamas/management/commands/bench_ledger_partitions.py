@@ -0,0 +1,112 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.utils import timezone
+
+from chamas.archive import archive_month, iter_ledger
+from chamas.bench import rolled_back, seed_chama, timer
+from chamas.models import Transaction
+from chamas.partitions import is_partitioned
+
+# Recent activity the queries read; history is added before it
+RECENT_DAYS = 60
+
+def add_history(chama, users, rows, oldest_days, newest_days, seed):
+    """Bulk insert ``rows`` ledger rows posted between the two ages"""
+    rng = random.Random(seed)
+    now = timezone.now()
+    batch = []
+    for _ in range(rows):
+        batch.append(Transaction(
+            chama=chama,
+            member=rng.choice(users),
+            transaction_type=Transaction.Type.CONTRIBUTION,
+            amount=Decimal(rng.randrange(500, 10000, 50)),
+            posted_at=now - timedelta(seconds=rng.randrange(newest_days * 86400, oldest_days * 86400)),
+        ))
+        if len(batch) >= 10_000:
+            Transaction.objects.bulk_create(batch)
+            batch = []
+    Transaction.objects.bulk_create(batch)
+
+class Command(BaseCommand):
+    help = 'Show recent-range ledger queries staying flat as history grows, before and after archiving'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=2000)
+        parser.add_argument('--recent', type=int, default=20, help=f'Rows per member in the last {RECENT_DAYS} days')
+        parser.add_argument('--history-rows', type=int, default=1_000_000, help='Rows of history added per step')
+        parser.add_argument('--steps', type=int, default=4, help='Years of history to add, one per step')
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def recent_queries(self, chama, users, repeat):
+        """Milliseconds per call for the queries a live chama runs all day"""
+        since = timezone.now() - timedelta(days=30)
+        ledger = Transaction.objects.filter(chama=chama)
+        members = random.Random(1).sample(users, min(repeat, len(users)))
+        with timer() as statement:
+            for member in members:
+                list(ledger.filter(member=member, posted_at__gte=since).order_by('posted_at', 'id'))
+        with timer() as page:
+            for _ in range(repeat):
+                list(ledger.order_by('-posted_at', '-id')[:50])
+        with timer() as month_total:
+            for _ in range(repeat):
+                ledger.filter(posted_at__gte=since).aggregate(total=Sum('amount'))
+        return [
+            statement['seconds'] / len(members) * 1000,
+            page['seconds'] / repeat * 1000,
+            month_total['seconds'] / repeat * 1000,
+        ]
+
+    def report(self, label, rows, timings):
+        statement, page, month_total = timings
+        self.stdout.write(
+            f"{label:<22} {rows:>12,} | member 30d {statement:7.2f} ms | "
+            f"latest page {page:7.2f} ms | chama 30d sum {month_total:8.2f} ms"
+        )
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.stdout.write(f"Ledger storage: {'monthly partitions' if is_partitioned() else 'plain table'}")
+
+        with rolled_back():
+            chama, users = seed_chama(options['members'], options['recent'], days=RECENT_DAYS)
+            rows = Transaction.objects.filter(chama=chama).count()
+            self.report('recent only', rows, self.recent_queries(chama, users, repeat))
+
+            for step in range(1, options['steps'] + 1):
+                add_history(
+                    chama, users, options['history_rows'],
+                    oldest_days=RECENT_DAYS + step * 365, newest_days=RECENT_DAYS + (step - 1) * 365, seed=step,
+                )
+                rows += options['history_rows']
+                self.report(f'+{step} years history', rows, self.recent_queries(chama, users, repeat))
+
+            # Archive everything older than the last three months
+            today = timezone.localdate()
+            oldest = today.year * 12 + today.month - 1 - (options['steps'] * 12 + 4)
+            cutoff = today.year * 12 + today.month - 1 - 3
+            with timer() as archiving:
+                archived = raw = stored = 0
+                for index in range(oldest, cutoff):
+                    year, month = divmod(index, 12)
+                    month_rows, month_raw, month_stored = archive_month(year, month + 1)
+                    archived, raw, stored = archived + month_rows, raw + month_raw, stored + month_stored
+            self.stdout.write(
+                f"Archived {archived:,} rows in {archiving['seconds']:.1f}s: "
+                f"{raw / 2**20:.1f} MB of columns stored in {stored / 2**20:.1f} MB"
+            )
+            hot = Transaction.objects.filter(chama=chama).count()
+            self.report('after archiving', hot, self.recent_queries(chama, users, repeat))
+
+            member = users[0]
+            with timer() as full_statement:
+                count = sum(1 for _ in iter_ledger(chama.pk, ('posted_at', 'amount'), member_id=member.pk))
+            self.stdout.write(
+                f"Full statement across hot and cold: {count:,} rows in {full_statement['seconds'] * 1000:.0f} ms"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Ledger partition benchmark complete'))
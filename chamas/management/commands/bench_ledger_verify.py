@@ -0,0 +1,95 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from chamas.bench import seed_chama, timer
+from chamas.integrity import run_parallel, verify_chama
+from chamas.models import Chama, LedgerCheckpoint, Transaction
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Time full, resumed and incremental ledger hash-chain verification across a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=10_000_000, help='Ledger rows in total')
+        parser.add_argument('--chamas', type=int, default=8)
+        parser.add_argument('--members', type=int, default=500, help='Members per chama')
+        parser.add_argument('--workers', type=int, default=None, help='Processes (default: one per CPU)')
+
+    def verify(self, label, ids, workers, **kwargs):
+        with timer() as elapsed:
+            results = list(run_parallel('verify', ids, workers, **kwargs))
+        rows = sum(result['rows'] for result in results)
+        errors = [result['error'] for result in results if result['error']]
+        self.stdout.write(
+            f"{label:<28} {rows:>12,} rows in {elapsed['seconds']:7.1f}s "
+            f"({rows / elapsed['seconds']:>10,.0f} rows/s){'; ' + errors[0] if errors else ''}"
+        )
+        return results
+
+    def handle(self, *args, **options):
+        # Worker processes open their own connections, so the data is
+        # committed and removed again afterwards instead of rolled back
+        per_chama = options['transactions'] // options['chamas']
+        per_member = max(1, per_chama // options['members'])
+        workers = options['workers']
+        ids = []
+        try:
+            with timer() as seeding:
+                for index in range(options['chamas']):
+                    chama, _ = seed_chama(
+                        options['members'], per_member, batch_size=10_000, name=f'Verify Benchmark {index}'
+                    )
+                    ids.append(chama.pk)
+            rows = Transaction.objects.unscoped().filter(chama_id__in=ids).count()
+            self.stdout.write(f"Seeded and chained {rows:,} rows in {len(ids)} chamas in {seeding['seconds']:.0f}s")
+
+            if connection.vendor == 'sqlite':
+                self.stdout.write('SQLite verifies one chama at a time; the process pool needs PostgreSQL')
+            self.verify('full, one process', ids, 1, full=True)
+            self.verify('full, process pool', ids, workers, full=True)
+
+            # Interrupt every chama halfway, then resume from the checkpoints
+            LedgerCheckpoint.objects.filter(chama_id__in=ids).delete()
+            self.verify('interrupted at half', ids, workers, max_rows=per_member * options['members'] // 2)
+            self.verify('resumed', ids, workers)
+
+            # The nightly run only reads what was posted since yesterday
+            chama = Chama.objects.get(pk=ids[0])
+            member = chama.memberships.values_list('user_id', flat=True).first()
+            Transaction.objects.bulk_create([
+                Transaction(
+                    chama=chama, member_id=member, transaction_type=Transaction.Type.CONTRIBUTION,
+                    amount=Decimal('500'), posted_at=timezone.now(),
+                )
+                for _ in range(1000)
+            ])
+            self.verify('incremental (1,000 new)', ids, workers)
+
+            # Change one amount in the middle of the chain
+            target = Transaction.objects.filter(chama=chama, chain_seq=per_member * options['members'] // 2)
+            target.update(amount=Decimal('1.00'))
+            result = verify_chama(chama.pk, full=True)
+            self.stdout.write(f"Tampered amount detected: {result['error']}")
+        finally:
+            with timer() as cleanup:
+                self.cleanup(ids)
+            self.stdout.write(f"Removed benchmark data in {cleanup['seconds']:.0f}s")
+
+        self.stdout.write(self.style.SUCCESS('Ledger verification benchmark complete'))
+
+    def cleanup(self, ids):
+        if not ids:
+            return
+        users = list(
+            User.objects.filter(memberships__chama_id__in=ids).values_list('pk', flat=True)
+        )
+        # A raw delete skips loading millions of rows into the collector
+        with connection.cursor() as cursor:
+            for chama_id in ids:
+                cursor.execute('DELETE FROM chama_transaction WHERE chama_id = %s', [chama_id.hex])
+        Chama.objects.filter(pk__in=ids).delete()
+        User.objects.filter(pk__in=users).delete()
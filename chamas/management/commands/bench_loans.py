@@ -0,0 +1,45 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from chamas.bench import timer
+from chamas.loans import project_portfolio, schedule_arrays
+
+class Command(BaseCommand):
+    help = 'Benchmark vectorized loan schedules and portfolio projection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loans', type=int, default=50_000)
+        parser.add_argument('--installments', type=int, default=24)
+        parser.add_argument('--weeks', type=int, default=104)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        n, term = options['loans'], options['installments']
+        rng = np.random.default_rng(42)
+        portfolio = {
+            'principal': rng.integers(1_000_00, 500_000_00, n),
+            'rate_ppm': rng.integers(0, 50_000, n),
+            'terms': np.full(n, term),
+            'methods': rng.integers(0, 3, n),
+            'custom_interest': rng.integers(0, 50_000_00, n),
+        }
+        start_day = rng.integers(-365, 0, n)
+        interval_days = rng.choice([7, 14, 30], n)
+        paid = rng.integers(0, 100_000_00, n)
+
+        self.stdout.write(f"{n} loans x {term} installments ({n * term:,} schedule rows)")
+        best_schedule = best_projection = float('inf')
+        for _ in range(options['repeat']):
+            with timer() as schedules:
+                schedule_arrays(**portfolio)
+            with timer() as projection:
+                project_portfolio(
+                    **portfolio, start_day=start_day, interval_days=interval_days,
+                    paid=paid, weeks=options['weeks'],
+                )
+            best_schedule = min(best_schedule, schedules['seconds'])
+            best_projection = min(best_projection, projection['seconds'])
+
+        self.stdout.write(f"Schedules:            {best_schedule * 1000:8.1f} ms")
+        self.stdout.write(f"Weekly projection:    {best_projection * 1000:8.1f} ms (incl. schedules)")
+        self.stdout.write(self.style.SUCCESS('Loan benchmark complete'))
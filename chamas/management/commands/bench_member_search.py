@@ -0,0 +1,124 @@
+import random
+import statistics
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import User, UserProfile
+from accounts.search import rebuild_search_documents
+from chamas.bench import rolled_back, timer
+from chamas.directory import search_members
+from chamas.models import Chama, Membership
+
+FIRST_NAMES = [
+    'Wanjiru', 'Wanjiku', 'Njeri', 'Achieng', 'Atieno', 'Akinyi', 'Chebet', 'Jepkosgei', 'Mwende', 'Nduta',
+    'Wambui', 'Nyambura', 'Kerubo', 'Moraa', 'Zawadi', 'Amani', 'Kamau', 'Otieno', 'Ochieng', 'Kipchoge',
+    'Kiprono', 'Mutua', 'Musyoka', 'Njoroge', 'Kariuki', 'Omondi', 'Odhiambo', 'Wafula', 'Barasa', 'Juma',
+    'Baraka', 'Mwangi', 'Githinji', 'Kibet', 'Cheruiyot', 'Onyango', 'Makena', 'Kendi', 'Nyokabi', 'Wekesa',
+]
+LAST_NAMES = [
+    'Kamau', 'Mwangi', 'Otieno', 'Ochieng', 'Kariuki', 'Njoroge', 'Wanjala', 'Mutua', 'Kiprop', 'Koech',
+    'Rotich', 'Kiplagat', 'Mbugua', 'Macharia', 'Gitau', 'Onyango', 'Omondi', 'Owino', 'Wekesa', 'Simiyu',
+    'Nyaga', 'Muriuki', 'Kimani', 'Ndungu', 'Waweru', 'Kiptoo', 'Langat', 'Chege', 'Maina', 'Odera',
+]
+LOCATIONS = ['Nairobi', 'Kisumu', 'Mombasa', 'Nakuru', 'Eldoret', 'Thika', 'Nyeri', 'Machakos', 'Kakamega', 'Kericho']
+
+def drop_letter(rng, word):
+    index = rng.randrange(1, len(word) - 1)
+    return word[:index] + word[index + 1:]
+
+def swap_letters(rng, word):
+    index = rng.randrange(1, len(word) - 2)
+    return word[:index] + word[index + 1] + word[index] + word[index + 2:]
+
+class Command(BaseCommand):
+    help = 'Time type-ahead member search in a large chama'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=500_000)
+        parser.add_argument('--others', type=int, default=50_000, help='Members of another chama, never returned')
+        parser.add_argument('--queries', type=int, default=300, help='Queries per kind')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def seed(self, rng, chama, count, tag, batch_size):
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=f'{first.lower()}.{last.lower()}.{tag}{i}@example.com',
+                    username=f'directory-{tag}{i}',
+                    first_name=first,
+                    last_name=last,
+                    phone_number=f'2547{rng.randrange(10 ** 8):08d}',
+                    password='!',
+                )
+                for i, (first, last) in enumerate(
+                    (rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)) for _ in range(count)
+                )
+            ],
+            batch_size=batch_size,
+        )
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=user, location=rng.choice(LOCATIONS)) for user in users], batch_size=batch_size,
+        )
+        joined = timezone.now() - timedelta(days=365)
+        Membership.objects.bulk_create(
+            [Membership(chama=chama, user=user, joined_at=joined, is_active=i % 50 != 0) for i, user in enumerate(users)],
+            batch_size=batch_size,
+        )
+        return users
+
+    def queries(self, rng, users, count):
+        """What treasurers type: names as they go, phone numbers, emails and misspellings"""
+        kinds = {'name prefix': [], 'full name': [], 'phone': [], 'email': [], 'typo': []}
+        for user in rng.sample(users, count):
+            first, last = user.first_name.lower(), user.last_name.lower()
+            kinds['name prefix'].append(first[:rng.randint(2, 6)])
+            kinds['full name'].append(f'{first} {last[:rng.randint(1, 4)]}')
+            kinds['phone'].append('0' + user.phone_number[3:3 + rng.randint(4, 9)])
+            kinds['email'].append(user.email[:rng.randint(8, 20)])
+            kinds['typo'].append(rng.choice([drop_letter, swap_letters])(rng, last))
+        return kinds
+
+    def handle(self, *args, **options):
+        rng = random.Random(48)
+        with rolled_back():
+            with timer() as seeding:
+                chama = Chama.objects.create(name='Directory', contribution_amount=Decimal('500'))
+                other = Chama.objects.create(name='Neighbours', contribution_amount=Decimal('500'))
+                users = self.seed(rng, chama, options['members'], 'a', options['batch_size'])
+                self.seed(rng, other, options['others'], 'b', options['batch_size'])
+                rebuild_search_documents(options['batch_size'])
+            self.stdout.write(
+                f"Seeded {options['members']:,} members (+{options['others']:,} in another chama) "
+                f"with search documents in {seeding['seconds']:.0f}s"
+            )
+
+            self.stdout.write(f"{'':<14} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  hits")
+            everything = []
+            for kind, queries in self.queries(rng, users, options['queries']).items():
+                latencies, hits = [], 0
+                for query in queries:
+                    with timer() as took:
+                        results = search_members(chama.pk, query)
+                    latencies.append(took['seconds'] * 1000)
+                    hits += bool(results)
+                everything += latencies
+                self.report(kind, latencies, f'{hits}/{len(queries)}')
+            self.report('all', everything, '')
+
+            # A rename as the profile form saves it: row, triggers and document upsert
+            user = users[len(users) // 2]
+            saves = []
+            for surname in ('Kiprotich', 'Wairimu', 'Mutiso') * 10:
+                user.last_name = surname
+                with timer() as took:
+                    user.save()
+                saves.append(took['seconds'] * 1000)
+            self.stdout.write(f'User save with reindex: p50 {statistics.median(saves):.2f} ms')
+
+        self.stdout.write(self.style.SUCCESS('Member search benchmark complete'))
+
+    def report(self, label, latencies, hits):
+        p50, p95, p99 = (statistics.quantiles(latencies, n=100)[i] for i in (49, 94, 98))
+        self.stdout.write(f'{label:<14} {p50:>6.2f} ms {p95:>6.2f} ms {p99:>6.2f} ms {max(latencies):>6.2f} ms  {hits}')
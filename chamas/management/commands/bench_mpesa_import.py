@@ -0,0 +1,107 @@
+import csv
+import os
+import resource
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+from django.core.management.base import BaseCommand
+from django.db import reset_queries
+
+from chamas.bench import rolled_back, timer
+from chamas.models import Chama, MpesaPayment
+from chamas.mpesa import import_statement
+
+HEADER = ['Receipt No.', 'Completion Time', 'Details', 'Transaction Status', 'Paid In', 'Withdrawn', 'Other Party Info']
+
+def synthetic_rows(count):
+    start = datetime(2026, 1, 1, 8, 0, 0)
+    for i in range(count):
+        withdrawal = i % 10 == 9
+        yield [
+            f'SBX{i:09d}',
+            (start + timedelta(seconds=i * 7)).strftime('%Y-%m-%d %H:%M:%S'),
+            'Pay Bill Online' if not withdrawal else 'Business Payment to Customer',
+            'Completed',
+            '' if withdrawal else f'{500 + (i % 40) * 125:,}.00',
+            '2,000.00' if withdrawal else '',
+            f'2547{i % 100_000:08d} - MEMBER {i % 100_000}',
+        ]
+
+def write_csv(path, count):
+    with open(path, 'w', newline='') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(['Safaricom M-PESA Statement'])
+        writer.writerow([])
+        writer.writerow(HEADER)
+        writer.writerows(synthetic_rows(count))
+
+def _xlsx_row(number, cells):
+    return f'<row r="{number}">' + ''.join(
+        f'<c r="{chr(65 + i)}{number}" t="inlineStr"><is><t>{escape(value)}</t></is></c>'
+        for i, value in enumerate(cells)
+    ) + '</row>'
+
+def write_xlsx(path, count):
+    """Minimal workbook with inline strings, written as a stream"""
+    main = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Override PartName="/xl/worksheets/sheet1.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/></Types>'
+        ))
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(f'<?xml version="1.0" encoding="UTF-8"?><worksheet xmlns="{main}"><sheetData>'.encode())
+            sheet.write(_xlsx_row(1, HEADER).encode())
+            for number, cells in enumerate(synthetic_rows(count), start=2):
+                sheet.write(_xlsx_row(number, cells).encode())
+            sheet.write(b'</sheetData></worksheet>')
+
+class Command(BaseCommand):
+    help = 'Benchmark streaming import of a synthetic M-Pesa statement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        count = options['rows']
+        suffix = f".{options['format']}"
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f'statement{suffix}')
+            with timer() as written:
+                (write_xlsx if suffix == '.xlsx' else write_csv)(path, count)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            self.stdout.write(f"Wrote {count:,}-row {suffix} statement ({size_mb:,.1f} MB) in {written['seconds']:.1f}s")
+
+            # ru_maxrss is in kilobytes on Linux
+            # With DEBUG on Django keeps every query's SQL; drop it between chunks
+            progress = lambda statement: reset_queries()
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            with rolled_back():
+                chama = Chama.objects.create(name='Benchmark Chama')
+                with open(path, 'rb') as handle, timer() as first:
+                    statement = import_statement(chama, handle, path, chunk_size=options['chunk_size'], progress=progress)
+                imported = MpesaPayment.objects.filter(chama=chama).count()
+                with open(path, 'rb') as handle, timer() as again:
+                    repeat = import_statement(chama, handle, path, chunk_size=options['chunk_size'], progress=progress)
+            rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        assert statement.error == '', statement.error
+        assert imported == statement.rows_imported
+        assert repeat.rows_imported == 0 and repeat.duplicates == statement.rows_imported
+
+        self.stdout.write(
+            f"Import:    {statement.rows_read:,} rows in {first['seconds']:.1f}s "
+            f"= {statement.rows_read / first['seconds']:,.0f} rows/s "
+            f"({statement.rows_imported:,} payments, {statement.rows_skipped:,} skipped)"
+        )
+        self.stdout.write(
+            f"Re-import: {repeat.rows_read:,} rows in {again['seconds']:.1f}s "
+            f"= {repeat.rows_read / again['seconds']:,.0f} rows/s ({repeat.duplicates:,} duplicates)"
+        )
+        self.stdout.write(f"Peak RSS:  {rss_after:,.0f} MB ({rss_after - rss_before:+,.0f} MB during import)")
+        self.stdout.write(self.style.SUCCESS('M-Pesa import benchmark complete'))
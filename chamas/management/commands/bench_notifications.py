@@ -0,0 +1,111 @@
+import random
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.models import UserProfile
+from chamas.bench import rolled_back, seed_chama, timer
+from chamas.notifications import LocalPushTransport, deliver, load_channels, queue, recipients
+
+class CrashingPushTransport(LocalPushTransport):
+    """Accepts ``crash_after`` messages, then fails once mid-batch"""
+
+    def __init__(self, crash_after=None, **options):
+        super().__init__(**options)
+        self.crash_after = crash_after
+
+    def send(self, messages):
+        accepted = super().send(messages)
+        if self.crash_after is not None and len(self.outbox) >= self.crash_after:
+            self.crash_after = None
+            raise ConnectionError('simulated crash')
+        return accepted
+
+class Command(BaseCommand):
+    help = 'Benchmark notification fan-out to a large chama, with a crash and resume'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=100_000)
+        parser.add_argument('--sms-share', type=float, default=0.3, help='Share of members with SMS switched on')
+        parser.add_argument('--rate-sample', type=int, default=2000, help='Members in the rate-limited run')
+
+    def channels(self, rates=False, push=None):
+        config = {name: dict(options) for name, options in settings.NOTIFICATION_CHANNELS.items()}
+        config['email']['transport'] = 'chamas.notifications.EmailTransport'
+        config['email']['options'] = {'backend': 'django.core.mail.backends.locmem.EmailBackend'}
+        config['sms']['transport'] = 'chamas.notifications.LocalSMSTransport'
+        config['push']['transport'] = push or 'chamas.notifications.LocalPushTransport'
+        for options in config.values():
+            options['rate'] = options['rate'] if rates else 0
+        return load_channels(config)
+
+    def seed(self, members, sms_share, name):
+        chama, users = seed_chama(members, 0, batch_size=10_000, name=name)
+        rng = random.Random(1)
+        UserProfile.objects.bulk_create(
+            [
+                UserProfile(
+                    user=user,
+                    sms_notifications=rng.random() < sms_share,
+                    email_notifications=rng.random() < 0.9,
+                )
+                for user in users
+            ],
+            batch_size=10_000,
+        )
+        return chama
+
+    def report(self, label, run, seconds):
+        total = sum(run.sent.values())
+        sent = ', '.join(f'{count:,} {channel}' for channel, count in sorted(run.sent.items()))
+        self.stdout.write(f"{label:<22} {seconds:7.2f}s | {sent} | {total / seconds:,.0f} messages/s")
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            with timer() as seeding:
+                chama = self.seed(options['recipients'], options['sms_share'], 'Notification Benchmark')
+            self.stdout.write(f"Seeded {options['recipients']:,} members in {seeding['seconds']:.1f}s")
+
+            with timer() as reading:
+                grouped = recipients(chama.pk)
+            counts = ', '.join(f'{len(people):,} {channel}' for channel, people in grouped.items())
+            self.stdout.write(f"Recipients by channel in one query: {reading['seconds'] * 1000:.0f} ms ({counts})")
+
+            run = queue(chama.pk, 'bench', 'Meeting on {chama}', 'Hi {first_name}, {chama} meets on Friday.')
+            with timer() as sending:
+                run = deliver(run.pk, self.channels())
+            self.report('Fan-out (no limits)', run, sending['seconds'])
+
+            # Crash halfway through push, then resume the same run
+            push = f'{__name__}.CrashingPushTransport'
+            channels = self.channels(push=push)
+            channels['push'].transport.crash_after = len(grouped['push']) // 2
+            run = queue(chama.pk, 'bench-crash', 'Reminder', 'Hi {first_name}')
+            with timer() as crashed:
+                run = deliver(run.pk, channels)
+            self.stdout.write(
+                f"Crashed after {sum(run.sent.values()):,} messages in {crashed['seconds']:.2f}s ({run.error})"
+            )
+            with timer() as resumed:
+                run = deliver(run.pk, channels)
+            outbox = channels['push'].transport.outbox
+            self.report('Resumed (whole run)', run, resumed['seconds'])
+            self.stdout.write(
+                f"Push delivered {len(outbox):,} messages to {len({message.key for message in outbox}):,} "
+                f"members (expected {len(grouped['push']):,})"
+            )
+
+            # Configured rate limits on a smaller chama
+            small = self.seed(options['rate_sample'], options['sms_share'], 'Rate Limit Benchmark')
+            grouped = recipients(small.pk)
+            # Each channel starts with one batch's worth of allowance
+            ideal = max(
+                max(len(grouped[name]) - channel['batch_size'], 0) / channel['rate']
+                for name, channel in settings.NOTIFICATION_CHANNELS.items() if channel['rate']
+            )
+            run = queue(small.pk, 'bench', 'Reminder', 'Hi {first_name}')
+            with timer() as limited:
+                run = deliver(run.pk, self.channels(rates=True))
+            self.report('Rate limited', run, limited['seconds'])
+            self.stdout.write(f"Slowest channel on its own at its configured rate: {ideal:.2f}s")
+
+        self.stdout.write(self.style.SUCCESS('Notification benchmark complete'))
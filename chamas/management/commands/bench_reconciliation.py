@@ -0,0 +1,80 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from chamas.bench import rolled_back, seed_chama, timer
+from chamas.models import MpesaPayment
+from chamas.reconciliation import (
+    RECONCILE_WINDOW_DAYS, ExpectationIndex, contribution_expectations, match_payment, member_phones,
+    reconcile_chama,
+)
+from chamas.loans import to_cents
+from chamas.utils import normalize_phone
+
+class Command(BaseCommand):
+    help = 'Benchmark reconciling M-Pesa payments against expected contributions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=100_000, help='Also the number of members')
+        parser.add_argument('--naive-sample', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = options['payments']
+        now = timezone.now()
+
+        with rolled_back():
+            with timer() as seeding:
+                # Joined 20 days ago: one contribution period open per member
+                chama, users = seed_chama(count, 0, days=20)
+                # Some members share a phone, which makes their payments ambiguous
+                for first, second in zip(users[0:1000:2], users[1:1000:2]):
+                    second.phone_number = first.phone_number
+                type(users[0]).objects.bulk_update(users[1:1000:2], ['phone_number'], batch_size=1000)
+
+                payments = []
+                for i, user in enumerate(users):
+                    phone = user.phone_number if i % 20 != 1 else f'2549{i:08d}'
+                    amount = Decimal('5000') if i % 20 != 0 else Decimal('4321')
+                    payments.append(MpesaPayment(
+                        chama=chama, receipt=f'BNC{i:09d}', completed_at=now, amount=amount, phone_number=phone,
+                    ))
+                MpesaPayment.objects.bulk_create(payments, batch_size=5000)
+            self.stdout.write(f"Seeded {count} members and payments in {seeding['seconds']:.1f}s ({connection.vendor})")
+
+            # Indexed matching alone, without persistence
+            with timer() as loading:
+                expectations = contribution_expectations(chama, timezone.localdate())
+                phones = member_phones(chama)
+            with timer() as indexing:
+                index = ExpectationIndex(expectations, phones)
+            with timer() as matching:
+                for payment in payments:
+                    match_payment(index, payment)
+            self.stdout.write(f"Load {len(expectations)} expectations: {loading['seconds'] * 1000:8.0f} ms")
+            self.stdout.write(f"Build indexes:                 {indexing['seconds'] * 1000:8.0f} ms")
+            self.stdout.write(f"Match {count} payments:      {matching['seconds'] * 1000:8.0f} ms")
+
+            # Nested loop baseline on a sample, extrapolated
+            sample = payments[:options['naive_sample']]
+            member_phone = {user.pk: normalize_phone(user.phone_number) for user in users}
+            with timer() as naive:
+                for payment in sample:
+                    day = timezone.localdate(payment.completed_at).toordinal()
+                    cents = to_cents(payment.amount)
+                    [
+                        e for e in expectations
+                        if member_phone[e.member_id] == payment.phone_number and e.cents == cents
+                        and abs(e.due_day - day) <= RECONCILE_WINDOW_DAYS
+                    ]
+            estimate = naive['seconds'] / len(sample) * count
+            self.stdout.write(f"Nested loop (extrapolated):    {estimate * 1000:8.0f} ms")
+
+            with timer() as full:
+                stats = reconcile_chama(chama.pk)
+            self.stdout.write(
+                f"reconcile_chama end to end:    {full['seconds'] * 1000:8.0f} ms "
+                f"({stats['matched']} matched, {stats['review']} review, {stats['unmatched']} unmatched)"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Reconciliation benchmark complete'))
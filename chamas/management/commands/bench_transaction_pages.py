@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from chamas.bench import rolled_back, seed_chama, timer
+from chamas.models import Transaction
+from chamas.pagination import KeysetPagination
+
+class Command(BaseCommand):
+    help = 'Compare keyset and OFFSET pagination latency at increasing page depths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=500)
+        parser.add_argument('--transactions', type=int, default=400, help='Ledger rows per member')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        repeat = options['repeat']
+
+        with rolled_back():
+            chama, _ = seed_chama(options['members'], options['transactions'])
+            ledger = Transaction.objects.filter(chama=chama)
+            rows = ledger.count()
+            page_size = KeysetPagination.page_size
+            self.stdout.write(f"{rows:,} ledger rows, {page_size} per page")
+
+            page = 1
+            while (page - 1) * page_size < rows:
+                offset = (page - 1) * page_size
+                cursor = ''
+                if offset:
+                    last = ledger.order_by('-posted_at', '-id')[offset - 1]
+                    cursor = KeysetPagination().encode_cursor(last)
+
+                with timer() as keyset:
+                    for _ in range(repeat):
+                        paginator = KeysetPagination()
+                        request = Request(factory.get('/', {'cursor': cursor} if cursor else {}))
+                        paginator.paginate_queryset(ledger, request)
+                with timer() as offset_based:
+                    for _ in range(repeat):
+                        ledger.count()
+                        list(ledger.order_by('-posted_at', '-id')[offset:offset + page_size])
+
+                self.stdout.write(
+                    f"page {page:>6}: keyset {keyset['seconds'] / repeat * 1000:7.2f} ms | "
+                    f"offset+count {offset_based['seconds'] / repeat * 1000:7.2f} ms"
+                )
+                page *= 10
+
+        self.stdout.write(self.style.SUCCESS('Pagination benchmark complete'))
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chamas.partitions import ensure_partitions, is_partitioned, list_partitions
+
+class Command(BaseCommand):
+    help = 'Create monthly ledger partitions ahead of time (run on a schedule; PostgreSQL only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=settings.LEDGER_PARTITION_MONTHS_AHEAD,
+            help='Months after this one that must already have a partition',
+        )
+        parser.add_argument('--list', action='store_true', help='Print every partition and its bounds')
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            self.stdout.write('The ledger is a plain table on this database; nothing to do')
+            return
+
+        created = ensure_partitions(options['months_ahead'])
+        for name in created:
+            self.stdout.write(f"Created {name}")
+        if options['list']:
+            for name, bounds in list_partitions():
+                self.stdout.write(f"{name}: {bounds}")
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} partitions created"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chamas.models import MpesaPayment
+from chamas.reconciliation import RECONCILE_WINDOW_DAYS, reconcile_chama
+
+class Command(BaseCommand):
+    help = 'Match unmatched M-Pesa payments to contributions and loan installments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chama', action='append', dest='chamas', help='Chama id (repeatable); default all')
+        parser.add_argument('--window-days', type=int, default=RECONCILE_WINDOW_DAYS)
+
+    def handle(self, *args, **options):
+        chama_ids = options['chamas'] or (
+            MpesaPayment.objects.unscoped().filter(status=MpesaPayment.Status.UNMATCHED)
+            .values_list('chama_id', flat=True).distinct()
+        )
+        for chama_id in chama_ids:
+            started = timezone.now()
+            stats = reconcile_chama(chama_id, window_days=options['window_days'])
+            elapsed = (timezone.now() - started).total_seconds()
+            self.stdout.write(
+                f"{chama_id}: {stats['matched']} matched, {stats['review']} for review, "
+                f"{stats['unmatched']} unmatched of {stats['payments']} payments in {elapsed:.2f}s"
+            )
+        self.stdout.write(self.style.SUCCESS('Reconciliation complete'))
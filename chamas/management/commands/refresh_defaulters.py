@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chamas.defaulters import refresh_defaulters
+
+class Command(BaseCommand):
+    help = 'Recompute contribution defaulters for every chama (run on a schedule)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chama', action='append', dest='chamas', help='Chama id (repeatable); default all')
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        count = refresh_defaulters(options['chamas'])
+        elapsed = (timezone.now() - started).total_seconds()
+        self.stdout.write(self.style.SUCCESS(f"Found {count} defaulters in {elapsed:.2f}s"))
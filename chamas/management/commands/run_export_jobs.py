@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from chamas.exports import run_pending
+
+class Command(BaseCommand):
+    help = 'Render pending report exports (when EXPORT_BACKGROUND_WORKERS is 0, run on a schedule)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many jobs')
+
+    def handle(self, *args, **options):
+        count = run_pending(options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Ran {count} export jobs"))
@@ -0,0 +1,28 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+
+from chamas.notifications import queue_meeting_reminders, queue_payment_due_notices, run_pending
+
+class Command(BaseCommand):
+    help = 'Queue meeting reminders and payment-due notices, then send every unfinished notification run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meetings-within', type=int, default=24, help='Remind members of meetings this many hours ahead'
+        )
+        parser.add_argument('--payment-due', action='store_true', help="Queue today's contribution reminders")
+
+    def handle(self, *args, **options):
+        queued = queue_meeting_reminders(timedelta(hours=options['meetings_within']))
+        if options['payment_due']:
+            queued += queue_payment_due_notices()
+        self.stdout.write(f"{len(queued)} notification runs queued")
+
+        for run in run_pending():
+            sent = ', '.join(f'{count:,} {channel}' for channel, count in sorted(run.sent.items())) or 'nothing'
+            line = f"{run.key} for {run.chama}: {run.get_status_display().lower()}, sent {sent}"
+            if run.error:
+                self.stdout.write(self.style.ERROR(f"{line}: {run.error}"))
+            else:
+                self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS('Notifications sent'))
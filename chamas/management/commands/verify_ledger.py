@@ -0,0 +1,66 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from chamas.integrity import CHECKPOINT_EVERY, run_parallel
+from chamas.models import Chama
+
+class Command(BaseCommand):
+    help = "Verify each chama's ledger hash chain from its last checkpoint (run on a schedule)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chama', action='append', dest='chamas', help='Chama id (repeatable); default all')
+        parser.add_argument('--full', action='store_true', help='Ignore checkpoints and verify from the first row')
+        parser.add_argument(
+            '--backfill', action='store_true', help='Chain rows posted before the ledger was hash-chained'
+        )
+        parser.add_argument('--workers', type=int, default=None, help='Processes (default: one per CPU)')
+        parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY)
+        parser.add_argument(
+            '--max-rows', type=int, default=None,
+            help='Stop each chama after this many rows; the next run resumes from there',
+        )
+
+    def handle(self, *args, **options):
+        chamas = Chama.objects.order_by('created_at')
+        if options['chamas']:
+            chamas = chamas.filter(id__in=options['chamas'])
+        names = dict(chamas.values_list('id', 'name'))
+        if not names:
+            self.stdout.write('No chamas to verify')
+            return
+
+        if options['backfill']:
+            for result in run_parallel('backfill', list(names), options['workers']):
+                self.stdout.write(f"{names[result['chama_id']]}: chained {result['rows']:,} rows")
+
+        started = time.perf_counter()
+        total_rows = 0
+        failures = []
+        results = run_parallel(
+            'verify', list(names), options['workers'],
+            full=options['full'], checkpoint_every=options['checkpoint_every'], max_rows=options['max_rows'],
+        )
+        for result in results:
+            name = names[result['chama_id']]
+            seconds = result['seconds']
+            total_rows += result['rows']
+            rate = result['rows'] / seconds if seconds else 0
+            line = (
+                f"{name}: {result['rows']:,} rows (to row {result['last_seq']}) "
+                f"in {seconds:.1f}s, {rate:,.0f} rows/s"
+            )
+            if result.get('unchained'):
+                line += f"; {result['unchained']:,} rows not chained yet (run with --backfill)"
+            if result['error']:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{line}: {result['error']}"))
+            else:
+                self.stdout.write(line)
+
+        if failures:
+            raise CommandError(f"Ledger verification failed for {', '.join(failures)}")
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Verified {total_rows:,} rows across {len(names)} chamas in {elapsed:.1f}s "
+            f"({total_rows / elapsed:,.0f} rows/s)"
+        ))
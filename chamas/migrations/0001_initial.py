@@ -0,0 +1,92 @@
+# Generated by Django 5.2.8 on 2026-10-18 22:07
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Chama',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=150)),
+                ('contribution_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Chama',
+                'verbose_name_plural': 'Chamas',
+                'db_table': 'chama',
+            },
+        ),
+        migrations.CreateModel(
+            name='Meeting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scheduled_for', models.DateTimeField()),
+                ('location', models.CharField(blank=True, max_length=200)),
+                ('agenda', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meetings', to='chamas.chama')),
+            ],
+            options={
+                'verbose_name': 'Meeting',
+                'verbose_name_plural': 'Meetings',
+                'db_table': 'chama_meeting',
+                'ordering': ('scheduled_for',),
+                'indexes': [models.Index(fields=['chama', 'scheduled_for'], name='chama_meeti_chama_i_5831df_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Membership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=True)),
+                ('joined_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='chamas.chama')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Membership',
+                'verbose_name_plural': 'Memberships',
+                'db_table': 'chama_membership',
+                'indexes': [models.Index(fields=['user', 'is_active'], name='chama_membe_user_id_75e508_idx')],
+                'constraints': [models.UniqueConstraint(fields=('chama', 'user'), name='unique_chama_membership')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Transaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(choices=[('contribution', 'Contribution'), ('loan_disbursement', 'Loan disbursement'), ('loan_payment', 'Loan payment'), ('fine_payment', 'Fine payment'), ('payout', 'Payout'), ('withdrawal', 'Withdrawal')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed'), ('reversed', 'Reversed')], default='completed', max_length=10)),
+                ('reference', models.CharField(blank=True, max_length=50)),
+                ('posted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to='chamas.chama')),
+                ('member', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Transaction',
+                'verbose_name_plural': 'Transactions',
+                'db_table': 'chama_transaction',
+                'indexes': [models.Index(fields=['chama', 'posted_at'], name='chama_trans_chama_i_990ca6_idx'), models.Index(fields=['member', 'posted_at'], name='chama_trans_member__324409_idx')],
+            },
+        ),
+    ]
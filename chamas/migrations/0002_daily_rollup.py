@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 22:08
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('inflow_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('outflow_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('contribution_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('loans_disbursed', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('loans_repaid', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='chamas.chama')),
+            ],
+            options={
+                'verbose_name': 'Daily Rollup',
+                'verbose_name_plural': 'Daily Rollups',
+                'db_table': 'chama_daily_rollup',
+                'constraints': [models.UniqueConstraint(fields=('chama', 'day'), name='unique_chama_daily_rollup')],
+            },
+        ),
+    ]
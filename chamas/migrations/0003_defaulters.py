@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 22:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0002_daily_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chama',
+            name='contribution_interval_days',
+            field=models.PositiveSmallIntegerField(default=30, help_text='Days between expected contributions'),
+        ),
+        migrations.CreateModel(
+            name='Defaulter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('paid_amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('amount_due', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('days_overdue', models.IntegerField()),
+                ('last_contribution', models.DateTimeField(blank=True, null=True)),
+                ('rank', models.IntegerField(help_text='1 = largest arrears in the chama')),
+                ('computed_at', models.DateTimeField()),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='defaulters', to='chamas.chama')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='defaults', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Defaulter',
+                'verbose_name_plural': 'Defaulters',
+                'db_table': 'chama_defaulter',
+                'indexes': [models.Index(fields=['chama', 'rank'], name='chama_defau_chama_i_9c5fc0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('chama', 'member'), name='unique_chama_defaulter')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 22:14
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0003_defaulters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Loan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('principal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('interest_method', models.CharField(choices=[('flat', 'Flat rate'), ('reducing_balance', 'Reducing balance'), ('custom', 'Custom interest')], default='flat', max_length=20)),
+                ('interest_rate', models.DecimalField(decimal_places=4, default=Decimal('0'), help_text='Percent charged per installment period', max_digits=7)),
+                ('custom_interest', models.DecimalField(blank=True, decimal_places=2, help_text='Total interest for custom loans, spread evenly across installments', max_digits=12, null=True)),
+                ('installments', models.PositiveSmallIntegerField()),
+                ('interval_days', models.PositiveSmallIntegerField(default=30)),
+                ('purpose', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending approval'), ('active', 'Active'), ('repaid', 'Repaid'), ('defaulted', 'Defaulted'), ('rejected', 'Rejected')], default='pending', max_length=10)),
+                ('disbursed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='loans', to='chamas.chama')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='loans', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Loan',
+                'verbose_name_plural': 'Loans',
+                'db_table': 'chama_loan',
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='loan',
+            field=models.ForeignKey(blank=True, help_text='The loan a disbursement or repayment belongs to', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to='chamas.loan'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['chama', 'status'], name='chama_loan_chama_i_11be5a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['member', 'status'], name='chama_loan_member__66cb20_idx'),
+        ),
+    ]
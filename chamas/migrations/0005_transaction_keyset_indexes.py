@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 22:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0004_loans'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='chama_trans_chama_i_990ca6_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='chama_trans_member__324409_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['chama', 'posted_at', 'id'], name='chama_trans_chama_i_9491ea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['member', 'posted_at', 'id'], name='chama_trans_member__5df369_idx'),
+        ),
+    ]
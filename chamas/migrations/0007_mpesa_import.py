@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-18 22:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0006_bulk_contributions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatementImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('rows_read', models.IntegerField(default=0)),
+                ('rows_imported', models.IntegerField(default=0)),
+                ('duplicates', models.IntegerField(default=0)),
+                ('rows_skipped', models.IntegerField(default=0, help_text='Withdrawals, failed or malformed rows')),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statement_imports', to='chamas.chama')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='statement_imports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Statement Import',
+                'verbose_name_plural': 'Statement Imports',
+                'db_table': 'mpesa_statement_import',
+            },
+        ),
+        migrations.CreateModel(
+            name='MpesaPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('receipt', models.CharField(help_text='M-Pesa receipt code, upper case', max_length=12, unique=True)),
+                ('completed_at', models.DateTimeField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('phone_number', models.CharField(blank=True, help_text='Payer phone, 2547XXXXXXXX form', max_length=15)),
+                ('payer_name', models.CharField(blank=True, max_length=150)),
+                ('account_reference', models.CharField(blank=True, max_length=50)),
+                ('details', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('unmatched', 'Unmatched'), ('matched', 'Matched'), ('review', 'Needs review'), ('ignored', 'Ignored')], default='unmatched', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mpesa_payments', to='chamas.chama')),
+                ('statement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to='chamas.statementimport')),
+            ],
+            options={
+                'verbose_name': 'M-Pesa Payment',
+                'verbose_name_plural': 'M-Pesa Payments',
+                'db_table': 'mpesa_payment',
+                'indexes': [models.Index(fields=['chama', 'status', 'completed_at'], name='mpesa_payme_chama_i_6a2368_idx')],
+            },
+        ),
+    ]
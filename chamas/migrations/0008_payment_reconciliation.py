@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 22:28
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0007_mpesa_import'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mpesapayment',
+            name='candidates',
+            field=models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Possible matches offered to the treasurer for review'),
+        ),
+        migrations.AddField(
+            model_name='mpesapayment',
+            name='member',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mpesa_payments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='mpesapayment',
+            name='reconciled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mpesapayment',
+            name='review_reason',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='mpesapayment',
+            name='transaction',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mpesa_payment', to='chamas.transaction'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 22:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0008_payment_reconciliation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RotationSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cycle', models.PositiveIntegerField()),
+                ('position', models.PositiveIntegerField()),
+                ('total_positions', models.PositiveIntegerField(help_text='Slots in this cycle, stored for single-row lookups')),
+                ('scheduled_for', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rotation_slots', to='chamas.chama')),
+                ('meeting', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rotation_slots', to='chamas.meeting')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rotation_slots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Rotation Slot',
+                'verbose_name_plural': 'Rotation Slots',
+                'db_table': 'chama_rotation_slot',
+                'indexes': [models.Index(fields=['chama', 'member', 'cycle'], name='chama_rotat_chama_i_c1ad7d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('chama', 'cycle', 'position'), name='unique_rotation_position')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-18 22:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0009_rotation_slots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report', models.CharField(choices=[('statement', 'Member statement'), ('group', 'Group report')], max_length=10)),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('pdf', 'PDF')], default='csv', max_length=4)),
+                ('date_from', models.DateField(blank=True, null=True)),
+                ('date_to', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('file', models.FileField(blank=True, upload_to='exports/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='chamas.chama')),
+                ('member', models.ForeignKey(blank=True, help_text='Member whose statement is exported', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='statement_exports', to=settings.AUTH_USER_MODEL)),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Export Job',
+                'verbose_name_plural': 'Export Jobs',
+                'db_table': 'chama_export_job',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='chama_expor_status_10b757_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0010_export_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['chama', 'transaction_type', 'status', 'posted_at', 'member', 'amount'], name='chama_trans_chama_i_120f59_idx'),
+        ),
+    ]
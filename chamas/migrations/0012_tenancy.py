@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0011_transaction_analytics_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='loan',
+            name='chama_loan_member__66cb20_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='chama_trans_member__5df369_idx',
+        ),
+        migrations.AddField(
+            model_name='membership',
+            name='role',
+            field=models.CharField(choices=[('member', 'Member'), ('treasurer', 'Treasurer')], default='member', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='exportjob',
+            index=models.Index(fields=['chama', 'requested_by', 'created_at'], name='chama_expor_chama_i_673829_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['chama', 'member', 'status'], name='chama_loan_chama_i_57b98d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['chama', 'is_active', 'joined_at'], name='chama_membe_chama_i_bf2a4e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statementimport',
+            index=models.Index(fields=['chama', 'started_at'], name='mpesa_state_chama_i_9459dc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['chama', 'member', 'posted_at', 'id'], name='chama_trans_chama_i_41018f_idx'),
+        ),
+    ]
@@ -0,0 +1,141 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def partition_ledger(apps, schema_editor):
+    """
+    Turn chama_transaction into a table partitioned by month on PostgreSQL.
+
+    The existing table becomes the first partition, so no rows are copied.
+    Its primary key, indexes and foreign keys move to the parent. The
+    primary key becomes (id, posted_at), because PostgreSQL requires unique
+    keys to include the partition key. Nothing can reference a single
+    ledger row with a database foreign key after this, which is why
+    mpesa_payment.transaction_id loses its constraint first.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    table = 'chama_transaction'
+    legacy = f'{table}_legacy'
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [table])
+        if cursor.fetchone():
+            return
+
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_indexdef(i.indexrelid)
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = %s::regclass AND NOT i.indisprimary
+            """,
+            [table],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [table]
+        )
+        primary_key = cursor.fetchone()[0]
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {table}')
+        next_id = cursor.fetchone()[0]
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, 'id'])
+        sequence = cursor.fetchone()[0]
+
+        for name, _ in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+        # The parent takes over the id sequence
+        cursor.execute(f'ALTER TABLE {table} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+        cursor.execute(f'ALTER TABLE {table} ALTER COLUMN id DROP DEFAULT')
+        if sequence:
+            cursor.execute(f'DROP SEQUENCE IF EXISTS {sequence}')
+
+        # Free the names the parent's index and constraints will use
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX "{name}" RENAME TO "{name[:52]}_legacy"')
+        cursor.execute(f'ALTER TABLE {table} RENAME CONSTRAINT "{primary_key}" TO "{legacy}_pkey"')
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            'PARTITION BY RANGE (posted_at)'
+        )
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT "{primary_key}" PRIMARY KEY (id, posted_at)')
+        cursor.execute(f'CREATE SEQUENCE {table}_id_seq START {next_id} OWNED BY {table}.id')
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')")
+
+        # Everything so far stays in the legacy partition; later months get their own
+        cursor.execute("SELECT date_trunc('month', now()) + interval '1 month'")
+        upper = cursor.fetchone()[0]
+        cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO (%s)', [upper])
+        cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+        # Recreated on the parent, the indexes adopt the legacy partition's
+        # matching ones instead of building new ones
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0012_tenancy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mpesapayment',
+            name='transaction',
+            field=models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mpesa_payment', to='chamas.transaction'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(choices=[('contribution', 'Contribution'), ('loan_disbursement', 'Loan disbursement'), ('loan_payment', 'Loan payment'), ('fine_payment', 'Fine payment'), ('payout', 'Payout'), ('withdrawal', 'Withdrawal')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('row_count', models.IntegerField()),
+                ('last_posted_at', models.DateTimeField()),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_totals', to='chamas.chama')),
+                ('loan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_totals', to='chamas.loan')),
+                ('member', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived Total',
+                'verbose_name_plural': 'Archived Totals',
+                'db_table': 'chama_archived_total',
+                'indexes': [models.Index(fields=['chama', 'member', 'transaction_type'], name='chama_archi_chama_i_236156_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month the rows were posted in')),
+                ('first_posted_at', models.DateTimeField()),
+                ('last_posted_at', models.DateTimeField()),
+                ('row_count', models.IntegerField()),
+                ('raw_bytes', models.IntegerField(help_text='Size of the columns before compression')),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ledger_archives', to='chamas.chama')),
+            ],
+            options={
+                'verbose_name': 'Ledger Archive',
+                'verbose_name_plural': 'Ledger Archives',
+                'db_table': 'chama_ledger_archive',
+                'indexes': [models.Index(fields=['chama', 'first_posted_at'], name='chama_ledge_chama_i_336562_idx')],
+            },
+        ),
+        migrations.RunPython(partition_ledger, migrations.RunPython.noop),
+    ]
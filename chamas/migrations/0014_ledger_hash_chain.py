@@ -0,0 +1,82 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0013_ledger_partitions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.BigIntegerField()),
+                ('hash', models.CharField(max_length=64)),
+                ('rows_verified', models.BigIntegerField(help_text='Rows checked by the run so far')),
+                ('full', models.BooleanField(default=False, help_text='Written by a run that started from the first row')),
+                ('verified_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Ledger Checkpoint',
+                'verbose_name_plural': 'Ledger Checkpoints',
+                'db_table': 'chama_ledger_checkpoint',
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerHead',
+            fields=[
+                ('chama', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger_head', serialize=False, to='chamas.chama')),
+                ('seq', models.BigIntegerField(default=0)),
+                ('hash', models.CharField(max_length=64)),
+            ],
+            options={
+                'verbose_name': 'Ledger Head',
+                'verbose_name_plural': 'Ledger Heads',
+                'db_table': 'chama_ledger_head',
+            },
+        ),
+        migrations.AddField(
+            model_name='ledgerarchive',
+            name='first_seq',
+            field=models.BigIntegerField(blank=True, help_text='Lowest hash chain position in the chunk', null=True),
+        ),
+        migrations.AddField(
+            model_name='ledgerarchive',
+            name='last_seq',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='chain_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='chain_seq',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='Position in the chama chain', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerarchive',
+            index=models.Index(fields=['chama', 'last_seq'], name='chama_ledge_chama_i_6c9da7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['chama', 'chain_seq'], name='chama_trans_chama_i_339fd7_idx'),
+        ),
+        migrations.AddField(
+            model_name='ledgercheckpoint',
+            name='chama',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_checkpoints', to='chamas.chama'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgercheckpoint',
+            index=models.Index(fields=['chama', 'seq'], name='chama_ledge_chama_i_c99a80_idx'),
+        ),
+    ]
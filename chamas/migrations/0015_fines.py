@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0014_ledger_hash_chain'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chama',
+            name='fine_grace_days',
+            field=models.PositiveSmallIntegerField(default=3, help_text='Days late before a fine is charged'),
+        ),
+        migrations.AddField(
+            model_name='chama',
+            name='late_contribution_fine',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), help_text='Charged per missed contribution; 0 disables', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='chama',
+            name='late_repayment_fine',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), help_text='Charged per missed loan installment; 0 disables', max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='Fine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('late_contribution', 'Late contribution'), ('late_repayment', 'Late loan repayment')], max_length=20)),
+                ('period', models.PositiveIntegerField(help_text='The contribution period or loan installment missed')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('status', models.CharField(choices=[('unpaid', 'Unpaid'), ('paid', 'Paid'), ('waived', 'Waived')], default='unpaid', max_length=10)),
+                ('due_at', models.DateTimeField(help_text='When the missed payment fell due')),
+                ('accrued_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fines', to='chamas.chama')),
+                ('loan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fines', to='chamas.loan')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fines', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Fine',
+                'verbose_name_plural': 'Fines',
+                'db_table': 'chama_fine',
+                'indexes': [models.Index(fields=['chama', 'status'], name='chama_fine_chama_i_79faa6_idx'), models.Index(fields=['accrued_at'], name='chama_fine_accrued_412b8f_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('reason', 'late_contribution')), fields=('chama', 'member', 'period'), name='unique_late_contribution_fine'), models.UniqueConstraint(condition=models.Q(('reason', 'late_repayment')), fields=('loan', 'period'), name='unique_late_repayment_fine')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 02:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0015_fines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='What the message is about; queued once per chama', max_length=100)),
+                ('subject', models.CharField(max_length=200)),
+                ('body', models.TextField(help_text='May use {first_name} and {chama}')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('progress', models.JSONField(blank=True, default=dict, help_text='Last user sent to, per channel')),
+                ('sent', models.JSONField(blank=True, default=dict, help_text='Messages sent, per channel')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, help_text='Last progress by the sending worker', null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('chama', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_runs', to='chamas.chama')),
+            ],
+            options={
+                'verbose_name': 'Notification Run',
+                'verbose_name_plural': 'Notification Runs',
+                'db_table': 'chama_notification_run',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='chama_notif_status_b7a07d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('chama', 'key'), name='unique_chama_notification')],
+            },
+        ),
+    ]
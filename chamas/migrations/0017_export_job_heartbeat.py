@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chamas', '0016_notification_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last progress by the rendering worker', null=True),
+        ),
+    ]
@@ -0,0 +1,661 @@
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
+
+from .integrity import LedgerManager, chain_rows
+from .tenancy import TenantManager
+
+class Chama(models.Model):
+    """A savings group whose members contribute into a shared pool"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=150)
+    contribution_amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
+    contribution_interval_days = models.PositiveSmallIntegerField(
+        default=30, help_text='Days between expected contributions'
+    )
+    late_contribution_fine = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal('0'), help_text='Charged per missed contribution; 0 disables'
+    )
+    late_repayment_fine = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal('0'),
+        help_text='Charged per missed loan installment; 0 disables'
+    )
+    fine_grace_days = models.PositiveSmallIntegerField(default=3, help_text='Days late before a fine is charged')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'chama'
+        verbose_name = 'Chama'
+        verbose_name_plural = 'Chamas'
+
+    def __str__(self):
+        return self.name
+
+class Membership(models.Model):
+    """Links a user to a chama"""
+
+    class Role(models.TextChoices):
+        MEMBER = 'member', 'Member'
+        TREASURER = 'treasurer', 'Treasurer'
+
+    chama = models.ForeignKey(Chama, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='memberships')
+    role = models.CharField(max_length=10, choices=Role.choices, default=Role.MEMBER)
+    is_active = models.BooleanField(default=True)
+    joined_at = models.DateTimeField(default=timezone.now)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_membership'
+        verbose_name = 'Membership'
+        verbose_name_plural = 'Memberships'
+        constraints = [
+            models.UniqueConstraint(fields=['chama', 'user'], name='unique_chama_membership'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'is_active']),
+            models.Index(fields=['chama', 'is_active', 'joined_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user} in {self.chama}"
+
+class Meeting(models.Model):
+    """A scheduled chama meeting"""
+    chama = models.ForeignKey(Chama, on_delete=models.CASCADE, related_name='meetings')
+    scheduled_for = models.DateTimeField()
+    location = models.CharField(max_length=200, blank=True)
+    agenda = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_meeting'
+        verbose_name = 'Meeting'
+        verbose_name_plural = 'Meetings'
+        ordering = ('scheduled_for',)
+        indexes = [
+            models.Index(fields=['chama', 'scheduled_for']),
+        ]
+
+    def __str__(self):
+        return f"{self.chama} meeting on {self.scheduled_for:%Y-%m-%d}"
+
+class Transaction(models.Model):
+    """Append-only ledger entry for money moving in or out of a chama"""
+
+    class Type(models.TextChoices):
+        CONTRIBUTION = 'contribution', 'Contribution'
+        LOAN_DISBURSEMENT = 'loan_disbursement', 'Loan disbursement'
+        LOAN_PAYMENT = 'loan_payment', 'Loan payment'
+        FINE_PAYMENT = 'fine_payment', 'Fine payment'
+        PAYOUT = 'payout', 'Payout'
+        WITHDRAWAL = 'withdrawal', 'Withdrawal'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+        REVERSED = 'reversed', 'Reversed'
+
+    # Money flowing into the group pool; everything else flows out
+    INFLOW_TYPES = (Type.CONTRIBUTION, Type.LOAN_PAYMENT, Type.FINE_PAYMENT)
+
+    chama = models.ForeignKey(Chama, on_delete=models.PROTECT, related_name='transactions')
+    member = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.PROTECT,
+        related_name='transactions', null=True, blank=True
+    )
+    loan = models.ForeignKey(
+        'Loan', on_delete=models.PROTECT, related_name='transactions', null=True, blank=True,
+        help_text='The loan a disbursement or repayment belongs to'
+    )
+    meeting = models.ForeignKey(
+        Meeting, on_delete=models.SET_NULL, related_name='transactions', null=True, blank=True,
+        help_text='The meeting the transaction was recorded at'
+    )
+    transaction_type = models.CharField(max_length=20, choices=Type.choices)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    description = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.COMPLETED)
+    reference = models.CharField(max_length=50, blank=True)
+
+    posted_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Hash chain (see chamas.integrity)
+    chain_seq = models.BigIntegerField(null=True, blank=True, editable=False, help_text='Position in the chama chain')
+    chain_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    objects = LedgerManager()
+
+    class Meta:
+        db_table = 'chama_transaction'
+        verbose_name = 'Transaction'
+        verbose_name_plural = 'Transactions'
+        indexes = [
+            # Keyset pagination walks (posted_at, id) within a chama or one member's rows in it
+            models.Index(fields=['chama', 'posted_at', 'id']),
+            models.Index(fields=['chama', 'member', 'posted_at', 'id']),
+            # Covers contribution analytics: the scan never touches the table
+            models.Index(fields=['chama', 'transaction_type', 'status', 'posted_at', 'member', 'amount']),
+            # Verification walks each chama's chain in order
+            models.Index(fields=['chama', 'chain_seq']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_transaction_type_display()} of {self.amount} ({self.chama})"
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.chain_seq is None:
+            with transaction.atomic(using=kwargs.get('using')):
+                chain_rows([self])
+                return super().save(*args, **kwargs)
+        return super().save(*args, **kwargs)
+
+    @property
+    def is_inflow(self):
+        return self.transaction_type in self.INFLOW_TYPES
+
+class Loan(models.Model):
+    """A loan from the chama pool to a member, repaid in fixed installments"""
+
+    class Method(models.TextChoices):
+        FLAT = 'flat', 'Flat rate'
+        REDUCING_BALANCE = 'reducing_balance', 'Reducing balance'
+        CUSTOM = 'custom', 'Custom interest'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending approval'
+        ACTIVE = 'active', 'Active'
+        REPAID = 'repaid', 'Repaid'
+        DEFAULTED = 'defaulted', 'Defaulted'
+        REJECTED = 'rejected', 'Rejected'
+
+    chama = models.ForeignKey(Chama, on_delete=models.PROTECT, related_name='loans')
+    member = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name='loans')
+
+    principal = models.DecimalField(max_digits=12, decimal_places=2)
+    interest_method = models.CharField(max_length=20, choices=Method.choices, default=Method.FLAT)
+    interest_rate = models.DecimalField(
+        max_digits=7, decimal_places=4, default=Decimal('0'),
+        help_text='Percent charged per installment period'
+    )
+    custom_interest = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True,
+        help_text='Total interest for custom loans, spread evenly across installments'
+    )
+    installments = models.PositiveSmallIntegerField()
+    interval_days = models.PositiveSmallIntegerField(default=30)
+    purpose = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    disbursed_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_loan'
+        verbose_name = 'Loan'
+        verbose_name_plural = 'Loans'
+        indexes = [
+            models.Index(fields=['chama', 'status']),
+            models.Index(fields=['chama', 'member', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_interest_method_display()} loan of {self.principal} to {self.member}"
+
+class DailyRollup(models.Model):
+    """Per-chama, per-day ledger aggregates maintained as transactions post"""
+    chama = models.ForeignKey(Chama, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+
+    # Completed transactions only
+    inflow_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    outflow_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    contribution_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    loans_disbursed = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    loans_repaid = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    transaction_count = models.IntegerField(default=0)
+
+    pending_count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_daily_rollup'
+        verbose_name = 'Daily Rollup'
+        verbose_name_plural = 'Daily Rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['chama', 'day'], name='unique_chama_daily_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.chama} on {self.day}"
+
+class Defaulter(models.Model):
+    """Members behind on contributions, refreshed by chamas.defaulters"""
+    chama = models.ForeignKey(Chama, on_delete=models.CASCADE, related_name='defaulters')
+    member = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='defaults')
+
+    expected_amount = models.DecimalField(max_digits=14, decimal_places=2)
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2)
+    amount_due = models.DecimalField(max_digits=14, decimal_places=2)
+    days_overdue = models.IntegerField()
+    last_contribution = models.DateTimeField(null=True, blank=True)
+    rank = models.IntegerField(help_text='1 = largest arrears in the chama')
+
+    computed_at = models.DateTimeField()
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_defaulter'
+        verbose_name = 'Defaulter'
+        verbose_name_plural = 'Defaulters'
+        constraints = [
+            models.UniqueConstraint(fields=['chama', 'member'], name='unique_chama_defaulter'),
+        ]
+        indexes = [
+            models.Index(fields=['chama', 'rank']),
+        ]
+
+    def __str__(self):
+        return f"{self.member} owes {self.amount_due} to {self.chama}"
+
+class Fine(models.Model):
+    """A fine for one missed contribution or loan installment, accrued by chamas.fines"""
+
+    class Reason(models.TextChoices):
+        LATE_CONTRIBUTION = 'late_contribution', 'Late contribution'
+        LATE_REPAYMENT = 'late_repayment', 'Late loan repayment'
+
+    class Status(models.TextChoices):
+        UNPAID = 'unpaid', 'Unpaid'
+        PAID = 'paid', 'Paid'
+        WAIVED = 'waived', 'Waived'
+
+    chama = models.ForeignKey(Chama, on_delete=models.CASCADE, related_name='fines')
+    member = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='fines')
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='fines', null=True, blank=True)
+    reason = models.CharField(max_length=20, choices=Reason.choices)
+    period = models.PositiveIntegerField(help_text='The contribution period or loan installment missed')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.UNPAID)
+    due_at = models.DateTimeField(help_text='When the missed payment fell due')
+    accrued_at = models.DateTimeField(default=timezone.now)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_fine'
+        verbose_name = 'Fine'
+        verbose_name_plural = 'Fines'
+        # One fine per missed obligation, so accrual can rerun safely
+        constraints = [
+            models.UniqueConstraint(
+                fields=['chama', 'member', 'period'],
+                condition=models.Q(reason='late_contribution'),
+                name='unique_late_contribution_fine',
+            ),
+            models.UniqueConstraint(
+                fields=['loan', 'period'],
+                condition=models.Q(reason='late_repayment'),
+                name='unique_late_repayment_fine',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['chama', 'status']),
+            models.Index(fields=['accrued_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_reason_display()} fine of {self.amount} for {self.member}"
+
+class IdempotencyKey(models.Model):
+    """Stored response for a client-supplied Idempotency-Key"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=100)
+    scope = models.CharField(max_length=50, help_text='The endpoint the key was used on')
+    request_hash = models.CharField(max_length=64)
+
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'idempotency_key'
+        verbose_name = 'Idempotency Key'
+        verbose_name_plural = 'Idempotency Keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
+
+class StatementImport(models.Model):
+    """One M-Pesa statement file imported into a chama"""
+
+    class Status(models.TextChoices):
+        RUNNING = 'running', 'Running'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+
+    chama = models.ForeignKey(Chama, on_delete=models.CASCADE, related_name='statement_imports')
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='statement_imports'
+    )
+    filename = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.RUNNING)
+
+    rows_read = models.IntegerField(default=0)
+    rows_imported = models.IntegerField(default=0)
+    duplicates = models.IntegerField(default=0)
+    rows_skipped = models.IntegerField(default=0, help_text='Withdrawals, failed or malformed rows')
+    error = models.TextField(blank=True)
+
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'mpesa_statement_import'
+        verbose_name = 'Statement Import'
+        verbose_name_plural = 'Statement Imports'
+        indexes = [
+            models.Index(fields=['chama', 'started_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.chama})"
+
+class MpesaPayment(models.Model):
+    """A payment received by M-Pesa, imported from a statement"""
+
+    class Status(models.TextChoices):
+        UNMATCHED = 'unmatched', 'Unmatched'
+        MATCHED = 'matched', 'Matched'
+        REVIEW = 'review', 'Needs review'
+        IGNORED = 'ignored', 'Ignored'
+
+    chama = models.ForeignKey(Chama, on_delete=models.CASCADE, related_name='mpesa_payments')
+    statement = models.ForeignKey(
+        StatementImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='payments'
+    )
+    receipt = models.CharField(max_length=12, unique=True, help_text='M-Pesa receipt code, upper case')
+    completed_at = models.DateTimeField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    phone_number = models.CharField(max_length=15, blank=True, help_text='Payer phone, 2547XXXXXXXX form')
+    payer_name = models.CharField(max_length=150, blank=True)
+    account_reference = models.CharField(max_length=50, blank=True)
+    details = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.UNMATCHED)
+
+    # Reconciliation
+    member = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='mpesa_payments'
+    )
+    # On PostgreSQL the ledger is partitioned and its primary key includes
+    # posted_at, so the database cannot enforce a key to a single row
+    transaction = models.OneToOneField(
+        Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='mpesa_payment',
+        db_constraint=False,
+    )
+    review_reason = models.CharField(max_length=255, blank=True)
+    candidates = models.JSONField(
+        default=list, blank=True, encoder=DjangoJSONEncoder,
+        help_text='Possible matches offered to the treasurer for review'
+    )
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'mpesa_payment'
+        verbose_name = 'M-Pesa Payment'
+        verbose_name_plural = 'M-Pesa Payments'
+        indexes = [
+            models.Index(fields=['chama', 'status', 'completed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.receipt}: {self.amount} from {self.phone_number or self.payer_name}"
+
+class RotationSlot(models.Model):
+    """One member's turn to receive the pot in a merry-go-round cycle"""
+    chama = models.ForeignKey(Chama, on_delete=models.CASCADE, related_name='rotation_slots')
+    cycle = models.PositiveIntegerField()
+    position = models.PositiveIntegerField()
+    total_positions = models.PositiveIntegerField(help_text='Slots in this cycle, stored for single-row lookups')
+    member = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='rotation_slots')
+    meeting = models.ForeignKey(
+        Meeting, on_delete=models.SET_NULL, null=True, blank=True, related_name='rotation_slots'
+    )
+    scheduled_for = models.DateTimeField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_rotation_slot'
+        verbose_name = 'Rotation Slot'
+        verbose_name_plural = 'Rotation Slots'
+        constraints = [
+            models.UniqueConstraint(fields=['chama', 'cycle', 'position'], name='unique_rotation_position'),
+        ]
+        indexes = [
+            models.Index(fields=['chama', 'member', 'cycle']),
+        ]
+
+    def __str__(self):
+        return f"{self.chama} cycle {self.cycle} #{self.position}: {self.member}"
+
+class ExportJob(models.Model):
+    """A report export rendered to a file in the background"""
+
+    class Report(models.TextChoices):
+        STATEMENT = 'statement', 'Member statement'
+        GROUP = 'group', 'Group report'
+
+    class Format(models.TextChoices):
+        CSV = 'csv', 'CSV'
+        PDF = 'pdf', 'PDF'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+
+    chama = models.ForeignKey(Chama, on_delete=models.CASCADE, related_name='export_jobs')
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='export_jobs'
+    )
+    report = models.CharField(max_length=10, choices=Report.choices)
+    file_format = models.CharField(max_length=4, choices=Format.choices, default=Format.CSV)
+    member = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='statement_exports', help_text='Member whose statement is exported'
+    )
+    date_from = models.DateField(null=True, blank=True)
+    date_to = models.DateField(null=True, blank=True)
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    file = models.FileField(upload_to='exports/', blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text='Last progress by the rendering worker')
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_export_job'
+        verbose_name = 'Export Job'
+        verbose_name_plural = 'Export Jobs'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['chama', 'requested_by', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_report_display()} ({self.file_format}) for {self.chama}"
+
+class NotificationRun(models.Model):
+    """One message fanned out to every active member of a chama (see chamas.notifications)"""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        SENDING = 'sending', 'Sending'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+
+    chama = models.ForeignKey(Chama, on_delete=models.CASCADE, related_name='notification_runs')
+    key = models.CharField(max_length=100, help_text='What the message is about; queued once per chama')
+    subject = models.CharField(max_length=200)
+    body = models.TextField(help_text='May use {first_name} and {chama}')
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    progress = models.JSONField(default=dict, blank=True, help_text='Last user sent to, per channel')
+    sent = models.JSONField(default=dict, blank=True, help_text='Messages sent, per channel')
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text='Last progress by the sending worker')
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_notification_run'
+        verbose_name = 'Notification Run'
+        verbose_name_plural = 'Notification Runs'
+        constraints = [
+            models.UniqueConstraint(fields=['chama', 'key'], name='unique_chama_notification'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.key} for {self.chama}"
+
+class LedgerArchive(models.Model):
+    """A compressed chunk of one chama's archived ledger rows (see chamas.archive)"""
+    chama = models.ForeignKey(Chama, on_delete=models.PROTECT, related_name='ledger_archives')
+    month = models.DateField(help_text='First day of the month the rows were posted in')
+    first_posted_at = models.DateTimeField()
+    last_posted_at = models.DateTimeField()
+    first_seq = models.BigIntegerField(null=True, blank=True, help_text='Lowest hash chain position in the chunk')
+    last_seq = models.BigIntegerField(null=True, blank=True)
+    row_count = models.IntegerField()
+    raw_bytes = models.IntegerField(help_text='Size of the columns before compression')
+    data = models.BinaryField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_ledger_archive'
+        verbose_name = 'Ledger Archive'
+        verbose_name_plural = 'Ledger Archives'
+        indexes = [
+            models.Index(fields=['chama', 'first_posted_at']),
+            models.Index(fields=['chama', 'last_seq']),
+        ]
+
+    def __str__(self):
+        return f"{self.row_count} rows of {self.chama} from {self.month:%Y-%m}"
+
+class ArchivedTotal(models.Model):
+    """Sum of archived completed ledger rows per member, loan and type, so balances survive archiving"""
+    chama = models.ForeignKey(Chama, on_delete=models.PROTECT, related_name='archived_totals')
+    member = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name='archived_totals', null=True, blank=True
+    )
+    loan = models.ForeignKey(
+        'Loan', on_delete=models.PROTECT, related_name='archived_totals', null=True, blank=True
+    )
+    transaction_type = models.CharField(max_length=20, choices=Transaction.Type.choices)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    row_count = models.IntegerField()
+    last_posted_at = models.DateTimeField()
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_archived_total'
+        verbose_name = 'Archived Total'
+        verbose_name_plural = 'Archived Totals'
+        indexes = [
+            models.Index(fields=['chama', 'member', 'transaction_type']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_transaction_type_display()} total of {self.amount} ({self.chama})"
+
+class LedgerHead(models.Model):
+    """The end of a chama's ledger hash chain; writers reserve sequence numbers here"""
+    chama = models.OneToOneField(Chama, on_delete=models.CASCADE, primary_key=True, related_name='ledger_head')
+    seq = models.BigIntegerField(default=0)
+    hash = models.CharField(max_length=64)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_ledger_head'
+        verbose_name = 'Ledger Head'
+        verbose_name_plural = 'Ledger Heads'
+
+    def __str__(self):
+        return f"{self.chama} at row {self.seq}"
+
+class LedgerCheckpoint(models.Model):
+    """A chama's chain verified up to ``seq``; verification resumes after the latest one"""
+    chama = models.ForeignKey(Chama, on_delete=models.CASCADE, related_name='ledger_checkpoints')
+    seq = models.BigIntegerField()
+    hash = models.CharField(max_length=64)
+    rows_verified = models.BigIntegerField(help_text='Rows checked by the run so far')
+    full = models.BooleanField(default=False, help_text='Written by a run that started from the first row')
+    verified_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TenantManager()
+
+    class Meta:
+        db_table = 'chama_ledger_checkpoint'
+        verbose_name = 'Ledger Checkpoint'
+        verbose_name_plural = 'Ledger Checkpoints'
+        indexes = [
+            models.Index(fields=['chama', 'seq']),
+        ]
+
+    def __str__(self):
+        return f"{self.chama} verified to row {self.seq}"
@@ -0,0 +1,333 @@
+"""
+Streaming M-Pesa statement import.
+
+Statements are read one row at a time by generators, so memory use stays flat
+however large the file is:
+
+* CSV is decoded incrementally through csv.reader.
+* XLSX worksheets are walked with ElementTree.iterparse, clearing each row
+  once read. Only the workbook's shared-strings table is held in memory;
+  files written with inline strings need none.
+
+Rows are normalized (receipt codes, phone numbers, amounts, timestamps) and
+written in chunks with bulk_create. Receipts are unique in the database, so
+re-importing an overlapping statement only adds the new payments.
+"""
+
+import codecs
+import csv
+import logging
+import zipfile
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from xml.etree.ElementTree import iterparse
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MpesaPayment, StatementImport
+from .utils import normalize_phone, normalize_receipt
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 5000
+
+# Lower-cased header names seen in Safaricom statement exports
+COLUMN_ALIASES = {
+    'receipt': ('receipt no.', 'receipt no', 'receipt', 'transaction id', 'mpesa receipt'),
+    'completed_at': ('completion time', 'transaction date', 'date', 'trans time'),
+    'details': ('details', 'description', 'transaction details'),
+    'status': ('transaction status', 'status'),
+    'paid_in': ('paid in', 'credit', 'amount'),
+    'withdrawn': ('withdrawn', 'withdrawal', 'debit'),
+    'other_party': ('other party info', 'other party', 'sender'),
+    'phone': ('msisdn', 'phone', 'phone number'),
+    'name': ('name', 'customer name', 'payer name'),
+    'account': ('a/c no.', 'a/c no', 'account no', 'account reference', 'bill ref number'),
+}
+
+# Statements often open with a preamble before the header row
+HEADER_SCAN_ROWS = 50
+
+DATE_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%d-%m-%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M',
+    '%m/%d/%Y %H:%M:%S',
+    '%Y%m%d%H%M%S',
+)
+
+EXCEL_EPOCH = datetime(1899, 12, 30)
+
+# Statement timestamps are local time without an offset
+STATEMENT_TIMEZONE = ZoneInfo(getattr(settings, 'MPESA_STATEMENT_TIMEZONE', 'Africa/Nairobi'))
+
+class StatementError(ValueError):
+    """The file is not a statement we can read"""
+
+# ============================================================================
+# Row Readers
+# ============================================================================
+
+def iter_csv_rows(fileobj, encoding='utf-8-sig'):
+    """Yield lists of cell strings from a binary CSV file object"""
+    text = codecs.getreader(encoding)(fileobj, errors='replace')
+    yield from csv.reader(text)
+
+def _column_index(ref):
+    """'AB12' -> 27"""
+    index = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        index = index * 26 + (ord(ch.upper()) - 64)
+    return index - 1
+
+def _shared_strings(archive):
+    try:
+        source = archive.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    strings = []
+    with source:
+        for _, element in iterparse(source):
+            if element.tag.endswith('}si'):
+                strings.append(''.join(node.text or '' for node in element.iter() if node.tag.endswith('}t')))
+                element.clear()
+    return strings
+
+def _first_sheet(archive):
+    names = sorted(
+        name for name in archive.namelist()
+        if name.startswith('xl/worksheets/sheet') and name.endswith('.xml')
+    )
+    if not names:
+        raise StatementError('The workbook has no worksheets')
+    return names[0]
+
+def iter_xlsx_rows(fileobj):
+    """Yield lists of cell strings from the first worksheet of an XLSX file"""
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise StatementError('Not a valid XLSX file')
+
+    with archive:
+        strings = _shared_strings(archive)
+        with archive.open(_first_sheet(archive)) as sheet:
+            row = {}
+            column = 0
+            sheet_data = None
+            for event, element in iterparse(sheet, events=('start', 'end')):
+                tag = element.tag.rsplit('}', 1)[-1]
+                if event == 'start':
+                    if tag == 'sheetData':
+                        sheet_data = element
+                    continue
+                if tag == 'c':
+                    # The cell reference is optional; without one a cell
+                    # follows the previous cell in its row
+                    ref = element.get('r')
+                    if ref:
+                        column = _column_index(ref)
+                    kind = element.get('t')
+                    if kind == 'inlineStr':
+                        value = ''.join(node.text or '' for node in element.iter() if node.tag.endswith('}t'))
+                    else:
+                        node = next((child for child in element if child.tag.endswith('}v')), None)
+                        value = node.text if node is not None else ''
+                        if kind == 's' and value:
+                            value = strings[int(value)]
+                    row[column] = value or ''
+                    column += 1
+                elif tag == 'row':
+                    width = max(row) + 1 if row else 0
+                    yield [row.get(i, '') for i in range(width)]
+                    row = {}
+                    column = 0
+                    # Detach finished rows so the tree never grows
+                    sheet_data.clear()
+
+def iter_rows(fileobj, filename):
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        return iter_xlsx_rows(fileobj)
+    return iter_csv_rows(fileobj)
+
+# ============================================================================
+# Normalization
+# ============================================================================
+
+def _find_header(rows):
+    """Consume rows up to the header; return {field: column index}"""
+    for _ in range(HEADER_SCAN_ROWS):
+        try:
+            row = next(rows)
+        except StopIteration:
+            break
+        cells = [cell.strip().lower() for cell in row]
+        columns = {}
+        for field, aliases in COLUMN_ALIASES.items():
+            for alias in aliases:
+                if alias in cells:
+                    columns[field] = cells.index(alias)
+                    break
+        if 'receipt' in columns and 'completed_at' in columns and 'paid_in' in columns:
+            return columns
+    raise StatementError('Could not find a header row with receipt, completion time and paid-in columns')
+
+def parse_amount(value):
+    value = str(value or '').replace(',', '').replace('KES', '').replace('Ksh', '').strip()
+    if not value:
+        return None
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        return None
+    return amount.quantize(Decimal('0.01')) if amount.is_finite() else None
+
+def parse_timestamp(value):
+    value = str(value or '').strip()
+    if not value:
+        return None
+    moment = None
+    try:
+        # Fast path for the usual ISO-style export
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        for fmt in DATE_FORMATS:
+            try:
+                moment = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+    if moment is None:
+        try:
+            serial = float(value)
+        except ValueError:
+            return None
+        if not 1 <= serial < 100_000:
+            return None
+        # Excel serial date (days since 1899-12-30)
+        moment = EXCEL_EPOCH + timedelta(days=serial)
+    if timezone.is_aware(moment):
+        return moment.replace(microsecond=0)
+    return timezone.make_aware(moment.replace(microsecond=0), STATEMENT_TIMEZONE)
+
+def _split_other_party(value):
+    """'254712345678 - JANE DOE' -> ('254712345678', 'JANE DOE')"""
+    phone, _, name = str(value or '').partition(' - ')
+    if not any(ch.isdigit() for ch in phone):
+        return '', str(value or '').strip()
+    return normalize_phone(phone), name.strip()
+
+def iter_payments(rows):
+    """
+    Yield (payment fields, None) for importable rows or (None, reason) for skipped ones.
+
+    Only completed, paid-in rows are importable.
+    """
+    rows = iter(rows)
+    columns = _find_header(rows)
+
+    def cell(row, field):
+        index = columns.get(field)
+        return row[index].strip() if index is not None and index < len(row) else ''
+
+    for row in rows:
+        if not any(row):
+            continue
+        status = cell(row, 'status').lower()
+        if status and status != 'completed':
+            yield None, 'not completed'
+            continue
+        amount = parse_amount(cell(row, 'paid_in'))
+        if not amount or amount <= 0:
+            yield None, 'not a payment in'
+            continue
+        receipt = normalize_receipt(cell(row, 'receipt'))
+        completed_at = parse_timestamp(cell(row, 'completed_at'))
+        if receipt is None or completed_at is None:
+            yield None, 'malformed'
+            continue
+
+        phone, name = _split_other_party(cell(row, 'other_party'))
+        if cell(row, 'phone'):
+            phone = normalize_phone(cell(row, 'phone'))
+        yield {
+            'receipt': receipt,
+            'completed_at': completed_at,
+            'amount': amount,
+            'phone_number': phone[:15],
+            'payer_name': (cell(row, 'name') or name)[:150],
+            'account_reference': cell(row, 'account')[:50],
+            'details': cell(row, 'details')[:255],
+        }, None
+
+# ============================================================================
+# Import
+# ============================================================================
+
+def _write_chunk(chama_id, statement, chunk):
+    """Insert a chunk of payments; returns (imported, duplicates)"""
+    receipts = {payment['receipt'] for payment in chunk}
+    # Receipts are unique across every chama
+    existing = set(MpesaPayment.objects.unscoped().filter(receipt__in=receipts).values_list('receipt', flat=True))
+    fresh, seen = [], set()
+    for payment in chunk:
+        receipt = payment['receipt']
+        if receipt in existing or receipt in seen:
+            continue
+        seen.add(receipt)
+        fresh.append(MpesaPayment(chama_id=chama_id, statement=statement, **payment))
+    if not fresh:
+        return 0, len(chunk)
+    with transaction.atomic():
+        # ignore_conflicts covers receipts inserted by a concurrent import.
+        # Rows it skips aren't reported, so count what this statement owns
+        MpesaPayment.objects.bulk_create(fresh, ignore_conflicts=True)
+        imported = MpesaPayment.objects.filter(chama_id=chama_id, statement=statement, receipt__in=seen).count()
+    return imported, len(chunk) - imported
+
+def import_statement(chama, fileobj, filename, uploaded_by=None, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Stream a statement file into MpesaPayment rows.
+
+    Each chunk commits on its own, so a failure part-way keeps the chunks
+    already written and a re-run skips them as duplicates. ``progress`` is
+    called with the StatementImport after every chunk.
+    """
+    statement = StatementImport.objects.create(chama=chama, uploaded_by=uploaded_by, filename=filename[:255])
+    chunk = []
+    try:
+        for payment, _ in iter_payments(iter_rows(fileobj, filename)):
+            statement.rows_read += 1
+            if payment is None:
+                statement.rows_skipped += 1
+                continue
+            chunk.append(payment)
+            if len(chunk) >= chunk_size:
+                imported, duplicates = _write_chunk(chama.pk, statement, chunk)
+                statement.rows_imported += imported
+                statement.duplicates += duplicates
+                chunk = []
+                if progress:
+                    progress(statement)
+        if chunk:
+            imported, duplicates = _write_chunk(chama.pk, statement, chunk)
+            statement.rows_imported += imported
+            statement.duplicates += duplicates
+        statement.status = StatementImport.Status.COMPLETED
+    except (StatementError, UnicodeDecodeError, csv.Error) as exc:
+        logger.warning('Statement import %s failed: %s', statement.pk, exc)
+        statement.status = StatementImport.Status.FAILED
+        statement.error = str(exc)
+    except Exception as exc:
+        statement.status = StatementImport.Status.FAILED
+        statement.error = f'Unexpected error: {exc}'
+        raise
+    finally:
+        statement.finished_at = timezone.now()
+        statement.save()
+    return statement
@@ -0,0 +1,326 @@
+"""
+Multi-channel notification fan-out.
+
+A NotificationRun is one message to every active member of a chama, sent
+on each channel the member has switched on in their UserProfile: email,
+SMS or push. Recipients and their preferences are read for the whole chama
+in one query and grouped by channel. Each channel sends in batches through
+its own transport and rate limit (settings.NOTIFICATION_CHANNELS).
+Whichever channel's limit frees up first sends its next batch, so a slow
+channel does not hold up the others.
+
+Every batch moves the run's per-channel checkpoint (the last user id sent
+to) forward. A run that crashed is picked up again after the checkpoint,
+so delivery is at least once: the batch a worker had sent but not yet
+checkpointed when it died is sent again. Each message carries a key unique
+to (run, channel, member) for providers that deduplicate on one. SMTP does
+not: EmailTransport only uses the key as the Message-ID, and a repeated
+email arrives twice.
+
+Subjects and bodies are format templates filled per member with
+``{first_name}`` and ``{chama}``. Text from users (chama names, meeting
+places) must reach them through those keys or be escaped with
+``_literal``, or a brace in it breaks every send.
+"""
+
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Chama, Meeting, Membership, NotificationRun
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ('email', 'sms', 'push')
+
+# UserProfile defaults, for members without a profile row
+PREFERENCE_DEFAULTS = (True, False, True)
+
+RECIPIENT_FETCH_SIZE = 5000
+
+@dataclass(frozen=True)
+class Message:
+    key: str
+    address: str
+    subject: str
+    body: str
+
+# ============================================================================
+# Transports
+# ============================================================================
+
+class Transport:
+    """Sends batches of messages over one channel"""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def send(self, messages):
+        """Deliver a batch; returns how many were accepted"""
+        raise NotImplementedError
+
+class EmailTransport(Transport):
+    """
+    Django's email backend, one connection per batch. The message key
+    becomes the Message-ID; nothing on the way deduplicates on it.
+    """
+
+    def send(self, messages):
+        emails = [
+            EmailMessage(
+                message.subject, message.body, to=[message.address],
+                headers={'Message-ID': f'<{message.key}@chamanexus>'},
+            )
+            for message in messages
+        ]
+        return get_connection(self.options.get('backend')).send_messages(emails) or 0
+
+class LocalTransport(Transport):
+    """
+    Stand-in for an SMS or push provider. Logs messages and keeps them in
+    ``outbox``; keys it has already seen are dropped, as a provider's
+    idempotency check would. It only remembers keys for its own lifetime.
+    """
+    channel = None
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.outbox = []
+        self.seen = set()
+
+    def send(self, messages):
+        accepted = 0
+        for message in messages:
+            if message.key in self.seen:
+                continue
+            self.seen.add(message.key)
+            self.outbox.append(message)
+            accepted += 1
+        logger.debug('Local %s transport accepted %s messages', self.channel, accepted)
+        return accepted
+
+class LocalSMSTransport(LocalTransport):
+    channel = 'sms'
+
+class LocalPushTransport(LocalTransport):
+    channel = 'push'
+
+# ============================================================================
+# Channels
+# ============================================================================
+
+class RateLimiter:
+    """Token bucket: ``rate`` messages a second, in bursts of up to ``burst``"""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_in(self, count):
+        """Seconds until ``count`` messages may go out"""
+        if not self.rate:
+            return 0
+        self._refill()
+        return max(count - self.tokens, 0) / self.rate
+
+    def wait(self, count):
+        """Block until ``count`` messages may go out, and take them from the bucket"""
+        delay = self.ready_in(count)
+        if delay:
+            self.sleep(delay)
+            self._refill()
+        if self.rate:
+            self.tokens -= count
+
+@dataclass
+class Channel:
+    transport: Transport
+    batch_size: int
+    limiter: RateLimiter
+
+def load_channels(config=None):
+    """Build each channel's transport and limiter from NOTIFICATION_CHANNELS"""
+    config = settings.NOTIFICATION_CHANNELS if config is None else config
+    channels = {}
+    for name, options in config.items():
+        transport = options['transport']
+        if isinstance(transport, str):
+            transport = import_string(transport)(**options.get('options', {}))
+        batch_size = options.get('batch_size', 100)
+        channels[name] = Channel(transport, batch_size, RateLimiter(options.get('rate', 0), burst=batch_size))
+    return channels
+
+# ============================================================================
+# Fan-out
+# ============================================================================
+
+def recipients(chama_id):
+    """
+    A chama's active members grouped by channel, in user id order:
+    ``{channel: [(user_id, address, first_name), ...]}``
+    """
+    rows = (
+        Membership.objects.filter(chama_id=chama_id, is_active=True, user__is_active=True)
+        .order_by('user_id')
+        .values_list(
+            'user_id', 'user__email', 'user__phone_number', 'user__first_name',
+            'user__profile__email_notifications', 'user__profile__sms_notifications',
+            'user__profile__push_notifications',
+        )
+    )
+    grouped = {channel: [] for channel in CHANNELS}
+    for user_id, email, phone, first_name, *preferences in rows.iterator(chunk_size=RECIPIENT_FETCH_SIZE):
+        email_on, sms_on, push_on = (
+            default if preference is None else preference
+            for preference, default in zip(preferences, PREFERENCE_DEFAULTS)
+        )
+        if email_on and email:
+            grouped['email'].append((user_id, email, first_name))
+        if sms_on and phone:
+            grouped['sms'].append((user_id, phone, first_name))
+        if push_on:
+            grouped['push'].append((user_id, str(user_id), first_name))
+    return grouped
+
+def _batches(run, channel, people, batch_size, context):
+    """Messages after the channel's checkpoint, a batch at a time"""
+    done = run.progress.get(channel)
+    if done:
+        done = uuid.UUID(done)
+        people = [person for person in people if person[0] > done]
+    for start in range(0, len(people), batch_size):
+        batch = people[start:start + batch_size]
+        yield batch[-1][0], [
+            Message(
+                key=f'{run.pk}-{channel}-{user_id.hex}',
+                address=address,
+                subject=run.subject.format_map(dict(context, first_name=first_name or 'member')),
+                body=run.body.format_map(dict(context, first_name=first_name or 'member')),
+            )
+            for user_id, address, first_name in batch
+        ]
+
+def _claim(run_id):
+    """Mark a run as ours unless another worker is actively sending it"""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS)
+    runs = NotificationRun.objects.unscoped().filter(pk=run_id)
+    return runs.filter(
+        Q(status__in=(NotificationRun.Status.PENDING, NotificationRun.Status.FAILED))
+        | Q(status=NotificationRun.Status.SENDING, heartbeat_at__lt=stale)
+    ).update(status=NotificationRun.Status.SENDING, heartbeat_at=now, error='')
+
+def deliver(run_id, channels=None):
+    """
+    Send whatever a run has not sent yet; safe to call again after a crash.
+
+    Returns the run, or None if it is finished or another worker holds it.
+    """
+    if not _claim(run_id):
+        return None
+    channels = load_channels() if channels is None else channels
+    run = NotificationRun.objects.unscoped().select_related('chama').get(pk=run_id)
+    runs = NotificationRun.objects.unscoped().filter(pk=run.pk)
+    context = {'chama': run.chama.name}
+    try:
+        pending = []
+        for name, people in recipients(run.chama_id).items():
+            if name in channels:
+                batches = _batches(run, name, people, channels[name].batch_size, context)
+                pending.append([name, channels[name], batches, next(batches, None)])
+        pending = [entry for entry in pending if entry[3] is not None]
+        # The channel whose rate limit frees up first sends next
+        while pending:
+            entry = min(pending, key=lambda entry: entry[1].limiter.ready_in(len(entry[3][1])))
+            name, channel, batches, (last_user, messages) = entry
+            channel.limiter.wait(len(messages))
+            channel.transport.send(messages)
+            run.progress[name] = str(last_user)
+            run.sent[name] = run.sent.get(name, 0) + len(messages)
+            runs.update(progress=run.progress, sent=run.sent, heartbeat_at=timezone.now())
+            entry[3] = next(batches, None)
+            if entry[3] is None:
+                pending.remove(entry)
+        run.status = NotificationRun.Status.COMPLETED
+    except Exception as exc:
+        logger.exception('Notification run %s failed', run.pk)
+        run.status = NotificationRun.Status.FAILED
+        run.error = str(exc)
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'error', 'finished_at'])
+    return run
+
+def run_pending(channels=None):
+    """Deliver every unfinished run, oldest first; returns the runs handled"""
+    run_ids = (
+        NotificationRun.objects.unscoped()
+        .exclude(status=NotificationRun.Status.COMPLETED)
+        .order_by('created_at')
+        .values_list('pk', flat=True)
+    )
+    channels = load_channels() if channels is None else channels
+    return [run for run in (deliver(run_id, channels) for run_id in list(run_ids)) if run is not None]
+
+# ============================================================================
+# Messages
+# ============================================================================
+
+def _literal(text):
+    """``text`` escaped for use inside a message template"""
+    return str(text).replace('{', '{{').replace('}', '}}')
+
+def queue(chama_id, key, subject, body):
+    """Queue a message for a chama; the same key is only ever queued once"""
+    run, _ = NotificationRun.objects.get_or_create(
+        chama_id=chama_id, key=key, defaults={'subject': subject, 'body': body}
+    )
+    return run
+
+def queue_meeting_reminders(within=timedelta(hours=24), now=None):
+    """Queue reminders for meetings starting within ``within``"""
+    now = now or timezone.now()
+    meetings = (
+        Meeting.objects.unscoped()
+        .filter(scheduled_for__gte=now, scheduled_for__lt=now + within)
+        .select_related('chama')
+    )
+    runs = []
+    for meeting in meetings:
+        when = timezone.localtime(meeting.scheduled_for)
+        where = f' at {_literal(meeting.location)}' if meeting.location else ''
+        runs.append(queue(
+            meeting.chama_id,
+            f'meeting-reminder:{meeting.pk}',
+            f'{{chama}} meets {when:%a %d %b, %H:%M}',
+            f'Hi {{first_name}}, {{chama}} meets on {when:%A %d %B at %H:%M}{where}.',
+        ))
+    return runs
+
+def queue_payment_due_notices(today=None):
+    """Queue today's contribution reminder for every chama that collects one"""
+    today = today or timezone.localdate()
+    runs = []
+    for chama in Chama.objects.filter(contribution_amount__gt=0):
+        runs.append(queue(
+            chama.pk,
+            f'payment-due:{today.isoformat()}',
+            '{chama} contribution due',
+            f'Hi {{first_name}}, your {{chama}} contribution of KES {chama.contribution_amount:,.0f} is due.',
+        ))
+    return runs
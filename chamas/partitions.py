@@ -0,0 +1,154 @@
+"""
+Monthly partitions of the ledger table.
+
+On PostgreSQL chama_transaction is a declaratively partitioned table, ranged
+on posted_at. Migration 0013 converted the original table into the parent's
+first partition, chama_transaction_legacy, which holds everything up to the
+month the migration ran. Each later month gets its own partition, created
+ahead of time by the create_ledger_partitions command. Rows posted outside
+every partition land in chama_transaction_default, and are moved to their
+month's partition when it is created. Queries on a recent range only touch
+the few partitions it covers, and old months are dropped whole when they
+are archived.
+
+Other databases keep a plain table; every function here is a no-op there.
+"""
+
+from datetime import datetime
+from django.db import connection
+from django.utils import timezone
+
+LEDGER_TABLE = 'chama_transaction'
+DEFAULT_PARTITION = f'{LEDGER_TABLE}_default'
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [LEDGER_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+def month_start(year, month):
+    """Local midnight on the first of a month"""
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return timezone.make_aware(datetime(year, month, 1), timezone.get_current_timezone())
+
+def month_range(year, month):
+    return month_start(year, month), month_start(year, month + 1)
+
+def partition_name(year, month):
+    return f'{LEDGER_TABLE}_p{year:04d}_{month:02d}'
+
+def list_partitions():
+    """``(name, bounds)`` for every partition, in creation order"""
+    if not is_partitioned():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            ORDER BY child.oid
+            """,
+            [LEDGER_TABLE],
+        )
+        return cursor.fetchall()
+
+def _exists(cursor, name):
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+    return cursor.fetchone()[0]
+
+def create_partition(year, month):
+    """
+    Create one month's partition if it is missing; returns True if it was created.
+
+    The table is built detached, any rows for the month that landed in the
+    default partition are moved into it, and then it is attached. Attaching
+    builds the parent's indexes on it.
+    """
+    name = partition_name(year, month)
+    start, end = month_range(year, month)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if _exists(cursor, name):
+            return False
+        cursor.execute(
+            f'CREATE TABLE {quote(name)} (LIKE {quote(LEDGER_TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        if _exists(cursor, DEFAULT_PARTITION):
+            cursor.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {quote(DEFAULT_PARTITION)}
+                    WHERE posted_at >= %s AND posted_at < %s
+                    RETURNING *
+                )
+                INSERT INTO {quote(name)} SELECT * FROM moved
+                """,
+                [start, end],
+            )
+        cursor.execute(
+            f'ALTER TABLE {quote(LEDGER_TABLE)} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+    return True
+
+def ensure_partitions(months_ahead, today=None):
+    """
+    Make sure this month and the next ``months_ahead`` months have partitions.
+
+    Months the legacy partition already covers are skipped. Returns the
+    names of the partitions created.
+    """
+    if not is_partitioned():
+        return []
+    today = today or timezone.localdate()
+    covered_until = legacy_upper_bound()
+    created = []
+    for offset in range(months_ahead + 1):
+        year, month = today.year, today.month + offset
+        start, _ = month_range(year, month)
+        if covered_until is not None and start < covered_until:
+            continue
+        if create_partition(start.year, start.month):
+            created.append(partition_name(start.year, start.month))
+    return created
+
+def legacy_upper_bound():
+    """Where the legacy partition's range ends"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \\(''(.*)''\\)'))[1]::timestamptz
+            FROM pg_class c WHERE c.oid = to_regclass(%s)
+            """,
+            [f'{LEDGER_TABLE}_legacy'],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+def has_partition(year, month):
+    """Whether a month has its own partition"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        return _exists(cursor, partition_name(year, month))
+
+def drop_partition(year, month):
+    """
+    Detach and drop a month's partition; returns True if there was one.
+
+    Callers copy the rows somewhere else first (see archive.archive_month).
+    """
+    name = partition_name(year, month)
+    quote = connection.ops.quote_name
+    if not has_partition(year, month):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {quote(LEDGER_TABLE)} DETACH PARTITION {quote(name)}')
+        cursor.execute(f'DROP TABLE {quote(name)}')
+    return True
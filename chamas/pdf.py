@@ -0,0 +1,101 @@
+"""
+Minimal streaming PDF writer for tabular reports.
+
+Pages are emitted as soon as they fill up, so a report of any length is
+rendered with one page of rows in memory. Only the byte offset of each object
+is kept for the cross-reference table written at the end. Text is set in
+the built-in Courier font, which needs no embedding and keeps columns
+aligned by character count.
+"""
+
+PAGE_WIDTH = 595   # A4 portrait, in points
+PAGE_HEIGHT = 842
+MARGIN = 36
+FONT_SIZE = 7
+LINE_HEIGHT = 9
+CHAR_WIDTH = FONT_SIZE * 0.6   # Courier advance width
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+CHARS_PER_LINE = int((PAGE_WIDTH - 2 * MARGIN) // CHAR_WIDTH)
+
+def _escape(text):
+    text = text.encode('latin-1', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def format_row(values, widths):
+    """Fixed-width line: text left aligned, numbers right aligned, cells truncated"""
+    cells = []
+    for value, width in zip(values, widths):
+        text = ('' if value is None else str(value))[:width]
+        cells.append(text.rjust(width) if _is_amount(text) else text.ljust(width))
+    return ' '.join(cells)[:CHARS_PER_LINE]
+
+def _is_amount(text):
+    return bool(text) and text.lstrip('-').replace('.', '', 1).isdigit()
+
+class PDFStream:
+    """Write objects sequentially while tracking their byte offsets"""
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+
+    def emit(self, data):
+        self.offset += len(data)
+        return data
+
+    def obj(self, number, body):
+        self.offsets[number] = self.offset
+        return self.emit(f'{number} 0 obj\n'.encode() + body + b'\nendobj\n')
+
+def render_table(title, header, widths, rows):
+    """
+    Yield the bytes of a PDF listing ``rows`` under a repeated ``header``.
+
+    ``widths`` are column widths in characters.
+    """
+    pdf = PDFStream()
+    # 1: catalog, 2: page tree (written last), 3: font; pages from 4 on
+    yield pdf.emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    yield pdf.obj(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    yield pdf.obj(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>')
+
+    rule = '-' * min(sum(widths) + len(widths) - 1, CHARS_PER_LINE)
+    heading = [title[:CHARS_PER_LINE], '', format_row(header, widths), rule]
+    page_ids = []
+    next_id = 4
+
+    def page(lines, number):
+        nonlocal next_id
+        text = [f'BT /F1 {FONT_SIZE} Tf {LINE_HEIGHT} TL {MARGIN} {PAGE_HEIGHT - MARGIN} Td']
+        text.extend(f'({_escape(line)}) Tj T*' for line in lines)
+        text.append(f'({_escape(f"Page {number}")}) Tj ET')
+        content = '\n'.join(text).encode('latin-1')
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        page_ids.append(page_id)
+        stream = f'<< /Length {len(content)} >>\nstream\n'.encode() + content + b'\nendstream'
+        page_dict = (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>'
+        )
+        return pdf.obj(content_id, stream) + pdf.obj(page_id, page_dict.encode())
+
+    rows_per_page = LINES_PER_PAGE - len(heading) - 1
+    lines = []
+    for row in rows:
+        lines.append(format_row(row, widths))
+        if len(lines) == rows_per_page:
+            yield page(heading + lines, len(page_ids) + 1)
+            lines = []
+    if lines or not page_ids:
+        yield page(heading + (lines or ['No transactions.']), len(page_ids) + 1)
+
+    kids = ' '.join(f'{page_id} 0 R' for page_id in page_ids)
+    yield pdf.obj(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>'.encode())
+
+    xref_offset = pdf.offset
+    size = next_id
+    entries = [b'0000000000 65535 f \n']
+    entries.extend(f'{pdf.offsets[number]:010d} 00000 n \n'.encode() for number in range(1, size))
+    yield pdf.emit(f'xref\n0 {size}\n'.encode() + b''.join(entries))
+    yield pdf.emit(f'trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n'.encode())
@@ -0,0 +1,10 @@
+from rest_framework import permissions
+
+from .tenancy import is_treasurer
+
+class IsTreasurer(permissions.BasePermission):
+    """
+    Only allow treasurers of the current chama (superusers are treasurers of every chama).
+    """
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and is_treasurer(request.user))
@@ -0,0 +1,367 @@
+"""
+Reconciliation of imported M-Pesa payments against what members owe.
+
+Everything a chama is currently owed (open contribution periods and unpaid
+loan installments) is loaded as a flat list of expectations and indexed in
+dictionaries keyed by (payer phone, amount in cents, due-date bucket). Each
+payment then costs a few dictionary lookups, so a batch reconciles in time
+linear in payments plus expectations rather than their product.
+
+For each payment, oldest first:
+
+* Candidates are the open expectations with the payer's phone and the exact
+  amount, due within ``window_days`` of the payment. If there are none, any
+  open expectation with that phone and amount is considered (arrears paid
+  late, or a period paid early).
+* If every candidate belongs to the same member, kind and loan, the
+  earliest-due one is taken and the payment is matched.
+* Candidates for several members or kinds, or a known member's phone with no
+  expectation of that amount, send the payment to treasurer review with the
+  candidates attached.
+* Payments from phones no member uses stay unmatched.
+
+Payments in review are reconsidered on every run, so they are matched once
+the expectation they pay exists. Matches are written with one bulk_create
+of ledger rows, and outcomes with one UPDATE per outcome plus a bulk_update
+of the fields that differ between payments.
+"""
+
+from collections import defaultdict
+from datetime import date
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .cache import invalidate_chama
+from .defaulters import schedule_refresh
+from .events import publish_transactions
+from .loans import (
+    METHOD_CODES, active_loans, from_cents, outstanding_by_installment, rate_to_ppm, schedule_arrays, to_cents,
+)
+from .models import ArchivedTotal, Chama, Membership, MpesaPayment, Transaction
+from .rollups import apply_transactions
+from .utils import normalize_phone
+
+RECONCILE_WINDOW_DAYS = 10
+RECONCILE_BATCH_SIZE = 2000
+
+# Contribution periods a member may pay ahead of time
+CONTRIBUTION_PERIODS_AHEAD = 1
+
+# Candidates listed on a payment sent for review
+MAX_REVIEW_CANDIDATES = 5
+
+class Expectation:
+    """One amount a member is expected to pay"""
+
+    __slots__ = ('kind', 'member_id', 'loan_id', 'cents', 'due_day', 'label', 'taken')
+
+    def __init__(self, kind, member_id, cents, due_day, label, loan_id=None):
+        self.kind = kind
+        self.member_id = member_id
+        self.loan_id = loan_id
+        self.cents = cents
+        self.due_day = due_day
+        self.label = label
+        self.taken = False
+
+    @property
+    def owner(self):
+        return self.member_id, self.kind, self.loan_id
+
+    def describe(self):
+        return {
+            'type': self.kind,
+            'member_id': self.member_id,
+            'loan_id': self.loan_id,
+            'amount': from_cents(self.cents),
+            'due_date': date.fromordinal(self.due_day),
+            'label': self.label,
+        }
+
+# ============================================================================
+# Expectations
+# ============================================================================
+
+def contribution_expectations(chama, today):
+    """Open contribution periods: arrears plus the next period ahead"""
+    per_period = to_cents(chama.contribution_amount)
+    if per_period <= 0:
+        return []
+    interval = chama.contribution_interval_days
+    paid = dict(
+        Transaction.objects.filter(
+            chama=chama,
+            transaction_type=Transaction.Type.CONTRIBUTION,
+            status=Transaction.Status.COMPLETED,
+        ).values('member_id').annotate(total=Sum('amount')).values_list('member_id', 'total')
+    )
+    for member_id, total in ArchivedTotal.objects.filter(
+        chama=chama, transaction_type=Transaction.Type.CONTRIBUTION,
+    ).values_list('member_id', 'amount'):
+        paid[member_id] = paid.get(member_id, 0) + total
+    expectations = []
+    members = Membership.objects.filter(chama=chama, is_active=True).values_list('user_id', 'joined_at')
+    for member_id, joined_at in members:
+        joined_day = timezone.localdate(joined_at).toordinal()
+        paid_cents = to_cents(paid.get(member_id))
+        paid_periods, part_paid = divmod(paid_cents, per_period)
+        due_periods = (today.toordinal() - joined_day) // interval
+        for period in range(paid_periods + 1, due_periods + CONTRIBUTION_PERIODS_AHEAD + 1):
+            # A partly paid period only expects the balance
+            cents = per_period - part_paid if period == paid_periods + 1 else per_period
+            expectations.append(Expectation(
+                Transaction.Type.CONTRIBUTION, member_id, cents,
+                joined_day + period * interval, f'Contribution period {period}',
+            ))
+    return expectations
+
+def installment_expectations(chama):
+    """Unpaid loan installments, payments applied to the oldest first"""
+    loans = list(active_loans(chama.pk).values_list(
+        'pk', 'member_id', 'principal', 'interest_rate', 'installments', 'interest_method',
+        'custom_interest', 'disbursed_at', 'interval_days', 'repaid',
+    ))
+    if not loans:
+        return []
+    columns = list(zip(*loans))
+    principal_due, interest_due = schedule_arrays(
+        [to_cents(value) for value in columns[2]],
+        [rate_to_ppm(value) for value in columns[3]],
+        columns[4],
+        [METHOD_CODES[value] for value in columns[5]],
+        [to_cents(value) for value in columns[6]],
+    )
+    remaining = outstanding_by_installment(principal_due + interest_due, [to_cents(value) for value in columns[9]])
+    start_day = np.array([timezone.localdate(value).toordinal() for value in columns[7]], dtype=np.int64)
+    interval = np.array(columns[8], dtype=np.int64)
+
+    expectations = []
+    rows, numbers = np.nonzero(remaining > 0)
+    for row, number in zip(rows.tolist(), numbers.tolist()):
+        expectations.append(Expectation(
+            Transaction.Type.LOAN_PAYMENT, columns[1][row], int(remaining[row, number]),
+            int(start_day[row] + (number + 1) * interval[row]), f'Loan installment {number + 1}',
+            loan_id=columns[0][row],
+        ))
+    return expectations
+
+def member_phones(chama):
+    """Normalized phone -> ids of the active members using it"""
+    phones = defaultdict(list)
+    members = Membership.objects.filter(chama=chama, is_active=True, user__phone_number__isnull=False)
+    for member_id, phone in members.values_list('user_id', 'user__phone_number'):
+        phone = normalize_phone(phone)
+        if phone:
+            phones[phone].append(member_id)
+    return phones
+
+# ============================================================================
+# Matching
+# ============================================================================
+
+class ExpectationIndex:
+    """Hash indexes over expectations by phone, amount and due-date bucket"""
+
+    def __init__(self, expectations, phones, window_days=RECONCILE_WINDOW_DAYS):
+        self.window = window_days
+        self.known_phones = set(phones)
+        self.by_window = defaultdict(list)
+        self.by_amount = defaultdict(list)
+        self.by_phone = defaultdict(list)
+        phones_by_member = defaultdict(list)
+        for phone, member_ids in phones.items():
+            for member_id in member_ids:
+                phones_by_member[member_id].append(phone)
+
+        for expectation in sorted(expectations, key=lambda e: e.due_day):
+            for phone in phones_by_member.get(expectation.member_id, ()):
+                self.by_window[phone, expectation.cents, expectation.due_day // window_days].append(expectation)
+                self.by_amount[phone, expectation.cents].append(expectation)
+                self.by_phone[phone].append(expectation)
+
+    def candidates(self, phone, cents, day):
+        bucket = day // self.window
+        found = [
+            expectation
+            for key in ((phone, cents, bucket - 1), (phone, cents, bucket), (phone, cents, bucket + 1))
+            for expectation in self.by_window.get(key, ())
+            if not expectation.taken and abs(expectation.due_day - day) <= self.window
+        ]
+        if found:
+            return found
+        return [expectation for expectation in self.by_amount.get((phone, cents), ()) if not expectation.taken]
+
+    def open_for_phone(self, phone):
+        return [expectation for expectation in self.by_phone.get(phone, ()) if not expectation.taken]
+
+def _review_candidates(expectations):
+    """Earliest-due candidate per (member, kind, loan)"""
+    seen = {}
+    for expectation in sorted(expectations, key=lambda e: e.due_day):
+        seen.setdefault(expectation.owner, expectation)
+    return [expectation.describe() for expectation in list(seen.values())[:MAX_REVIEW_CANDIDATES]]
+
+def match_payment(index, payment):
+    """
+    Decide one payment against the index.
+
+    Returns (status, expectation, reason, candidates); a matched expectation
+    is marked as taken.
+    """
+    phone = normalize_phone(payment.phone_number) if payment.phone_number else ''
+    if phone not in index.known_phones:
+        return MpesaPayment.Status.UNMATCHED, None, '', []
+
+    day = timezone.localdate(payment.completed_at).toordinal()
+    candidates = index.candidates(phone, to_cents(payment.amount), day)
+    if not candidates:
+        return (
+            MpesaPayment.Status.REVIEW, None, 'No open contribution or installment of this amount',
+            _review_candidates(index.open_for_phone(phone)),
+        )
+    if len({expectation.owner for expectation in candidates}) > 1:
+        return (
+            MpesaPayment.Status.REVIEW, None, 'Matches more than one member, loan or payment type',
+            _review_candidates(candidates),
+        )
+    expectation = min(candidates, key=lambda e: e.due_day)
+    expectation.taken = True
+    return MpesaPayment.Status.MATCHED, expectation, '', []
+
+# ============================================================================
+# Persistence
+# ============================================================================
+
+def _ledger_row(chama_id, payment, member_id, kind, loan_id=None):
+    return Transaction(
+        chama_id=chama_id,
+        member_id=member_id,
+        loan_id=loan_id,
+        transaction_type=kind,
+        amount=payment.amount,
+        description=f'M-Pesa payment {payment.receipt}',
+        reference=payment.receipt,
+        status=Transaction.Status.COMPLETED,
+        posted_at=payment.completed_at,
+    )
+
+def post_matches(chama_id, matches):
+    """
+    Write ledger rows for ``(payment, member id, kind, loan id)`` matches.
+
+    Must run inside a transaction. Payments are linked to their new
+    transactions but not saved.
+    """
+    created = Transaction.objects.bulk_create(
+        [_ledger_row(chama_id, payment, member_id, kind, loan_id) for payment, member_id, kind, loan_id in matches],
+        batch_size=RECONCILE_BATCH_SIZE,
+    )
+    for (payment, member_id, _, _), txn in zip(matches, created):
+        payment.member_id = member_id
+        payment.transaction = txn
+        payment.status = MpesaPayment.Status.MATCHED
+
+    # Signals don't fire for bulk_create: maintain derived data explicitly
+    if created:
+        apply_transactions(created)
+        schedule_refresh(chama_id)
+        transaction.on_commit(lambda: invalidate_chama(chama_id))
+        publish_transactions(chama_id, created)
+    return created
+
+def save_outcomes(chama_id, payments, reconciled_at):
+    """
+    Write reconciliation outcomes back to the payment rows.
+
+    bulk_update builds a CASE expression per row and field, which dominates
+    a large run, so it only writes the fields that differ between payments:
+    the member and transaction of matched ones, the reason and candidates
+    of those sent to review. The rest is the same for every payment with an
+    outcome and is set with one UPDATE per outcome. Neither calls save() or
+    sends signals; MpesaPayment has no receivers, and the ledger's derived
+    data is kept by post_matches.
+    """
+    by_status = defaultdict(list)
+    for payment in payments:
+        by_status[payment.status].append(payment)
+    for payment_status, group in by_status.items():
+        shared = {'status': payment_status, 'reconciled_at': reconciled_at}
+        if payment_status == MpesaPayment.Status.MATCHED:
+            shared.update(review_reason='', candidates=[])
+            fields = ['member', 'transaction']
+        else:
+            fields = ['review_reason', 'candidates']
+        ids = [payment.pk for payment in group]
+        for start in range(0, len(ids), RECONCILE_BATCH_SIZE):
+            MpesaPayment.objects.filter(chama_id=chama_id, pk__in=ids[start:start + RECONCILE_BATCH_SIZE]).update(**shared)
+        MpesaPayment.objects.bulk_update(group, fields, batch_size=RECONCILE_BATCH_SIZE)
+
+def reconcile_chama(chama_id, window_days=RECONCILE_WINDOW_DAYS, today=None):
+    """
+    Match a chama's unmatched payments and those awaiting review; returns
+    counts per outcome.
+
+    Payments in review are decided again on every run, so one that was
+    ambiguous or had nothing to match is posted once the expectation it
+    pays arrives: a loan disbursed, a member joining or changing phone, a
+    period opening. Until the treasurer resolves it, its reason and
+    candidates are refreshed.
+
+    Runs in one transaction with the chama row locked, so concurrent runs
+    for the same chama queue up instead of posting a payment twice.
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    with transaction.atomic():
+        chama = Chama.objects.select_for_update().get(pk=chama_id)
+        payments = list(
+            MpesaPayment.objects.filter(
+                chama=chama, status__in=[MpesaPayment.Status.UNMATCHED, MpesaPayment.Status.REVIEW],
+            ).order_by('completed_at', 'receipt')
+        )
+        stats = {'payments': len(payments), 'matched': 0, 'review': 0, 'unmatched': 0, 'expectations': 0}
+        if not payments:
+            return stats
+
+        # Late payments posted after the window still settle their period
+        latest = max(timezone.localdate(payment.completed_at) for payment in payments)
+        expectations = contribution_expectations(chama, max(today, latest)) + installment_expectations(chama)
+        stats['expectations'] = len(expectations)
+        index = ExpectationIndex(expectations, member_phones(chama), window_days)
+
+        matches, changed = [], []
+        for payment in payments:
+            outcome, expectation, reason, candidates = match_payment(index, payment)
+            stats[outcome] += 1
+            if outcome == payment.status == MpesaPayment.Status.UNMATCHED:
+                continue
+            payment.status = outcome
+            payment.review_reason = reason
+            payment.candidates = candidates
+            payment.reconciled_at = now
+            changed.append(payment)
+            if expectation is not None:
+                matches.append((payment, expectation.member_id, expectation.kind, expectation.loan_id))
+
+        post_matches(chama.pk, matches)
+        save_outcomes(chama.pk, changed, now)
+    return stats
+
+def resolve_payment(payment, member_id, kind, loan_id=None):
+    """Post a payment the treasurer matched by hand"""
+    with transaction.atomic():
+        payment = MpesaPayment.objects.select_for_update().get(pk=payment.pk, chama_id=payment.chama_id)
+        if payment.transaction_id is not None:
+            raise ValueError('This payment is already posted')
+        txn = _ledger_row(payment.chama_id, payment, member_id, kind, loan_id)
+        txn.save()
+        payment.transaction = txn
+        payment.member_id = member_id
+        payment.status = MpesaPayment.Status.MATCHED
+        payment.review_reason = ''
+        payment.candidates = []
+        payment.reconciled_at = timezone.now()
+        payment.save()
+    return payment
@@ -0,0 +1,173 @@
+"""
+Incrementally maintained per-chama, per-day ledger aggregates.
+
+New transactions are folded into their day's DailyRollup row as they post.
+Edits and deletes recompute the affected day from the ledger. Group summary
+figures are then read from a few hundred pre-aggregated rows instead of
+scanning years of ledger history.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .archive import hot_since
+from .loans import outstanding_principal
+from .models import DailyRollup, Transaction
+
+ZERO = Decimal('0')
+
+AMOUNT_FIELDS = (
+    'inflow_amount', 'outflow_amount', 'contribution_amount', 'loans_disbursed', 'loans_repaid',
+)
+COUNT_FIELDS = ('transaction_count', 'pending_count')
+ROLLUP_FIELDS = AMOUNT_FIELDS + COUNT_FIELDS
+
+def rollup_day(posted_at):
+    return timezone.localdate(posted_at)
+
+def _deltas(txn):
+    """The change a single transaction makes to its day's rollup"""
+    if txn.status == Transaction.Status.PENDING:
+        return {'pending_count': 1}
+    if txn.status != Transaction.Status.COMPLETED:
+        return {}
+
+    amount = txn.amount
+    deltas = {'transaction_count': 1}
+    if txn.transaction_type in Transaction.INFLOW_TYPES:
+        deltas['inflow_amount'] = amount
+    else:
+        deltas['outflow_amount'] = amount
+    if txn.transaction_type == Transaction.Type.CONTRIBUTION:
+        deltas['contribution_amount'] = amount
+    elif txn.transaction_type == Transaction.Type.LOAN_DISBURSEMENT:
+        deltas['loans_disbursed'] = amount
+    elif txn.transaction_type == Transaction.Type.LOAN_PAYMENT:
+        deltas['loans_repaid'] = amount
+    return deltas
+
+def _apply(chama_id, day, deltas):
+    """Add deltas to one rollup row, creating it if needed"""
+    if not deltas:
+        return
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    updates['updated_at'] = timezone.now()
+    if DailyRollup.objects.filter(chama_id=chama_id, day=day).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.create(chama_id=chama_id, day=day, **deltas)
+    except IntegrityError:
+        # A concurrent writer created the row first
+        DailyRollup.objects.filter(chama_id=chama_id, day=day).update(**updates)
+
+def apply_transactions(transactions):
+    """
+    Fold newly posted transactions into their rollup rows.
+
+    Use this after bulk_create, which does not send post_save signals.
+    Transactions are grouped first so each (chama, day) row is written once.
+    """
+    grouped = defaultdict(lambda: defaultdict(lambda: 0))
+    for txn in transactions:
+        bucket = grouped[(txn.chama_id, rollup_day(txn.posted_at))]
+        for field, value in _deltas(txn).items():
+            bucket[field] += value
+    for (chama_id, day), deltas in grouped.items():
+        _apply(chama_id, day, dict(deltas))
+
+def _aggregates():
+    completed = Q(status=Transaction.Status.COMPLETED)
+    inflow = completed & Q(transaction_type__in=Transaction.INFLOW_TYPES)
+    return {
+        'inflow_amount': Sum('amount', filter=inflow),
+        'outflow_amount': Sum('amount', filter=completed & ~Q(transaction_type__in=Transaction.INFLOW_TYPES)),
+        'contribution_amount': Sum('amount', filter=completed & Q(transaction_type=Transaction.Type.CONTRIBUTION)),
+        'loans_disbursed': Sum('amount', filter=completed & Q(transaction_type=Transaction.Type.LOAN_DISBURSEMENT)),
+        'loans_repaid': Sum('amount', filter=completed & Q(transaction_type=Transaction.Type.LOAN_PAYMENT)),
+        'transaction_count': Count('id', filter=completed),
+        'pending_count': Count('id', filter=Q(status=Transaction.Status.PENDING)),
+    }
+
+def _window(day_from, day_to):
+    """Datetime bounds covering whole local days [day_from, day_to]"""
+    start = timezone.make_aware(datetime.combine(day_from, time.min))
+    end = timezone.make_aware(datetime.combine(day_to + timedelta(days=1), time.min))
+    return start, end
+
+def rebuild_range(chama_id, day_from, day_to):
+    """
+    Recompute rollups for one chama over [day_from, day_to] from the ledger.
+
+    Returns the number of rollup rows written. Archived days are skipped:
+    their rows are no longer in the ledger and their rollups are final.
+    """
+    archived_until = hot_since(chama_id)
+    if archived_until is not None and day_from < archived_until:
+        day_from = archived_until
+        if day_from > day_to:
+            return 0
+    start, end = _window(day_from, day_to)
+    rows = (
+        Transaction.objects.filter(chama_id=chama_id, posted_at__gte=start, posted_at__lt=end)
+        .annotate(day=TruncDate('posted_at'))
+        .values('day')
+        .annotate(**_aggregates())
+    )
+    rollups = [
+        DailyRollup(
+            chama_id=chama_id,
+            day=row['day'],
+            **{field: row[field] or (ZERO if field in AMOUNT_FIELDS else 0) for field in ROLLUP_FIELDS},
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        # Days whose transactions all disappeared must not keep stale totals
+        DailyRollup.objects.filter(chama_id=chama_id, day__gte=day_from, day__lte=day_to).exclude(
+            day__in=[rollup.day for rollup in rollups]
+        ).delete()
+        DailyRollup.objects.bulk_create(
+            rollups,
+            update_conflicts=True,
+            unique_fields=['chama', 'day'],
+            update_fields=[*ROLLUP_FIELDS, 'updated_at'],
+        )
+    return len(rollups)
+
+def rebuild_day(chama_id, day):
+    return rebuild_range(chama_id, day, day)
+
+def group_totals(chama_id, today=None):
+    """
+    Group summary figures for one chama from its rollup rows.
+
+    A single aggregate query over pre-aggregated days covers the all-time,
+    today, month-to-date and year-to-date windows. Outstanding loans are
+    the principal left on active loans' schedules, since repayments in
+    the rollups include interest.
+    """
+    today = today or timezone.localdate()
+    month_start = today.replace(day=1)
+    year_start = today.replace(month=1, day=1)
+    totals = DailyRollup.objects.filter(chama_id=chama_id).aggregate(
+        inflow=Sum('inflow_amount'),
+        outflow=Sum('outflow_amount'),
+        loans_disbursed=Sum('loans_disbursed'),
+        loans_repaid=Sum('loans_repaid'),
+        pending_count=Sum('pending_count'),
+        collected_today=Sum('inflow_amount', filter=Q(day=today)),
+        collected_month_to_date=Sum('inflow_amount', filter=Q(day__gte=month_start, day__lte=today)),
+        collected_year_to_date=Sum('inflow_amount', filter=Q(day__gte=year_start, day__lte=today)),
+        contributions_month_to_date=Sum('contribution_amount', filter=Q(day__gte=month_start, day__lte=today)),
+        contributions_year_to_date=Sum('contribution_amount', filter=Q(day__gte=year_start, day__lte=today)),
+    )
+    totals = {key: value or 0 for key, value in totals.items()}
+    totals['balance'] = totals.pop('inflow') - totals.pop('outflow')
+    totals['outstanding_loans'] = outstanding_principal(chama_id)
+    return totals
@@ -0,0 +1,192 @@
+"""
+Merry-go-round payout rotation.
+
+Each cycle gives every active member one turn to receive the pot, one
+meeting apart. The whole cycle is generated up front as RotationSlot rows
+(with the meetings they fall on), and every slot carries the cycle length,
+so a member's position and the total are a single indexed read.
+
+Changes only touch the current cycle of the chama concerned, and only its
+upcoming slots; turns already taken are history:
+
+* skip: the member gives up their turn and moves to the end of the cycle.
+* swap: two members exchange upcoming turns.
+* join: a new member's turn is appended to the end of the cycle.
+* leave: later members move up one turn and the last slot is dropped.
+
+Meeting dates stay with positions; members move between them.
+"""
+
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import invalidate_chama
+from .events import publish_meeting
+from .models import Chama, Meeting, Membership, RotationSlot, Transaction
+
+class RotationError(ValueError):
+    pass
+
+def current_cycle(chama_id):
+    return RotationSlot.objects.filter(chama_id=chama_id).aggregate(cycle=Max('cycle'))['cycle']
+
+def member_position(chama_id, user_id):
+    """(position, total_positions) in the member's latest cycle, or (None, None)"""
+    slot = (
+        RotationSlot.objects.filter(chama_id=chama_id, member_id=user_id)
+        .order_by('-cycle')
+        .values_list('position', 'total_positions')
+        .first()
+    )
+    return slot or (None, None)
+
+def _create_meetings(chama_id, dates):
+    """Meeting for each datetime, reusing meetings already scheduled then"""
+    existing = {
+        meeting.scheduled_for: meeting
+        for meeting in Meeting.objects.filter(chama_id=chama_id, scheduled_for__in=dates)
+    }
+    missing = [
+        Meeting(chama_id=chama_id, scheduled_for=moment, agenda='Merry-go-round payout')
+        for moment in dates if moment not in existing
+    ]
+    for meeting in Meeting.objects.bulk_create(missing):
+        existing[meeting.scheduled_for] = meeting
+        # bulk_create skips post_save, which announces meetings to live clients
+        publish_meeting(meeting)
+    return [existing[moment] for moment in dates]
+
+def _meeting_in_use(chama_id, meeting):
+    return (
+        Transaction.objects.filter(chama_id=chama_id, meeting=meeting).exists()
+        or RotationSlot.objects.filter(chama_id=chama_id, meeting=meeting).exists()
+    )
+
+def _changed(chama_id):
+    # Bulk writes skip signals: refresh cached dashboards explicitly
+    transaction.on_commit(lambda: invalidate_chama(chama_id))
+
+def generate_cycle(chama, first_payout, order=None):
+    """
+    Schedule a new cycle starting at ``first_payout``, one payout per
+    contribution interval.
+
+    ``order`` lists member ids in payout order (default: join order) and
+    must name every active member exactly once.
+    """
+    members = list(
+        Membership.objects.filter(chama=chama, is_active=True)
+        .order_by('joined_at', 'id')
+        .values_list('user_id', flat=True)
+    )
+    if order is not None:
+        order = list(order)
+        if len(order) != len(set(order)) or set(order) != set(members):
+            raise RotationError('The order must list every active member exactly once')
+        members = order
+    if not members:
+        raise RotationError('The chama has no active members')
+
+    interval = timedelta(days=chama.contribution_interval_days)
+    dates = [first_payout + interval * i for i in range(len(members))]
+    with transaction.atomic():
+        Chama.objects.select_for_update().get(pk=chama.pk)
+        cycle = (current_cycle(chama.pk) or 0) + 1
+        meetings = _create_meetings(chama.pk, dates)
+        slots = RotationSlot.objects.bulk_create([
+            RotationSlot(
+                chama=chama, cycle=cycle, position=position, total_positions=len(members),
+                member_id=member_id, meeting=meeting, scheduled_for=meeting.scheduled_for,
+            )
+            for position, (member_id, meeting) in enumerate(zip(members, meetings), start=1)
+        ])
+        _changed(chama.pk)
+    return slots
+
+def upcoming_slots(chama_id, cycle=None, from_position=1):
+    """Slots of the cycle not yet paid out, in position order"""
+    cycle = cycle or current_cycle(chama_id)
+    return list(
+        RotationSlot.objects.filter(
+            chama_id=chama_id, cycle=cycle, position__gte=from_position, scheduled_for__gte=timezone.now(),
+        ).order_by('position')
+    )
+
+def _reassign(slots, members):
+    """Give ``slots`` the ``members`` in order; only changed rows are written"""
+    changed = []
+    for slot, member_id in zip(slots, members):
+        if slot.member_id != member_id:
+            slot.member_id = member_id
+            changed.append(slot)
+    RotationSlot.objects.bulk_update(changed, ['member'])
+    return changed
+
+def _upcoming_from(chama_id, position):
+    slots = upcoming_slots(chama_id, from_position=position)
+    if not slots or slots[0].position != position:
+        raise RotationError(f'Position {position} is not an upcoming turn')
+    return slots
+
+def skip_turn(chama_id, position):
+    """Move the member at ``position`` to the end of the cycle"""
+    with transaction.atomic():
+        slots = _upcoming_from(chama_id, position)
+        members = [slot.member_id for slot in slots]
+        _reassign(slots, members[1:] + members[:1])
+        _changed(chama_id)
+    return slots
+
+def swap_turns(chama_id, first, second):
+    """Exchange the members at two upcoming positions"""
+    with transaction.atomic():
+        slots = {slot.position: slot for slot in upcoming_slots(chama_id)}
+        if first not in slots or second not in slots:
+            raise RotationError('Both positions must be upcoming turns')
+        a, b = slots[first], slots[second]
+        a.member_id, b.member_id = b.member_id, a.member_id
+        RotationSlot.objects.bulk_update([a, b], ['member'])
+        _changed(chama_id)
+    return a, b
+
+def add_member(chama_id, user_id):
+    """Append a turn for a member who joined after the cycle was scheduled"""
+    with transaction.atomic():
+        cycle = current_cycle(chama_id)
+        if cycle is None or RotationSlot.objects.filter(chama_id=chama_id, cycle=cycle, member_id=user_id).exists():
+            return None
+        last = RotationSlot.objects.filter(chama_id=chama_id, cycle=cycle).order_by('-position').first()
+        interval = Chama.objects.values_list('contribution_interval_days', flat=True).get(pk=chama_id)
+        moment = last.scheduled_for + timedelta(days=interval)
+        meeting, = _create_meetings(chama_id, [moment])
+        slot = RotationSlot.objects.create(
+            chama_id=chama_id, cycle=cycle, position=last.position + 1, total_positions=last.position + 1,
+            member_id=user_id, meeting=meeting, scheduled_for=moment,
+        )
+        RotationSlot.objects.filter(chama_id=chama_id, cycle=cycle).update(total_positions=slot.position)
+        _changed(chama_id)
+    return slot
+
+def remove_member(chama_id, user_id):
+    """Drop a departing member's upcoming turn; later members move up"""
+    with transaction.atomic():
+        cycle = current_cycle(chama_id)
+        if cycle is None:
+            return None
+        slot = RotationSlot.objects.filter(
+            chama_id=chama_id, cycle=cycle, member_id=user_id, scheduled_for__gte=timezone.now(),
+        ).first()
+        if slot is None:
+            return None
+        slots = upcoming_slots(chama_id, cycle, from_position=slot.position)
+        last = slots[-1]
+        last.delete()
+        _reassign(slots[:-1], [later.member_id for later in slots[1:]])
+        meeting = last.meeting
+        if meeting is not None and not _meeting_in_use(chama_id, meeting):
+            meeting.delete()
+        RotationSlot.objects.filter(chama_id=chama_id, cycle=cycle).update(total_positions=last.position - 1)
+        _changed(chama_id)
+    return slot
@@ -0,0 +1,99 @@
+from django.urls import reverse
+from rest_framework import serializers
+from .contributions import MAX_SHEET_ROWS
+from .models import ExportJob, MpesaPayment, RotationSlot, StatementImport, Transaction
+
+class TransactionSerializer(serializers.ModelSerializer):
+    date = serializers.DateTimeField(source='posted_at', read_only=True)
+    type = serializers.CharField(source='transaction_type', read_only=True)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, coerce_to_string=False, read_only=True)
+    member_name = serializers.CharField(source='member.full_name', default='', read_only=True)
+
+    class Meta:
+        model = Transaction
+        fields = ('id', 'date', 'type', 'member_name', 'amount', 'description', 'status', 'reference')
+        read_only_fields = fields
+
+class MeetingSheetSerializer(serializers.Serializer):
+    """Envelope for a bulk contribution sheet; rows are validated in chamas.contributions"""
+    meeting_id = serializers.IntegerField(required=False, allow_null=True)
+    posted_at = serializers.DateTimeField(required=False, allow_null=True)
+    rows = serializers.ListField(child=serializers.JSONField(), allow_empty=False)
+
+    def validate_rows(self, value):
+        if len(value) > MAX_SHEET_ROWS:
+            raise serializers.ValidationError(f"A sheet can have at most {MAX_SHEET_ROWS} rows.")
+        return value
+
+class StatementImportSerializer(serializers.ModelSerializer):
+    uploaded_by = serializers.CharField(source='uploaded_by.email', default=None, read_only=True)
+
+    class Meta:
+        model = StatementImport
+        fields = (
+            'id', 'filename', 'status', 'uploaded_by', 'rows_read', 'rows_imported',
+            'duplicates', 'rows_skipped', 'error', 'started_at', 'finished_at',
+        )
+        read_only_fields = fields
+
+class MpesaPaymentSerializer(serializers.ModelSerializer):
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, coerce_to_string=False, read_only=True)
+    member_name = serializers.CharField(source='member.full_name', default='', read_only=True)
+
+    class Meta:
+        model = MpesaPayment
+        fields = (
+            'id', 'receipt', 'completed_at', 'amount', 'phone_number', 'payer_name', 'account_reference',
+            'status', 'member', 'member_name', 'transaction', 'review_reason', 'candidates', 'reconciled_at',
+        )
+        read_only_fields = fields
+
+class PaymentResolutionSerializer(serializers.Serializer):
+    """A treasurer's decision on a payment queued for review"""
+    type = serializers.ChoiceField(choices=[
+        Transaction.Type.CONTRIBUTION, Transaction.Type.LOAN_PAYMENT, Transaction.Type.FINE_PAYMENT, 'ignore',
+    ])
+    member_id = serializers.UUIDField(required=False)
+    loan_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if attrs['type'] != 'ignore' and not attrs.get('member_id'):
+            raise serializers.ValidationError({'member_id': 'Choose the member who paid.'})
+        if attrs['type'] == Transaction.Type.LOAN_PAYMENT and not attrs.get('loan_id'):
+            raise serializers.ValidationError({'loan_id': 'Choose the loan being repaid.'})
+        return attrs
+
+class RotationSlotSerializer(serializers.ModelSerializer):
+    member_name = serializers.CharField(source='member.full_name', read_only=True)
+
+    class Meta:
+        model = RotationSlot
+        fields = ('cycle', 'position', 'total_positions', 'member', 'member_name', 'scheduled_for', 'meeting')
+        read_only_fields = fields
+
+class RotationScheduleSerializer(serializers.Serializer):
+    first_payout = serializers.DateTimeField()
+    order = serializers.ListField(child=serializers.UUIDField(), required=False)
+
+class RotationChangeSerializer(serializers.Serializer):
+    position = serializers.IntegerField(min_value=1)
+    swap_with = serializers.IntegerField(min_value=1, required=False)
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = (
+            'id', 'report', 'file_format', 'member', 'date_from', 'date_to', 'status', 'error',
+            'created_at', 'finished_at', 'download_url',
+        )
+        read_only_fields = ('id', 'status', 'error', 'created_at', 'finished_at', 'download_url')
+
+    def get_download_url(self, job):
+        if job.status != ExportJob.Status.COMPLETED:
+            return None
+        request = self.context.get('request')
+        path = reverse('exports-download', kwargs={'pk': job.pk})
+        return request.build_absolute_uri(path) if request else path
+
@@ -0,0 +1,158 @@
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from accounts.models import UserProfile
+from accounts.search import update_document_chamas
+from .cache import invalidate_chama, invalidate_user
+from .defaulters import schedule_refresh
+from .events import balance_effect, publish_balance_change, publish_meeting, publish_transactions
+from .models import Loan, Meeting, Membership, Transaction
+from .rollups import apply_transactions, rebuild_day, rollup_day
+from .rotation import add_member, remove_member
+
+# User fields rendered into payloads other members see
+SHARED_USER_FIELDS = {'first_name', 'last_name', 'email', 'phone_number'}
+
+def _invalidate_chama_on_commit(chama_id):
+    # Bump after commit so a concurrent rebuild can't cache pre-commit data
+    transaction.on_commit(lambda: invalidate_chama(chama_id))
+
+def _invalidate_user_on_commit(user_id):
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Meeting)
+@receiver(post_delete, sender=Meeting)
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+def invalidate_chama_payloads(sender, instance, **kwargs):
+    """
+    Invalidate cached chama payloads when the ledger, meetings or loans change.
+    """
+    _invalidate_chama_on_commit(instance.chama_id)
+
+@receiver(pre_save, sender=Transaction)
+def remember_posted_day(sender, instance, **kwargs):
+    """
+    Remember the day an edited transaction was rolled up under, and what it
+    added to the group balance.
+    """
+    if instance._state.adding or instance.pk is None:
+        return
+    previous = (
+        Transaction.objects.unscoped().filter(pk=instance.pk)
+        .values_list('posted_at', 'transaction_type', 'amount', 'status').first()
+    )
+    instance._rollup_previous_day = rollup_day(previous[0]) if previous else None
+    instance._previous_balance_effect = balance_effect(*previous[1:]) if previous else None
+
+@receiver(post_save, sender=Transaction)
+def update_daily_rollup(sender, instance, created, **kwargs):
+    """
+    Fold new transactions into their day's rollup; recompute edited days.
+    """
+    if created:
+        apply_transactions([instance])
+        return
+    days = {rollup_day(instance.posted_at), getattr(instance, '_rollup_previous_day', None)}
+    for day in days - {None}:
+        rebuild_day(instance.chama_id, day)
+
+@receiver(post_delete, sender=Transaction)
+def remove_from_daily_rollup(sender, instance, **kwargs):
+    rebuild_day(instance.chama_id, rollup_day(instance.posted_at))
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def refresh_chama_defaulters(sender, instance, **kwargs):
+    """
+    Recompute the chama's defaulters after a contribution is posted or changed.
+    """
+    if instance.transaction_type == Transaction.Type.CONTRIBUTION:
+        schedule_refresh(instance.chama_id)
+
+@receiver(post_save, sender=Transaction)
+def publish_transaction_events(sender, instance, created, **kwargs):
+    """
+    Push the new row, or an edit's change to the balance, to live streams.
+    """
+    if created:
+        publish_transactions(instance.chama_id, [instance])
+        return
+    previous = getattr(instance, '_previous_balance_effect', None)
+    if previous is not None:
+        current = balance_effect(instance.transaction_type, Decimal(instance.amount), instance.status)
+        publish_balance_change(instance.chama_id, current - previous)
+
+@receiver(post_delete, sender=Transaction)
+def publish_transaction_removal(sender, instance, **kwargs):
+    publish_balance_change(
+        instance.chama_id, -balance_effect(instance.transaction_type, Decimal(instance.amount), instance.status)
+    )
+
+@receiver(post_save, sender=Meeting)
+def publish_meeting_update(sender, instance, **kwargs):
+    publish_meeting(instance)
+
+@receiver(post_delete, sender=Meeting)
+def publish_meeting_removal(sender, instance, **kwargs):
+    publish_meeting(instance, deleted=True)
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def invalidate_membership_payloads(sender, instance, **kwargs):
+    """
+    Invalidate the chama (member counts) and the user (primary chama).
+    """
+    _invalidate_chama_on_commit(instance.chama_id)
+    _invalidate_user_on_commit(instance.user_id)
+    schedule_refresh(instance.chama_id)
+
+@receiver(post_save, sender=Membership)
+def update_rotation_on_save(sender, instance, **kwargs):
+    """
+    Give joining members a turn and release the turns of departing ones.
+
+    Only the chama's current cycle is touched.
+    """
+    if instance.is_active:
+        add_member(instance.chama_id, instance.user_id)
+    else:
+        remove_member(instance.chama_id, instance.user_id)
+
+@receiver(post_delete, sender=Membership)
+def update_rotation_on_delete(sender, instance, **kwargs):
+    remove_member(instance.chama_id, instance.user_id)
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def index_membership(sender, instance, raw=False, **kwargs):
+    """Show or hide the member in their chama's directory search"""
+    if not raw:
+        update_document_chamas(instance.user_id)
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_payloads(sender, instance, update_fields=None, **kwargs):
+    """
+    Invalidate cached payloads for a user when their account changes.
+
+    Names appear in other members' payloads, so chamas the user belongs to are
+    invalidated too unless the save only touched bookkeeping fields.
+    """
+    _invalidate_user_on_commit(instance.pk)
+    if update_fields is not None and not set(update_fields) & SHARED_USER_FIELDS:
+        return
+    chama_ids = Membership.objects.unscoped().filter(user_id=instance.pk).values_list('chama_id', flat=True)
+    for chama_id in chama_ids:
+        _invalidate_chama_on_commit(chama_id)
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_profile_payloads(sender, instance, **kwargs):
+    """
+    Invalidate cached payloads for a user when their profile changes.
+    """
+    _invalidate_user_on_commit(instance.user_id)
@@ -0,0 +1,304 @@
+"""
+Multi-chama tenancy.
+
+Every chama's rows live in the same tables, so every query on a tenant
+model (one with a ``chama`` foreign key) has to filter on chama_id. This
+module makes that the default:
+
+* The current chama is resolved once per request by TenantMiddleware. It
+  comes from the ``X-Chama-ID`` header, which must name one of the user's
+  chamas, or else from the chama the user joined first. Outside requests,
+  ``tenant(chama_id)`` sets it.
+* TenantManager, the default manager of tenant models, filters on the
+  current chama. A queryset remembers whether it was scoped, either by the
+  manager or by an explicit chama filter. Evaluating one that wasn't
+  scoped is logged, or raises UnscopedQueryError when TENANCY_STRICT is
+  on. Deliberately cross-chama queries (queue workers, admin, maintenance
+  commands) say so with ``.unscoped()``.
+* An explicit chama filter is ANDed with the manager's, so naming another
+  chama inside a tenant context could only ever match nothing. That raises
+  ChamaMismatchError instead; start from ``.unscoped()`` to reach it.
+* Roles are resolved per chama from Membership.role and cached for the
+  rest of the request.
+"""
+
+import contextvars
+import logging
+import re
+import uuid
+from contextlib import contextmanager
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import models
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+class UnscopedQueryError(RuntimeError):
+    """A tenant model was queried without a chama filter"""
+
+class ChamaMismatchError(RuntimeError):
+    """A query filtered on a chama other than the current one"""
+
+# ============================================================================
+# Current Chama
+# ============================================================================
+
+class TenantContext:
+    """Tenancy state for one request or ``tenant()`` block"""
+
+    def __init__(self, request=None, chama_id=None):
+        self.request = request
+        self._chama_id = chama_id
+        self._resolved = chama_id is not None or request is None
+        self.roles = {}
+
+    @property
+    def chama_id(self):
+        if not self._resolved:
+            user = getattr(self.request, 'user', None)
+            if user is None or not user.is_authenticated:
+                # DRF authenticates inside the view; resolve once it has
+                return None
+            self._chama_id = resolve_chama_id(user, self.request.headers.get('X-Chama-ID'))
+            self._resolved = True
+        return self._chama_id
+
+_context = contextvars.ContextVar('chama_tenant', default=None)
+
+def current_context():
+    return _context.get()
+
+def current_chama_id():
+    """The chama the current request or ``tenant()`` block is working in, or None"""
+    context = _context.get()
+    return context.chama_id if context is not None else None
+
+def activate(context):
+    """Make ``context`` current; returns a token for ``deactivate``"""
+    return _context.set(context)
+
+def deactivate(token):
+    _context.reset(token)
+
+@contextmanager
+def tenant(chama_id):
+    """Scope tenant queries to one chama outside a request"""
+    token = activate(TenantContext(chama_id=chama_id))
+    try:
+        yield
+    finally:
+        deactivate(token)
+
+def resolve_chama_id(user, requested=None):
+    """
+    The chama a user is working in: ``requested`` (an id from the
+    X-Chama-ID header) if they belong to it, else the chama they joined
+    first.
+    """
+    memberships = apps.get_model('chamas', 'Membership').objects.unscoped().filter(user=user, is_active=True)
+    if requested:
+        try:
+            chama_id = uuid.UUID(str(requested))
+        except ValueError:
+            raise PermissionDenied('Unknown chama')
+        if user.is_superuser:
+            if apps.get_model('chamas', 'Chama').objects.filter(pk=chama_id).exists():
+                return chama_id
+        elif memberships.filter(chama_id=chama_id).exists():
+            return chama_id
+        raise PermissionDenied('You are not a member of that chama')
+    return memberships.order_by('joined_at').values_list('chama_id', flat=True).first()
+
+# ============================================================================
+# Roles
+# ============================================================================
+
+def get_role(user, chama_id=None):
+    """
+    The user's role in a chama (default: the current one), cached for the
+    rest of the request.
+
+    Roles come from Membership alone; superusers, who may open any chama,
+    are its treasurers.
+    """
+    Membership = apps.get_model('chamas', 'Membership')
+    if chama_id is None:
+        chama_id = current_chama_id()
+    context = _context.get()
+    key = (user.pk, chama_id)
+    if context is not None and key in context.roles:
+        return context.roles[key]
+
+    if user.is_superuser:
+        role = Membership.Role.TREASURER
+    elif chama_id is None:
+        role = None
+    else:
+        role = (
+            Membership.objects.unscoped()
+            .filter(chama_id=chama_id, user=user, is_active=True)
+            .values_list('role', flat=True)
+            .first()
+        )
+    if context is not None:
+        context.roles[key] = role
+    return role
+
+def is_treasurer(user, chama_id=None):
+    return get_role(user, chama_id) == apps.get_model('chamas', 'Membership').Role.TREASURER
+
+# ============================================================================
+# Scoped Managers
+# ============================================================================
+
+_SCOPING_LOOKUPS = {'', 'exact', 'in', 'id', 'pk', 'id__exact', 'pk__exact', 'id__in', 'pk__in'}
+
+def _scopes(lookup):
+    field, _, rest = lookup.partition('__')
+    return field in ('chama', 'chama_id') and rest in _SCOPING_LOOKUPS
+
+def _q_scopes(q):
+    if not isinstance(q, Q) or q.negated or q.connector != Q.AND:
+        return False
+    return any(
+        _scopes(child[0]) if isinstance(child, tuple) else _q_scopes(child)
+        for child in q.children
+    )
+
+def _chama_ids(lookup, value):
+    """Chama ids a scoping lookup admits, or None if they can't be known up front"""
+    values = value if lookup.rsplit('__', 1)[-1] == 'in' else [value]
+    if not isinstance(values, (list, tuple, set, frozenset)):
+        # A subquery or expression
+        return None
+    try:
+        return {uuid.UUID(str(getattr(value, 'pk', value))) for value in values}
+    except ValueError:
+        return None
+
+class TenantQuerySet(models.QuerySet):
+    """QuerySet that refuses to run without a chama filter"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tenant_scoped = False
+        # The chama TenantManager filtered on, if any
+        self._tenant_chama_id = None
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._tenant_scoped = self._tenant_scoped
+        clone._tenant_chama_id = self._tenant_chama_id
+        return clone
+
+    def _filter_or_exclude(self, negate, args, kwargs):
+        if not negate and self._tenant_chama_id is not None:
+            self._check_chama(kwargs)
+        clone = super()._filter_or_exclude(negate, args, kwargs)
+        if not negate and (any(_scopes(lookup) for lookup in kwargs) or any(_q_scopes(q) for q in args)):
+            clone._tenant_scoped = True
+        return clone
+
+    def _check_chama(self, kwargs):
+        for lookup, value in kwargs.items():
+            if not _scopes(lookup):
+                continue
+            chama_ids = _chama_ids(lookup, value)
+            if chama_ids is not None and self._tenant_chama_id not in chama_ids:
+                raise ChamaMismatchError(
+                    f'{self.model.__name__} filtered on another chama while chama {self._tenant_chama_id} '
+                    'is current; use .unscoped() for cross-chama queries'
+                )
+
+    def for_chama(self, chama_id):
+        return self.filter(chama_id=chama_id)
+
+    def unscoped(self):
+        """Mark a deliberately cross-chama query"""
+        clone = self._clone()
+        clone._tenant_scoped = True
+        return clone
+
+    def _check_scope(self):
+        if self._tenant_scoped:
+            return
+        message = f'{self.model.__name__} queried without a chama filter'
+        if getattr(settings, 'TENANCY_STRICT', False):
+            raise UnscopedQueryError(message)
+        logger.warning(message, stack_info=settings.DEBUG)
+
+    def _fetch_all(self):
+        if self._result_cache is None:
+            self._check_scope()
+        super()._fetch_all()
+
+    def iterator(self, *args, **kwargs):
+        self._check_scope()
+        return super().iterator(*args, **kwargs)
+
+    def count(self):
+        if self._result_cache is None:
+            self._check_scope()
+        return super().count()
+
+    def exists(self):
+        if self._result_cache is None:
+            self._check_scope()
+        return super().exists()
+
+    def aggregate(self, *args, **kwargs):
+        self._check_scope()
+        return super().aggregate(*args, **kwargs)
+
+    def update(self, **kwargs):
+        self._check_scope()
+        return super().update(**kwargs)
+
+    def delete(self):
+        self._check_scope()
+        return super().delete()
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        # Rows are addressed by primary key and already carry their chama
+        return super(TenantQuerySet, self.unscoped()).bulk_update(objs, fields, batch_size)
+
+class TenantManager(models.Manager.from_queryset(TenantQuerySet)):
+    """Default manager for tenant models: filters on the current chama"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        chama_id = current_chama_id()
+        if chama_id is not None:
+            queryset = queryset.filter(chama_id=chama_id)
+            queryset._tenant_chama_id = uuid.UUID(str(chama_id))
+        return queryset
+
+    def unscoped(self):
+        """Every chama's rows, ignoring the current chama"""
+        return super().get_queryset().unscoped()
+
+# ============================================================================
+# Middleware
+# ============================================================================
+
+class TenantMiddleware:
+    """
+    Give each request its own tenancy context.
+
+    The chama is resolved on first use, so it sees the user DRF
+    authenticates inside the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if any(re.match(pattern, request.path) for pattern in settings.TENANCY_EXEMPT_PATTERNS):
+            return self.get_response(request)
+        token = activate(TenantContext(request))
+        try:
+            return self.get_response(request)
+        finally:
+            deactivate(token)
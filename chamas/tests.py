@@ -0,0 +1,1432 @@
+import asyncio
+import base64
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import uuid
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import close_old_connections
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from config.asgi import application as asgi_application
+from config.renderers import ORJSONParser, ORJSONRenderer
+
+from accounts.models import User, UserProfile
+
+from . import idempotency
+from .analytics import build_contribution_report
+from .archive import archive_month
+from .bench import seed_chama
+from .cache import chama_version, get_metrics, get_or_build
+from .dashboard import build_dashboard_summary, build_member_summary, build_treasurer_summary
+from .defaulters import refresh_defaulters, schedule_refresh
+from .events import (
+    BALANCE_CHANGED, MEETING_UPDATED, RESYNC, TRANSACTION_CREATED, Broker, Event, LocalBackend, broker, get_backend,
+    publish_transactions,
+)
+from .exports import group_rows, render, run_export, run_pending, statement_rows
+from .fines import accrue_fines
+from .loans import build_schedule, loan_status, schedule_arrays
+from .integrity import backfill_chama, verify_chama
+from .models import (
+    ArchivedTotal, Chama, DailyRollup, Defaulter, ExportJob, Fine, IdempotencyKey, LedgerArchive, LedgerCheckpoint, LedgerHead, Loan, Meeting, Membership, MpesaPayment,
+    NotificationRun, RotationSlot, StatementImport, Transaction,
+)
+from .reconciliation import reconcile_chama
+from .rotation import RotationError, current_cycle, generate_cycle, member_position, skip_turn, swap_turns
+from .rollups import ROLLUP_FIELDS, _apply, group_totals, rebuild_day, rebuild_range
+from .mpesa import import_statement, iter_payments, iter_rows
+from .notifications import (
+    LocalPushTransport, RateLimiter, deliver, load_channels, queue, queue_meeting_reminders,
+    queue_payment_due_notices, recipients,
+)
+from .tenancy import ChamaMismatchError, UnscopedQueryError, get_role, is_treasurer, tenant
+
+# The memory ceiling must hold at any ledger size. Set EXPORT_TEST_ROWS=5000000
+# to run at production scale; the default keeps the suite fast.
+EXPORT_TEST_ROWS = int(os.getenv('EXPORT_TEST_ROWS', 20_000))
+EXPORT_MEMORY_CEILING = 16 * 1024 * 1024
+
+class DashboardCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, (cls.member,) = seed_chama(1, 0)
+
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def builder(self, payload='fresh'):
+        def build():
+            self.builds += 1
+            return payload
+        return build
+
+    def test_ledger_writes_bump_the_chama_version(self):
+        version = chama_version(self.chama.pk)
+        self.assertEqual(get_or_build('summary', version, self.builder('first'), 'test'), (version, 'first'))
+        self.assertEqual(get_or_build('summary', chama_version(self.chama.pk), self.builder(), 'test')[1], 'first')
+        self.assertEqual(self.builds, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                chama=self.chama, member=self.member, transaction_type=Transaction.Type.CONTRIBUTION,
+                amount=Decimal('500'),
+            )
+        self.assertNotEqual(chama_version(self.chama.pk), version)
+        self.assertEqual(get_or_build('summary', chama_version(self.chama.pk), self.builder('second'), 'test')[1], 'second')
+        self.assertEqual(self.builds, 2)
+
+    def test_stale_copy_is_served_while_another_request_rebuilds(self):
+        cache.set('summary', (1, 'stale'))
+        cache.add('summary:lock', 1)
+        # Labelled with the version it was built at, not the one asked for
+        self.assertEqual(get_or_build('summary', 2, self.builder(), 'test'), (1, 'stale'))
+        self.assertEqual(self.builds, 0)
+        self.assertEqual(get_metrics('test')['stale'], 1)
+
+        cache.delete('summary:lock')
+        self.assertEqual(get_or_build('summary', 2, self.builder(), 'test'), (2, 'fresh'))
+        self.assertEqual(cache.get('summary'), (2, 'fresh'))
+
+    @override_settings(CACHE_REBUILD_WAIT=0.1)
+    def test_waiters_build_themselves_when_the_lock_is_never_released(self):
+        cache.add('summary:lock', 1)
+        self.assertEqual(get_or_build('summary', 1, self.builder(), 'test'), (1, 'fresh'))
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(get_metrics('test')['wait'], 1)
+
+    def test_failed_build_releases_the_lock(self):
+        def broken():
+            raise RuntimeError('database went away')
+        with self.assertRaises(RuntimeError):
+            get_or_build('summary', 1, broken, 'test')
+        self.assertIsNone(cache.get('summary:lock'))
+        self.assertEqual(get_or_build('summary', 1, self.builder(), 'test'), (1, 'fresh'))
+
+class DailyRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, cls.users = seed_chama(3, 20, days=60)
+
+    def rollups(self):
+        return {
+            row['day']: tuple(row[field] for field in ROLLUP_FIELDS)
+            for row in DailyRollup.objects.filter(chama=self.chama).values('day', *ROLLUP_FIELDS)
+        }
+
+    def post(self, amount, kind=Transaction.Type.CONTRIBUTION, **fields):
+        return Transaction.objects.create(
+            chama=self.chama, member=self.users[0], transaction_type=kind, amount=Decimal(amount), **fields
+        )
+
+    def test_incremental_updates_match_a_rebuild(self):
+        today = timezone.localdate()
+        first = self.post('500')
+        self.post('250', status=Transaction.Status.PENDING)
+        self.post('300', Transaction.Type.LOAN_DISBURSEMENT)
+        moved = self.post('700', posted_at=timezone.now() - timedelta(days=3))
+        first.amount = Decimal('600')
+        first.save()
+        moved.posted_at = timezone.now() - timedelta(days=5)
+        moved.save()
+        self.post('50').delete()
+        incremental = self.rollups()
+
+        self.assertEqual(rebuild_range(self.chama.pk, today - timedelta(days=60), today), len(incremental))
+        self.assertEqual(self.rollups(), incremental)
+        self.assertEqual(rebuild_day(self.chama.pk, today), 1)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_apply_creates_then_increments(self):
+        day = timezone.localdate() + timedelta(days=1)
+        _apply(self.chama.pk, day, {'inflow_amount': Decimal('10'), 'transaction_count': 1})
+        _apply(self.chama.pk, day, {'inflow_amount': Decimal('5'), 'transaction_count': 1})
+        _apply(self.chama.pk, day, {})
+        row = DailyRollup.objects.get(chama=self.chama, day=day)
+        self.assertEqual((row.inflow_amount, row.transaction_count), (Decimal('15'), 2))
+
+    def test_rebuild_drops_days_left_without_transactions(self):
+        day = timezone.localdate() + timedelta(days=1)
+        _apply(self.chama.pk, day, {'inflow_amount': Decimal('10'), 'transaction_count': 1})
+        self.assertEqual(rebuild_day(self.chama.pk, day), 0)
+        self.assertFalse(DailyRollup.objects.filter(chama=self.chama, day=day).exists())
+
+    def test_outstanding_loans_are_principal_left_on_schedules(self):
+        chama, (member,) = seed_chama(1, 0, name='Loans')
+        # 1200 over three installments at 10% flat: 400 principal and 120 interest each
+        loan = Loan.objects.create(
+            chama=chama, member=member, principal=Decimal('1200'), interest_rate=Decimal('10'), installments=3,
+            status=Loan.Status.ACTIVE, disbursed_at=timezone.now(),
+        )
+        for kind, amount in ((Transaction.Type.LOAN_DISBURSEMENT, '1200'), (Transaction.Type.LOAN_PAYMENT, '620')):
+            Transaction.objects.create(chama=chama, member=member, loan=loan, transaction_type=kind, amount=Decimal(amount))
+        totals = group_totals(chama.pk)
+        # The first installment is paid; the other 100 only covers interest
+        self.assertEqual(totals['outstanding_loans'], Decimal('800.00'))
+        self.assertEqual(totals['loans_disbursed'] - totals['loans_repaid'], Decimal('580'))
+
+class DefaulterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, cls.users = seed_chama(6, 0)
+        cls.now = timezone.now()
+        Chama.objects.filter(pk=cls.chama.pk).update(contribution_amount=Decimal('1000'), contribution_interval_days=30)
+        # Three periods have fallen due for everyone
+        Membership.objects.filter(chama=cls.chama).update(joined_at=cls.now - timedelta(days=95))
+        behind, partly, archived, paid_up, tied, former = cls.users
+        for member, amount in ((behind, '1000'), (partly, '2500'), (paid_up, '3000'), (tied, '2000')):
+            Transaction.objects.create(
+                chama=cls.chama, member=member, transaction_type=Transaction.Type.CONTRIBUTION,
+                amount=Decimal(amount), posted_at=cls.now - timedelta(days=10),
+            )
+        # Two periods paid in months that have since been archived
+        ArchivedTotal.objects.create(
+            chama=cls.chama, member=archived, transaction_type=Transaction.Type.CONTRIBUTION,
+            amount=Decimal('2000'), row_count=2, last_posted_at=cls.now - timedelta(days=50),
+        )
+        Membership.objects.filter(chama=cls.chama, user=former).update(is_active=False)
+
+    def test_arrears_ranking_and_archived_payments(self):
+        self.assertEqual(refresh_defaulters([self.chama.pk], now=self.now), 4)
+        behind, partly, archived, _, tied, _ = self.users
+        rows = list(
+            Defaulter.objects.filter(chama=self.chama).order_by('rank')
+            .values_list('rank', 'member_id', 'expected_amount', 'paid_amount', 'amount_due', 'days_overdue')
+        )
+        # Equal arrears: the longer overdue ranks first, then the member id
+        first, second = sorted([archived, tied], key=lambda user: user.pk)
+        self.assertEqual(rows, [
+            (1, behind.pk, Decimal('3000'), Decimal('1000'), Decimal('2000'), 35),
+            (2, first.pk, Decimal('3000'), Decimal('2000'), Decimal('1000'), 5),
+            (3, second.pk, Decimal('3000'), Decimal('2000'), Decimal('1000'), 5),
+            (4, partly.pk, Decimal('3000'), Decimal('2500'), Decimal('500'), 5),
+        ])
+        self.assertEqual(
+            Defaulter.objects.get(chama=self.chama, member=archived).last_contribution, self.now - timedelta(days=50)
+        )
+
+    def test_payments_in_one_transaction_refresh_once(self):
+        with mock.patch('chamas.defaulters.refresh_defaulters') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                for member in self.users[:3]:
+                    Transaction.objects.create(
+                        chama=self.chama, member=member, transaction_type=Transaction.Type.CONTRIBUTION,
+                        amount=Decimal('1000'),
+                    )
+                schedule_refresh(self.chama.pk)
+        # Chamas from transactions rolled back earlier may ride along
+        refresh.assert_called_once()
+        self.assertIn(self.chama.pk, refresh.call_args.args[0])
+
+class LoanScheduleTests(TestCase):
+    def schedule(self, method, principal='1000', rate='0', installments=3, custom_interest=None):
+        loan = Loan(
+            principal=Decimal(principal), interest_method=method, interest_rate=Decimal(rate),
+            installments=installments, custom_interest=custom_interest, disbursed_at=timezone.now(),
+        )
+        return [(row['principal'], row['interest'], row['total']) for row in build_schedule(loan)]
+
+    def test_flat_schedule_carries_the_remainder_last(self):
+        self.assertEqual(self.schedule(Loan.Method.FLAT, rate='2'), [
+            (Decimal('333.33'), Decimal('20.00'), Decimal('353.33')),
+            (Decimal('333.33'), Decimal('20.00'), Decimal('353.33')),
+            (Decimal('333.34'), Decimal('20.00'), Decimal('353.34')),
+        ])
+
+    def test_custom_interest_is_spread_evenly(self):
+        rows = self.schedule(Loan.Method.CUSTOM, custom_interest=Decimal('100'))
+        self.assertEqual([interest for _, interest, _ in rows], [Decimal('33.33'), Decimal('33.33'), Decimal('33.34')])
+        self.assertEqual(sum(total for _, _, total in rows), Decimal('1100'))
+
+    def test_reducing_balance_annuity(self):
+        # 1000 at 1% a period over 12: the textbook installment is 88.8488 -> 88.85
+        rows = self.schedule(Loan.Method.REDUCING_BALANCE, rate='1', installments=12)
+        self.assertEqual({total for _, _, total in rows[:-1]}, {Decimal('88.85')})
+        self.assertEqual(rows[0], (Decimal('78.85'), Decimal('10.00'), Decimal('88.85')))
+        # The last installment clears what rounding left over
+        self.assertEqual(rows[-1], (Decimal('87.96'), Decimal('0.88'), Decimal('88.84')))
+        self.assertEqual(sum(principal for principal, _, _ in rows), Decimal('1000'))
+        self.assertEqual(
+            [total for _, _, total in self.schedule(Loan.Method.REDUCING_BALANCE)],
+            [Decimal('333.33'), Decimal('333.33'), Decimal('333.34')],
+        )
+
+    def test_interest_on_the_largest_loans_does_not_overflow(self):
+        principal = 999_999_999_999
+        _, interest = schedule_arrays([principal], [9_999_999], [1], [0])
+        self.assertEqual(int(interest[0, 0]), (principal * 9_999_999 + 500_000) // 1_000_000)
+
+    def test_status_applies_repayments_oldest_first(self):
+        chama, (member,) = seed_chama(1, 0)
+        loan = Loan.objects.create(
+            chama=chama, member=member, principal=Decimal('1000'), interest_rate=Decimal('2'), installments=3,
+            status=Loan.Status.ACTIVE, disbursed_at=timezone.now(),
+        )
+        Transaction.objects.create(
+            chama=chama, member=member, loan=loan, transaction_type=Transaction.Type.LOAN_PAYMENT,
+            amount=Decimal('400'),
+        )
+        status = loan_status(loan)
+        self.assertEqual(status['remaining_balance'], Decimal('660.00'))
+        self.assertEqual(status['next_payment_amount'], Decimal('306.66'))
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, users = seed_chama(2, 0, name='Pages')
+        cls.treasurer = users[0]
+        Membership.objects.filter(chama=cls.chama, user=cls.treasurer).update(role=Membership.Role.TREASURER)
+        # Five rows share one instant, so ties straddle every page boundary
+        instant = timezone.now() - timedelta(hours=1)
+        types = [Transaction.Type.CONTRIBUTION, Transaction.Type.LOAN_PAYMENT]
+        Transaction.objects.bulk_create([
+            Transaction(
+                chama=cls.chama, member=users[i % 2], transaction_type=types[i % 2], amount=Decimal(100 + i),
+                posted_at=instant if i < 5 else instant - timedelta(minutes=i),
+            )
+            for i in range(8)
+        ])
+        cls.expected = list(
+            Transaction.objects.filter(chama=cls.chama).order_by('-posted_at', '-id').values_list('id', 'transaction_type')
+        )
+
+    def walk(self, **params):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.treasurer.pk))
+        response = client.get('/api/v1/chamas/transactions/', {'page_size': 2, **params}, HTTP_HOST='localhost')
+        seen = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.json()['results'])
+            if not response.json()['next']:
+                return seen
+            response = client.get(response.json()['next'], HTTP_HOST='localhost')
+
+    def test_pages_cover_ties_without_gaps_or_repeats(self):
+        self.assertEqual(self.walk(), [pk for pk, _ in self.expected])
+
+    def test_cursor_keeps_filters(self):
+        contributions = [pk for pk, kind in self.expected if kind == Transaction.Type.CONTRIBUTION]
+        self.assertEqual(self.walk(type=Transaction.Type.CONTRIBUTION), contributions)
+
+    def test_invalid_cursor_is_bad_request(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.treasurer.pk))
+        encode = lambda raw: base64.urlsafe_b64encode(raw.encode()).decode()
+        for cursor in ('not-a-cursor', encode('yesterday|5'), encode('2024-01-01T00:00:00|5'),
+                       encode('2024-01-01T00:00:00+00:00|99999999999999999999'), encode('2024-13-45T00:00:00+00:00|1')):
+            with self.subTest(cursor=cursor):
+                response = client.get('/api/v1/chamas/transactions/', {'cursor': cursor}, HTTP_HOST='localhost')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.json())
+
+class ContributionSheetTests(TestCase):
+    url = '/api/v1/chamas/contributions/bulk/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, cls.users = seed_chama(3, 0, name='Sheets')
+        cls.treasurer = cls.users[0]
+        Membership.objects.filter(chama=cls.chama, user=cls.treasurer).update(role=Membership.Role.TREASURER)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.treasurer.pk))
+
+    def sheet(self, *amounts):
+        members = self.users[1:]
+        return {'rows': [
+            {'email': members[0].email.upper(), 'amount': amounts[0], 'reference': 'R1'},
+            {'phone': members[1].phone_number, 'amount': amounts[1]},
+        ]}
+
+    def post(self, body, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, body, format='json', HTTP_HOST='localhost', **headers)
+
+    def ledger(self):
+        return Transaction.objects.filter(chama=self.chama)
+
+    def test_sheet_posts_contributions_and_rollups(self):
+        response = self.post(self.sheet('1500.50', 2000))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['total'], '3500.50')
+        self.assertEqual(
+            sorted(self.ledger().values_list('member_id', 'amount', 'reference')),
+            sorted([(self.users[1].pk, Decimal('1500.50'), 'R1'), (self.users[2].pk, Decimal('2000.00'), '')]),
+        )
+        self.assertEqual(group_totals(self.chama.pk)['contributions_month_to_date'], Decimal('3500.50'))
+
+    def test_invalid_row_writes_nothing(self):
+        response = self.post(self.sheet(500, '12.345'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([row['status'] for row in response.json()['results']], ['valid', 'invalid'])
+        self.assertIn('amount', response.json()['results'][1]['errors'])
+        self.assertFalse(self.ledger().exists())
+
+    def test_retry_replays_stored_response(self):
+        first = self.post(self.sheet(500, 700), key='sheet-1')
+        second = self.post(self.sheet(500, 700), key='sheet-1')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.ledger().count(), 2)
+
+    def test_key_reused_with_other_body_is_rejected(self):
+        self.post(self.sheet(500, 700), key='sheet-1')
+        self.assertEqual(self.post(self.sheet(500, 800), key='sheet-1').status_code, 422)
+        self.assertEqual(self.ledger().count(), 2)
+
+    def test_failed_request_releases_key(self):
+        self.assertEqual(self.post(self.sheet(500, 'lots'), key='sheet-1').status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.filter(key='sheet-1').exists())
+        response = self.post(self.sheet(500, 700), key='sheet-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_racing_retry_replays_winner(self):
+        first = self.post(self.sheet(500, 700), key='sheet-1')
+        # The retry looked before the original committed, so its claim collides
+        winner = IdempotencyKey.objects.get(key='sheet-1')
+        with mock.patch.object(idempotency, '_stored', side_effect=[None, winner]):
+            second = self.post(self.sheet(500, 700), key='sheet-1')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.ledger().count(), 2)
+
+STATEMENT_CSV = """\
+Safaricom M-PESA Statement
+Customer Name,UMOJA CHAMA
+
+Receipt No.,Completion Time,Details,Transaction Status,Paid In,Withdrawn,Other Party Info
+QAB1CD2EF3,2024-03-01 09:15:00,Funds received,Completed,"1,500.00",,0712345678 - JANE DOE
+qab1cd2ef4,01/03/2024 10:00:00,Funds received,Completed,200,,254722000111 - JOHN DOE
+QAB1CD2EF5,2024-03-01 11:00:00,Pay bill,Completed,,300.00,
+QAB1CD2EF6,2024-03-01 12:00:00,Funds received,Failed,50,,
+BAD,2024-03-01 12:30:00,Funds received,Completed,50,,
+QAB1CD2EF3,2024-03-01 09:15:00,Funds received,Completed,"1,500.00",,0712345678 - JANE DOE
+"""
+
+def xlsx_statement(rows):
+    """A one-sheet workbook mixing shared and inline strings; a None reference omits ``r``"""
+    ns = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+    strings, body = [], []
+    for number, cells in enumerate(rows, 1):
+        xml = []
+        for position, (ref, value) in enumerate(cells):
+            attribute = f' r="{ref}{number}"' if ref else ''
+            if isinstance(value, (int, float)):
+                xml.append(f'<c{attribute}><v>{value}</v></c>')
+            elif position % 2:
+                xml.append(f'<c{attribute} t="inlineStr"><is><t>{value}</t></is></c>')
+            else:
+                xml.append(f'<c{attribute} t="s"><v>{len(strings)}</v></c>')
+                strings.append(value)
+        body.append(f'<row r="{number}">{"".join(xml)}</row>')
+    shared = ''.join(f'<si><t>{value}</t></si>' for value in strings)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('xl/sharedStrings.xml', f'<sst xmlns="{ns}">{shared}</sst>')
+        archive.writestr('xl/worksheets/sheet1.xml', f'<worksheet xmlns="{ns}"><sheetData>{"".join(body)}</sheetData></worksheet>')
+    buffer.seek(0)
+    return buffer
+
+class MpesaImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama = Chama.objects.create(name='Imports', contribution_amount=Decimal('1000'))
+
+    def import_csv(self, text=STATEMENT_CSV, **kwargs):
+        return import_statement(self.chama, io.BytesIO(text.encode('utf-8-sig')), 'statement.csv', **kwargs)
+
+    def test_csv_rows_are_normalized_and_skipped(self):
+        payments = list(iter_payments(iter_rows(io.BytesIO(STATEMENT_CSV.encode()), 'statement.csv')))
+        self.assertEqual([reason for _, reason in payments], [None, None, 'not a payment in', 'not completed', 'malformed', None])
+        first, second = payments[0][0], payments[1][0]
+        self.assertEqual(
+            (first['receipt'], first['amount'], first['phone_number'], first['payer_name']),
+            ('QAB1CD2EF3', Decimal('1500.00'), '254712345678', 'JANE DOE'),
+        )
+        self.assertEqual(second['receipt'], 'QAB1CD2EF4')
+        self.assertEqual(first['completed_at'], second['completed_at'] - timedelta(minutes=45))
+
+    def test_xlsx_cells_without_reference_follow_previous_cell(self):
+        workbook = xlsx_statement([
+            [('A', 'Receipt No.'), (None, 'Completion Time'), (None, 'Paid In'), ('E', 'Other Party Info')],
+            [(None, 'QAB1CD2EF3'), (None, '2024-03-01 09:15:00'), ('C', 1500), (None, 'skipped column'), (None, '0712345678 - JANE')],
+        ])
+        rows = list(iter_rows(workbook, 'statement.xlsx'))
+        self.assertEqual(rows[1], ['QAB1CD2EF3', '2024-03-01 09:15:00', '1500', 'skipped column', '0712345678 - JANE'])
+        (payment, _), = iter_payments(iter(rows))
+        self.assertEqual((payment['amount'], payment['phone_number']), (Decimal('1500.00'), '254712345678'))
+
+    def test_reimport_counts_duplicates(self):
+        statement = self.import_csv(chunk_size=2)
+        self.assertEqual(
+            (statement.status, statement.rows_read, statement.rows_imported, statement.duplicates, statement.rows_skipped),
+            (StatementImport.Status.COMPLETED, 6, 2, 1, 3),
+        )
+        again = self.import_csv()
+        self.assertEqual((again.rows_imported, again.duplicates), (0, 3))
+        self.assertEqual(MpesaPayment.objects.filter(chama=self.chama).count(), 2)
+
+    def test_receipts_taken_by_concurrent_import_are_duplicates(self):
+        bulk_create = MpesaPayment.objects.bulk_create
+
+        def racing(payments, **kwargs):
+            # Another import commits one receipt between the lookup and the insert
+            other = Chama.objects.create(name='Racer', contribution_amount=Decimal('1000'))
+            MpesaPayment.objects.create(
+                chama=other, receipt=payments[0].receipt, completed_at=payments[0].completed_at, amount=Decimal('1'),
+            )
+            return bulk_create(payments, **kwargs)
+
+        with mock.patch.object(MpesaPayment.objects, 'bulk_create', side_effect=racing):
+            statement = self.import_csv()
+        self.assertEqual((statement.rows_imported, statement.duplicates), (1, 2))
+        self.assertEqual(MpesaPayment.objects.filter(chama=self.chama).count(), 1)
+
+    def test_unreadable_file_fails_import(self):
+        statement = import_statement(self.chama, io.BytesIO(b'not a zip'), 'statement.xlsx')
+        self.assertEqual(statement.status, StatementImport.Status.FAILED)
+        self.assertIn('XLSX', statement.error)
+
+class ReconciliationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Joined 35 days ago: period 1 fell due 5 days ago, period 2 is ahead
+        cls.chama, cls.users = seed_chama(4, 0, days=35, name='Reconcile')
+        Chama.objects.filter(pk=cls.chama.pk).update(contribution_interval_days=30)
+        User.objects.filter(pk=cls.users[3].pk).update(phone_number=cls.users[2].phone_number)
+        now = timezone.now()
+        cls.payments = {
+            name: MpesaPayment.objects.create(
+                chama=cls.chama, receipt=f'QRC00000{number}', completed_at=now, amount=Decimal(amount), phone_number=phone,
+            )
+            for number, (name, phone, amount) in enumerate((
+                ('paid', cls.users[0].phone_number, '5000'),
+                ('shared phone', cls.users[2].phone_number, '5000'),
+                ('stranger', '254799999999', '5000'),
+                ('odd amount', cls.users[1].phone_number, '1234'),
+            ))
+        }
+
+    def payment(self, name):
+        return MpesaPayment.objects.filter(chama=self.chama).get(pk=self.payments[name].pk)
+
+    def test_outcomes(self):
+        stats = reconcile_chama(self.chama.pk)
+        self.assertEqual(
+            {key: stats[key] for key in ('payments', 'matched', 'review', 'unmatched')},
+            {'payments': 4, 'matched': 1, 'review': 2, 'unmatched': 1},
+        )
+        paid = self.payment('paid')
+        self.assertEqual((paid.status, paid.member_id), (MpesaPayment.Status.MATCHED, self.users[0].pk))
+        self.assertEqual(
+            (paid.transaction.transaction_type, paid.transaction.amount, paid.transaction.reference),
+            (Transaction.Type.CONTRIBUTION, Decimal('5000.00'), paid.receipt),
+        )
+
+        shared = self.payment('shared phone')
+        self.assertEqual(shared.status, MpesaPayment.Status.REVIEW)
+        self.assertIn('more than one member', shared.review_reason)
+        self.assertEqual({candidate['member_id'] for candidate in shared.candidates}, {str(self.users[2].pk), str(self.users[3].pk)})
+
+        odd = self.payment('odd amount')
+        self.assertEqual(odd.status, MpesaPayment.Status.REVIEW)
+        self.assertEqual([candidate['label'] for candidate in odd.candidates], ['Contribution period 1'])
+
+        stranger = self.payment('stranger')
+        self.assertEqual((stranger.status, stranger.reconciled_at), (MpesaPayment.Status.UNMATCHED, None))
+
+    def test_review_payments_match_once_expectation_arrives(self):
+        reconcile_chama(self.chama.pk)
+        # A loan whose installments are the amount the member paid
+        loan = Loan.objects.create(
+            chama=self.chama, member=self.users[1], principal=Decimal('2468'), interest_rate=Decimal('0'),
+            installments=2, status=Loan.Status.ACTIVE, disbursed_at=timezone.now() - timedelta(days=25),
+        )
+        stats = reconcile_chama(self.chama.pk)
+        self.assertEqual((stats['payments'], stats['matched'], stats['review']), (3, 1, 1))
+
+        odd = self.payment('odd amount')
+        self.assertEqual((odd.status, odd.review_reason, odd.candidates), (MpesaPayment.Status.MATCHED, '', []))
+        self.assertEqual((odd.transaction.transaction_type, odd.transaction.loan_id), (Transaction.Type.LOAN_PAYMENT, loan.pk))
+        # Nothing already matched is posted again
+        self.assertEqual(Transaction.objects.filter(chama=self.chama, reference=self.payments['paid'].receipt).count(), 1)
+
+@override_settings(EVENTS_BACKEND='chamas.tests.RecordingBackend')
+class RotationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, cls.users = seed_chama(4, 0, name='Rotation')
+        cls.first_payout = timezone.now() + timedelta(days=7)
+
+    def setUp(self):
+        self.published = get_backend().events
+        self.published.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_cycle(self.chama, self.first_payout)
+
+    def order(self):
+        return list(
+            RotationSlot.objects.filter(chama=self.chama, cycle=current_cycle(self.chama.pk))
+            .order_by('position').values_list('member_id', flat=True)
+        )
+
+    def member(self, index):
+        return self.users[index].pk
+
+    def test_generate_schedules_every_member_and_publishes_meetings(self):
+        self.assertEqual(self.order(), [self.member(i) for i in range(4)])
+        slots = RotationSlot.objects.filter(chama=self.chama).order_by('position')
+        self.assertEqual(
+            [slot.scheduled_for for slot in slots], [self.first_payout + timedelta(days=30 * i) for i in range(4)],
+        )
+        self.assertEqual(
+            [(event.type, event.data['id']) for event in self.published],
+            [(MEETING_UPDATED, slot.meeting_id) for slot in slots],
+        )
+        self.assertEqual(member_position(self.chama.pk, self.member(2)), (3, 4))
+
+        # A second cycle on the same dates reuses the meetings
+        self.published.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_cycle(self.chama, self.first_payout, order=[self.member(i) for i in (3, 2, 1, 0)])
+        self.assertEqual(self.order(), [self.member(i) for i in (3, 2, 1, 0)])
+        self.assertEqual([event.type for event in self.published], [])
+        with self.assertRaises(RotationError):
+            generate_cycle(self.chama, self.first_payout, order=[self.member(0)])
+
+    def test_skip_moves_member_to_end(self):
+        skip_turn(self.chama.pk, 2)
+        self.assertEqual(self.order(), [self.member(i) for i in (0, 2, 3, 1)])
+        with self.assertRaises(RotationError):
+            skip_turn(self.chama.pk, 9)
+
+    def test_swap_exchanges_turns(self):
+        swap_turns(self.chama.pk, 1, 4)
+        self.assertEqual(self.order(), [self.member(i) for i in (3, 1, 2, 0)])
+
+    def test_join_and_leave(self):
+        user = User.objects.create_user(
+            email='rotation-new@example.com', username='rotation-new', password='!', phone_number='254711000999',
+        )
+        self.published.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            membership = Membership.objects.create(chama=self.chama, user=user)
+        self.assertEqual(self.order(), [self.member(i) for i in range(4)] + [user.pk])
+        self.assertEqual(member_position(self.chama.pk, user.pk), (5, 5))
+        self.assertEqual([event.type for event in self.published], [MEETING_UPDATED])
+        joined_meeting = self.published[0].data['id']
+
+        membership.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            membership.save()
+        self.assertEqual(self.order(), [self.member(i) for i in range(4)])
+        self.assertEqual(member_position(self.chama.pk, self.member(0)), (1, 4))
+        self.assertFalse(Meeting.objects.filter(chama=self.chama, pk=joined_meeting).exists())
+
+        Membership.objects.filter(chama=self.chama, user_id=self.member(1)).get().delete()
+        self.assertEqual(self.order(), [self.member(i) for i in (0, 2, 3)])
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EXPORT_BACKGROUND_WORKERS=0, EXPORT_LEASE_SECONDS=300)
+class ExportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, cls.users = seed_chama(2, 5, name='Jobs')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def job(self, **fields):
+        return ExportJob.objects.create(
+            chama=self.chama, requested_by=self.users[0], report=ExportJob.Report.GROUP, **fields,
+        )
+
+    def status(self, job):
+        return ExportJob.objects.filter(chama=self.chama).values_list('status', flat=True).get(pk=job.pk)
+
+    def test_jobs_of_dead_workers_are_reclaimed(self):
+        pending = self.job()
+        abandoned = self.job(status=ExportJob.Status.RUNNING, heartbeat_at=timezone.now() - timedelta(minutes=10))
+        busy = self.job(status=ExportJob.Status.RUNNING, heartbeat_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(self.status(pending), ExportJob.Status.COMPLETED)
+        self.assertEqual(self.status(abandoned), ExportJob.Status.COMPLETED)
+        self.assertEqual(self.status(busy), ExportJob.Status.RUNNING)
+        self.assertIsNone(run_export(busy.pk))
+
+    @override_settings(EXPORT_LEASE_SECONDS=0.003)
+    def test_long_renders_renew_their_lease(self):
+        job = self.job()
+        beats = []
+
+        def rendering(*args):
+            # Each block takes longer than a third of the lease
+            for _ in range(3):
+                beats.append(ExportJob.objects.filter(chama=self.chama).values_list('heartbeat_at', flat=True).get(pk=job.pk))
+                time.sleep(0.002)
+                yield b'block\n'
+
+        with mock.patch('chamas.exports.render', rendering):
+            run_export(job.pk)
+        self.assertEqual(self.status(job), ExportJob.Status.COMPLETED)
+        self.assertEqual(len(set(beats)), 3)
+
+    def test_csv_cells_never_start_formulas(self):
+        member = self.users[0]
+        User.objects.filter(pk=member.pk).update(first_name='@SUM(A1)')
+        row = Transaction.objects.filter(chama=self.chama, member=member).order_by('posted_at').first()
+        Transaction.objects.filter(chama=self.chama, pk=row.pk).update(
+            description='=HYPERLINK("http://example.com")', reference='+254700000000',
+        )
+        for report, extra in ((ExportJob.Report.GROUP, {}), (ExportJob.Report.STATEMENT, {'member': member})):
+            with self.subTest(report=report):
+                content = b''.join(render(report, ExportJob.Format.CSV, self.chama, **extra)).decode()
+                cells = {cell for line in csv.reader(io.StringIO(content)) for cell in line}
+                self.assertIn("'=HYPERLINK(\"http://example.com\")", cells)
+                self.assertIn("'+254700000000", cells)
+                # Negative amounts are numbers, not text
+                self.assertFalse({cell for cell in cells if cell.startswith(('=', '+', '@'))})
+        self.assertIn("'@SUM(A1)", b''.join(render(ExportJob.Report.GROUP, ExportJob.Format.CSV, self.chama)).decode())
+
+class ContributionAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, users = seed_chama(3, 0, days=100, name='Quiet')
+        cls.treasurer = users[0]
+        Membership.objects.filter(chama=cls.chama, user=cls.treasurer).update(role=Membership.Role.TREASURER)
+
+    def test_chama_without_contributions_has_no_nan(self):
+        empty = Chama.objects.create(name='Empty', contribution_amount=Decimal('0'))
+        for chama in (self.chama, empty):
+            with self.subTest(chama=chama.name):
+                report = build_contribution_report(chama)
+                # Strict JSON: NaN and infinity must have become null
+                json.dumps(report, allow_nan=False)
+                for month in report['trend']:
+                    self.assertEqual((month['total'], month['contributors'], month['growth']), (0, 0, None))
+                    self.assertEqual(set(month['percentiles'].values()), {None})
+
+        report = build_contribution_report(self.chama)
+        self.assertEqual(report['trend'][-1]['participation'], 0.0)
+        self.assertEqual(report['consistency']['percentiles'], {'p25': 0.0, 'p50': 0.0, 'p75': 0.0, 'p90': 0.0})
+        self.assertEqual({member['variability'] for member in report['consistency']['at_risk']}, {None})
+        report = build_contribution_report(empty)
+        self.assertEqual(report['trend'][-1]['participation'], None)
+        self.assertEqual(set(report['consistency']['percentiles'].values()), {None})
+
+    def test_endpoint_serves_empty_report(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=self.treasurer.pk))
+        response = client.get('/api/v1/chamas/analytics/contributions/', HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'NaN', response.content)
+        self.assertEqual(response.json()['consistency']['members'], 3)
+
+class StreamingExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        per_member = 50
+        cls.chama, cls.users = seed_chama(max(EXPORT_TEST_ROWS // per_member, 1), per_member)
+        cls.rows = Transaction.objects.filter(chama=cls.chama).count()
+
+    def consume(self, stream):
+        """Drain an export; returns (bytes, lines, peak traced memory)"""
+        tracemalloc.start()
+        try:
+            size = lines = 0
+            for block in stream:
+                size += len(block)
+                lines += block.count(b'\n')
+            return size, lines, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_group_csv_stays_under_memory_ceiling(self):
+        _, lines, peak = self.consume(render(ExportJob.Report.GROUP, ExportJob.Format.CSV, self.chama))
+        self.assertEqual(lines, self.rows + 1)
+        self.assertLess(peak, EXPORT_MEMORY_CEILING)
+
+    def test_group_pdf_stays_under_memory_ceiling(self):
+        stream = render(ExportJob.Report.GROUP, ExportJob.Format.PDF, self.chama)
+        _, _, peak = self.consume(stream)
+        self.assertLess(peak, EXPORT_MEMORY_CEILING)
+
+    def test_pdf_cross_reference_offsets(self):
+        member = self.users[0]
+        pdf = b''.join(render(ExportJob.Report.STATEMENT, ExportJob.Format.PDF, self.chama, member))
+        self.assertTrue(pdf.startswith(b'%PDF-1.4'))
+        self.assertTrue(pdf.endswith(b'%%EOF\n'))
+        xref = int(pdf[pdf.rindex(b'startxref') + len(b'startxref'):].split()[0])
+        lines = pdf[xref:].split(b'\n')
+        size = int(lines[1].split()[1])
+        for number in range(1, size):
+            offset = int(lines[2 + number][:10])
+            self.assertTrue(pdf[offset:].startswith(b'%d 0 obj' % number))
+
+    def test_statement_running_balance(self):
+        member = self.users[0]
+        body = b''.join(render(ExportJob.Report.STATEMENT, ExportJob.Format.CSV, self.chama, member)).decode()
+        last = body.strip().splitlines()[-1].split(',')
+        expected = Decimal('0')
+        for kind, amount in Transaction.objects.filter(
+            chama=self.chama, member=member, status=Transaction.Status.COMPLETED
+        ).values_list('transaction_type', 'amount'):
+            expected += amount if kind in Transaction.INFLOW_TYPES else -amount
+        self.assertEqual(Decimal(last[-1]), expected)
+
+MEMBER_PATHS = [
+    '/api/v1/chamas/transactions/',
+    '/api/v1/chamas/rotation/',
+    '/api/v1/chamas/exports/statement/',
+    '/api/v1/accounts/dashboard/summary/',
+]
+TREASURER_PATHS = MEMBER_PATHS + [
+    '/api/v1/chamas/mpesa-imports/',
+    '/api/v1/chamas/mpesa-payments/',
+    '/api/v1/chamas/analytics/contributions/',
+    '/api/v1/chamas/exports/group/?output=pdf',
+    '/api/v1/accounts/dashboard/loan-projection/',
+]
+
+@override_settings(TENANCY_STRICT=True)
+class TenancyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, users = seed_chama(4, 5, name='Chama A')
+        cls.other, _ = seed_chama(4, 5, name='Chama B')
+        cls.treasurer, cls.member = users[0], users[1]
+        Membership.objects.filter(chama=cls.chama, user=cls.treasurer).update(role=Membership.Role.TREASURER)
+        Membership.objects.create(chama=cls.other, user=cls.treasurer)
+
+    def get(self, user, path, **headers):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(path, HTTP_HOST='localhost', **headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def test_unscoped_queries_raise(self):
+        with self.assertRaises(UnscopedQueryError):
+            Transaction.objects.count()
+        with self.assertRaises(UnscopedQueryError):
+            list(Loan.objects.filter(status=Loan.Status.ACTIVE))
+        self.assertTrue(Transaction.objects.filter(chama=self.chama).exists())
+        self.assertTrue(Transaction.objects.unscoped().exists())
+
+    def test_api_only_runs_scoped_queries(self):
+        # Any unscoped tenant query raises UnscopedQueryError and fails here
+        for user, paths in ((self.member, MEMBER_PATHS), (self.treasurer, TREASURER_PATHS)):
+            for path in paths:
+                with self.subTest(user=user.email, path=path):
+                    self.assertLess(self.get(user, path).status_code, 300)
+
+    def test_default_manager_filters_on_current_chama(self):
+        with tenant(self.other.pk):
+            chamas = set(Transaction.objects.values_list('chama_id', flat=True))
+        self.assertEqual(chamas, {self.other.pk})
+
+    def test_chama_header_selects_tenant_and_role(self):
+        header = {'HTTP_X_CHAMA_ID': str(self.other.pk)}
+        self.assertEqual(self.get(self.treasurer, '/api/v1/chamas/exports/group/').status_code, 200)
+        self.assertEqual(self.get(self.treasurer, '/api/v1/chamas/exports/group/', **header).status_code, 403)
+        # A member in the other chama, so only their own (no) rows
+        self.assertTrue(self.get(self.treasurer, '/api/v1/chamas/transactions/').json()['results'])
+        self.assertEqual(self.get(self.treasurer, '/api/v1/chamas/transactions/', **header).json()['results'], [])
+        self.assertEqual(self.get(self.member, '/api/v1/chamas/transactions/', **header).status_code, 403)
+
+    def test_staff_get_no_treasurer_rights(self):
+        staff = User.objects.create_user('staff@example.com', 'pass-12345', phone_number='254799000001', is_staff=True)
+        header = {'HTTP_X_CHAMA_ID': str(self.chama.pk)}
+        self.assertEqual(self.get(staff, '/api/v1/chamas/exports/group/', **header).status_code, 403)
+        Membership.objects.create(chama=self.chama, user=staff)
+        self.assertEqual(self.get(staff, '/api/v1/chamas/exports/group/', **header).status_code, 403)
+        self.assertFalse(is_treasurer(staff, self.other.pk))
+
+        admin = User.objects.create_superuser('admin@example.com', 'pass-12345', phone_number='254799000002')
+        self.assertEqual(self.get(admin, '/api/v1/chamas/exports/group/', **header).status_code, 200)
+
+    def test_filtering_on_another_chama_raises(self):
+        with tenant(self.chama.pk):
+            self.assertTrue(Transaction.objects.filter(chama=self.chama).exists())
+            self.assertTrue(Transaction.objects.filter(chama_id__in=[self.chama.pk, self.other.pk]).exists())
+            with self.assertRaises(ChamaMismatchError):
+                Transaction.objects.filter(chama_id=self.other.pk)
+            with self.assertRaises(ChamaMismatchError):
+                Loan.objects.filter(status=Loan.Status.ACTIVE).filter(chama=self.other)
+            with self.assertRaises(ChamaMismatchError):
+                Transaction.objects.filter(chama_id__in=[str(self.other.pk)])
+            chamas = set(Transaction.objects.unscoped().filter(chama=self.other).values_list('chama_id', flat=True))
+        self.assertEqual(chamas, {self.other.pk})
+
+    def test_chama_header_is_allowed_cross_origin(self):
+        response = APIClient().options(
+            '/api/v1/chamas/transactions/', HTTP_HOST='localhost', HTTP_ORIGIN='http://localhost:5173',
+            HTTP_ACCESS_CONTROL_REQUEST_METHOD='GET', HTTP_ACCESS_CONTROL_REQUEST_HEADERS='authorization, x-chama-id',
+        )
+        self.assertIn('x-chama-id', response['Access-Control-Allow-Headers'])
+
+    def test_roles_are_resolved_once_per_context(self):
+        with tenant(self.chama.pk):
+            with self.assertNumQueries(1):
+                for _ in range(3):
+                    self.assertEqual(get_role(self.treasurer), Membership.Role.TREASURER)
+
+class LedgerArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, cls.users = seed_chama(10, 60, days=400)
+
+    def snapshot(self):
+        member = self.users[0]
+        refresh_defaulters([self.chama.pk])
+        return {
+            'statement': b''.join(render(ExportJob.Report.STATEMENT, ExportJob.Format.CSV, self.chama, member)),
+            'group': b''.join(render(ExportJob.Report.GROUP, ExportJob.Format.CSV, self.chama)),
+            'dashboard': build_member_summary(member, self.chama.pk)['contribution_summary'],
+            'defaulters': list(
+                Defaulter.objects.filter(chama=self.chama).order_by('rank')
+                .values_list('member_id', 'paid_amount', 'last_contribution')
+            ),
+        }
+
+    def test_archiving_is_invisible_to_exports_and_balances(self):
+        before = self.snapshot()
+        rows = Transaction.objects.filter(chama=self.chama).count()
+
+        today = timezone.localdate()
+        archived = 0
+        for index in range(today.year * 12 + today.month - 15, today.year * 12 + today.month - 4):
+            year, month = divmod(index, 12)
+            archived += archive_month(year, month + 1)[0]
+
+        self.assertGreater(archived, 0)
+        self.assertEqual(Transaction.objects.filter(chama=self.chama).count(), rows - archived)
+        self.assertEqual(
+            sum(LedgerArchive.objects.filter(chama=self.chama).values_list('row_count', flat=True)), archived
+        )
+        self.assertEqual(self.snapshot(), before)
+
+    def assertFilteredReportsContinueBalance(self, date_from):
+        member = self.users[0].pk
+        for full, filtered in (
+            (statement_rows(self.chama.pk, member)[1], statement_rows(self.chama.pk, member, date_from)[1]),
+            (group_rows(self.chama.pk)[1], group_rows(self.chama.pk, date_from)[1]),
+        ):
+            full, filtered = list(full), list(filtered)
+            self.assertTrue(0 < len(filtered) < len(full))
+            self.assertEqual(filtered, full[-len(filtered):])
+
+    def test_filtered_reports_open_with_earlier_balance(self):
+        today = timezone.localdate()
+        self.assertFilteredReportsContinueBalance(today - timedelta(days=60))
+        for index in range(today.year * 12 + today.month - 15, today.year * 12 + today.month - 4):
+            year, month = divmod(index, 12)
+            archive_month(year, month + 1)
+        # Starting after the archive (ArchivedTotal) and inside it (archived rows)
+        self.assertFilteredReportsContinueBalance(today - timedelta(days=60))
+        self.assertFilteredReportsContinueBalance(today - timedelta(days=250))
+
+class LedgerIntegrityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, cls.users = seed_chama(5, 20)
+        cls.rows = Transaction.objects.filter(chama=cls.chama).count()
+
+    def post(self, amount='100'):
+        return Transaction.objects.create(
+            chama=self.chama, member=self.users[0], transaction_type=Transaction.Type.CONTRIBUTION,
+            amount=Decimal(amount),
+        )
+
+    def test_rows_are_chained_in_order(self):
+        txn = self.post()
+        seqs = list(Transaction.objects.filter(chama=self.chama).order_by('chain_seq').values_list('chain_seq', flat=True))
+        self.assertEqual(seqs, list(range(1, self.rows + 2)))
+        self.assertEqual(txn.chain_seq, self.rows + 1)
+        result = verify_chama(self.chama.pk)
+        self.assertIsNone(result['error'])
+        self.assertEqual(result['rows'], self.rows + 1)
+
+    def test_verification_resumes_from_checkpoint(self):
+        first = verify_chama(self.chama.pk, max_rows=30, checkpoint_every=10)
+        self.assertEqual((first['rows'], first['last_seq']), (30, 30))
+        self.assertEqual(LedgerCheckpoint.objects.filter(chama=self.chama).count(), 3)
+        rest = verify_chama(self.chama.pk)
+        self.assertEqual((rest['first_seq'], rest['last_seq']), (31, self.rows))
+        self.post()
+        self.assertEqual(verify_chama(self.chama.pk)['rows'], 1)
+
+    def test_tampering_is_detected(self):
+        ledger = Transaction.objects.filter(chama=self.chama)
+        ledger.filter(chain_seq=40).update(amount=F('amount') + 1)
+        self.assertEqual(verify_chama(self.chama.pk)['error'], 'row 40 does not match its hash')
+        ledger.filter(chain_seq=40).update(amount=F('amount') - 1)
+        ledger.filter(chain_seq=60).delete()
+        self.assertEqual(verify_chama(self.chama.pk)['error'], 'rows 60 to 60 are missing')
+
+    def test_full_verification_reads_archived_rows(self):
+        today = timezone.localdate()
+        for index in range(today.year * 12 + today.month - 14, today.year * 12 + today.month - 3):
+            year, month = divmod(index, 12)
+            archive_month(year, month + 1)
+        self.assertLess(Transaction.objects.filter(chama=self.chama).count(), self.rows)
+        result = verify_chama(self.chama.pk, full=True)
+        self.assertIsNone(result['error'])
+        self.assertEqual(result['rows'], self.rows)
+
+    def test_backfill_chains_existing_rows(self):
+        # As the ledger was before rows were chained
+        Transaction.objects.filter(chama=self.chama).update(chain_seq=None, chain_hash='')
+        LedgerHead.objects.filter(chama=self.chama).delete()
+        self.assertEqual(backfill_chama(self.chama.pk, batch_size=30), self.rows)
+        self.assertIsNone(verify_chama(self.chama.pk, full=True)['error'])
+
+class FineAccrualTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, (cls.late, cls.paid_up) = seed_chama(2, 0)
+        Chama.objects.filter(pk=cls.chama.pk).update(
+            contribution_amount=Decimal('1000'), late_contribution_fine=Decimal('100'),
+            late_repayment_fine=Decimal('500'), fine_grace_days=3,
+        )
+        cls.now = timezone.now()
+        Membership.objects.filter(chama=cls.chama).update(joined_at=cls.now - timedelta(days=100))
+        # Three periods are past due; one is paid for and one fully paid up
+        for member, amount in ((cls.late, '1000'), (cls.paid_up, '3000')):
+            Transaction.objects.create(
+                chama=cls.chama, member=member, transaction_type=Transaction.Type.CONTRIBUTION,
+                amount=Decimal(amount),
+            )
+        # Installments due on days 30, 60 and 90; only the first is repaid
+        loan = Loan.objects.create(
+            chama=cls.chama, member=cls.late, principal=Decimal('1200'), installments=3,
+            status=Loan.Status.ACTIVE, disbursed_at=cls.now - timedelta(days=70),
+        )
+        Transaction.objects.create(
+            chama=cls.chama, member=cls.late, loan=loan, transaction_type=Transaction.Type.LOAN_PAYMENT,
+            amount=Decimal('400'),
+        )
+
+    def test_late_obligations_are_fined_once(self):
+        result = accrue_fines(now=self.now, chunk_size=1)
+        self.assertEqual((result['late_contributions'], result['late_repayments'], result['created']), (2, 1, 3))
+        fines = Fine.objects.filter(chama=self.chama)
+        self.assertEqual(
+            sorted(fines.values_list('member_id', 'reason', 'period', 'amount')),
+            sorted([
+                (self.late.pk, Fine.Reason.LATE_CONTRIBUTION, 2, Decimal('100')),
+                (self.late.pk, Fine.Reason.LATE_CONTRIBUTION, 3, Decimal('100')),
+                (self.late.pk, Fine.Reason.LATE_REPAYMENT, 2, Decimal('500')),
+            ]),
+        )
+        self.assertEqual(build_treasurer_summary(self.late, self.chama.pk)['pending_actions']['overdue_fines'], 3)
+
+        rerun = accrue_fines(now=self.now + timedelta(hours=1))
+        self.assertEqual((rerun['late_contributions'], rerun['late_repayments'], rerun['created']), (0, 0, 0))
+        # The constraints hold even if two runs race
+        duplicate = fines.filter(reason=Fine.Reason.LATE_CONTRIBUTION).first()
+        duplicate.pk = None
+        Fine.objects.bulk_create([duplicate], ignore_conflicts=True)
+        self.assertEqual(fines.count(), 3)
+
+    def test_grace_period_and_lookback(self):
+        # Period 3 and installment 2 fell due 10 days ago
+        Chama.objects.filter(pk=self.chama.pk).update(fine_grace_days=15)
+        result = accrue_fines(now=self.now)
+        self.assertEqual((result['late_contributions'], result['late_repayments']), (1, 0))
+        Fine.objects.filter(chama=self.chama).delete()
+
+        # Period 2 fell due 40 days ago
+        Chama.objects.filter(pk=self.chama.pk).update(fine_grace_days=3)
+        with override_settings(FINE_LOOKBACK_DAYS=30):
+            result = accrue_fines(now=self.now)
+        self.assertEqual((result['late_contributions'], result['late_repayments']), (1, 1))
+        self.assertEqual(
+            Fine.objects.get(chama=self.chama, reason=Fine.Reason.LATE_CONTRIBUTION).period, 3
+        )
+
+class FlakyPushTransport(LocalPushTransport):
+    """Sends its second batch, then crashes before the run is checkpointed"""
+    crashed = False
+
+    def send(self, messages):
+        accepted = super().send(messages)
+        if len(self.outbox) > len(messages) and not self.crashed:
+            self.crashed = True
+            raise ConnectionError('push provider went away')
+        return accepted
+
+class NotificationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, cls.users = seed_chama(6, 0, name='Umoja')
+        UserProfile.objects.bulk_create([
+            UserProfile(user=cls.users[0]),
+            UserProfile(user=cls.users[1], sms_notifications=True),
+            UserProfile(user=cls.users[2], email_notifications=False, push_notifications=False),
+        ])
+
+    def channels(self, push='chamas.notifications.LocalPushTransport'):
+        return load_channels({
+            'email': {
+                'transport': 'chamas.notifications.EmailTransport',
+                'options': {'backend': 'django.core.mail.backends.locmem.EmailBackend'},
+                'batch_size': 2,
+            },
+            'sms': {'transport': 'chamas.notifications.LocalSMSTransport', 'batch_size': 2},
+            'push': {'transport': push, 'batch_size': 2},
+        })
+
+    def test_recipients_follow_preferences_in_one_query(self):
+        with self.assertNumQueries(1):
+            grouped = recipients(self.chama.pk)
+        everyone_but_2 = sorted(user.pk for user in self.users if user != self.users[2])
+        self.assertEqual([row[0] for row in grouped['email']], everyone_but_2)
+        self.assertEqual([row[0] for row in grouped['push']], everyone_but_2)
+        self.assertEqual([row[0] for row in grouped['sms']], [self.users[1].pk])
+
+    def test_fan_out_sends_each_channel_once(self):
+        run = queue(self.chama.pk, 'test', 'Hello {first_name}', '{chama} meets on Friday')
+        self.assertEqual(queue(self.chama.pk, 'test', 'Again', 'Again').pk, run.pk)
+        channels = self.channels()
+        run = deliver(run.pk, channels)
+        self.assertEqual(run.status, NotificationRun.Status.COMPLETED)
+        self.assertEqual(run.sent, {'email': 5, 'sms': 1, 'push': 5})
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].body, 'Umoja meets on Friday')
+        self.assertEqual(channels['sms'].transport.outbox[0].address, self.users[1].phone_number)
+        self.assertIsNone(deliver(run.pk, channels))
+
+    def test_crashed_run_resumes_without_double_sending(self):
+        run = queue(self.chama.pk, 'test', 'Reminder', 'Hi {first_name}')
+        channels = self.channels(push='chamas.tests.FlakyPushTransport')
+        with self.assertLogs('chamas.notifications', 'ERROR'):
+            run = deliver(run.pk, channels)
+        self.assertEqual(run.status, NotificationRun.Status.FAILED)
+        self.assertEqual(run.sent['push'], 2)
+
+        run = deliver(run.pk, channels)
+        self.assertEqual(run.status, NotificationRun.Status.COMPLETED)
+        # The batch sent before the crash was resent and dropped by the provider
+        self.assertEqual(len(channels['push'].transport.outbox), 5)
+        self.assertEqual(len({message.key for message in channels['push'].transport.outbox}), 5)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_run_resumed_elsewhere_resends_only_the_unrecorded_batch(self):
+        run = queue(self.chama.pk, 'test', 'Reminder', 'Hi {first_name}')
+        crashed = self.channels(push='chamas.tests.FlakyPushTransport')
+        with self.assertLogs('chamas.notifications', 'ERROR'):
+            deliver(run.pk, crashed)
+
+        # A new worker remembers no keys: delivery is at least once
+        resumed = self.channels()
+        run = deliver(run.pk, resumed)
+        self.assertEqual(run.status, NotificationRun.Status.COMPLETED)
+        self.assertEqual(run.sent['push'], 5)
+        first = [message.key for message in crashed['push'].transport.outbox]
+        second = [message.key for message in resumed['push'].transport.outbox]
+        self.assertEqual(second[:2], first[2:])
+        self.assertEqual(len(set(first + second)), 5)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_user_text_with_braces_is_sent_as_written(self):
+        Chama.objects.filter(pk=self.chama.pk).update(name='Umoja {2024}')
+        Meeting.objects.create(chama=self.chama, scheduled_for=timezone.now() + timedelta(hours=2), location='Hall {B}')
+        runs = queue_meeting_reminders() + queue_payment_due_notices()
+        for run in runs:
+            self.assertEqual(deliver(run.pk, self.channels()).status, NotificationRun.Status.COMPLETED)
+        reminder, notice = mail.outbox[0], mail.outbox[5]
+        self.assertTrue(reminder.subject.startswith('Umoja {2024} meets '))
+        self.assertTrue(reminder.body.endswith(' at Hall {B}.'))
+        self.assertEqual(notice.subject, 'Umoja {2024} contribution due')
+
+    def test_rate_limiter_spaces_batches(self):
+        now, slept = [0.0], []
+        limiter = RateLimiter(10, clock=lambda: now[0], sleep=slept.append)
+        limiter.wait(10)
+        limiter.wait(5)
+        self.assertEqual(slept, [0.5])
+        now[0] += 2
+        limiter.wait(10)
+        self.assertEqual(slept, [0.5])
+
+class RecordingBackend(LocalBackend):
+    """Delivers events in this process and keeps them for assertions"""
+
+    def __init__(self, broker):
+        super().__init__(broker)
+        self.events = []
+
+    def publish(self, event):
+        self.events.append(event)
+        super().publish(event)
+
+@override_settings(EVENTS_BACKEND='chamas.tests.RecordingBackend')
+class LiveEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, (cls.treasurer, cls.member, cls.other) = seed_chama(3, 0, name='Pamoja')
+        Membership.objects.filter(chama=cls.chama, user=cls.treasurer).update(role=Membership.Role.TREASURER)
+
+    def setUp(self):
+        self.published = get_backend().events
+        self.published.clear()
+
+    def post(self, member, amount, kind=Transaction.Type.CONTRIBUTION, status=Transaction.Status.COMPLETED):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Transaction.objects.create(
+                chama=self.chama, member=member, transaction_type=kind, amount=Decimal(amount), status=status,
+            )
+
+    def test_writes_publish_deltas_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            Transaction.objects.create(
+                chama=self.chama, member=self.member, transaction_type=Transaction.Type.CONTRIBUTION,
+                amount=Decimal('1'),
+            )
+        self.assertEqual(self.published, [])
+
+        contribution = self.post(self.member, '500')
+        self.post(self.other, '200', kind=Transaction.Type.WITHDRAWAL, status=Transaction.Status.PENDING)
+        self.assertEqual(
+            [(event.type, event.member_id, event.private) for event in self.published],
+            [
+                (TRANSACTION_CREATED, str(self.member.pk), True),
+                (BALANCE_CHANGED, None, False),
+                (TRANSACTION_CREATED, str(self.other.pk), True),
+            ],
+        )
+        self.assertEqual(self.published[1].data, {'group_delta': Decimal('500')})
+
+        self.published.clear()
+        contribution.status = Transaction.Status.REVERSED
+        with self.captureOnCommitCallbacks(execute=True):
+            contribution.save()
+            meeting = Meeting.objects.create(chama=self.chama, scheduled_for=timezone.now(), location='Hall')
+        self.assertEqual([event.type for event in self.published], [BALANCE_CHANGED, MEETING_UPDATED])
+        self.assertEqual(self.published[0].data, {'group_delta': Decimal('-500')})
+        self.assertEqual(json.loads(self.published[1].frame.decode().split('data: ')[1])['location'], 'Hall')
+        self.assertEqual(self.published[1].data['id'], meeting.pk)
+
+        self.published.clear()
+        with override_settings(EVENTS_MAX_TRANSACTIONS=1), self.captureOnCommitCallbacks(execute=True):
+            publish_transactions(self.chama.pk, [contribution, contribution])
+        self.assertEqual([event.type for event in self.published], [RESYNC])
+
+    def test_broker_filters_private_events_and_resyncs_slow_streams(self):
+        async def run():
+            broker = Broker()
+            chama = str(self.chama.pk)
+            member = broker.subscribe(chama, self.member.pk, maxsize=2)
+            treasurer = broker.subscribe(chama, self.treasurer.pk, treasurer=True, maxsize=2)
+            elsewhere = broker.subscribe(uuid.uuid4(), self.member.pk)
+            self.assertEqual(broker.count(chama), 2)
+
+            # Published from another thread, as the database listener does
+            private = Event(chama, TRANSACTION_CREATED, {}, member_id=str(self.other.pk), private=True)
+            await asyncio.to_thread(broker.dispatch, private)
+            broker.dispatch(Event(chama, BALANCE_CHANGED, {'group_delta': '5'}))
+            self.assertEqual((await member.get(1)).type, BALANCE_CHANGED)
+            self.assertEqual((await treasurer.get(1)).type, TRANSACTION_CREATED)
+            self.assertIsNone(await elsewhere.get(0.01))
+
+            for _ in range(3):
+                broker.dispatch(Event(chama, MEETING_UPDATED, {}))
+            self.assertEqual((await member.get(1)).type, RESYNC)
+            self.assertIsNone(await member.get(0.01))
+
+            for subscription in (member, treasurer, elsewhere):
+                subscription.close()
+            self.assertEqual(broker.count(), 0)
+        asyncio.run(run())
+
+    async def test_stream_delivers_member_events(self):
+        response = await self.async_client.get('/api/v1/chamas/events/')
+        self.assertEqual(response.status_code, 401)
+
+        await self.async_client.aforce_login(self.member)
+        response = await self.async_client.get('/api/v1/chamas/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = aiter(response.streaming_content)
+        try:
+            self.assertIn(b'event: ready', await anext(content))
+            await sync_to_async(self.post)(self.other, '300')
+            await sync_to_async(self.post)(self.member, '200')
+            frames = [await asyncio.wait_for(anext(content), 1) for _ in range(3)]
+        finally:
+            await content.aclose()
+        # The other member's row is private to them and the treasurers
+        self.assertEqual(
+            [frame.split(b'\n', 1)[0] for frame in frames],
+            [b'event: balance_changed', b'event: transaction_created', b'event: balance_changed'],
+        )
+        self.assertEqual(json.loads(frames[1].split(b'data: ')[1])['member_id'], str(self.member.pk))
+
+    async def test_asgi_app_streams_ready_then_deltas(self):
+        await self.async_client.aforce_login(self.member)
+        session = self.async_client.cookies[settings.SESSION_COOKIE_NAME].value
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': '/api/v1/chamas/events/', 'raw_path': b'/api/v1/chamas/events/',
+            'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 50000), 'server': ('localhost', 8000),
+            'headers': [(b'host', b'localhost'), (b'cookie', f'{settings.SESSION_COOKIE_NAME}={session}'.encode())],
+        }
+        incoming = asyncio.Queue()
+        incoming.put_nowait({'type': 'http.request', 'body': b'', 'more_body': False})
+        outgoing = asyncio.Queue()
+        # As the test client does: keep the test's transaction open across requests
+        request_started.disconnect(close_old_connections)
+        try:
+            app = asyncio.ensure_future(asgi_application(scope, incoming.get, outgoing.put))
+            self.assertEqual((await asyncio.wait_for(outgoing.get(), 1))['status'], 200)
+            self.assertIn(b'event: ready', (await asyncio.wait_for(outgoing.get(), 1))['body'])
+            await sync_to_async(self.post)(self.member, '200')
+            frames = [(await asyncio.wait_for(outgoing.get(), 1))['body'] for _ in range(2)]
+            incoming.put_nowait({'type': 'http.disconnect'})
+            await asyncio.wait_for(app, 1)
+        finally:
+            request_started.connect(close_old_connections)
+        self.assertEqual(
+            [frame.split(b'\n', 1)[0] for frame in frames],
+            [b'event: transaction_created', b'event: balance_changed'],
+        )
+        self.assertEqual(broker.count(), 0)
+
+    def test_stream_is_refused_under_wsgi(self):
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get('/api/v1/chamas/events/').status_code, 501)
+
+class JSONRendererTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama, cls.users = seed_chama(5, 20, name='Harambee')
+        Membership.objects.filter(chama=cls.chama, user=cls.users[0]).update(role=Membership.Role.TREASURER)
+
+    def assertSameBytes(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_dashboard_payloads_render_byte_identical(self):
+        for user in self.users[:2]:
+            role = get_role(user, self.chama.pk)
+            self.assertSameBytes(build_dashboard_summary(user, self.chama.pk, role))
+
+    def test_native_and_fallback_types_match_drf(self):
+        transaction = Transaction.objects.filter(chama=self.chama).first()
+        self.assertSameBytes({
+            'id': uuid.uuid4(),
+            'posted_at': transaction.posted_at,
+            'nairobi': timezone.localtime(transaction.posted_at, timezone.get_fixed_timezone(180)),
+            'day': transaction.posted_at.date(),
+            'amount': Decimal('1500.50'),
+            'label': gettext_lazy('Contribution'),
+            'ids': (1, 2),
+            'note': 'line\u2028break',
+            'nested': [{'when': timedelta(hours=1)}],
+        })
+
+    def test_parser_round_trip(self):
+        parsed = ORJSONParser().parse(io.BytesIO(ORJSONRenderer().render({'amount': Decimal('2.5'), 'name': 'Akiba'})))
+        self.assertEqual(parsed, {'amount': 2.5, 'name': 'Akiba'})
+
+class MemberSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.chama = Chama.objects.create(name='Umoja')
+        cls.other = Chama.objects.create(name='Tujenge')
+        people = [
+            ('Wanjiru', 'Kamau', 'wanjiru.k@example.com', '254712345678'),
+            ('Wanjiku', 'Otieno', 'otieno@example.com', '0722000111'),
+            ('Kamau', 'Njoroge', 'njoroge@example.com', '254733111222'),
+            ('Achieng', 'Wanyama', 'achieng@example.com', ''),
+            ('Wanjala', 'Mwangi', 'outsider@example.com', '254700000000'),
+            ('Wanjohi', 'Kariuki', 'former@example.com', '254711000000'),
+        ]
+        cls.users = {}
+        for first, last, email, phone in people:
+            cls.users[first] = User.objects.create_user(
+                email, 'pass-12345', first_name=first, last_name=last, phone_number=phone,
+            )
+        for first in ('Wanjiru', 'Wanjiku', 'Kamau', 'Achieng'):
+            Membership.objects.create(chama=cls.chama, user=cls.users[first])
+        Membership.objects.create(chama=cls.other, user=cls.users['Wanjala'])
+        Membership.objects.create(chama=cls.chama, user=cls.users['Wanjohi'], is_active=False)
+        Membership.objects.filter(chama=cls.chama, user=cls.users['Achieng']).update(role=Membership.Role.TREASURER)
+
+    def search(self, q, user=None, **params):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=(user or self.users['Achieng']).pk))
+        return client.get('/api/v1/chamas/members/search/', {'q': q, **params}, HTTP_HOST='localhost')
+
+    def names(self, q, match=None):
+        response = self.search(q)
+        self.assertEqual(response.status_code, 200)
+        return [row['full_name'] for row in response.json()['results'] if match in (None, row['match'])]
+
+    def test_prefixes_of_names_phones_and_emails(self):
+        self.assertEqual(self.names('wanj', 'prefix'), ['Wanjiku Otieno', 'Wanjiru Kamau'])
+        self.assertEqual(self.names('wanj kam'), ['Wanjiru Kamau'])
+        self.assertEqual(self.names('0712'), ['Wanjiru Kamau'])
+        self.assertEqual(self.names('254722'), ['Wanjiku Otieno'])
+        self.assertEqual(self.names('njoroge@exa'), ['Kamau Njoroge'])
+
+    def test_names_rank_above_other_fields(self):
+        UserProfile.objects.filter(user=self.users['Achieng']).update(location='Kamukunji')
+        self.users['Achieng'].profile.refresh_from_db()
+        self.users['Achieng'].profile.save()
+        self.assertEqual(self.names('kam', 'prefix'), ['Kamau Njoroge', 'Wanjiru Kamau', 'Achieng Wanyama'])
+
+    def test_other_chamas_and_former_members_are_hidden(self):
+        self.assertNotIn('Wanjala Mwangi', self.names('wanjala'))
+        self.assertNotIn('Wanjohi Kariuki', self.names('wanjohi'))
+        membership = Membership.objects.get(chama=self.chama, user=self.users['Wanjiru'])
+        membership.is_active = False
+        membership.save()
+        self.assertEqual(self.names('wanjiru', 'prefix'), [])
+
+    def test_user_and_profile_changes_are_searchable(self):
+        user = self.users['Wanjiku']
+        user.last_name = 'Chebet'
+        user.save()
+        self.assertEqual(self.names('cheb'), ['Wanjiku Chebet'])
+        self.assertEqual(self.names('wanjiku', 'prefix'), ['Wanjiku Chebet'])
+        profile = UserProfile.objects.get(user=user)
+        profile.location = 'Eldoret'
+        profile.save()
+        self.assertEqual(self.names('eldo'), ['Wanjiku Chebet'])
+
+    def test_typos_fall_back_to_similar_names(self):
+        self.assertEqual(self.names('wanjru', 'prefix'), [])
+        self.assertEqual(self.names('wanjru', 'fuzzy'), ['Wanjiru Kamau', 'Wanjiku Otieno'])
+        self.assertEqual(self.names('njoroeg'), ['Kamau Njoroge'])
+
+    def test_treasurers_only_and_query_bounds(self):
+        self.assertEqual(self.search('wanj', user=self.users['Kamau']).status_code, 403)
+        self.assertEqual(self.search('w').status_code, 400)
+        self.assertEqual(self.search('wanj', limit=100).status_code, 400)
+        self.assertEqual(len(self.search('wanj', limit=1).json()['results']), 1)
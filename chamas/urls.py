@@ -0,0 +1,21 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import (
+    AnalyticsViewSet, ContributionViewSet, ExportViewSet, MemberViewSet, MpesaImportViewSet, MpesaPaymentViewSet,
+    RotationViewSet, TransactionViewSet, event_stream,
+)
+
+router = DefaultRouter()
+router.register(r'transactions', TransactionViewSet, basename='transactions')
+router.register(r'contributions', ContributionViewSet, basename='contributions')
+router.register(r'mpesa-imports', MpesaImportViewSet, basename='mpesa-imports')
+router.register(r'mpesa-payments', MpesaPaymentViewSet, basename='mpesa-payments')
+router.register(r'rotation', RotationViewSet, basename='rotation')
+router.register(r'exports', ExportViewSet, basename='exports')
+router.register(r'analytics', AnalyticsViewSet, basename='analytics')
+router.register(r'members', MemberViewSet, basename='members')
+
+urlpatterns = [
+    path('events/', event_stream, name='chama-events'),
+    path('', include(router.urls)),
+]
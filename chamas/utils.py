@@ -0,0 +1,22 @@
+import re
+
+RECEIPT_RE = re.compile(r'^[A-Z0-9]{8,12}$')
+
+def normalize_phone(value):
+    """
+    Reduce Kenyan phone numbers to 2547XXXXXXXX form.
+
+    Masked digits (``*``) in statement exports are kept so partial numbers
+    can still be compared.
+    """
+    digits = ''.join(ch for ch in str(value) if ch.isdigit() or ch == '*')
+    if digits.startswith('0') and len(digits) == 10:
+        digits = '254' + digits[1:]
+    elif len(digits) == 9 and digits[0] in '17':
+        digits = '254' + digits
+    return digits
+
+def normalize_receipt(value):
+    """Upper-case an M-Pesa receipt code and drop whitespace; None if malformed"""
+    receipt = ''.join(str(value or '').split()).upper()
+    return receipt if RECEIPT_RE.match(receipt) else None
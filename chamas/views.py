@@ -0,0 +1,462 @@
+from datetime import datetime, time, timedelta
+from asgiref.sync import sync_to_async
+from rest_framework import permissions, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, NotFound, PermissionDenied, ValidationError
+from rest_framework.mixins import CreateModelMixin, ListModelMixin, RetrieveModelMixin
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+from django.core.exceptions import PermissionDenied as DjangoPermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from config.renderers import JsonResponse
+
+from .analytics import ANALYTICS_MONTHS, MAX_ANALYTICS_MONTHS, get_contribution_report
+from .contributions import post_contributions, validate_sheet
+from .directory import MAX_SEARCH_RESULTS, MIN_QUERY_LENGTH, search_members
+from .events import stream
+from .exports import CONTENT_TYPES, enqueue_export, streaming_export
+from .idempotency import idempotent
+from .models import (
+    Chama, ExportJob, Loan, Meeting, Membership, MpesaPayment, RotationSlot, StatementImport, Transaction,
+)
+from .mpesa import import_statement
+from .reconciliation import reconcile_chama, resolve_payment
+from .rotation import RotationError, current_cycle, generate_cycle, skip_turn, swap_turns
+from .pagination import KeysetPagination
+from .permissions import IsTreasurer
+from .serializers import (
+    ExportJobSerializer, MeetingSheetSerializer, MpesaPaymentSerializer, PaymentResolutionSerializer, RotationChangeSerializer,
+    RotationScheduleSerializer, RotationSlotSerializer, StatementImportSerializer, TransactionSerializer,
+)
+from .tenancy import current_chama_id, is_treasurer, resolve_chama_id
+
+def _current_chama_id():
+    chama_id = current_chama_id()
+    if chama_id is None:
+        raise NotFound('You are not a member of any chama')
+    return chama_id
+
+def _parse_day(request, param):
+    value = request.query_params.get(param)
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({param: 'Use YYYY-MM-DD.'})
+    return day
+
+class TransactionViewSet(ListModelMixin, GenericViewSet):
+    """
+    Transaction history for the user's chama, newest first.
+
+    Treasurers see the whole chama ledger; members see their own rows.
+    Supports ``type`` (comma separated), ``date_from`` and ``date_to``
+    filters and cursor pagination for infinite scroll.
+    """
+
+    serializer_class = TransactionSerializer
+    pagination_class = KeysetPagination
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Transaction.objects.filter(chama_id=_current_chama_id()).select_related('member')
+        if not is_treasurer(user):
+            queryset = queryset.filter(member=user)
+
+        types = self.request.query_params.get('type')
+        if types:
+            types = [value for value in types.split(',') if value]
+            unknown = set(types) - set(Transaction.Type.values)
+            if unknown:
+                raise ValidationError({'type': f"Unknown type(s): {', '.join(sorted(unknown))}"})
+            queryset = queryset.filter(transaction_type__in=types)
+
+        date_from = _parse_day(self.request, 'date_from')
+        if date_from:
+            queryset = queryset.filter(posted_at__gte=timezone.make_aware(datetime.combine(date_from, time.min)))
+        date_to = _parse_day(self.request, 'date_to')
+        if date_to:
+            queryset = queryset.filter(
+                posted_at__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+            )
+        return queryset
+
+class ContributionViewSet(GenericViewSet):
+    """Contribution recording for treasurers"""
+
+    permission_classes = [IsTreasurer]
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Post a whole meeting sheet of contributions in one transaction.
+
+        Every row is validated first; if any row is invalid nothing is written
+        and the per-row errors are returned. Send an Idempotency-Key header to
+        make retries safe.
+        """
+        chama_id = current_chama_id()
+        if chama_id is None:
+            return Response({'error': 'You are not a member of any chama'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = MeetingSheetSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        sheet = serializer.validated_data
+
+        meeting = None
+        if sheet.get('meeting_id'):
+            meeting = Meeting.objects.filter(pk=sheet['meeting_id'], chama_id=chama_id).first()
+            if meeting is None:
+                return Response({'meeting_id': ['Meeting not found in your chama.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        def post_sheet():
+            entries, results = validate_sheet(chama_id, sheet['rows'])
+            if len(entries) != len(results):
+                return Response({
+                    'message': 'No contributions were posted; fix the invalid rows and resubmit',
+                    'results': results,
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            created = post_contributions(chama_id, entries, meeting=meeting, posted_at=sheet.get('posted_at'))
+            for (index, _, amount, _), txn in zip(entries, created):
+                results[index] = {
+                    'row': index,
+                    'status': 'created',
+                    'transaction_id': txn.pk,
+                    'amount': str(amount),
+                }
+            return Response({
+                'message': f'{len(created)} contributions posted',
+                'total': str(sum(amount for _, _, amount, _ in entries)),
+                'results': results,
+            }, status=status.HTTP_201_CREATED)
+
+        return idempotent(request, 'contributions.bulk', post_sheet)
+
+class MpesaImportViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+    """M-Pesa statement uploads for treasurers"""
+
+    serializer_class = StatementImportSerializer
+    permission_classes = [IsTreasurer]
+    parser_classes = [MultiPartParser]
+
+    def get_queryset(self):
+        return StatementImport.objects.filter(chama_id=_current_chama_id()).select_related('uploaded_by').order_by('-started_at')
+
+    def create(self, request):
+        """
+        Import an M-Pesa statement (CSV or XLSX) sent as multipart ``file``.
+
+        Large uploads are spooled to disk by Django and the file is parsed as
+        a stream, so the request never holds the whole statement in memory.
+        Receipts already imported are counted as duplicates and skipped.
+        """
+        chama_id = current_chama_id()
+        if chama_id is None:
+            return Response({'error': 'You are not a member of any chama'}, status=status.HTTP_404_NOT_FOUND)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ['Attach the statement as "file".']}, status=status.HTTP_400_BAD_REQUEST)
+        if not upload.name.lower().endswith(('.csv', '.xlsx', '.xlsm')):
+            return Response({'file': ['Upload a .csv or .xlsx statement.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        chama = Chama.objects.get(pk=chama_id)
+        statement = import_statement(chama, upload, upload.name, uploaded_by=request.user)
+        data = StatementImportSerializer(statement).data
+        if statement.status == StatementImport.Status.FAILED:
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+class MpesaPaymentViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+    """
+    Imported M-Pesa payments and the treasurer's review queue.
+
+    Lists payments awaiting review by default; pass ``status`` to see others.
+    """
+
+    serializer_class = MpesaPaymentSerializer
+    permission_classes = [IsTreasurer]
+
+    def get_chama_id(self):
+        return _current_chama_id()
+
+    def get_queryset(self):
+        queryset = MpesaPayment.objects.filter(chama_id=self.get_chama_id()).select_related('member')
+        if self.action == 'list':
+            payment_status = self.request.query_params.get('status', MpesaPayment.Status.REVIEW)
+            if payment_status not in MpesaPayment.Status.values:
+                raise ValidationError({'status': f"Use one of: {', '.join(MpesaPayment.Status.values)}"})
+            queryset = queryset.filter(status=payment_status)
+        return queryset.order_by('-completed_at', '-id')
+
+    @action(detail=False, methods=['post'])
+    def reconcile(self, request):
+        """Match unmatched payments to open contributions and loan installments"""
+        stats = reconcile_chama(self.get_chama_id())
+        return Response({'message': f"{stats['matched']} of {stats['payments']} payments matched", **stats})
+
+    @action(detail=True, methods=['post'])
+    def resolve(self, request, pk=None):
+        """Post a reviewed payment to a member, or ignore it"""
+        payment = self.get_object()
+        if payment.status == MpesaPayment.Status.MATCHED:
+            return Response({'error': 'This payment is already matched'}, status=status.HTTP_409_CONFLICT)
+
+        serializer = PaymentResolutionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        decision = serializer.validated_data
+
+        if decision['type'] == 'ignore':
+            payment.status = MpesaPayment.Status.IGNORED
+            payment.reconciled_at = timezone.now()
+            payment.save(update_fields=['status', 'reconciled_at'])
+            return Response(MpesaPaymentSerializer(payment).data)
+
+        if not Membership.objects.filter(chama_id=payment.chama_id, user_id=decision['member_id']).exists():
+            return Response({'member_id': ['Not a member of your chama.']}, status=status.HTTP_400_BAD_REQUEST)
+        loan_id = decision.get('loan_id')
+        if loan_id and not Loan.objects.filter(
+            pk=loan_id, chama_id=payment.chama_id, member_id=decision['member_id']
+        ).exists():
+            return Response({'loan_id': ["Not one of this member's loans."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            payment = resolve_payment(payment, decision['member_id'], decision['type'], loan_id)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(MpesaPaymentSerializer(payment).data)
+
+class RotationViewSet(ListModelMixin, GenericViewSet):
+    """
+    Merry-go-round payout order for the user's chama.
+
+    Members can read the current cycle; treasurers schedule cycles and
+    rearrange upcoming turns.
+    """
+
+    serializer_class = RotationSlotSerializer
+    pagination_class = None
+
+    def get_permissions(self):
+        if self.action == 'list':
+            return [permissions.IsAuthenticated()]
+        return [IsTreasurer()]
+
+    def get_chama_id(self):
+        return _current_chama_id()
+
+    def get_queryset(self):
+        chama_id = self.get_chama_id()
+        return (
+            RotationSlot.objects.filter(chama_id=chama_id, cycle=current_cycle(chama_id))
+            .select_related('member')
+            .order_by('position')
+        )
+
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        """Schedule the next cycle for every active member"""
+        serializer = RotationScheduleSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        chama = Chama.objects.get(pk=self.get_chama_id())
+        try:
+            generate_cycle(chama, serializer.validated_data['first_payout'], serializer.validated_data.get('order'))
+        except RotationError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(RotationSlotSerializer(self.get_queryset(), many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def skip(self, request):
+        """Move the member at ``position`` to the end of the cycle"""
+        return self._change(request, lambda chama_id, data: skip_turn(chama_id, data['position']))
+
+    @action(detail=False, methods=['post'])
+    def swap(self, request):
+        """Exchange the members at ``position`` and ``swap_with``"""
+        def swap(chama_id, data):
+            if 'swap_with' not in data:
+                raise RotationError('Choose the position to swap with')
+            swap_turns(chama_id, data['position'], data['swap_with'])
+        return self._change(request, swap)
+
+    def _change(self, request, change):
+        serializer = RotationChangeSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            change(self.get_chama_id(), serializer.validated_data)
+        except RotationError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(RotationSlotSerializer(self.get_queryset(), many=True).data)
+
+class ExportViewSet(CreateModelMixin, RetrieveModelMixin, GenericViewSet):
+    """
+    CSV and PDF exports of member statements and the group report.
+
+    ``statement`` and ``group`` stream the file back directly. For large
+    chamas, POST a job instead and fetch its ``download_url`` once it has
+    completed. Members may only export their own statement.
+    """
+
+    serializer_class = ExportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_chama(self):
+        return Chama.objects.get(pk=_current_chama_id())
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(chama_id=_current_chama_id(), requested_by=self.request.user)
+
+    def _output(self, request):
+        # 'format' is reserved for DRF's renderer selection
+        output = request.query_params.get('output', ExportJob.Format.CSV)
+        if output not in ExportJob.Format.values:
+            raise ValidationError({'output': f"Use one of: {', '.join(ExportJob.Format.values)}"})
+        return output
+
+    def _statement_member(self, chama, member_id):
+        user = self.request.user
+        if not member_id or str(member_id) == str(user.pk):
+            return user
+        if not is_treasurer(user):
+            raise PermissionDenied('You can only export your own statement')
+        membership = Membership.objects.filter(chama=chama, user_id=member_id).select_related('user').first()
+        if membership is None:
+            raise ValidationError({'member': 'Not a member of your chama.'})
+        return membership.user
+
+    @action(detail=False, methods=['get'])
+    def statement(self, request):
+        """Stream a member statement; ``member`` defaults to the requesting user"""
+        chama = self.get_chama()
+        member = self._statement_member(chama, request.query_params.get('member'))
+        return streaming_export(
+            ExportJob.Report.STATEMENT, self._output(request), chama, member,
+            _parse_day(request, 'date_from'), _parse_day(request, 'date_to'),
+        )
+
+    @action(detail=False, methods=['get'], permission_classes=[IsTreasurer])
+    def group(self, request):
+        """Stream the whole chama ledger"""
+        return streaming_export(
+            ExportJob.Report.GROUP, self._output(request), self.get_chama(), None,
+            _parse_day(request, 'date_from'), _parse_day(request, 'date_to'),
+        )
+
+    def perform_create(self, serializer):
+        chama = self.get_chama()
+        data = serializer.validated_data
+        if data['report'] == ExportJob.Report.GROUP and not is_treasurer(self.request.user):
+            raise PermissionDenied('Only treasurers can export the group report')
+        member = None
+        if data['report'] == ExportJob.Report.STATEMENT:
+            member = self._statement_member(chama, data['member'].pk if data.get('member') else None)
+        job = serializer.save(chama=chama, requested_by=self.request.user, member=member)
+        enqueue_export(job)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != ExportJob.Status.COMPLETED:
+            return Response({'error': f'The export is {job.status}'}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(
+            job.file.open('rb'), as_attachment=True, filename=job.file.name.rsplit('/', 1)[-1],
+            content_type=CONTENT_TYPES[job.file_format],
+        )
+
+class AnalyticsViewSet(GenericViewSet):
+    """Contribution trends, consistency and retention for treasurers"""
+
+    permission_classes = [IsTreasurer]
+
+    @action(detail=False, methods=['get'])
+    def contributions(self, request):
+        try:
+            months = int(request.query_params.get('months', ANALYTICS_MONTHS))
+        except ValueError:
+            months = 0
+        if not 1 <= months <= MAX_ANALYTICS_MONTHS:
+            raise ValidationError({'months': f'Choose between 1 and {MAX_ANALYTICS_MONTHS} months.'})
+        chama = Chama.objects.get(pk=_current_chama_id())
+        return Response(get_contribution_report(chama, months))
+
+class MemberViewSet(GenericViewSet):
+    """Type-ahead lookup of the chama's members by name, phone or email"""
+
+    permission_classes = [IsTreasurer]
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if len(query) < MIN_QUERY_LENGTH:
+            raise ValidationError({'q': f'Type at least {MIN_QUERY_LENGTH} characters.'})
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_SEARCH_RESULTS:
+            raise ValidationError({'limit': f'Choose between 1 and {MAX_SEARCH_RESULTS} results.'})
+        return Response({'results': search_members(_current_chama_id(), query, limit)})
+
+# ============================================================================
+# Live Events
+# ============================================================================
+
+def _event_subscriber(request, user):
+    """``(user, chama id, treasurer)`` for a stream request, or None if anonymous"""
+    if not user.is_authenticated:
+        # EventSource polyfills send the token header; browsers send the session
+        credentials = TokenAuthentication().authenticate(request)
+        if credentials is None:
+            return None
+        user = credentials[0]
+    chama_id = resolve_chama_id(user, request.GET.get('chama') or request.headers.get('X-Chama-ID'))
+    return user, chama_id, chama_id is not None and is_treasurer(user, chama_id)
+
+@require_GET
+async def event_stream(request):
+    """
+    Server-sent events for the member's chama (``?chama=`` or X-Chama-ID).
+
+    Only the ASGI app (config.asgi) serves it: an open stream is a
+    suspended coroutine there. A WSGI server would buffer the endless
+    stream in a worker, so requests through config.wsgi get a 501.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Live events are served by the ASGI app'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    try:
+        subscriber = await sync_to_async(_event_subscriber)(request, await request.auser())
+    except AuthenticationFailed as exc:
+        return JsonResponse({'error': str(exc.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    except DjangoPermissionDenied as exc:
+        return JsonResponse({'error': str(exc)}, status=status.HTTP_403_FORBIDDEN)
+    if subscriber is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+    user, chama_id, treasurer = subscriber
+    if chama_id is None:
+        return JsonResponse({'error': 'You are not a member of any chama'}, status=status.HTTP_404_NOT_FOUND)
+
+    response = StreamingHttpResponse(stream(chama_id, user.pk, treasurer), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
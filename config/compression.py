@@ -0,0 +1,226 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+CompressionMiddleware compresses text-like responses (JSON, CSV, HTML)
+of at least COMPRESSION_MIN_SIZE bytes. It picks brotli, zstd or gzip, in
+COMPRESSION_ENCODINGS order, from those the client accepts with the
+highest q-value. gzip is always available. brotli and zstd need the
+``brotli`` and ``zstandard`` packages, and are skipped when they are not
+installed.
+
+Streaming responses (statement exports) are compressed chunk by chunk as
+they are generated, so memory use stays flat. Event streams and
+binary formats (PDF, XLSX, images) are passed through untouched.
+
+ETags stay strong: a compressed response's tag gets the coding as a
+suffix (``"abc-br"``), since its bytes differ from the identity body's.
+The suffix is stripped from If-None-Match and If-Match before the view
+sees them, so version-stamp tags still match. A 304 carries the suffix
+the client sent back.
+
+Responses that carry secrets (CSRF and auth tokens) next to request data
+are never compressed (COMPRESSION_EXEMPT_PATTERNS), which closes off
+BREACH-style length oracles on them.
+"""
+
+import re
+import zlib
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ============================================================================
+# Codecs
+# ============================================================================
+
+class Codec:
+    name = None
+    default_level = None
+
+    def __init__(self, level=None):
+        self.level = self.default_level if level is None else level
+
+    def compressor(self):
+        """An object with ``compress(chunk)`` and ``flush()``"""
+        raise NotImplementedError
+
+    def compress(self, data):
+        compressor = self.compressor()
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self, chunks):
+        compressor = self.compressor()
+        for chunk in chunks:
+            if output := compressor.compress(chunk):
+                yield output
+        yield compressor.flush()
+
+class GzipCodec(Codec):
+    name = 'gzip'
+    default_level = 6
+
+    def compressor(self):
+        # wbits=31 writes the gzip header and trailer
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+class _BrotliCompressor:
+    """brotli.Compressor behind the ``compress(chunk)``/``flush()`` API the other codecs share"""
+
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, chunk):
+        return self.compressor.process(chunk)
+
+    def flush(self):
+        # Brotli's own flush() leaves the stream open; finish() ends it
+        return self.compressor.finish()
+
+class BrotliCodec(Codec):
+    name = 'br'
+    default_level = 5
+
+    def compressor(self):
+        return _BrotliCompressor(self.level)
+
+class ZstdCodec(Codec):
+    name = 'zstd'
+    default_level = 3
+
+    def compressor(self):
+        return zstandard.ZstdCompressor(level=self.level).compressobj()
+
+CODECS = {
+    'br': BrotliCodec if brotli is not None else None,
+    'zstd': ZstdCodec if zstandard is not None else None,
+    'gzip': GzipCodec,
+}
+
+def available_codecs():
+    """Installed codecs in preference order, at their configured levels"""
+    levels = settings.COMPRESSION_LEVELS
+    return {
+        name: CODECS[name](levels.get(name))
+        for name in settings.COMPRESSION_ENCODINGS
+        if CODECS.get(name) is not None
+    }
+
+def parse_accept_encoding(header):
+    """``{coding: q}`` from an Accept-Encoding header"""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        match = re.search(r'q\s*=\s*([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+def negotiate(header, codecs):
+    """The codec to use for an Accept-Encoding header, or None for identity"""
+    accepted = parse_accept_encoding(header or '')
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    # Ties go to the earlier codec in COMPRESSION_ENCODINGS
+    for name, codec in codecs.items():
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = codec, q
+    return best
+
+# ============================================================================
+# ETags
+# ============================================================================
+
+_CODED_ETAG = re.compile(r'-(br|zstd|gzip)"')
+
+def strip_coding(header):
+    """An If-None-Match/If-Match value with coding suffixes removed, and the last coding seen"""
+    codings = _CODED_ETAG.findall(header)
+    return _CODED_ETAG.sub('"', header), codings[-1] if codings else None
+
+def add_coding(etag, coding):
+    if not coding or etag.startswith('W/') or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{coding}"'
+
+# ============================================================================
+# Middleware
+# ============================================================================
+
+def _compressible(content_type):
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return media_type in settings.COMPRESSION_CONTENT_TYPES or (
+        media_type.startswith('text/') and media_type != 'text/event-stream'
+    )
+
+class CompressionMiddleware:
+    """Compress responses with the best encoding the client accepts"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.codecs = available_codecs()
+        self.exempt = [re.compile(pattern) for pattern in settings.COMPRESSION_EXEMPT_PATTERNS]
+
+    def __call__(self, request):
+        # The view compares against its own tags, which carry no coding
+        client_coding = None
+        for key in ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MATCH'):
+            if key in request.META:
+                request.META[key], coding = strip_coding(request.META[key])
+                client_coding = client_coding or coding
+
+        response = self.get_response(request)
+
+        if response.status_code == 304:
+            if client_coding and response.has_header('ETag'):
+                response['ETag'] = add_coding(response['ETag'], client_coding)
+            return response
+        if (
+            response.has_header('Content-Encoding')
+            or not _compressible(response.get('Content-Type', ''))
+            or any(pattern.match(request.path) for pattern in self.exempt)
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return response
+        codec = negotiate(request.META.get('HTTP_ACCEPT_ENCODING'), self.codecs)
+        if codec is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                # Compressing would hold back data an async stream flushes deliberately
+                return response
+            response.streaming_content = codec.stream(response.streaming_content)
+            del response['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            compressed = codec.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        if response.has_header('ETag'):
+            response['ETag'] = add_coding(response['ETag'], codec.name)
+        response['Content-Encoding'] = codec.name
+        return response
@@ -7,13 +7,15 @@ It helps bridge the gap between Django's CSRF protection and frontend API calls.
 
 from functools import wraps
 from django.middleware.csrf import get_token, rotate_token
-from django.http import JsonResponse, HttpResponse
+from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.views.decorators.http import require_GET, require_POST
 from django.utils.decorators import method_decorator
 from django.conf import settings
 import re
 
+from .renderers import JsonResponse
+
 # ============================================================================
 # CSRF Token Management
 # ============================================================================
@@ -0,0 +1,130 @@
+"""
+Content-addressed media: uploads stored under the hash of their bytes.
+
+ContentAddressedStorage names every file it saves after the SHA-256 of its
+content (``profile_pictures/3f/a4c1...e2.jpg``), keeping the directory
+the field asked for and the extension. Saving bytes that are already
+stored writes nothing and returns the existing name, so identical uploads
+share one file. A name never changes what it points to, which makes the
+files safe to cache forever.
+
+MediaFilesMiddleware serves those files in production, the way WhiteNoise
+serves static files. Responses carry far-future ``immutable`` cache
+headers, an ETag and Last-Modified, and answer Range and conditional
+requests. Django hands the open file to the WSGI server's file wrapper,
+so gunicorn sends it with ``sendfile()`` and it is never read into Python.
+Byte ranges are sent the same way.
+
+Only content-addressed names are served. Anything else under MEDIA_ROOT,
+such as statement exports, is never public.
+"""
+
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+from urllib.parse import urlparse
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseFileResponse
+from whitenoise.responders import SlicedFile
+from whitenoise.string_utils import ensure_leading_trailing_slash
+
+# Two hex digits of fan-out, then the rest of the digest
+CONTENT_NAME = re.compile(r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{62}\.[a-z0-9]{1,8}$')
+
+# ============================================================================
+# Storage
+# ============================================================================
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Files named by the SHA-256 of their content; identical files are stored once"""
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        self._ensure_directory(self.path(directory or '.'))
+        # Hash while spooling beside the destination, then rename into place:
+        # readers never see a partial file, and writers racing with the same
+        # bytes can all rename over each other
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=self.path(directory or '.'), prefix='.upload-', delete=False) as spool:
+            try:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    spool.write(chunk)
+            except BaseException:
+                os.unlink(spool.name)
+                raise
+        digest = digest.hexdigest()
+        extension = posixpath.splitext(name)[1].lower()
+        name = posixpath.join(directory, digest[:2], digest[2:] + extension)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.unlink(spool.name)
+            return name
+        self._ensure_directory(os.path.dirname(full_path))
+        if self.file_permissions_mode is not None:
+            os.chmod(spool.name, self.file_permissions_mode)
+        os.replace(spool.name, full_path)
+        return name
+
+    def _ensure_directory(self, directory):
+        if self.directory_permissions_mode is not None:
+            # os.makedirs() doesn't apply its mode to intermediate directories
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+    def get_available_name(self, name, max_length=None):
+        # The name is replaced by the content's, and a stored one is reused
+        return name
+
+# ============================================================================
+# Serving
+# ============================================================================
+
+class MediaFilesMiddleware(WhiteNoise):
+    """Serves content-addressed files from MEDIA_ROOT with immutable caching"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Uploads arrive while the process runs, so look files up per request
+        # rather than scanning MEDIA_ROOT once as WhiteNoise does for static files
+        super().__init__(application=None, autorefresh=True, allow_all_origins=False)
+        self.media_prefix = ensure_leading_trailing_slash(urlparse(settings.MEDIA_URL).path)
+        self.add_files(settings.MEDIA_ROOT, prefix=self.media_prefix)
+
+    def __call__(self, request):
+        url = request.path_info
+        if url.startswith(self.media_prefix) and CONTENT_NAME.search(url):
+            media_file = self.find_file(url)
+            if media_file is not None:
+                return self.serve(media_file, request)
+        return self.get_response(request)
+
+    @staticmethod
+    def serve(media_file, request):
+        response = media_file.get_response(request.method, request.META)
+        if isinstance(response.file, SlicedFile):
+            # WhiteNoise's slice for a Range request hides the descriptor. The
+            # file already sits at the range's start, so a server can sendfile()
+            # Content-Length bytes from it (and seek past them, as
+            # socket.sendfile() does); others read the slice as before
+            response.file.fileno = response.file.fileobj.fileno
+            response.file.seek = response.file.fileobj.seek
+        http_response = WhiteNoiseFileResponse(response.file or (), status=int(response.status))
+        # As WhiteNoiseMiddleware.serve: WhiteNoise's headers only
+        del http_response['content-type']
+        for key, value in response.headers:
+            http_response[key] = value
+        return http_response
+
+    def immutable_file_test(self, path, url):
+        # Only content-addressed names get this far
+        return True
@@ -70,7 +70,7 @@ INSTALLED_APPS = [
     
     # Local apps
     'accounts',
-    # 'chamas',    # Uncomment when created
+    'chamas',
     # 'members',   # Uncomment when created
 ]
 
@@ -85,6 +85,10 @@ MIDDLEWARE = [
     # Django security middleware
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # Content-addressed uploads, served like static files
+    'config.media.MediaFilesMiddleware',
+    # Compresses whatever the middleware below and the views produce
+    'config.compression.CompressionMiddleware',
     
     # Session and authentication middleware
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -95,6 +99,8 @@ MIDDLEWARE = [
     'config.middleware.CsrfExemptApiMiddleware',
     
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Current chama for tenant-scoped queries (resolved lazily, after auth)
+    'chamas.tenancy.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -171,6 +177,149 @@ if DATABASE_URL:
 else:
     print("⚠️ Using SQLite database (no DATABASE_URL found)")
 
+# ============================================================================
+# Cache Configuration
+# ============================================================================
+
+# Local memory by default; set REDIS_URL (requires the redis package) to share
+# cached payloads and invalidation stamps across gunicorn workers.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'chamanexus',
+        }
+    }
+
+# Dashboard payloads are invalidated by writes; the timeout is only a backstop
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 3600))
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv('ANALYTICS_CACHE_TIMEOUT', 86400))
+
+# Stampede protection: how long one rebuild holds the lock, and how long other
+# requests wait for it when there is no stale copy to serve
+CACHE_REBUILD_LOCK_TIMEOUT = 10
+CACHE_REBUILD_WAIT = 2.0
+
+# ============================================================================
+# Tenancy
+# ============================================================================
+
+# Raise instead of logging when a tenant model is queried without a chama
+# filter (see chamas.tenancy)
+TENANCY_STRICT = os.getenv('TENANCY_STRICT', 'False').lower() in ('true', '1', 'yes')
+
+# Requests that work across chamas and get no current chama
+TENANCY_EXEMPT_PATTERNS = [
+    r'^/admin/',
+]
+
+# ============================================================================
+# Ledger Storage
+# ============================================================================
+
+# Monthly ledger partitions created ahead of time by create_ledger_partitions
+# (PostgreSQL only)
+LEDGER_PARTITION_MONTHS_AHEAD = int(os.getenv('LEDGER_PARTITION_MONTHS_AHEAD', 3))
+
+# Whole months kept in the hot ledger; archive_ledger moves older months to
+# compressed cold storage. Covers the longest analytics window.
+LEDGER_HOT_MONTHS = int(os.getenv('LEDGER_HOT_MONTHS', 36))
+
+# ============================================================================
+# Fines
+# ============================================================================
+
+# accrue_fines only charges for payments that fell due this many days ago or
+# less, so enabling fines does not backdate them
+FINE_LOOKBACK_DAYS = int(os.getenv('FINE_LOOKBACK_DAYS', 90))
+
+# ============================================================================
+# Notifications
+# ============================================================================
+
+# Channels chamas.notifications fans out over. ``rate`` is messages per
+# second (0 for no limit); SMS and push use local stand-ins until a provider
+# is configured.
+NOTIFICATION_CHANNELS = {
+    'email': {
+        'transport': 'chamas.notifications.EmailTransport',
+        'batch_size': int(os.getenv('NOTIFICATION_EMAIL_BATCH', 50)),
+        'rate': float(os.getenv('NOTIFICATION_EMAIL_RATE', 14)),
+    },
+    'sms': {
+        'transport': os.getenv('NOTIFICATION_SMS_TRANSPORT', 'chamas.notifications.LocalSMSTransport'),
+        'batch_size': int(os.getenv('NOTIFICATION_SMS_BATCH', 100)),
+        'rate': float(os.getenv('NOTIFICATION_SMS_RATE', 30)),
+    },
+    'push': {
+        'transport': os.getenv('NOTIFICATION_PUSH_TRANSPORT', 'chamas.notifications.LocalPushTransport'),
+        'batch_size': int(os.getenv('NOTIFICATION_PUSH_BATCH', 500)),
+        'rate': float(os.getenv('NOTIFICATION_PUSH_RATE', 500)),
+    },
+}
+
+# A run whose worker has shown no progress for this long is taken over
+NOTIFICATION_LEASE_SECONDS = int(os.getenv('NOTIFICATION_LEASE_SECONDS', 300))
+
+# ============================================================================
+# Compression
+# ============================================================================
+
+# Codings in preference order; br and zstd need the brotli and zstandard
+# packages and are skipped without them
+COMPRESSION_ENCODINGS = ('br', 'zstd', 'gzip')
+# Levels tuned for per-request compression, not static assets
+COMPRESSION_LEVELS = {'br': 5, 'zstd': 3, 'gzip': 6}
+# Smaller bodies fit in a packet or two anyway
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 512))
+# Compressed besides text/* (event streams excepted)
+COMPRESSION_CONTENT_TYPES = ('application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+# Responses carrying CSRF or auth tokens are never compressed (BREACH)
+COMPRESSION_EXEMPT_PATTERNS = [
+    r'^(/api/v1)?/csrf-token/$',
+    r'^(/api/v1)?/accounts/auth/(login|register)/$',
+    r'^(/api/v1)?/accounts/users/change-password/$',
+    r'^(/api/v1)?/accounts/api-token-auth/$',
+]
+
+# ============================================================================
+# Live Events
+# ============================================================================
+
+# How chamas.events reaches the processes holding event streams: 'local'
+# only delivers within the publishing process; 'postgres' relays through
+# LISTEN/NOTIFY so every ASGI worker sees writes made anywhere.
+EVENTS_BACKEND = os.getenv(
+    'EVENTS_BACKEND',
+    'chamas.events.PostgresBackend' if DATABASE_URL else 'chamas.events.LocalBackend',
+)
+EVENTS_CHANNEL = 'chama_events'
+
+# Comment lines sent on idle streams so proxies keep the connection open
+EVENTS_HEARTBEAT_SECONDS = int(os.getenv('EVENTS_HEARTBEAT_SECONDS', 15))
+
+# Events buffered per stream; a client that falls further behind is told to resync
+EVENTS_QUEUE_SIZE = 100
+
+# Batches posting more rows than this send one resync instead of per-row events
+EVENTS_MAX_TRANSACTIONS = 50
+
+# ============================================================================
+# Admin
+# ============================================================================
+
+# Changelists of big tables (users) show an estimate above this many rows
+# instead of counting them, and cap filtered counts here
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv('ADMIN_EXACT_COUNT_LIMIT', '10000'))
+
 # ============================================================================
 # Password Validation
 # ============================================================================
@@ -220,6 +369,28 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Profile pictures are stored by content hash, and config.media's middleware
+# serves those with immutable caching; everything else stays private
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'pictures': {'BACKEND': 'config.media.ContentAddressedStorage'},
+}
+
+# Threads per process rendering background report exports; 0 leaves jobs
+# for the run_export_jobs command
+EXPORT_BACKGROUND_WORKERS = int(os.getenv('EXPORT_BACKGROUND_WORKERS', 2))
+
+# A running export whose worker has shown no progress for this long is taken over
+EXPORT_LEASE_SECONDS = int(os.getenv('EXPORT_LEASE_SECONDS', 300))
+
+# Profile picture uploads stop being read past this size
+PROFILE_PICTURE_MAX_BYTES = int(os.getenv('PROFILE_PICTURE_MAX_BYTES', 25 * 1024 * 1024))
+
+# Threads per process resizing profile pictures; 0 leaves them for the
+# process_profile_pictures command
+PICTURE_BACKGROUND_WORKERS = int(os.getenv('PICTURE_BACKGROUND_WORKERS', 2))
+
 # WhiteNoise configuration for serving static files in production
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
@@ -260,11 +431,10 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',  # Changed to AllowAny for API access
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'config.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'config.renderers.ORJSONParser',
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
     ],
@@ -280,6 +450,10 @@ REST_FRAMEWORK = {
     }
 }
 
+# The browsable API costs a template render per request; production serves JSON only
+if DEBUG:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('rest_framework.renderers.BrowsableAPIRenderer')
+
 # ============================================================================
 # CORS Configuration (Fixed for Frontend)
 # ============================================================================
@@ -325,8 +499,15 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
     'access-control-allow-origin',
+    'idempotency-key',
+    'x-chama-id',
+    'if-match',
+    'if-none-match',
 ]
 
+# Lets the frontend read the tag it sends back in If-Match / If-None-Match
+CORS_EXPOSE_HEADERS = ['etag']
+
 # ============================================================================
 # CSRF Configuration (Fixed for Frontend)
 # ============================================================================
@@ -501,5 +682,8 @@ GUNICORN_KEEPALIVE = 5
 API_VERSION = 'v1'
 API_BASE_URL = f'/api/{API_VERSION}'
 
+# M-Pesa statements carry local timestamps without an offset
+MPESA_STATEMENT_TIMEZONE = 'Africa/Nairobi'
+
 # Create logs directory if it doesn't exist
 (BASE_DIR / 'logs').mkdir(exist_ok=True)
@@ -6,11 +6,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.http import JsonResponse
 from django.middleware.csrf import get_token
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 
+from .renderers import JsonResponse
+
 # ============================================================================
 # Root-Level Views for Frontend Compatibility
 # ============================================================================
@@ -53,6 +54,7 @@ def api_root(request):
         'documentation': 'Coming soon',
         'endpoints': {
             'accounts': '/accounts/',
+            'chamas': '/api/v1/chamas/',
             'csrf': '/csrf-token/',
             'health': '/health/',
             'admin': '/admin/'
@@ -70,8 +72,10 @@ api_v1_patterns = [
     # Accounts app
     path('accounts/', include('accounts.urls')),
     
+    # Chamas app
+    path('chamas/', include('chamas.urls')),
+    
     # Add other apps here when created
-    # path('chamas/', include('chamas.urls')),
     # path('members/', include('members.urls')),
 ]
 
@@ -102,4 +106,6 @@ urlpatterns = [
 if settings.DEBUG:
     # Serve static files in development
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+    # Content-addressed uploads are served by config.media everywhere; this
+    # covers the rest of MEDIA_ROOT (exports, older uploads) in development
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
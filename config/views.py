@@ -3,7 +3,8 @@ Custom error handler views for ChamaNexus.
 """
 
 from django.shortcuts import render
-from django.http import JsonResponse
+
+from .renderers import JsonResponse
 
 def bad_request(request, exception):
     """400 Bad Request handler"""